@@ -0,0 +1,472 @@
+# coding=utf-8
+
+"""
+This module defines an offline benchmark suite driving the application created
+by `create_api` directly through its WSGI callable.
+
+Authentication goes through the real `MiddlewareAuth0` with a JSON Web Key Set
+written to a local file and tokens minted by `tests.utils.JwtIssuerLocal`,
+while Braintree is replaced by the `benchmarks.gateway.GatewayStub` with a
+configurable latency. No network access or configuration file is needed.
+
+For every scenario the suite reports the requests per second, the p50/p99
+latencies, the peak memory allocated per request and the number of memory
+blocks retained per request, and writes the results as JSON so that runs can be
+compared across commits, e.g.,
+
+    python -m benchmarks.bench --output before.json
+    git checkout <branch>
+    python -m benchmarks.bench --output after.json --compare before.json
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import argparse
+import datetime
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from typing import Dict, List, Optional
+
+import attrdict
+import falcon.testing
+
+from braintree_server.api import create_api
+from benchmarks.gateway import GatewayStub
+from tests import fixtures
+from tests.utils import JwtIssuerLocal
+
+
+# The settings shared by all scenarios.
+cfg_default = {
+    "logger_level": "CRITICAL",
+    "braintree": {
+        "environment": "sandbox",
+        "merchant_id": "benchmark",
+        "public_key": "benchmark",
+        "private_key": "benchmark",
+    },
+    "auth0": {
+        "domain": "benchmark.auth0.com",
+        "audience": "benchmark",
+        "client_id": "benchmark",
+        "client_secret": "benchmark",
+    },
+    "sentry": {"dsn": None},
+}
+
+path_customer = "/customer/{}".format(fixtures.CUSTOMER_ID)
+path_subscription = "/customer/{}/subscription/{}".format(
+    fixtures.CUSTOMER_ID,
+    fixtures.SUBSCRIPTION_ID,
+)
+
+body_customer = json.dumps({
+    "customer_id": fixtures.CUSTOMER_ID,
+    "email": fixtures.CUSTOMER_EMAIL,
+})
+body_subscription = json.dumps({
+    "payment_method_nonce": fixtures.PAYMENT_METHOD_NONCE,
+    "customer_id": fixtures.CUSTOMER_ID,
+    "plan_id": fixtures.PLAN_ID,
+})
+
+
+class Scenario(object):
+    """ A single request repeatedly issued against the application."""
+
+    def __init__(
+        self,
+        name: str,
+        method: str,
+        path: str,
+        status: int,
+        body: Optional[str] = None,
+        cfg: Optional[Dict] = None,
+        customer: Optional[Dict] = None,
+    ):
+        """ Constructor.
+
+        Args:
+            name (str): The scenario name used as the key of its results.
+            method (str): The HTTP method.
+            path (str): The request path.
+            status (int): The expected response status code.
+            body (Optional[str] = None): The request body.
+            cfg (Optional[Dict] = None): Settings overriding the defaults.
+            customer (Optional[Dict] = None): The customer returned by the
+                stubbed gateway.
+        """
+
+        self.name = name
+        self.method = method
+        self.path = path
+        self.status = status
+        self.body = body
+        self.cfg = cfg or {}
+        self.customer = customer
+
+
+scenarios = [
+    Scenario("ping", "GET", "/ping", 200),
+    Scenario("client_token_get", "GET", "/client-token", 200),
+    Scenario(
+        "client_token_customer_get",
+        "GET",
+        "/client-token/{}".format(fixtures.CUSTOMER_ID),
+        200,
+    ),
+    Scenario("customer_get", "GET", path_customer, 200),
+    Scenario("customer_post", "POST", "/customer", 201, body=body_customer),
+    Scenario("customer_delete", "DELETE", path_customer, 204),
+    Scenario("subscription_get", "GET", path_subscription, 200),
+    Scenario(
+        "subscription_post",
+        "POST",
+        "/customer/{}/subscription".format(fixtures.CUSTOMER_ID),
+        201,
+        body=body_subscription,
+    ),
+    Scenario("subscription_delete", "DELETE", path_subscription, 204),
+]
+
+# Compare the response-validation modes on a customer with many
+# payment-methods.
+scenarios += [
+    Scenario(
+        "customer_get_large[validation={}]".format(mode),
+        "GET",
+        path_customer,
+        200,
+        cfg={"response_validation": {"mode": mode}},
+        customer=fixtures.customer_with_payment_methods,
+    )
+    for mode in ["full", "sampled", "off"]
+]
+
+
+def get_percentile(values: List[int], fraction: float) -> int:
+    """ Retrieves a percentile of sorted values.
+
+    Args:
+        values (List[int]): The sorted values.
+        fraction (float): The percentile as a fraction, e.g., `0.99`.
+
+    Returns:
+        int: The percentile value.
+    """
+
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+
+    return values[index]
+
+
+def get_commit() -> Optional[str]:
+    """ Retrieves the hash of the checked-out commit.
+
+    Returns:
+        Optional[str]: The commit hash or `None` if it can't be retrieved.
+    """
+
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            stderr=subprocess.DEVNULL,
+        ).decode("utf-8").strip()
+    except Exception:
+        return None
+
+
+class Runner(object):
+    """ Class running benchmark scenarios against the WSGI application."""
+
+    def __init__(self, num_requests: int, num_warmup: int, latency: float):
+        """ Constructor.
+
+        Args:
+            num_requests (int): The number of timed requests per scenario.
+            num_warmup (int): The number of untimed requests issued before the
+                timed ones.
+            latency (float): The latency in seconds of every gateway call.
+        """
+
+        self.num_requests = num_requests
+        self.num_warmup = num_warmup
+        self.latency = latency
+
+        self.dir_tmp = tempfile.mkdtemp(prefix="braintree-gateway-bench-")
+
+        # Mint a service-to-service token with a local key and write the
+        # matching JWKS to a file read by the Auth0 middleware.
+        self.issuer = JwtIssuerLocal(
+            auth0_domain=cfg_default["auth0"]["domain"],
+            auth0_audience=cfg_default["auth0"]["audience"],
+            subject="{}@clients".format(cfg_default["auth0"]["client_id"]),
+        )
+        self.jwks_url = self.issuer.write_jwks(
+            fname=os.path.join(self.dir_tmp, "jwks.json"),
+        )
+        self.headers = {
+            "Authorization": "Bearer {}".format(self.issuer.generate()),
+            "Content-Type": "application/json",
+        }
+
+    def create_app(self, scenario: Scenario):
+        """ Creates the application for a scenario.
+
+        Args:
+            scenario (Scenario): The scenario.
+
+        Returns:
+            falcon.API: The application.
+        """
+
+        cfg = json.loads(json.dumps(cfg_default))
+        cfg["auth0"]["jwks_url"] = self.jwks_url
+        cfg.update(scenario.cfg)
+
+        return create_api(
+            cfg=attrdict.AttrDict(cfg),
+            logger_level="CRITICAL",
+            gateway=GatewayStub(
+                latency=self.latency,
+                customer=scenario.customer,
+            ),
+        )
+
+    def create_environ(self, scenario: Scenario) -> Dict:
+        """ Creates the WSGI environment of a scenario request.
+
+        Args:
+            scenario (Scenario): The scenario.
+
+        Returns:
+            Dict: The WSGI environment.
+        """
+
+        return falcon.testing.create_environ(
+            method=scenario.method,
+            path=scenario.path,
+            headers=self.headers,
+            body=scenario.body or "",
+        )
+
+    @staticmethod
+    def call(app, environ: Dict) -> int:
+        """ Calls the WSGI application consuming the entire response.
+
+        Args:
+            app (falcon.API): The application.
+            environ (Dict): The WSGI environment.
+
+        Returns:
+            int: The response status code.
+        """
+
+        status = []
+
+        def start_response(status_line, headers, exc_info=None):
+            status.append(status_line)
+
+        iterable = app(environ, start_response)
+        for _ in iterable:
+            pass
+        if hasattr(iterable, "close"):
+            iterable.close()
+
+        return int(status[0][:3])
+
+    def run(self, scenario: Scenario) -> Dict:
+        """ Runs a scenario and returns its results.
+
+        Args:
+            scenario (Scenario): The scenario.
+
+        Returns:
+            Dict: The scenario results.
+        """
+
+        app = self.create_app(scenario=scenario)
+
+        # Warm up the application, e.g., schema variants and JWT decoding.
+        for _ in range(self.num_warmup):
+            status = self.call(app, self.create_environ(scenario=scenario))
+            if status != scenario.status:
+                msg = "Scenario '{}' responded with {} instead of {}."
+                raise RuntimeError(
+                    msg.format(scenario.name, status, scenario.status)
+                )
+
+        # Create the environments upfront so that only the application is
+        # timed.
+        environs = [
+            self.create_environ(scenario=scenario)
+            for _ in range(self.num_requests)
+        ]
+
+        latencies = []
+        gc.collect()
+        start = time.perf_counter_ns()
+        for environ in environs:
+            request_start = time.perf_counter_ns()
+            self.call(app, environ)
+            latencies.append(time.perf_counter_ns() - request_start)
+        elapsed = time.perf_counter_ns() - start
+
+        # Measure allocations in a separate pass as tracing distorts timings.
+        num_alloc = max(1, self.num_requests // 10)
+        environs = [
+            self.create_environ(scenario=scenario)
+            for _ in range(num_alloc)
+        ]
+        peaks = []
+        tracemalloc.start()
+        gc.collect()
+        blocks_start = sys.getallocatedblocks()
+        for environ in environs:
+            tracemalloc.clear_traces()
+            self.call(app, environ)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        gc.collect()
+        blocks_retained = sys.getallocatedblocks() - blocks_start
+        tracemalloc.stop()
+
+        latencies.sort()
+
+        return {
+            "requests": self.num_requests,
+            "rps": round(self.num_requests / (elapsed / 1e9), 1),
+            "p50_ms": round(get_percentile(latencies, 0.50) / 1e6, 4),
+            "p99_ms": round(get_percentile(latencies, 0.99) / 1e6, 4),
+            "alloc_peak_kib": round(sum(peaks) / len(peaks) / 1024, 2),
+            "alloc_blocks_retained": round(blocks_retained / num_alloc, 2),
+        }
+
+
+def compare(results: Dict, results_baseline: Dict) -> str:
+    """ Formats a comparison of results against baseline results.
+
+    Args:
+        results (Dict): The results.
+        results_baseline (Dict): The baseline results.
+
+    Returns:
+        str: The comparison table.
+    """
+
+    metrics = ["rps", "p50_ms", "p99_ms", "alloc_peak_kib"]
+
+    lines = ["{:<40}".format("scenario") + "".join(
+        "{:>22}".format(metric) for metric in metrics
+    )]
+    for name, result in results["results"].items():
+        result_baseline = results_baseline["results"].get(name)
+        if result_baseline is None:
+            continue
+
+        cells = []
+        for metric in metrics:
+            value = result[metric]
+            value_baseline = result_baseline[metric]
+            change = (
+                (value - value_baseline) / value_baseline * 100
+                if value_baseline else 0.0
+            )
+            cells.append("{:>22}".format(
+                "{:.4g} ({:+.1f}%)".format(value, change)
+            ))
+        lines.append("{:<40}".format(name) + "".join(cells))
+
+    return "\n".join(lines)
+
+
+def main(arguments: Optional[List[str]] = None):
+
+    argument_parser = argparse.ArgumentParser(
+        description="Offline benchmark suite of the braintree-gateway API.",
+    )
+    argument_parser.add_argument(
+        "--requests",
+        dest="num_requests",
+        type=int,
+        default=2000,
+        help="The number of timed requests per scenario.",
+    )
+    argument_parser.add_argument(
+        "--warmup",
+        dest="num_warmup",
+        type=int,
+        default=200,
+        help="The number of untimed requests per scenario.",
+    )
+    argument_parser.add_argument(
+        "--latency",
+        dest="latency",
+        type=float,
+        default=0.0,
+        help="The latency in seconds of every stubbed gateway call.",
+    )
+    argument_parser.add_argument(
+        "--scenarios",
+        dest="scenarios",
+        default=None,
+        help="Comma-delimited names of the scenarios to run.",
+    )
+    argument_parser.add_argument(
+        "--output",
+        dest="output",
+        default=None,
+        help="The path of the JSON file the results are written to.",
+    )
+    argument_parser.add_argument(
+        "--compare",
+        dest="compare",
+        default=None,
+        help="The path of a JSON results file to compare against.",
+    )
+
+    args = argument_parser.parse_args(arguments)
+
+    names = args.scenarios.split(",") if args.scenarios else None
+
+    runner = Runner(
+        num_requests=args.num_requests,
+        num_warmup=args.num_warmup,
+        latency=args.latency,
+    )
+
+    results = {
+        "meta": {
+            "commit": get_commit(),
+            "timestamp": datetime.datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.num_requests,
+            "warmup": args.num_warmup,
+            "latency": args.latency,
+        },
+        "results": {},
+    }
+
+    for scenario in scenarios:
+        if names and scenario.name not in names:
+            continue
+
+        results["results"][scenario.name] = runner.run(scenario=scenario)
+        print(scenario.name, json.dumps(results["results"][scenario.name]))
+
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(results, fout, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fin:
+            print(compare(results=results, results_baseline=json.load(fin)))
+
+
+if __name__ == "__main__":
+    main()
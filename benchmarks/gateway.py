@@ -0,0 +1,122 @@
+# coding=utf-8
+
+"""
+This module defines a `GatewayStub` class standing in for the
+`braintree.BraintreeGateway` in benchmarks. It answers every call the
+resources make with the objects defined under `tests/fixtures.py` after
+sleeping for a configurable latency simulating the round-trip to Braintree.
+"""
+
+import time
+
+import braintree.exceptions
+
+from tests import fixtures
+
+
+class _Api(object):
+    """ Base class of the stubbed gateway APIs."""
+
+    def __init__(self, latency: float):
+        """ Constructor.
+
+        Args:
+            latency (float): The number of seconds every call sleeps for.
+        """
+
+        self.latency = latency
+
+    def _wait(self):
+        """ Sleeps for the configured latency."""
+
+        if self.latency:
+            time.sleep(self.latency)
+
+
+class _CustomerApi(_Api):
+    """ Stub of the `braintree.CustomerGateway`."""
+
+    def __init__(self, latency: float, customer: dict):
+        super(_CustomerApi, self).__init__(latency=latency)
+
+        self.customer = customer
+
+    def find(self, customer_id):
+        self._wait()
+
+        if customer_id != fixtures.CUSTOMER_ID:
+            raise braintree.exceptions.NotFoundError()
+
+        return self.customer
+
+    def create(self, params):
+        self._wait()
+
+        return fixtures.result_customer_success
+
+    def delete(self, customer_id):
+        self._wait()
+
+        return fixtures.result_success
+
+
+class _SubscriptionApi(_Api):
+    """ Stub of the `braintree.SubscriptionGateway`."""
+
+    def find(self, subscription_id):
+        self._wait()
+
+        if subscription_id != fixtures.SUBSCRIPTION_ID:
+            raise braintree.exceptions.NotFoundError()
+
+        return fixtures.subscription
+
+    def create(self, params):
+        self._wait()
+
+        return fixtures.result_subscription_success
+
+    def cancel(self, subscription_id):
+        self._wait()
+
+        return fixtures.result_success
+
+
+class _PaymentMethodApi(_Api):
+    """ Stub of the `braintree.PaymentMethodGateway`."""
+
+    def create(self, params):
+        self._wait()
+
+        return fixtures.result_payment_method_success
+
+
+class _ClientTokenApi(_Api):
+    """ Stub of the `braintree.ClientTokenGateway`."""
+
+    def generate(self, params=None):
+        self._wait()
+
+        return fixtures.CLIENT_TOKEN
+
+
+class GatewayStub(object):
+    """ Stateless stand-in for the `braintree.BraintreeGateway`."""
+
+    def __init__(self, latency: float = 0.0, customer: dict = None):
+        """ Constructor.
+
+        Args:
+            latency (float): The number of seconds every gateway call sleeps
+                for.
+            customer (dict): The customer returned by `customer.find`.
+                Defaults to `tests.fixtures.customer`.
+        """
+
+        self.customer = _CustomerApi(
+            latency=latency,
+            customer=customer or fixtures.customer,
+        )
+        self.subscription = _SubscriptionApi(latency=latency)
+        self.payment_method = _PaymentMethodApi(latency=latency)
+        self.client_token = _ClientTokenApi(latency=latency)
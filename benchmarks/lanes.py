@@ -0,0 +1,200 @@
+# coding=utf-8
+
+"""
+This module benchmarks the responsiveness of cheap requests during a burst of
+expensive mutations with and without the priority lanes of the
+`MiddlewarePriority`.
+
+A `gunicorn` worker with a fixed number of threads is simulated through a
+thread pool. A burst of subscription creations, each making several stubbed
+Braintree calls, is submitted at once followed by a steady stream of cached
+customer retrievals. The latencies, including the time spent waiting for a
+thread, of both kinds of requests and the number of shed mutations are
+reported per configuration, e.g.,
+
+    python -m benchmarks.lanes --threads 8 --latency 0.05
+"""
+
+import json
+import time
+import argparse
+import concurrent.futures
+from typing import Dict, List, Optional
+
+from benchmarks.bench import Runner, Scenario, get_percentile
+from benchmarks.bench import body_subscription, path_customer
+from tests import fixtures
+
+
+# The configurations compared.
+configurations = {
+    "lanes_off": {
+        "cache": {"ttl": 60},
+    },
+    "lanes_on": {
+        "cache": {"ttl": 60},
+        "priority": {"enabled": True},
+    },
+}
+
+scenario_mutation = Scenario(
+    "subscription_post",
+    "POST",
+    "/customer/{}/subscription".format(fixtures.CUSTOMER_ID),
+    201,
+    body=body_subscription,
+)
+scenario_read = Scenario("customer_get", "GET", path_customer, 200)
+
+
+def summarize(latencies: List[int]) -> Dict:
+    """ Summarizes latencies in nanoseconds into p50/p99 milliseconds."""
+
+    latencies = sorted(latencies)
+
+    return {
+        "p50_ms": round(get_percentile(latencies, 0.50) / 1e6, 2),
+        "p99_ms": round(get_percentile(latencies, 0.99) / 1e6, 2),
+    }
+
+
+def run(
+    runner: Runner,
+    cfg: Dict,
+    threads: int,
+    num_mutations: int,
+    num_reads: int,
+    read_interval: float,
+) -> Dict:
+    """ Runs a burst of mutations alongside a stream of reads.
+
+    Args:
+        runner (Runner): The runner creating the application and requests.
+        cfg (Dict): The settings overriding the defaults.
+        threads (int): The number of threads of the simulated worker.
+        num_mutations (int): The number of mutations in the burst.
+        num_reads (int): The number of reads.
+        read_interval (float): The number of seconds between reads.
+
+    Returns:
+        Dict: The results.
+    """
+
+    scenario_mutation.cfg = cfg
+    app = runner.create_app(scenario=scenario_mutation)
+
+    # Warm up the cache of the read.
+    runner.call(app, runner.create_environ(scenario=scenario_read))
+
+    def call(environ: Dict, submitted: int):
+        status = runner.call(app, environ)
+        return status, time.perf_counter_ns() - submitted
+
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        futures_mutations = [
+            executor.submit(
+                call,
+                runner.create_environ(scenario=scenario_mutation),
+                time.perf_counter_ns(),
+            )
+            for _ in range(num_mutations)
+        ]
+
+        futures_reads = []
+        for _ in range(num_reads):
+            futures_reads.append(executor.submit(
+                call,
+                runner.create_environ(scenario=scenario_read),
+                time.perf_counter_ns(),
+            ))
+            time.sleep(read_interval)
+
+        mutations = [future.result() for future in futures_mutations]
+        reads = [future.result() for future in futures_reads]
+
+    return {
+        "reads": summarize([latency for _, latency in reads]),
+        "mutations": dict(
+            summarize([
+                latency for status, latency in mutations
+                if status == scenario_mutation.status
+            ] or [0]),
+            admitted=sum(
+                status == scenario_mutation.status for status, _ in mutations
+            ),
+            shed=sum(status == 503 for status, _ in mutations),
+        ),
+    }
+
+
+def main(arguments: Optional[List[str]] = None):
+
+    argument_parser = argparse.ArgumentParser(
+        description=("Benchmarks cheap requests during a burst of mutations "
+                     "with and without priority lanes."),
+    )
+    argument_parser.add_argument(
+        "--threads",
+        dest="threads",
+        type=int,
+        default=8,
+        help="The number of threads of the simulated worker.",
+    )
+    argument_parser.add_argument(
+        "--latency",
+        dest="latency",
+        type=float,
+        default=0.05,
+        help="The latency in seconds of every stubbed gateway call.",
+    )
+    argument_parser.add_argument(
+        "--mutations",
+        dest="num_mutations",
+        type=int,
+        default=64,
+        help="The number of mutations in the burst.",
+    )
+    argument_parser.add_argument(
+        "--reads",
+        dest="num_reads",
+        type=int,
+        default=200,
+        help="The number of reads issued during the burst.",
+    )
+    argument_parser.add_argument(
+        "--read-interval",
+        dest="read_interval",
+        type=float,
+        default=0.002,
+        help="The number of seconds between reads.",
+    )
+    argument_parser.add_argument(
+        "--output",
+        dest="output",
+        default=None,
+        help="The path of the JSON file the results are written to.",
+    )
+
+    args = argument_parser.parse_args(arguments)
+
+    runner = Runner(num_requests=0, num_warmup=0, latency=args.latency)
+
+    results = {}
+    for name, cfg in configurations.items():
+        results[name] = run(
+            runner=runner,
+            cfg=cfg,
+            threads=args.threads,
+            num_mutations=args.num_mutations,
+            num_reads=args.num_reads,
+            read_interval=args.read_interval,
+        )
+        print(name, json.dumps(results[name]))
+
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(results, fout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
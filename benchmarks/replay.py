@@ -0,0 +1,218 @@
+# coding=utf-8
+
+"""
+This module replays the incoming requests recorded in a cassette against the
+application created by `create_api` while serving the Braintree exchanges
+from the same cassette, i.e., without network access.
+
+For every endpoint the replay reports the number of requests, the number of
+Braintree calls made per request when recording and when replaying, the
+p50/p99 latencies, and the number of responses whose status differs from the
+recorded one. It exits with a non-zero status should any endpoint make more
+Braintree calls than recorded so that extra round trips surface in review,
+e.g.,
+
+    python -m benchmarks.replay --cassette traffic.jsonl --latency-scale 1
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import functools
+import collections
+from typing import Dict, List, Optional
+
+import attrdict
+import braintree
+import falcon.testing
+
+from braintree_server.api import create_api
+from braintree_server.transport import Cassette, HttpReplayer
+from benchmarks.bench import Runner, cfg_default, get_commit, get_percentile
+from tests.utils import JwtIssuerLocal
+
+
+def load_requests(path_cassette: str) -> List[Dict]:
+    """ Loads the episodes of a cassette pertaining to incoming requests.
+
+    Args:
+        path_cassette (str): The path of the cassette file.
+
+    Returns:
+        List[Dict]: The episodes.
+    """
+
+    return [
+        episode for episode in Cassette.load(path=path_cassette)
+        if episode.get("request") is not None
+    ]
+
+
+def replay(
+    path_cassette: str,
+    latency_scale: float = 1.0,
+) -> Dict:
+    """ Replays the incoming requests recorded in a cassette.
+
+    Args:
+        path_cassette (str): The path of the cassette file.
+        latency_scale (float): The factor the recorded Braintree durations are
+            multiplied by.
+
+    Returns:
+        Dict: The results keyed by endpoint, e.g.,
+            `GET /customer/{customer_id}`.
+    """
+
+    # Mint a service-to-service token, which is authorized to access any
+    # customer, with a local key and write the matching JWKS to a file.
+    issuer = JwtIssuerLocal(
+        auth0_domain=cfg_default["auth0"]["domain"],
+        auth0_audience=cfg_default["auth0"]["audience"],
+        subject="{}@clients".format(cfg_default["auth0"]["client_id"]),
+    )
+    jwks_url = issuer.write_jwks(
+        fname=os.path.join(
+            tempfile.mkdtemp(prefix="braintree-gateway-replay-"),
+            "jwks.json",
+        ),
+    )
+    headers = {
+        "Authorization": "Bearer {}".format(issuer.generate()),
+        "Content-Type": "application/json",
+    }
+
+    cfg = json.loads(json.dumps(cfg_default))
+    cfg["auth0"]["jwks_url"] = jwks_url
+
+    # Create the gateway serving the recorded Braintree exchanges and retrieve
+    # its transport to count the calls made per request.
+    gateway = braintree.BraintreeGateway(
+        braintree.Configuration(
+            environment=cfg["braintree"]["environment"],
+            merchant_id=cfg["braintree"]["merchant_id"],
+            public_key=cfg["braintree"]["public_key"],
+            private_key=cfg["braintree"]["private_key"],
+            http_strategy=functools.partial(
+                HttpReplayer,
+                episodes=Cassette.load(path=path_cassette),
+                latency_scale=latency_scale,
+            ),
+        )
+    )
+    transport = gateway.config.http_strategy()
+
+    app = create_api(
+        cfg=attrdict.AttrDict(cfg),
+        logger_level="CRITICAL",
+        gateway=gateway,
+    )
+
+    latencies = collections.defaultdict(list)  # type: Dict[str, List[int]]
+    calls_recorded = collections.Counter()
+    calls_replayed = collections.Counter()
+    mismatches = collections.Counter()
+
+    for episode in load_requests(path_cassette=path_cassette):
+        request = episode["request"]
+        endpoint = "{} {}".format(request["method"], request["route"])
+
+        environ = falcon.testing.create_environ(
+            method=request["method"],
+            path=request["path"],
+            headers=headers,
+            body=request["body"] or "",
+        )
+
+        transport.reset_calls_thread()
+        start = time.perf_counter_ns()
+        status = Runner.call(app, environ)
+        latencies[endpoint].append(time.perf_counter_ns() - start)
+
+        calls_recorded[endpoint] += len(episode["interactions"])
+        calls_replayed[endpoint] += transport.get_calls_thread()
+        if status != episode["response"]["status"]:
+            mismatches[endpoint] += 1
+
+    results = {}
+    for endpoint, values in sorted(latencies.items()):
+        values.sort()
+        results[endpoint] = {
+            "requests": len(values),
+            "upstream_calls_recorded": round(
+                calls_recorded[endpoint] / len(values), 2
+            ),
+            "upstream_calls_replayed": round(
+                calls_replayed[endpoint] / len(values), 2
+            ),
+            "p50_ms": round(get_percentile(values, 0.50) / 1e6, 4),
+            "p99_ms": round(get_percentile(values, 0.99) / 1e6, 4),
+            "status_mismatches": mismatches[endpoint],
+        }
+
+    return results
+
+
+def main(arguments: Optional[List[str]] = None):
+
+    argument_parser = argparse.ArgumentParser(
+        description="Replays the requests recorded in a cassette.",
+    )
+    argument_parser.add_argument(
+        "--cassette",
+        dest="cassette",
+        required=True,
+        help="The path of the cassette file.",
+    )
+    argument_parser.add_argument(
+        "--latency-scale",
+        dest="latency_scale",
+        type=float,
+        default=1.0,
+        help="The factor the recorded Braintree durations are multiplied by.",
+    )
+    argument_parser.add_argument(
+        "--output",
+        dest="output",
+        default=None,
+        help="The path of the JSON file the results are written to.",
+    )
+
+    args = argument_parser.parse_args(arguments)
+
+    results = {
+        "meta": {
+            "commit": get_commit(),
+            "cassette": args.cassette,
+            "latency_scale": args.latency_scale,
+        },
+        "results": replay(
+            path_cassette=args.cassette,
+            latency_scale=args.latency_scale,
+        ),
+    }
+
+    for endpoint, result in results["results"].items():
+        print(endpoint, json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(results, fout, indent=2)
+
+    # Fail should any endpoint make more Braintree calls than recorded.
+    regressions = [
+        endpoint for endpoint, result in results["results"].items()
+        if result["upstream_calls_replayed"] >
+        result["upstream_calls_recorded"]
+    ]
+    if regressions:
+        msg = "Endpoints making more Braintree calls than recorded: {}"
+        print(msg.format(", ".join(regressions)), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
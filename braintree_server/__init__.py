@@ -9,6 +9,17 @@ __version__ = '0.4.0'
 from braintree_server import config
 from braintree_server import excs
 from braintree_server import loggers
+from braintree_server import cache
+from braintree_server import metrics
+from braintree_server import timing
+from braintree_server import limiter
+from braintree_server import deadline
+from braintree_server import idempotency
+from braintree_server import webhooks
+from braintree_server import profiler
+from braintree_server import errors
+from braintree_server import gateway_fake
+from braintree_server import transport
 from braintree_server import middlewares
 from braintree_server import resources
 from braintree_server import api
@@ -1,13 +1,53 @@
 # coding=utf-8
 
+import functools
+from typing import Optional
+
 import attrdict
 import falcon
 import braintree
 
 from braintree_server.loggers import create_logger
+from braintree_server.loggers import enable_logging_queue
+from braintree_server.loggers import set_log_format
+from braintree_server.loggers import set_log_sampling
+from braintree_server.cache import CacheMemory
+from braintree_server.cache import CacheNegative
+from braintree_server.cache_shared import CacheShared
+from braintree_server.cache_shared import CacheTiered
+from braintree_server.revalidation import Revalidator
+from braintree_server.metrics import create_store
+from braintree_server.profiler import Profiler
+from braintree_server.idempotency import create_idempotency_store
+from braintree_server.replica import Replica
+from braintree_server.webhooks import WebhookConsumer
+from braintree_server.warmup import CacheSnapshot
+from braintree_server.warmup import warm_up
+from braintree_server.errors import ErrorHandler
+from braintree_server.excs import DeadlineExceeded
+from braintree_server.excs import ServiceOverloaded
+from braintree_server.limiter import LimiterAimd
+from braintree_server.gateway_fake import GatewayFake
+from braintree_server.transport import Cassette
+from braintree_server.transport import HttpCounting
+from braintree_server.transport import HttpCounted
+from braintree_server.transport import HttpRecorder
+from braintree_server.transport import HttpReplayer
+from braintree_server.middlewares.cassette import MiddlewareCassette
+from braintree_server.middlewares.context import MiddlewareRequestContext
+from braintree_server.middlewares.metrics import MiddlewareMetrics
+from braintree_server.middlewares.timing import MiddlewareTiming
 from braintree_server.middlewares.auth0 import MiddlewareCors
 from braintree_server.middlewares.auth0 import MiddlewareAuth0
+from braintree_server.middlewares.priority import MiddlewarePriority
+from braintree_server.middlewares.deadline import MiddlewareDeadline
+from braintree_server.middlewares.idempotency import MiddlewareIdempotency
 from braintree_server.resources.resource_ping import ResourcePing
+from braintree_server.resources.resource_metrics import ResourceMetrics
+from braintree_server.resources.resource_profile import ResourceProfile
+from braintree_server.resources.resource_webhook import (
+    ResourceWebhookBraintree,
+)
 from braintree_server.resources.resource_customer import ResourceCustomer
 from braintree_server.resources.resource_subscription import (
     ResourceSubscription
@@ -20,7 +60,8 @@ from braintree_server.resources.resource_client_token import (
 
 def create_api(
     cfg: attrdict.AttrDict,
-    logger_level: str
+    logger_level: str,
+    gateway: Optional[braintree.BraintreeGateway] = None,
 ):
     """ Creates a Falcon API and adds resources the different endpoints.
 
@@ -29,42 +70,347 @@ def create_api(
             methods under the `config.py` module.
         logger_level (str): The logger level to be set in the Falcon resource
             classes.
+        gateway (Optional[braintree.BraintreeGateway] = None): The Braintree
+            gateway to be used by the resources. Defaults to a `GatewayFake`
+            if enabled through the `braintree_fake` settings or a gateway
+            created from the `braintree` settings otherwise.
 
     Returns:
         falcon.api.API: The instantiate Falcon API.
     """
 
+    # Set the format of the log records and the fraction of requests whose
+    # records are emitted per route and level.
+    cfg_logging = cfg.get("logging") or {}
+    set_log_format(log_format=cfg_logging.get("format", "text"))
+    set_log_sampling(sampling=cfg_logging.get("sampling"))
+
+    # Hand the log records to a bounded queue drained by a listener thread
+    # should it have been enabled.
+    cfg_logging_queue = cfg.get("logging_queue") or {}
+    if cfg_logging_queue.get("enabled"):
+        enable_logging_queue(
+            queue_size=cfg_logging_queue.get("size", 10000),
+            overflow=cfg_logging_queue.get("overflow", "drop"),
+            block_timeout=cfg_logging_queue.get("block_timeout"),
+        )
+
     # Create logger.
     logger = create_logger(
         logger_name=__name__,
         logger_level=logger_level
     )
 
-    gateway = braintree.BraintreeGateway(
-        braintree.Configuration(
-            environment=cfg.braintree.environment,
-            merchant_id=cfg.braintree.merchant_id,
-            public_key=cfg.braintree.public_key,
-            private_key=cfg.braintree.private_key,
+    cfg_fake = cfg.get("braintree_fake") or {}
+    if gateway is None and cfg_fake.get("enabled"):
+        msg_fmt = u"Using the in-memory fake of the Braintree gateway."
+        logger.warning(msg_fmt)
+
+        gateway = GatewayFake(
+            latency=cfg_fake.get("latency"),
+            error_rate=cfg_fake.get("error_rate", 0.0),
+            rate_limit=cfg_fake.get("rate_limit"),
+            plans=cfg_fake.get("plans"),
+            seed=cfg_fake.get("seed"),
+            logger_level=logger_level,
         )
+
+    # Record the Braintree exchanges into, or replay them from, a cassette
+    # should a cassette mode have been configured.
+    cfg_cassette = cfg.get("cassette") or {}
+    cassette = None
+    http_strategy = HttpCounted
+    if cfg_cassette.get("mode") == "record":
+        msg = u"Recording Braintree exchanges into cassette '{}'."
+        msg_fmt = msg.format(cfg_cassette["path"])
+        logger.warning(msg_fmt)
+
+        cassette = Cassette(path=cfg_cassette["path"])
+        http_strategy = functools.partial(HttpRecorder, cassette=cassette)
+    elif cfg_cassette.get("mode") == "replay":
+        msg = u"Replaying Braintree exchanges from cassette '{}'."
+        msg_fmt = msg.format(cfg_cassette["path"])
+        logger.warning(msg_fmt)
+
+        http_strategy = functools.partial(
+            HttpReplayer,
+            episodes=Cassette.load(path=cfg_cassette["path"]),
+            latency_scale=cfg_cassette.get("latency_scale", 1.0),
+        )
+
+    # Limit the concurrent Braintree requests shedding those over the limit
+    # should the limiter have been enabled.
+    cfg_limiter = cfg.get("concurrency_limit") or {}
+    if cfg_limiter.get("enabled"):
+        http_strategy = functools.partial(
+            http_strategy,
+            limiter=LimiterAimd(
+                limit_initial=cfg_limiter.get("limit_initial", 20),
+                limit_min=cfg_limiter.get("limit_min", 1),
+                limit_max=cfg_limiter.get("limit_max", 200),
+                latency_threshold=cfg_limiter.get("latency_threshold", 1.0),
+                backoff_ratio=cfg_limiter.get("backoff_ratio", 0.9),
+                retry_after=cfg_limiter.get("retry_after", 1),
+            ),
+        )
+
+    if gateway is None:
+        gateway = braintree.BraintreeGateway(
+            braintree.Configuration(
+                environment=cfg.braintree.environment,
+                merchant_id=cfg.braintree.merchant_id,
+                public_key=cfg.braintree.public_key,
+                private_key=cfg.braintree.private_key,
+                http_strategy=http_strategy,
+            )
+        )
+
+    # Create the in-process response cache should a time-to-live have been
+    # configured. Expired entries are kept for the longest of the windows
+    # they may still be served within.
+    cfg_cache = cfg.get("cache") or {}
+    ttl_stale = max(
+        cfg_cache.get("stale_while_revalidate", 0),
+        cfg_cache.get("stale_if_error", 0),
     )
+    if cfg_cache.get("ttl"):
+        cache = CacheMemory(
+            ttl=cfg_cache["ttl"],
+            max_entries=cfg_cache.get("max_entries", 10000),
+            ttl_stale=ttl_stale,
+        )
+    else:
+        cache = None
 
-    # Create the API.
-    api = falcon.API(
-        middleware=[
-            # Instantiate and add the CORS middleware.
-            MiddlewareCors(logger_level=logger_level),
-            # Instantiate and add the Auth0 authentication middleware.
-            MiddlewareAuth0(
-                auth0_domain=cfg.auth0.domain,
-                auth0_audience=cfg.auth0.audience,
-                auth0_jwks_url=cfg.auth0.jwks_url,
-                exlcude=["/ping"],
-                logger_level=logger_level,
+    # Layer the in-process cache over a cache shared by the workers of the
+    # host should the shared tier have been enabled.
+    cfg_cache_shared = cfg_cache.get("shared") or {}
+    if cache is not None and cfg_cache_shared.get("enabled"):
+        cache = CacheTiered(
+            memory=cache,
+            shared=CacheShared(
+                path=cfg_cache_shared["path"],
+                ttl=cfg_cache["ttl"],
+                ttl_stale=ttl_stale,
+                size=cfg_cache_shared.get("size", 64 * 1024 * 1024),
+                slot_size=cfg_cache_shared.get("slot_size", 16384),
             ),
-        ],
+        )
+
+    # Persist the in-process response cache to a snapshot file loaded by the
+    # workers when forked (if enabled).
+    cfg_cache_snapshot = cfg_cache.get("snapshot") or {}
+    if cache is not None and cfg_cache_snapshot.get("enabled"):
+        snapshot = CacheSnapshot(
+            path=cfg_cache_snapshot["path"],
+            cache=cache,
+            interval=cfg_cache_snapshot.get("interval", 60.0),
+            logger_level=logger_level,
+        )
+    else:
+        snapshot = None
+
+    # Create the runner of the background refreshes of expired cached
+    # responses should a stale-while-revalidate window have been configured.
+    if cache is not None and cfg_cache.get("stale_while_revalidate"):
+        revalidator = Revalidator(
+            max_workers=cfg_cache.get("revalidation_workers", 2),
+            logger_level=logger_level,
+        )
+    else:
+        revalidator = None
+
+    # Create the cache of the customers and subscriptions recently not found
+    # should it have been enabled. Its entries follow the invalidations of the
+    # shared cache tier (if any).
+    cfg_cache_negative = cfg_cache.get("negative") or {}
+    if cfg_cache_negative.get("enabled"):
+        cache_negative = CacheNegative(
+            ttl=cfg_cache_negative.get("ttl", 30.0),
+            max_entries=cfg_cache_negative.get("max_entries", 10000),
+            versions=cache.shared if isinstance(cache, CacheTiered) else None,
+        )
+    else:
+        cache_negative = None
+
+    # Retrieve the HTTP strategy of the gateway should it count the Braintree
+    # calls made per request. The fake gateway counts its calls itself.
+    transport = None
+    if isinstance(getattr(gateway, "config", None), braintree.Configuration):
+        if isinstance(gateway.config.http_strategy(), HttpCounting):
+            transport = gateway.config.http_strategy()
+    elif isinstance(gateway, GatewayFake):
+        transport = gateway
+
+    # Create the store aggregating the metrics across processes should the
+    # metrics have been enabled. The `/metrics` route is unauthenticated so
+    # it's only exposed upon opting in.
+    cfg_metrics = cfg.get("metrics") or {}
+    if cfg_metrics.get("enabled", False):
+        store = create_store(
+            directory=cfg_metrics.get("directory"),
+            flush_interval=cfg_metrics.get("flush_interval", 1.0),
+        )
+    else:
+        store = None
+
+    # Create the local replica of customers and subscriptions should it have
+    # been enabled.
+    cfg_replica = cfg.get("replica") or {}
+    if cfg_replica.get("enabled"):
+        replica = Replica(
+            path=cfg_replica["path"],
+            reconcile_interval=cfg_replica.get("reconcile_interval", 60.0),
+            reconcile_batch=cfg_replica.get("reconcile_batch", 50),
+            reconcile_age=cfg_replica.get("reconcile_age", 300.0),
+            logger_level=logger_level,
+        )
+    else:
+        replica = None
+
+    # Create the consumer applying Braintree webhook notifications to the
+    # cached responses should the webhook route have been enabled.
+    cfg_webhooks = cfg.get("webhooks") or {}
+    if cfg_webhooks.get("enabled"):
+        consumer = WebhookConsumer(
+            gateway=gateway,
+            cache=cache,
+            replica=replica,
+            queue_size=cfg_webhooks.get("queue_size", 1000),
+            logger_level=logger_level,
+        )
+    else:
+        consumer = None
+
+    # Exclude the routes not called with access-tokens from authentication.
+    exclude = ["/ping"]
+    if store is not None:
+        exclude.append("/metrics")
+    if consumer is not None:
+        exclude.append("/webhooks/braintree")
+
+    middleware = [
+        # Instantiate and add the middleware recording the request metrics.
+        MiddlewareMetrics(logger_level=logger_level),
+        # Instantiate and add the middleware binding the request context.
+        MiddlewareRequestContext(
+            transport=transport,
+            logger_level=logger_level,
+        ),
+    ]
+
+    # Instantiate and add the middleware tracing the phases of requests (if
+    # enabled). Without it the phases are not timed.
+    cfg_timing = cfg.get("timing") or {}
+    if cfg_timing.get("enabled"):
+        middleware.append(
+            MiddlewareTiming(
+                sample_rate=cfg_timing.get("sample_rate", 0.0),
+                request_header=cfg_timing.get(
+                    "request_header",
+                    "X-Request-Timing",
+                ),
+                slow_threshold=cfg_timing.get("slow_threshold"),
+                logger_level=logger_level,
+            )
+        )
+
+    # Instantiate and add the middleware bounding the Braintree requests of
+    # requests by their deadline (if enabled).
+    cfg_deadline = cfg.get("deadline") or {}
+    if cfg_deadline.get("enabled"):
+        middleware.append(
+            MiddlewareDeadline(
+                request_header=cfg_deadline.get(
+                    "request_header",
+                    "X-Request-Timeout",
+                ),
+                default_timeout=cfg_deadline.get("default_timeout"),
+                routes=cfg_deadline.get("routes"),
+                logger_level=logger_level,
+            )
+        )
+
+    # Instantiate the Auth0 authentication middleware.
+    middleware_auth0 = MiddlewareAuth0(
+        auth0_domain=cfg.auth0.domain,
+        auth0_audience=cfg.auth0.audience,
+        auth0_jwks_url=cfg.auth0.jwks_url,
+        exlcude=exclude,
+        logger_level=logger_level,
     )
 
+    middleware += [
+        # Instantiate and add the CORS middleware.
+        MiddlewareCors(logger_level=logger_level),
+        # Add the Auth0 authentication middleware.
+        middleware_auth0,
+    ]
+
+    # Instantiate and add the middleware replaying the responses of requests
+    # retried with the same idempotency key (if enabled). It precedes the
+    # priority lanes so that replays and waiting duplicates take no slots.
+    cfg_idempotency = cfg.get("idempotency") or {}
+    if cfg_idempotency.get("enabled"):
+        middleware.append(
+            MiddlewareIdempotency(
+                store=create_idempotency_store(
+                    backend=cfg_idempotency.get("backend", "memory"),
+                    path=cfg_idempotency.get("path"),
+                    ttl=cfg_idempotency.get("ttl", 86400.0),
+                    lock_timeout=cfg_idempotency.get("lock_timeout", 60.0),
+                ),
+                routes=cfg_idempotency.get("routes"),
+                request_header=cfg_idempotency.get(
+                    "request_header",
+                    "Idempotency-Key",
+                ),
+                wait_timeout=cfg_idempotency.get("wait_timeout", 10.0),
+                transport=transport,
+                logger_level=logger_level,
+            )
+        )
+
+    # Instantiate and add the middleware admitting authenticated requests
+    # through the priority lane of their route (if enabled).
+    cfg_priority = cfg.get("priority") or {}
+    if cfg_priority.get("enabled"):
+        middleware.append(
+            MiddlewarePriority(
+                lanes=cfg_priority.get("lanes"),
+                routes=cfg_priority.get("routes"),
+                retry_after=cfg_priority.get("retry_after", 1),
+                logger_level=logger_level,
+            )
+        )
+
+    # Instantiate and add the middleware delimiting the recorded episodes.
+    if cassette is not None:
+        middleware.append(
+            MiddlewareCassette(cassette=cassette, logger_level=logger_level)
+        )
+
+    # Create the API.
+    api = falcon.API(middleware=middleware)
+
+    # Handle all `falcon.HTTPError` exceptions centrally so that each error
+    # is logged once and serialized through precomputed envelopes.
+    cfg_errors = cfg.get("errors") or {}
+    error_handler = ErrorHandler(
+        traceback_interval=cfg_errors.get("traceback_interval", 60.0),
+        logger_level=logger_level,
+    )
+    api.add_error_handler(falcon.HTTPError, error_handler.handle)
+    api.add_error_handler(
+        ServiceOverloaded,
+        error_handler.handle_overloaded,
+    )
+    api.add_error_handler(
+        DeadlineExceeded,
+        error_handler.handle_deadline_exceeded,
+    )
+    api.set_error_serializer(error_handler.serialize)
+
     msg_fmt = u"Initializing API resources."
     logger.info(msg_fmt)
 
@@ -74,18 +420,63 @@ def create_api(
         resource=ResourcePing(
             cfg=cfg,
             gateway=gateway,
+            cache=cache,
             logger_level=logger_level,
         ),
     )
 
+    # Add the route used to scrape the metrics (if enabled).
+    if store is not None:
+        api.add_route(
+            uri_template="/metrics",
+            resource=ResourceMetrics(
+                store=store,
+                cfg=cfg,
+                gateway=gateway,
+                cache=cache,
+                logger_level=logger_level,
+            ),
+        )
+
+    # Add the route used to capture (POST) profiles of the worker process and
+    # install the signal handler triggering captures (if enabled).
+    cfg_profiler = cfg.get("profiler") or {}
+    if cfg_profiler.get("enabled"):
+        profiler = Profiler(
+            duration_max=cfg_profiler.get("duration_max", 30.0),
+            directory=cfg_profiler.get("directory"),
+            logger_level=logger_level,
+        )
+        if cfg_profiler.get("signal"):
+            profiler.install_signal_handler(
+                signal_name=cfg_profiler["signal"],
+                allocations=True,
+            )
+        api.add_route(
+            uri_template="/admin/profile",
+            resource=ResourceProfile(
+                profiler=profiler,
+                scope=cfg_profiler.get("scope", "admin:profile"),
+                cfg=cfg,
+                gateway=gateway,
+                cache=cache,
+                logger_level=logger_level,
+            ),
+        )
+
     # Add the route used to retrieve (GET) or delete (DELETE) customers.
+    resource_customer = ResourceCustomer(
+        cfg=cfg,
+        gateway=gateway,
+        cache=cache,
+        cache_negative=cache_negative,
+        replica=replica,
+        revalidator=revalidator,
+        logger_level=logger_level,
+    )
     api.add_route(
         uri_template="/customer/{customer_id}",
-        resource=ResourceCustomer(
-            cfg=cfg,
-            gateway=gateway,
-            logger_level=logger_level,
-        ),
+        resource=resource_customer,
     )
 
     # Add the route used to create (POST) customers.
@@ -94,18 +485,27 @@ def create_api(
         resource=ResourceCustomer(
             cfg=cfg,
             gateway=gateway,
+            cache=cache,
+            cache_negative=cache_negative,
+            replica=replica,
+            revalidator=revalidator,
             logger_level=logger_level,
         ),
     )
 
     # Add the route used to retrieve (GET) or delete (DELETE) subscriptions.
+    resource_subscription = ResourceSubscription(
+        cfg=cfg,
+        gateway=gateway,
+        cache=cache,
+        cache_negative=cache_negative,
+        replica=replica,
+        revalidator=revalidator,
+        logger_level=logger_level,
+    )
     api.add_route(
         uri_template="/customer/{customer_id}/subscription/{subscription_id}",
-        resource=ResourceSubscription(
-            cfg=cfg,
-            gateway=gateway,
-            logger_level=logger_level,
-        ),
+        resource=resource_subscription,
     )
 
     # Add the route used to create (POST) subscriptions.
@@ -114,16 +514,41 @@ def create_api(
         resource=ResourceSubscription(
             cfg=cfg,
             gateway=gateway,
+            cache=cache,
+            cache_negative=cache_negative,
+            replica=replica,
+            revalidator=revalidator,
             logger_level=logger_level,
         )
     )
 
+    # Register the functions through which the replica refreshes its objects
+    # from Braintree (if enabled).
+    if replica is not None:
+        replica.register(
+            resource="customer",
+            retrieve=gateway.customer.find,
+            serialize=functools.partial(
+                resource_customer.serialize_replicated,
+                schema=resource_customer.schema_response,
+            ),
+        )
+        replica.register(
+            resource="subscription",
+            retrieve=gateway.subscription.find,
+            serialize=functools.partial(
+                resource_subscription.serialize_replicated,
+                schema=resource_subscription.schema_response,
+            ),
+        )
+
     # Add the route used to retrieve (GET) client-tokens without a customer ID.
     api.add_route(
         uri_template="/client-token",
         resource=ResourceClientTokenNoCustomerId(
             cfg=cfg,
             gateway=gateway,
+            cache=cache,
             logger_level=logger_level,
         ),
     )
@@ -134,10 +559,45 @@ def create_api(
         resource=ResourceClientToken(
             cfg=cfg,
             gateway=gateway,
+            cache=cache,
             logger_level=logger_level,
         ),
     )
 
+    # Add the route receiving (POST) Braintree webhook notifications (if
+    # enabled).
+    if consumer is not None:
+        api.add_route(
+            uri_template="/webhooks/braintree",
+            resource=ResourceWebhookBraintree(
+                consumer=consumer,
+                cfg=cfg,
+                gateway=gateway,
+                cache=cache,
+                logger_level=logger_level,
+            ),
+        )
+
+    # Warm the process up before the workers are forked by loading the cache
+    # snapshot and creating the response serializers.
+    warm_up(
+        snapshot=snapshot,
+        schemas={
+            "customer": functools.partial(
+                resource_customer.get_schema_response,
+                schema=resource_customer.schema_response,
+            ),
+            "subscription": functools.partial(
+                resource_subscription.get_schema_response,
+                schema=resource_subscription.schema_response,
+            ),
+        },
+        jwks_keys=len(middleware_auth0.rsa_keys),
+        logger_level=logger_level,
+    )
+    if snapshot is not None:
+        snapshot.start()
+
     msg_fmt = u"API initialization complete."
     logger.info(msg_fmt)
 
@@ -0,0 +1,359 @@
+# coding=utf-8
+
+"""
+This module defines a `CacheMemory` class meant to act as an in-process,
+size-bounded cache of serialized responses with a per-entry time-to-live, and
+a `CacheNegative` class meant to remember the objects recently not found in
+Braintree along with their serialized 404 responses.
+"""
+
+import time
+import threading
+import collections
+from typing import Any, Optional, Tuple, Dict, List, Set
+
+from braintree_server.metrics import metric_cache_lookups
+
+
+class CacheEntry(object):
+    """ Class representing a cached serialized response."""
+
+    __slots__ = ("body", "etag", "created", "version")
+
+    def __init__(
+        self,
+        body: str,
+        etag: Optional[str] = None,
+        created: Optional[float] = None,
+        version: Optional[int] = None,
+    ):
+        """ Constructor.
+
+        Args:
+            body (str): The serialized response body.
+            etag (Optional[str] = None): The entity-tag of the response.
+            created (Optional[float] = None): The `time.monotonic` timestamp
+                at which the entry was created. Defaults to the current time.
+            version (Optional[int] = None): The version of the object in the
+                `CacheShared` tier when it was retrieved (if any).
+        """
+
+        self.body = body
+        self.etag = etag
+        self.created = time.monotonic() if created is None else created
+        self.version = version
+
+
+class CacheMemory(object):
+    """ Thread-safe, size-bounded, in-process cache of serialized responses.
+
+    Note:
+        Entries are keyed by a `(resource, resource_id, fields)` tuple so that
+        different projections of the same object are cached separately while
+        all of them can be invalidated at once through the `invalidate`
+        method. The generation of the cache, i.e., its number of
+        invalidations, is recorded upon each miss so that entries retrieved
+        before an invalidation of their object aren't stored after it.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_entries: int = 10000,
+        ttl_stale: float = 0.0,
+    ):
+        """ Constructor.
+
+        Args:
+            ttl (float): The number of seconds after which an entry expires.
+            max_entries (int): The maximum number of entries after which the
+                least recently used entries are evicted.
+            ttl_stale (float): The number of seconds expired entries are kept
+                for to be retrieved through `get_stale`.
+        """
+
+        # Internalize arguments.
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.ttl_stale = ttl_stale
+
+        # Entries ordered from the least to the most recently used.
+        self.entries = collections.OrderedDict()  # type: Dict
+
+        # Index of the keys cached for each `(resource, resource_id)` pair.
+        self.index = {}  # type: Dict[Tuple[str, str], Set[Tuple]]
+
+        self.lock = threading.Lock()
+
+        # The number of invalidations and the generations at which the most
+        # recently invalidated objects were invalidated. Objects whose record
+        # was evicted are deemed invalidated at `generation_min`.
+        self.generation = 0
+        self.generations = collections.OrderedDict()  # type: Dict
+        self.generation_min = 0
+
+        # The generations recorded upon the misses of each thread.
+        self.local = threading.local()
+
+        # Lookup counters.
+        self.hits = 0
+        self.misses = 0
+        self.metric_hits = metric_cache_lookups.labels("memory", "hit")
+        self.metric_misses = metric_cache_lookups.labels("memory", "miss")
+
+    def get(self, key: Tuple) -> Optional[CacheEntry]:
+        """ Retrieves a non-expired entry.
+
+        Args:
+            key (Tuple): The `(resource, resource_id, fields)` key.
+
+        Returns:
+            Optional[CacheEntry]: The cached entry or `None` if the key was
+                not found or its entry has expired.
+        """
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            # Skip the entry if it has expired discarding it once it's past
+            # its stale window.
+            if entry is not None:
+                age = time.monotonic() - entry.created
+                if age > self.ttl + self.ttl_stale:
+                    self._remove(key=key)
+                    entry = None
+                elif age > self.ttl:
+                    entry = None
+
+            if entry is None:
+                # Record the generation preceding the retrieval of the object.
+                generations = getattr(self.local, "generations", None)
+                if generations is None:
+                    generations = self.local.generations = {}
+                generations[key[:2]] = self.generation
+
+                self.misses += 1
+                self.metric_misses.inc()
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.metric_hits.inc()
+
+        return entry
+
+    def get_stale(self, key: Tuple) -> Optional[CacheEntry]:
+        """ Retrieves an entry which may have expired within the stale window.
+
+        Args:
+            key (Tuple): The `(resource, resource_id, fields)` key.
+
+        Returns:
+            Optional[CacheEntry]: The cached entry or `None` if the key was
+                not found or its entry is past its stale window.
+        """
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            if time.monotonic() - entry.created > self.ttl + self.ttl_stale:
+                self._remove(key=key)
+                return None
+
+        return entry
+
+    def set(self, key: Tuple, entry: CacheEntry):
+        """ Stores an entry evicting the least recently used entries if the
+            cache is full.
+
+        Note:
+            The entry is discarded should its object have been invalidated
+            since the preceding miss of the current thread.
+
+        Args:
+            key (Tuple): The `(resource, resource_id, fields)` key.
+            entry (CacheEntry): The entry to be stored.
+        """
+
+        generations = getattr(self.local, "generations", None) or {}
+        generation = generations.pop(key[:2], None)
+
+        with self.lock:
+            if generation is not None and (
+                generation < self.generation_min or
+                generation < self.generations.get(key[:2], 0)
+            ):
+                return None
+
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self.index.setdefault(key[:2], set()).add(key)
+
+            while len(self.entries) > self.max_entries:
+                key_oldest = next(iter(self.entries))
+                self._remove(key=key_oldest)
+
+    def get_entries(self) -> List[Tuple[Tuple, CacheEntry]]:
+        """ Retrieves all entries, including expired ones, ordered from the
+            least to the most recently used.
+
+        Returns:
+            List[Tuple[Tuple, CacheEntry]]: The `(key, entry)` pairs.
+        """
+
+        with self.lock:
+            return list(self.entries.items())
+
+    def invalidate(self, resource: str, resource_id: str):
+        """ Removes all entries, i.e., all projections, cached for an object.
+
+        Args:
+            resource (str): The resource name, e.g., `customer`.
+            resource_id (str): The ID of the object.
+        """
+
+        with self.lock:
+            for key in self.index.pop((resource, resource_id), set()):
+                self.entries.pop(key, None)
+
+            self.generation += 1
+            self.generations[(resource, resource_id)] = self.generation
+            self.generations.move_to_end((resource, resource_id))
+            while len(self.generations) > self.max_entries:
+                _, generation = self.generations.popitem(last=False)
+                self.generation_min = generation
+
+    def _remove(self, key: Tuple):
+        """ Removes an entry and its index record.
+
+        Note:
+            This method must be called while holding `self.lock`.
+
+        Args:
+            key (Tuple): The `(resource, resource_id, fields)` key.
+        """
+
+        self.entries.pop(key, None)
+
+        keys = self.index.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.index[key[:2]]
+
+
+class CacheNegative(object):
+    """ Thread-safe, size-bounded, in-process cache of the serialized 404
+        responses of objects recently not found in Braintree.
+
+    Note:
+        Should a `versions` source, i.e., a `CacheShared`, be provided the
+        entries record the shared version of their object so that the
+        invalidations made by any worker, e.g., upon creations, discard them.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 30.0,
+        max_entries: int = 10000,
+        versions: Optional[Any] = None,
+    ):
+        """ Constructor.
+
+        Args:
+            ttl (float): The number of seconds after which an entry expires.
+            max_entries (int): The maximum number of entries after which the
+                oldest entries are evicted.
+            versions (Optional[Any] = None): The source of the shared object
+                versions, i.e., an object with a `get_version` method.
+                Defaults to `None` in which case entries are only discarded
+                by the worker creating the object.
+        """
+
+        # Internalize arguments.
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.versions = versions
+
+        # Entries keyed by `(resource, resource_id)` holding their expiry
+        # `time.monotonic` timestamp, body, and version ordered by insertion.
+        self.entries = collections.OrderedDict()  # type: Dict
+
+        self.lock = threading.Lock()
+
+        self.metric_hits = metric_cache_lookups.labels("negative", "hit")
+        self.metric_misses = metric_cache_lookups.labels("negative", "miss")
+
+    def get_version(self, resource: str, resource_id: str) -> Optional[int]:
+        """ Returns the shared version of an object (if any)."""
+
+        if self.versions is None:
+            return None
+
+        return self.versions.get_version(resource, resource_id)
+
+    def get(self, resource: str, resource_id: str) -> Optional[str]:
+        """ Retrieves the serialized 404 response of an object recently not
+            found.
+
+        Args:
+            resource (str): The resource name, e.g., `customer`.
+            resource_id (str): The ID of the object.
+
+        Returns:
+            Optional[str]: The serialized response or `None` if the object
+                wasn't recently not found.
+        """
+
+        key = (resource, resource_id)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() > entry[0]:
+                del self.entries[key]
+                entry = None
+
+        if entry is None or entry[2] != self.get_version(*key):
+            self.metric_misses.inc()
+            return None
+
+        self.metric_hits.inc()
+
+        return entry[1]
+
+    def add(self, resource: str, resource_id: str, body: str):
+        """ Remembers an object not found evicting the oldest entries if the
+            cache is full.
+
+        Args:
+            resource (str): The resource name, e.g., `customer`.
+            resource_id (str): The ID of the object.
+            body (str): The serialized 404 response.
+        """
+
+        key = (resource, resource_id)
+        entry = (
+            time.monotonic() + self.ttl,
+            body,
+            self.get_version(*key),
+        )
+
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def discard(self, resource: str, resource_id: str):
+        """ Forgets an object, e.g., upon its creation.
+
+        Args:
+            resource (str): The resource name, e.g., `customer`.
+            resource_id (str): The ID of the object.
+        """
+
+        with self.lock:
+            self.entries.pop((resource, resource_id), None)
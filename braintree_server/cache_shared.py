@@ -0,0 +1,518 @@
+# coding=utf-8
+
+"""
+This module defines a `CacheShared` class meant to act as a cache of
+serialized responses shared by the workers of a host through a memory-mapped
+file, and a `CacheTiered` class layering the in-process `CacheMemory` of each
+worker over it.
+
+The file holds a table of invalidation versions followed by fixed-size slots.
+Each key maps to two candidate slots and writers replace the least recently
+written candidate so that the file size bounds the cache. Slots are guarded
+by a sequence number which writers, serialized through byte-range locks, make
+odd while writing so that readers copy slots without locking and discard
+copies whose sequence number changed. Invalidating an object increments the
+version of its bucket which entries record when written so that entries
+written before the invalidation, even those of responses retrieved from
+Braintree while it took place, are no longer served by any worker.
+"""
+
+import os
+import json
+import mmap
+import time
+import zlib
+import fcntl
+import struct
+import hashlib
+import threading
+from typing import Optional, Tuple
+
+from braintree_server.cache import CacheEntry
+from braintree_server.cache import CacheMemory
+from braintree_server.metrics import metric_cache_lookups
+
+
+# The file header, i.e., magic bytes, layout version, number of version
+# buckets, number of slots, and slot size, padded to 64 bytes.
+HEADER = struct.Struct("<4sIIII")
+HEADER_SIZE = 64
+MAGIC = b"BTGC"
+LAYOUT = 1
+
+# The slot header, i.e., sequence number, key hash, version, creation
+# timestamp, body checksum, body length, key length, and entity-tag length.
+SLOT = struct.Struct("<QQQdIIHH")
+
+VERSION = struct.Struct("<Q")
+
+
+def hash_bytes(value: bytes) -> int:
+    """ Returns a 64-bit hash of bytes stable across processes."""
+
+    digest = hashlib.blake2b(value, digest_size=8).digest()
+
+    return int.from_bytes(digest, "little")
+
+
+class CacheShared(object):
+    """ Cache of serialized responses shared by processes through a
+        memory-mapped file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float,
+        ttl_stale: float = 0.0,
+        size: int = 64 * 1024 * 1024,
+        slot_size: int = 16384,
+        num_versions: int = 65536,
+    ):
+        """ Constructor.
+
+        Args:
+            path (str): The path of the memory-mapped file.
+            ttl (float): The number of seconds after which an entry expires.
+            ttl_stale (float): The number of seconds expired entries may be
+                retrieved for through `get_stale`.
+            size (int): The size of the slots of the file in bytes which
+                bounds the size of the cache.
+            slot_size (int): The size of a slot in bytes. Responses which
+                don't fit a slot aren't cached.
+            num_versions (int): The number of version buckets objects are
+                hashed into. Objects sharing a bucket are invalidated
+                together.
+        """
+
+        # Internalize arguments.
+        self.path = path
+        self.ttl = ttl
+        self.ttl_stale = ttl_stale
+        self.slot_size = slot_size
+        self.num_slots = max(size // slot_size, 2)
+        self.num_versions = num_versions
+
+        self.offset_versions = HEADER_SIZE
+        self.offset_slots = HEADER_SIZE + num_versions * VERSION.size
+        self.size = self.offset_slots + self.num_slots * slot_size
+
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.initialize()
+        self.mm = mmap.mmap(self.fd, self.size, access=mmap.ACCESS_WRITE)
+
+        # Byte-range locks only serialize writers of different processes.
+        self.lock = threading.Lock()
+        self.lock_pid = os.getpid()
+
+        # The versions of the objects recorded upon misses per thread so that
+        # the entries subsequently written record the version preceding their
+        # retrieval from Braintree.
+        self.local = threading.local()
+
+        self.metric_hits = metric_cache_lookups.labels("shared", "hit")
+        self.metric_misses = metric_cache_lookups.labels("shared", "miss")
+
+    def initialize(self):
+        """ Sizes and writes the header of the file unless another process
+            already did so with the same layout.
+        """
+
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            header_expected = HEADER.pack(
+                MAGIC,
+                LAYOUT,
+                self.num_versions,
+                self.num_slots,
+                self.slot_size,
+            )
+            header = os.pread(self.fd, HEADER.size, 0)
+            if (
+                header == header_expected and
+                os.fstat(self.fd).st_size == self.size
+            ):
+                return None
+
+            # Discard the contents of files of a different layout.
+            os.ftruncate(self.fd, 0)
+            os.ftruncate(self.fd, self.size)
+            os.pwrite(self.fd, header_expected, 0)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def get_thread_lock(self) -> threading.Lock:
+        """ Returns the lock serializing the writers of the current process
+            replacing it in forked processes where it may have been held.
+        """
+
+        if self.lock_pid != os.getpid():
+            self.lock = threading.Lock()
+            self.lock_pid = os.getpid()
+
+        return self.lock
+
+    def lock_range(self, offset: int, length: int):
+        """ Acquires the lock of a byte range of the file."""
+
+        lock = self.get_thread_lock()
+        lock.acquire()
+        try:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, length, offset)
+        except Exception:
+            lock.release()
+            raise
+
+    def unlock_range(self, offset: int, length: int):
+        """ Releases the lock of a byte range of the file."""
+
+        fcntl.lockf(self.fd, fcntl.LOCK_UN, length, offset)
+        self.lock.release()
+
+    @staticmethod
+    def dumps_key(key: Tuple) -> bytes:
+        """ Encodes a `(resource, resource_id, fields)` key."""
+
+        resource, resource_id, fields = key
+
+        return json.dumps([resource, resource_id, fields]).encode("utf-8")
+
+    def get_version_offset(self, resource: str, resource_id: str) -> int:
+        """ Returns the offset of the version bucket of an object."""
+
+        bucket = hash_bytes(
+            json.dumps([resource, resource_id]).encode("utf-8")
+        ) % self.num_versions
+
+        return self.offset_versions + bucket * VERSION.size
+
+    def get_version(self, resource: str, resource_id: str) -> int:
+        """ Returns the current version of an object."""
+
+        offset = self.get_version_offset(resource, resource_id)
+
+        return VERSION.unpack_from(self.mm, offset)[0]
+
+    def get_slot_offsets(self, key_hash: int) -> Tuple[int, int]:
+        """ Returns the offsets of the two candidate slots of a key."""
+
+        index_a = key_hash % self.num_slots
+        index_b = (key_hash >> 32) % self.num_slots
+        if index_b == index_a:
+            index_b = (index_a + 1) % self.num_slots
+
+        return (
+            self.offset_slots + index_a * self.slot_size,
+            self.offset_slots + index_b * self.slot_size,
+        )
+
+    def read_slot(
+        self,
+        offset: int,
+        key_hash: int,
+        key_bytes: bytes,
+    ) -> Optional[Tuple[int, float, Optional[str], bytes]]:
+        """ Copies the entry of a slot without locking.
+
+        Args:
+            offset (int): The offset of the slot.
+            key_hash (int): The hash of the key.
+            key_bytes (bytes): The encoded key.
+
+        Returns:
+            Optional[Tuple[int, float, Optional[str], bytes]]: The version,
+                `time.time` creation timestamp, entity-tag, and body of the
+                entry or `None` if the slot holds another key or was being
+                written.
+        """
+
+        (
+            seq,
+            slot_key_hash,
+            version,
+            created,
+            crc,
+            body_len,
+            key_len,
+            etag_len,
+        ) = SLOT.unpack_from(self.mm, offset)
+
+        if seq == 0 or seq & 1 or slot_key_hash != key_hash:
+            return None
+
+        start = offset + SLOT.size
+        end = start + key_len + etag_len + body_len
+        if end > offset + self.slot_size:
+            return None
+
+        data = self.mm[start:end]
+
+        # Discard the copy should a writer have modified the slot meanwhile.
+        if VERSION.unpack_from(self.mm, offset)[0] != seq:
+            return None
+
+        if data[:key_len] != key_bytes:
+            return None
+
+        etag = data[key_len:key_len + etag_len].decode("utf-8") or None
+        body = data[key_len + etag_len:]
+        if zlib.crc32(body) != crc:
+            return None
+
+        return version, created, etag, body
+
+    def lookup(
+        self,
+        key: Tuple,
+        age_max: float,
+        version_current: int,
+    ) -> Optional[CacheEntry]:
+        """ Retrieves a non-invalidated entry no older than `age_max`
+            seconds.
+        """
+
+        key_bytes = self.dumps_key(key)
+        key_hash = hash_bytes(key_bytes)
+
+        for offset in self.get_slot_offsets(key_hash):
+            slot = self.read_slot(offset, key_hash, key_bytes)
+            if slot is None:
+                continue
+
+            version, created, etag, body = slot
+            age = time.time() - created
+            if version != version_current or age > age_max:
+                return None
+
+            return CacheEntry(
+                body=body.decode("utf-8"),
+                etag=etag,
+                created=time.monotonic() - max(age, 0),
+                version=version,
+            )
+
+        return None
+
+    def get(self, key: Tuple) -> Optional[CacheEntry]:
+        """ Retrieves a non-expired, non-invalidated entry.
+
+        Args:
+            key (Tuple): The `(resource, resource_id, fields)` key.
+
+        Returns:
+            Optional[CacheEntry]: The cached entry, whose `version` is set,
+                or `None` if the key was not found, its entry has expired, or
+                its object was invalidated since.
+        """
+
+        version_current = self.get_version(key[0], key[1])
+
+        entry = self.lookup(
+            key=key,
+            age_max=self.ttl,
+            version_current=version_current,
+        )
+        if entry is not None:
+            self.metric_hits.inc()
+            return entry
+
+        # Record the version preceding the retrieval of the object.
+        versions = getattr(self.local, "versions", None)
+        if versions is None:
+            versions = self.local.versions = {}
+        versions[key[:2]] = version_current
+
+        self.metric_misses.inc()
+
+        return None
+
+    def get_stale(self, key: Tuple) -> Optional[CacheEntry]:
+        """ Retrieves a non-invalidated entry which may have expired within
+            the stale window.
+        """
+
+        return self.lookup(
+            key=key,
+            age_max=self.ttl + self.ttl_stale,
+            version_current=self.get_version(key[0], key[1]),
+        )
+
+    def set(self, key: Tuple, entry: CacheEntry):
+        """ Stores an entry replacing the least recently written of its
+            candidate slots.
+
+        Args:
+            key (Tuple): The `(resource, resource_id, fields)` key.
+            entry (CacheEntry): The entry to be stored. Its `version`, should
+                it be set, takes precedence over the version recorded upon
+                the preceding miss of the current thread.
+        """
+
+        key_bytes = self.dumps_key(key)
+        key_hash = hash_bytes(key_bytes)
+        etag_bytes = (entry.etag or "").encode("utf-8")
+        body = entry.body
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+        if SLOT.size + len(key_bytes) + len(etag_bytes) + len(body) > (
+            self.slot_size
+        ):
+            return None
+
+        version = entry.version
+        versions = getattr(self.local, "versions", None) or {}
+        if version is None:
+            version = versions.pop(key[:2], None)
+        if version is None:
+            version = self.get_version(key[0], key[1])
+
+        # Pick the slot already holding the key or, otherwise, the least
+        # recently written one.
+        candidates = []
+        for offset in self.get_slot_offsets(key_hash):
+            _, slot_key_hash, _, created = SLOT.unpack_from(self.mm, offset)[:4]
+            if slot_key_hash == key_hash:
+                candidates = [(0.0, offset)]
+                break
+            candidates.append((created, offset))
+        offset = min(candidates)[1]
+
+        self.lock_range(offset, self.slot_size)
+        try:
+            seq = VERSION.unpack_from(self.mm, offset)[0]
+            seq_writing = seq + 1 if seq % 2 == 0 else seq + 2
+            VERSION.pack_into(self.mm, offset, seq_writing)
+
+            start = offset + SLOT.size
+            data = key_bytes + etag_bytes + body
+            self.mm[start:start + len(data)] = data
+            SLOT.pack_into(
+                self.mm,
+                offset,
+                seq_writing,
+                key_hash,
+                version,
+                time.time(),
+                zlib.crc32(body),
+                len(body),
+                len(key_bytes),
+                len(etag_bytes),
+            )
+
+            VERSION.pack_into(self.mm, offset, seq_writing + 1)
+        finally:
+            self.unlock_range(offset, self.slot_size)
+
+    def invalidate(self, resource: str, resource_id: str):
+        """ Increments the version of an object so that the entries of all its
+            projections are no longer served.
+
+        Args:
+            resource (str): The resource name, e.g., `customer`.
+            resource_id (str): The ID of the object.
+        """
+
+        offset = self.get_version_offset(resource, resource_id)
+
+        self.lock_range(offset, VERSION.size)
+        try:
+            version = VERSION.unpack_from(self.mm, offset)[0]
+            VERSION.pack_into(self.mm, offset, version + 1)
+        finally:
+            self.unlock_range(offset, VERSION.size)
+
+    def close(self):
+        """ Unmaps and closes the file."""
+
+        self.mm.close()
+        os.close(self.fd)
+
+
+class CacheTiered(object):
+    """ Cache layering the in-process `CacheMemory` of a worker over a
+        `CacheShared` shared by the workers of the host.
+
+    Note:
+        Entries of the in-process tier record the shared version of their
+        object so that invalidations made by any worker, e.g., upon webhook
+        notifications, reach the in-process tiers of all workers.
+    """
+
+    def __init__(self, memory: CacheMemory, shared: CacheShared):
+        """ Constructor.
+
+        Args:
+            memory (CacheMemory): The in-process tier.
+            shared (CacheShared): The shared tier.
+        """
+
+        # Internalize arguments.
+        self.memory = memory
+        self.shared = shared
+
+    def get(self, key: Tuple) -> Optional[CacheEntry]:
+        """ Retrieves an entry from the in-process tier or, failing that, the
+            shared tier promoting it into the in-process tier.
+
+        Args:
+            key (Tuple): The `(resource, resource_id, fields)` key.
+
+        Returns:
+            Optional[CacheEntry]: The cached entry or `None` if neither tier
+                holds a valid entry.
+        """
+
+        entry = self.memory.get(key=key)
+        if entry is not None:
+            version = self.shared.get_version(key[0], key[1])
+            if entry.version == version:
+                return entry
+            self.memory.invalidate(resource=key[0], resource_id=key[1])
+
+        entry = self.shared.get(key=key)
+        if entry is not None:
+            self.memory.set(key=key, entry=entry)
+
+        return entry
+
+    def get_stale(self, key: Tuple) -> Optional[CacheEntry]:
+        """ Retrieves a non-invalidated entry which may have expired within
+            the stale window from either tier.
+        """
+
+        entry = self.memory.get_stale(key=key)
+        if entry is not None:
+            version = self.shared.get_version(key[0], key[1])
+            if entry.version == version:
+                return entry
+
+        return self.shared.get_stale(key=key)
+
+    def set(self, key: Tuple, entry: CacheEntry):
+        """ Stores an entry in both tiers.
+
+        Args:
+            key (Tuple): The `(resource, resource_id, fields)` key.
+            entry (CacheEntry): The entry to be stored.
+        """
+
+        if entry.version is None:
+            versions = getattr(self.shared.local, "versions", None) or {}
+            entry.version = versions.pop(key[:2], None)
+            if entry.version is None:
+                entry.version = self.shared.get_version(key[0], key[1])
+
+        self.shared.set(key=key, entry=entry)
+        self.memory.set(key=key, entry=entry)
+
+    def invalidate(self, resource: str, resource_id: str):
+        """ Removes all entries cached for an object in both tiers.
+
+        Args:
+            resource (str): The resource name, e.g., `customer`.
+            resource_id (str): The ID of the object.
+        """
+
+        self.shared.invalidate(resource=resource, resource_id=resource_id)
+        self.memory.invalidate(resource=resource, resource_id=resource_id)
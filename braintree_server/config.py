@@ -41,6 +41,558 @@ config_schema_default = {
                 "CRITICAL"
             ]
         },
+        "response_validation": {
+            "type": "object",
+            "description": ("The validation applied to the responses encoded "
+                            "via the `marshmallow` schemas"),
+            "properties": {
+                "mode": {
+                    "type": "string",
+                    "enum": [
+                        "full",
+                        "sampled",
+                        "off",
+                    ]
+                },
+                "sample_every": {
+                    "type": "integer",
+                    "minimum": 1,
+                },
+            }
+        },
+        "braintree_fake": {
+            "type": "object",
+            "description": ("The in-memory fake used in place of the Braintree "
+                            "gateway when enabled, e.g., for load-testing"),
+            "properties": {
+                "enabled": {
+                    "type": "boolean",
+                },
+                "latency": {
+                    "type": "object",
+                    "properties": {
+                        "distribution": {
+                            "type": "string",
+                            "enum": [
+                                "constant",
+                                "uniform",
+                                "lognormal",
+                            ]
+                        },
+                    }
+                },
+                "error_rate": {
+                    "type": "number",
+                    "minimum": 0,
+                    "maximum": 1,
+                },
+                "rate_limit": {
+                    "type": "object",
+                    "properties": {
+                        "rate": {
+                            "type": "number",
+                            "minimum": 0,
+                        },
+                        "burst": {
+                            "type": "integer",
+                            "minimum": 1,
+                        },
+                    }
+                },
+                "plans": {
+                    "type": "array",
+                },
+                "seed": {
+                    "type": "integer",
+                },
+            }
+        },
+        "cassette": {
+            "type": "object",
+            "description": ("The recording of the Braintree exchanges into, "
+                            "or their replay from, a cassette file"),
+            "properties": {
+                "mode": {
+                    "type": "string",
+                    "enum": [
+                        "record",
+                        "replay",
+                    ]
+                },
+                "path": {
+                    "type": "string",
+                },
+                "latency_scale": {
+                    "type": "number",
+                    "minimum": 0,
+                },
+            }
+        },
+        "errors": {
+            "type": "object",
+            "description": "The handling of errors raised by the resources",
+            "properties": {
+                "traceback_interval": {
+                    "type": "number",
+                    "minimum": 0,
+                },
+            }
+        },
+        "metrics": {
+            "type": "object",
+            "description": ("The metrics exposed under the unauthenticated "
+                            "`/metrics` route"),
+            "properties": {
+                "enabled": {
+                    "type": "boolean",
+                    "description": ("Whether the `/metrics` route is exposed "
+                                    "(defaults to `false`)"),
+                },
+                "directory": {
+                    "type": "string",
+                    "description": ("The directory shared by the worker "
+                                    "processes their metrics are aggregated "
+                                    "through"),
+                },
+                "flush_interval": {
+                    "type": "number",
+                    "minimum": 0,
+                    "exclusiveMinimum": True,
+                },
+            }
+        },
+        "timing": {
+            "type": "object",
+            "description": ("The tracing of the phases of requests through "
+                            "`Server-Timing` headers and slow-request logs"),
+            "properties": {
+                "enabled": {
+                    "type": "boolean",
+                },
+                "sample_rate": {
+                    "type": "number",
+                    "minimum": 0,
+                    "maximum": 1,
+                },
+                "request_header": {
+                    "type": ["string", "null"],
+                },
+                "slow_threshold": {
+                    "type": "number",
+                    "minimum": 0,
+                },
+            }
+        },
+        "logging": {
+            "type": "object",
+            "description": ("The format of the log records and the fraction "
+                            "of requests whose records are emitted"),
+            "properties": {
+                "format": {
+                    "type": "string",
+                    "enum": [
+                        "text",
+                        "json",
+                    ]
+                },
+                "sampling": {
+                    "type": "object",
+                    "description": ("The fraction of requests whose records "
+                                    "are emitted keyed by route, or `*`, and "
+                                    "level name"),
+                    "additionalProperties": {
+                        "type": "object",
+                        "additionalProperties": {
+                            "type": "number",
+                            "minimum": 0,
+                            "maximum": 1,
+                        },
+                    },
+                },
+            }
+        },
+        "concurrency_limit": {
+            "type": "object",
+            "description": ("The adaptive limit of concurrent Braintree "
+                            "requests per worker process over which requests "
+                            "are shed with a 503"),
+            "properties": {
+                "enabled": {
+                    "type": "boolean",
+                },
+                "limit_initial": {
+                    "type": "integer",
+                    "minimum": 1,
+                },
+                "limit_min": {
+                    "type": "integer",
+                    "minimum": 1,
+                },
+                "limit_max": {
+                    "type": "integer",
+                    "minimum": 1,
+                },
+                "latency_threshold": {
+                    "type": "number",
+                    "minimum": 0,
+                    "exclusiveMinimum": True,
+                },
+                "backoff_ratio": {
+                    "type": "number",
+                    "minimum": 0,
+                    "maximum": 1,
+                    "exclusiveMinimum": True,
+                    "exclusiveMaximum": True,
+                },
+                "retry_after": {
+                    "type": "integer",
+                    "minimum": 0,
+                },
+            }
+        },
+        "cache": {
+            "type": "object",
+            "description": "The cache of serialized responses",
+            "properties": {
+                "ttl": {
+                    "type": ["number", "null"],
+                    "minimum": 0,
+                },
+                "max_entries": {
+                    "type": "integer",
+                    "minimum": 1,
+                },
+                "client_tokens": {
+                    "type": "boolean",
+                    "description": "Whether client-tokens are cached",
+                },
+                "stale_while_revalidate": {
+                    "type": "number",
+                    "description": ("The number of seconds past their ttl "
+                                    "responses are served for while being "
+                                    "refreshed in the background"),
+                    "minimum": 0,
+                },
+                "stale_if_error": {
+                    "type": "number",
+                    "description": ("The number of seconds past their ttl "
+                                    "responses are served for upon Braintree "
+                                    "errors"),
+                    "minimum": 0,
+                },
+                "revalidation_workers": {
+                    "type": "integer",
+                    "minimum": 1,
+                },
+                "negative": {
+                    "type": "object",
+                    "description": ("The cache of the customers and "
+                                    "subscriptions recently not found"),
+                    "properties": {
+                        "enabled": {
+                            "type": "boolean",
+                        },
+                        "ttl": {
+                            "type": "number",
+                            "minimum": 0,
+                            "exclusiveMinimum": True,
+                        },
+                        "max_entries": {
+                            "type": "integer",
+                            "minimum": 1,
+                        },
+                    }
+                },
+                "snapshot": {
+                    "type": "object",
+                    "description": ("The snapshot file of the in-process "
+                                    "cache loaded by forked workers"),
+                    "properties": {
+                        "enabled": {
+                            "type": "boolean",
+                        },
+                        "path": {
+                            "type": ["string", "null"],
+                        },
+                        "interval": {
+                            "type": "number",
+                            "minimum": 0,
+                            "exclusiveMinimum": True,
+                        },
+                    }
+                },
+                "shared": {
+                    "type": "object",
+                    "description": ("The cache tier shared by the workers of "
+                                    "a host through a memory-mapped file"),
+                    "properties": {
+                        "enabled": {
+                            "type": "boolean",
+                        },
+                        "path": {
+                            "type": ["string", "null"],
+                        },
+                        "size": {
+                            "type": "integer",
+                            "minimum": 1,
+                        },
+                        "slot_size": {
+                            "type": "integer",
+                            "minimum": 1024,
+                        },
+                    }
+                },
+            }
+        },
+        "webhooks": {
+            "type": "object",
+            "description": ("The route receiving Braintree webhook "
+                            "notifications applied to the cached responses"),
+            "properties": {
+                "enabled": {
+                    "type": "boolean",
+                },
+                "queue_size": {
+                    "type": "integer",
+                    "minimum": 1,
+                },
+            }
+        },
+        "replica": {
+            "type": "object",
+            "description": ("The local replica of customers and subscriptions "
+                            "responses may be served from"),
+            "properties": {
+                "enabled": {
+                    "type": "boolean",
+                },
+                "path": {
+                    "type": ["string", "null"],
+                    "description": ("The path of the SQLite database shared "
+                                    "by the workers"),
+                },
+                "request_header": {
+                    "type": ["string", "null"],
+                    "description": ("The request header holding the number "
+                                    "of seconds stale a response may be"),
+                },
+                "routes": {
+                    "type": "object",
+                    "description": ("The number of seconds stale responses "
+                                    "may be by default keyed by method and "
+                                    "route, e.g., `GET /customer/{id}`"),
+                    "additionalProperties": {
+                        "type": "number",
+                        "minimum": 0,
+                    },
+                },
+                "reconcile_interval": {
+                    "type": "number",
+                    "minimum": 0,
+                    "exclusiveMinimum": True,
+                },
+                "reconcile_batch": {
+                    "type": "integer",
+                    "minimum": 1,
+                },
+                "reconcile_age": {
+                    "type": "number",
+                    "minimum": 0,
+                },
+            }
+        },
+        "idempotency": {
+            "type": "object",
+            "description": ("The store of the responses to requests carrying "
+                            "an idempotency key"),
+            "properties": {
+                "enabled": {
+                    "type": "boolean",
+                },
+                "backend": {
+                    "type": "string",
+                    "enum": ["memory", "file", "sqlite"],
+                },
+                "path": {
+                    "type": ["string", "null"],
+                    "description": ("The directory of the `file` backend or "
+                                    "the database file of the `sqlite` "
+                                    "backend"),
+                },
+                "ttl": {
+                    "type": "number",
+                    "minimum": 0,
+                    "exclusiveMinimum": True,
+                },
+                "lock_timeout": {
+                    "type": "number",
+                    "minimum": 0,
+                    "exclusiveMinimum": True,
+                },
+                "wait_timeout": {
+                    "type": "number",
+                    "minimum": 0,
+                },
+                "request_header": {
+                    "type": "string",
+                },
+                "routes": {
+                    "type": "array",
+                    "description": ("The method and route of the requests "
+                                    "whose responses are stored, e.g., "
+                                    "`POST /customer`"),
+                    "items": {
+                        "type": "string",
+                    },
+                },
+            }
+        },
+        "deadline": {
+            "type": "object",
+            "description": ("The deadlines bounding the Braintree requests "
+                            "made while handling requests"),
+            "properties": {
+                "enabled": {
+                    "type": "boolean",
+                },
+                "request_header": {
+                    "type": ["string", "null"],
+                    "description": ("The request header holding the timeout "
+                                    "requested by clients in seconds"),
+                },
+                "default_timeout": {
+                    "type": ["number", "null"],
+                    "minimum": 0,
+                    "exclusiveMinimum": True,
+                },
+                "routes": {
+                    "type": "object",
+                    "description": ("The timeouts in seconds keyed by method "
+                                    "and route, e.g., `POST /customer`"),
+                    "additionalProperties": {
+                        "type": "number",
+                        "minimum": 0,
+                        "exclusiveMinimum": True,
+                    },
+                },
+            }
+        },
+        "priority": {
+            "type": "object",
+            "description": ("The priority lanes requests are classified into "
+                            "per route, each admitting a bounded number of "
+                            "concurrent requests"),
+            "properties": {
+                "enabled": {
+                    "type": "boolean",
+                },
+                "lanes": {
+                    "type": "object",
+                    "description": ("The settings of the lanes keyed by lane "
+                                    "name"),
+                    "additionalProperties": {
+                        "type": "object",
+                        "properties": {
+                            "max_concurrency": {
+                                "type": "integer",
+                                "minimum": 1,
+                                "required": True,
+                            },
+                            "max_wait": {
+                                "type": "number",
+                                "minimum": 0,
+                            },
+                        },
+                    },
+                },
+                "routes": {
+                    "type": "object",
+                    "description": ("The lane names keyed by method and "
+                                    "route, e.g., `POST /customer`"),
+                    "additionalProperties": {
+                        "type": "string",
+                    },
+                },
+                "retry_after": {
+                    "type": "integer",
+                    "minimum": 0,
+                },
+            }
+        },
+        "profiler": {
+            "type": "object",
+            "description": ("The on-demand sampling profiler and allocation "
+                            "tracer of the worker processes"),
+            "properties": {
+                "enabled": {
+                    "type": "boolean",
+                },
+                "scope": {
+                    "type": "string",
+                    "description": ("The scope access-tokens must grant to "
+                                    "request captures"),
+                },
+                "duration_max": {
+                    "type": "number",
+                    "minimum": 0,
+                    "maximum": 60,
+                },
+                "directory": {
+                    "type": "string",
+                    "description": ("The directory captures triggered by "
+                                    "signal are written under"),
+                },
+                "signal": {
+                    "type": ["string", "null"],
+                    "description": ("The name of the signal triggering "
+                                    "captures, e.g., `SIGURG`"),
+                },
+            }
+        },
+        "sentry": {
+            "type": "object",
+            "description": ("The reporting of errors and the sampled tracing "
+                            "of requests through Sentry"),
+            "properties": {
+                "dsn": {
+                    "type": ["string", "null"],
+                },
+                "traces_sample_rate": {
+                    "type": "number",
+                    "minimum": 0,
+                    "maximum": 1,
+                },
+                "queue_size": {
+                    "type": "integer",
+                    "minimum": 1,
+                },
+            }
+        },
+        "logging_queue": {
+            "type": "object",
+            "description": ("The bounded queue the log records are handed to "
+                            "and written out from by a listener thread"),
+            "properties": {
+                "enabled": {
+                    "type": "boolean",
+                },
+                "size": {
+                    "type": "integer",
+                    "minimum": 1,
+                },
+                "overflow": {
+                    "type": "string",
+                    "enum": [
+                        "drop",
+                        "block",
+                    ]
+                },
+                "block_timeout": {
+                    "type": "number",
+                    "minimum": 0,
+                },
+            }
+        },
     }
 }
 
@@ -0,0 +1,85 @@
+# coding=utf-8
+
+"""
+This module defines the per-request deadlines bounding the time spent on
+Braintree requests.
+
+The `MiddlewareDeadline` binds the deadline of an incoming request, derived
+from a request header and per-route defaults, through `bind_deadline` while
+the HTTP strategies under the `transport` module bound each Braintree request
+by the remaining budget, as returned by `get_remaining`, and raise
+`DeadlineExceeded` through `check_deadline` once it has run out so that the
+remaining calls of the request are skipped.
+"""
+
+import time
+import contextvars
+from typing import Optional
+
+from braintree_server.excs import DeadlineExceeded
+
+
+# The deadline, as a `time.monotonic` value, of the request being handled by
+# the current thread, if any.
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+def bind_deadline(deadline: float) -> contextvars.Token:
+    """ Binds the deadline of a request to the current thread.
+
+    Args:
+        deadline (float): The deadline as a `time.monotonic` value.
+
+    Returns:
+        contextvars.Token: The token used to unbind the deadline via
+            `unbind_deadline`.
+    """
+
+    return _deadline.set(deadline)
+
+
+def unbind_deadline(token: contextvars.Token):
+    """ Unbinds the deadline of a request from the current thread.
+
+    Args:
+        token (contextvars.Token): The token returned by `bind_deadline`.
+    """
+
+    _deadline.reset(token)
+
+
+def get_remaining() -> Optional[float]:
+    """ Returns the number of seconds left until the deadline of the current
+        request or `None` if it has no deadline.
+    """
+
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+
+    return deadline - time.monotonic()
+
+
+def check_deadline(operation: str) -> Optional[float]:
+    """ Checks whether the deadline of the current request has passed ahead
+        of a Braintree request.
+
+    Args:
+        operation (str): The Braintree operation about to be performed, e.g.,
+            `POST subscriptions`.
+
+    Returns:
+        Optional[float]: The number of seconds left until the deadline or
+            `None` if the request has no deadline.
+
+    Raises:
+        DeadlineExceeded: Raised if the deadline has passed.
+    """
+
+    remaining = get_remaining()
+    if remaining is not None and remaining <= 0:
+        msg = "Deadline exceeded ahead of Braintree request '{}'."
+        msg_fmt = msg.format(operation)
+        raise DeadlineExceeded(msg_fmt)
+
+    return remaining
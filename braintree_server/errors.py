@@ -0,0 +1,310 @@
+# coding=utf-8
+
+"""
+This module defines an `ErrorHandler` class meant to act as the central
+handler of `falcon.HTTPError` exceptions raised by the resources and
+middlewares. It logs every error outcome as a single structured line, limits
+the rate at which tracebacks are logged per exception class, and serializes
+error responses using precomputed JSON envelopes.
+"""
+
+import json
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+import falcon
+import falcon.api_helpers
+
+from braintree_server.excs import DeadlineExceeded
+from braintree_server.excs import ServiceOverloaded
+from braintree_server.loggers import create_logger
+from braintree_server.metrics import metric_deadline_exceeded
+
+
+class ErrorHandler(object):
+    """ Central handler and serializer of `falcon.HTTPError` exceptions."""
+
+    def __init__(
+        self,
+        traceback_interval: float = 60.0,
+        **kwargs
+    ):
+        """ Constructor.
+
+        Args:
+            traceback_interval (float): The minimum number of seconds between
+                two tracebacks logged for the same exception class. Server
+                errors raised within that interval, and all client errors,
+                are logged as a single line.
+        """
+
+        # Internalize arguments.
+        self.traceback_interval = traceback_interval
+
+        # Create a class-level logger.
+        self.logger = create_logger(
+            logger_name=type(self).__name__,
+            logger_level=kwargs.get("logger_level", "DEBUG")
+        )
+
+        # JSON envelope prefixes keyed by error title.
+        self.envelopes = {}  # type: Dict[str, str]
+
+        # Timestamps of the last logged traceback keyed by exception class and
+        # the number of tracebacks suppressed since.
+        self.tracebacks_last = {}  # type: Dict[type, float]
+        self.tracebacks_suppressed = {}  # type: Dict[type, int]
+        self.lock = threading.Lock()
+
+    def get_envelope(self, title: str) -> str:
+        """ Retrieves the precomputed JSON envelope prefix for errors with a
+            given title, i.e., the JSON document up to the description.
+
+        Args:
+            title (str): The error title.
+
+        Returns:
+            str: The JSON envelope prefix.
+        """
+
+        envelope = self.envelopes.get(title)
+        if envelope is None:
+            envelope = "{{{}: {}".format(
+                json.dumps("title"),
+                json.dumps(title, ensure_ascii=False),
+            )
+            self.envelopes[title] = envelope
+
+        return envelope
+
+    def to_json(self, error: falcon.HTTPError) -> str:
+        """ Serializes an error into JSON reusing the precomputed envelope of
+            its title.
+
+        Note:
+            The produced JSON is identical to that produced by the `to_json`
+            method of `falcon.HTTPError`.
+
+        Args:
+            error (falcon.HTTPError): The error to be serialized.
+
+        Returns:
+            str: The JSON document.
+        """
+
+        # Errors with a code or a link are rare enough to not warrant an
+        # envelope.
+        if error.title is None or error.code is not None or error.link:
+            return error.to_json()
+
+        envelope = self.get_envelope(title=error.title)
+
+        if error.description is None:
+            return envelope + "}"
+
+        return "{}, {}: {}}}".format(
+            envelope,
+            json.dumps("description"),
+            json.dumps(error.description, ensure_ascii=False),
+        )
+
+    def serialize(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        exception: falcon.HTTPError,
+    ):
+        """ Serializes errors into the response replacing the default
+            `falcon` error serializer for clients preferring JSON.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            exception (falcon.HTTPError): The error to be serialized.
+        """
+
+        # Defer to the default serializer, which negotiates the media-type,
+        # for anything but the plain JSON or wildcard `Accept` headers.
+        if req.accept not in ("*/*", "application/json"):
+            falcon.api_helpers.default_serialize_error(req, resp, exception)
+            return None
+
+        if not exception.has_representation:
+            return None
+
+        resp.body = self.to_json(error=exception)
+        resp.content_type = "application/json"
+        resp.append_header("Vary", "Accept")
+
+    def is_traceback_due(self, error_class: type) -> Tuple[bool, int]:
+        """ Checks whether a traceback should be logged for an exception
+            class based on the configured interval.
+
+        Args:
+            error_class (type): The exception class.
+
+        Returns:
+            Tuple[bool, int]: Whether a traceback should be logged and the
+                number of tracebacks suppressed since the last one.
+        """
+
+        now = time.monotonic()
+
+        with self.lock:
+            last = self.tracebacks_last.get(error_class)
+            if last is not None and now - last < self.traceback_interval:
+                self.tracebacks_suppressed[error_class] = (
+                    self.tracebacks_suppressed.get(error_class, 0) + 1
+                )
+                return False, 0
+
+            self.tracebacks_last[error_class] = now
+            suppressed = self.tracebacks_suppressed.pop(error_class, 0)
+
+        return True, suppressed
+
+    def log(
+        self,
+        req: falcon.Request,
+        error: falcon.HTTPError,
+        cause: Optional[BaseException] = None,
+    ):
+        """ Logs an error outcome as a single structured line including a
+            traceback for server errors should one be due.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            error (falcon.HTTPError): The raised error.
+            cause (Optional[BaseException] = None): The exception during the
+                handling of which the error was raised (if any).
+        """
+
+        status = error.status[:3]
+
+        msg = "status={} method={} path={} title={} description={} cause={}"
+        msg_fmt = msg.format(
+            status,
+            req.method,
+            json.dumps(req.path),
+            json.dumps(error.title),
+            json.dumps(error.description),
+            type(cause).__name__ if cause is not None else None,
+        )
+
+        # Client errors, shed requests, and exceeded deadlines are expected
+        # outcomes and never warrant a traceback.
+        if status < "500" or isinstance(
+            cause,
+            (ServiceOverloaded, DeadlineExceeded),
+        ):
+            self.logger.warning(msg_fmt)
+            return None
+
+        is_due, suppressed = self.is_traceback_due(
+            error_class=type(cause if cause is not None else error),
+        )
+        if is_due:
+            msg_fmt += " tracebacks_suppressed={}".format(suppressed)
+            self.logger.error(msg_fmt, exc_info=error)
+        else:
+            self.logger.error(msg_fmt)
+
+    def handle(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        error: falcon.HTTPError,
+        params: Dict,
+    ):
+        """ Handles `falcon.HTTPError` exceptions by logging them and
+            composing the error response.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            error (falcon.HTTPError): The raised error.
+            params (Dict): The responder parameters.
+        """
+
+        self.log(req=req, error=error, cause=error.__context__)
+
+        self.respond(req=req, resp=resp, error=error)
+
+    def handle_overloaded(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        exception: ServiceOverloaded,
+        params: Dict,
+    ):
+        """ Handles `ServiceOverloaded` exceptions, i.e., requests shed by
+            the concurrency limiter or the priority lanes, by responding with
+            a 503 and a `Retry-After` header.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            exception (ServiceOverloaded): The raised exception.
+            params (Dict): The responder parameters.
+        """
+
+        error = falcon.HTTPServiceUnavailable(
+            title="Service overloaded.",
+            description=str(exception),
+            retry_after=exception.retry_after,
+        )
+
+        self.log(req=req, error=error, cause=exception)
+
+        self.respond(req=req, resp=resp, error=error)
+
+    def handle_deadline_exceeded(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        exception: DeadlineExceeded,
+        params: Dict,
+    ):
+        """ Handles `DeadlineExceeded` exceptions, i.e., requests whose
+            deadline ran out ahead of or during a Braintree request, by
+            counting them per route and responding with a 504.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            exception (DeadlineExceeded): The raised exception.
+            params (Dict): The responder parameters.
+        """
+
+        metric_deadline_exceeded.labels(req.uri_template or "").inc()
+
+        error = falcon.HTTPGatewayTimeout(
+            title="Deadline exceeded.",
+            description=str(exception),
+        )
+
+        self.log(req=req, error=error, cause=exception)
+
+        self.respond(req=req, resp=resp, error=error)
+
+    def respond(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        error: falcon.HTTPError,
+    ):
+        """ Composes the response of an error.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            error (falcon.HTTPError): The error.
+        """
+
+        resp.status = error.status
+
+        if error.headers is not None:
+            resp.set_headers(error.headers)
+
+        self.serialize(req=req, resp=resp, exception=error)
@@ -37,3 +37,85 @@ class Auth0TokenRetrievalError(Exception):
 
     def __init__(self, message, *args):
         super(Auth0TokenRetrievalError, self).__init__(message, *args)
+
+
+class CassetteInteractionNotFound(Exception):
+    """ Exception raised when a Braintree request being replayed has no
+        recorded exchange in the cassette.
+    """
+
+    def __init__(self, message, *args):
+        super(CassetteInteractionNotFound, self).__init__(message, *args)
+
+
+class ProfilerBusy(Exception):
+    """ Exception raised when a profile is requested while another one is
+        being captured in the same process.
+    """
+
+    def __init__(self, message, *args):
+        super(ProfilerBusy, self).__init__(message, *args)
+
+
+class ServiceOverloaded(Exception):
+    """ Base exception of requests shed to protect the service, responded to
+        with a 503 and a `Retry-After` header.
+    """
+
+    def __init__(self, message, *args, retry_after: int = 1):
+        super(ServiceOverloaded, self).__init__(message, *args)
+
+        self.retry_after = retry_after
+
+
+class UpstreamOverloaded(ServiceOverloaded):
+    """ Exception raised when a Braintree request is shed by the concurrency
+        limiter.
+    """
+
+    def __init__(self, message, *args, retry_after: int = 1):
+        super(UpstreamOverloaded, self).__init__(
+            message,
+            *args,
+            retry_after=retry_after
+        )
+
+
+class LaneSaturated(ServiceOverloaded):
+    """ Exception raised when a request is shed as the priority lane it was
+        classified into is saturated.
+    """
+
+    def __init__(self, message, *args, retry_after: int = 1):
+        super(LaneSaturated, self).__init__(
+            message,
+            *args,
+            retry_after=retry_after
+        )
+
+
+class DeadlineExceeded(Exception):
+    """ Exception raised when the deadline of a request runs out ahead of or
+        during a Braintree request.
+    """
+
+    def __init__(self, message, *args):
+        super(DeadlineExceeded, self).__init__(message, *args)
+
+
+class IdempotencyStoreError(Exception):
+    """ Exception raised when the store of idempotent responses can't be read
+        from or written to.
+    """
+
+    def __init__(self, message, *args):
+        super(IdempotencyStoreError, self).__init__(message, *args)
+
+
+class ReplicaError(Exception):
+    """ Exception raised when the local replica can't be read from or written
+        to.
+    """
+
+    def __init__(self, message, *args):
+        super(ReplicaError, self).__init__(message, *args)
@@ -0,0 +1,580 @@
+# coding=utf-8
+
+"""
+This module defines a `GatewayFake` class meant to stand in for the
+`braintree.BraintreeGateway` when load or soak testing the service on a single
+machine.
+
+The fake keeps customers, payment-methods, subscriptions, and plans in memory
+and answers the `customer`, `subscription`, `payment_method`, `client_token`,
+and `plan` calls made by the resources with the same `braintree` objects,
+results, and exceptions the real gateway produces. Every call can be subjected
+to a simulated latency, a random error rate, and a token-bucket rate limit.
+"""
+
+import copy
+import uuid
+import time
+import base64
+import random
+import datetime
+import threading
+from typing import Dict, List, Optional
+
+import braintree
+import braintree.exceptions
+
+from braintree_server.deadline import check_deadline
+from braintree_server.excs import DeadlineExceeded
+from braintree_server.loggers import create_logger
+
+
+# The plans available should none be configured.
+plans_default = [
+    {
+        "id": "fake_plan_id",
+        "name": "Fake plan",
+        "price": "10.00",
+        "currency_iso_code": "USD",
+        "billing_frequency": 1,
+        "trial_period": False,
+        "trial_duration": None,
+        "trial_duration_unit": None,
+    }
+]
+
+
+class CustomerGatewayFake(object):
+    """ Fake of the `braintree.CustomerGateway`."""
+
+    def __init__(self, fake: "GatewayFake"):
+        self.fake = fake
+
+    def create(
+        self,
+        params: Optional[Dict] = None,
+    ) -> braintree.SuccessfulResult:
+        params = params or {}
+
+        self.fake.simulate_call()
+
+        customer_id = params.get("id") or uuid.uuid4().hex[:8]
+
+        with self.fake.lock:
+            if customer_id in self.fake.customers:
+                return self.fake.error("Customer ID has already been taken.")
+
+            now = self.fake.now()
+            self.fake.customers[customer_id] = {
+                "id": customer_id,
+                "email": params.get("email"),
+                "first_name": params.get("first_name"),
+                "last_name": params.get("last_name"),
+                "company": params.get("company"),
+                "phone": params.get("phone"),
+                "fax": params.get("fax"),
+                "website": params.get("website"),
+                "merchant_id": self.fake.merchant_id,
+                "created_at": now,
+                "updated_at": now,
+            }
+
+            customer = self.fake.get_customer(customer_id=customer_id)
+
+        return braintree.SuccessfulResult({"customer": customer})
+
+    def delete(self, customer_id: str) -> braintree.SuccessfulResult:
+
+        self.fake.simulate_call()
+
+        with self.fake.lock:
+            if customer_id not in self.fake.customers:
+                raise braintree.exceptions.NotFoundError()
+
+            # Deleting a customer deletes their payment-methods and cancels
+            # the subscriptions charged to them.
+            for token, payment_method in list(
+                self.fake.payment_methods.items()
+            ):
+                if payment_method["customer_id"] != customer_id:
+                    continue
+                for subscription in self.fake.subscriptions.values():
+                    if subscription["payment_method_token"] == token:
+                        subscription["status"] = "Canceled"
+                        subscription["updated_at"] = self.fake.now()
+                del self.fake.payment_methods[token]
+
+            del self.fake.customers[customer_id]
+
+        return braintree.SuccessfulResult()
+
+    def find(
+        self,
+        customer_id: str,
+        association_filter_id: Optional[str] = None,
+    ) -> braintree.Customer:
+
+        self.fake.simulate_call()
+
+        with self.fake.lock:
+            if customer_id not in self.fake.customers:
+                raise braintree.exceptions.NotFoundError()
+
+            return self.fake.get_customer(customer_id=customer_id)
+
+
+class SubscriptionGatewayFake(object):
+    """ Fake of the `braintree.SubscriptionGateway`."""
+
+    def __init__(self, fake: "GatewayFake"):
+        self.fake = fake
+
+    def cancel(self, subscription_id: str) -> braintree.SuccessfulResult:
+
+        self.fake.simulate_call()
+
+        with self.fake.lock:
+            subscription = self.fake.subscriptions.get(subscription_id)
+            if subscription is None:
+                raise braintree.exceptions.NotFoundError()
+
+            if subscription["status"] == "Canceled":
+                return self.fake.error(
+                    "Subscription has already been canceled."
+                )
+
+            subscription["status"] = "Canceled"
+            subscription["updated_at"] = self.fake.now()
+
+            subscription = self.fake.get_subscription(
+                subscription_id=subscription_id,
+            )
+
+        return braintree.SuccessfulResult({"subscription": subscription})
+
+    def create(
+        self,
+        params: Optional[Dict] = None,
+    ) -> braintree.SuccessfulResult:
+        params = params or {}
+
+        self.fake.simulate_call()
+
+        with self.fake.lock:
+            token = params.get("payment_method_token")
+            if token not in self.fake.payment_methods:
+                return self.fake.error("Payment method token is invalid.")
+
+            plan = self.fake.plans.get(params.get("plan_id"))
+            if plan is None:
+                return self.fake.error("Plan ID is invalid.")
+
+            subscription_id = params.get("id") or uuid.uuid4().hex[:6]
+            if subscription_id in self.fake.subscriptions:
+                return self.fake.error("ID has already been taken.")
+
+            now = self.fake.now()
+            self.fake.subscriptions[subscription_id] = {
+                "id": subscription_id,
+                "plan_id": plan["id"],
+                "status": "Active",
+                "price": params.get("price", plan["price"]),
+                "balance": "0.00",
+                "billing_day_of_month": min(now.day, 28),
+                "current_billing_cycle": 1,
+                "days_past_due": None,
+                "payment_method_token": token,
+                "trial_duration": plan.get("trial_duration"),
+                "trial_duration_unit": plan.get("trial_duration_unit"),
+                "trial_period": plan.get("trial_period", False),
+                "created_at": now,
+                "updated_at": now,
+            }
+
+            subscription = self.fake.get_subscription(
+                subscription_id=subscription_id,
+            )
+
+        return braintree.SuccessfulResult({"subscription": subscription})
+
+    def find(self, subscription_id: str) -> braintree.Subscription:
+
+        self.fake.simulate_call()
+
+        with self.fake.lock:
+            if subscription_id not in self.fake.subscriptions:
+                raise braintree.exceptions.NotFoundError()
+
+            return self.fake.get_subscription(subscription_id=subscription_id)
+
+
+class PaymentMethodGatewayFake(object):
+    """ Fake of the `braintree.PaymentMethodGateway` supporting credit-cards
+        created from the Braintree test nonces, e.g., `fake-valid-visa-nonce`.
+    """
+
+    # Card types, BINs, and last digits keyed by the infix of the Braintree
+    # test nonces.
+    card_types = {
+        "visa": ("Visa", "401288", "1881"),
+        "amex": ("American Express", "378282", "0005"),
+        "mastercard": ("MasterCard", "555555", "4444"),
+        "discover": ("Discover", "601111", "1117"),
+    }
+
+    def __init__(self, fake: "GatewayFake"):
+        self.fake = fake
+
+    def create(
+        self,
+        params: Optional[Dict] = None,
+    ) -> braintree.SuccessfulResult:
+        params = params or {}
+
+        self.fake.simulate_call()
+
+        nonce = params.get("payment_method_nonce") or ""
+
+        with self.fake.lock:
+            customer_id = params.get("customer_id")
+            if customer_id not in self.fake.customers:
+                return self.fake.error("Customer ID is invalid.")
+
+            if nonce.startswith("fake-processor-declined"):
+                return self.fake.error("Do Not Honor")
+
+            if not nonce.startswith("fake-valid"):
+                return self.fake.error(
+                    "Unknown or expired payment_method_nonce."
+                )
+
+            card_name = "visa"
+            for infix in self.card_types.keys():
+                if infix in nonce:
+                    card_name = infix
+            card_type, bin_, last_4 = self.card_types[card_name]
+
+            # New payment-methods become the customer's default.
+            for payment_method in self.fake.payment_methods.values():
+                if payment_method["customer_id"] == customer_id:
+                    payment_method["default"] = False
+
+            now = self.fake.now()
+            token = params.get("token") or uuid.uuid4().hex[:6]
+            self.fake.payment_methods[token] = {
+                "token": token,
+                "customer_id": customer_id,
+                "card_type": card_type,
+                "cardholder_name": params.get("cardholder_name"),
+                "default": True,
+                "expiration_month": "12",
+                "expiration_year": str(now.year + 3),
+                "expired": False,
+                "image_url": (
+                    "https://assets.braintreegateway.com/payment_method_logo/"
+                    "{}.png?environment=sandbox".format(card_name)
+                ),
+                "bin": bin_,
+                "last_4": last_4,
+                "created_at": now,
+                "updated_at": now,
+            }
+
+            payment_method = self.fake.get_payment_method(token=token)
+
+        return braintree.SuccessfulResult({"payment_method": payment_method})
+
+
+class ClientTokenGatewayFake(object):
+    """ Fake of the `braintree.ClientTokenGateway`."""
+
+    def __init__(self, fake: "GatewayFake"):
+        self.fake = fake
+
+    def generate(self, params: Optional[Dict] = None) -> str:
+        params = params or {}
+
+        self.fake.simulate_call()
+
+        customer_id = params.get("customer_id")
+        with self.fake.lock:
+            if (
+                customer_id is not None and
+                customer_id not in self.fake.customers
+            ):
+                raise ValueError(
+                    "Customer specified by customer_id does not exist"
+                )
+
+        token = "{}|{}|{}".format(
+            self.fake.merchant_id,
+            customer_id,
+            time.time(),
+        )
+
+        return base64.b64encode(token.encode("utf-8")).decode("utf-8")
+
+
+class PlanGatewayFake(object):
+    """ Fake of the `braintree.PlanGateway`."""
+
+    def __init__(self, fake: "GatewayFake"):
+        self.fake = fake
+
+    def all(self) -> List[braintree.Plan]:
+
+        self.fake.simulate_call()
+
+        return [
+            braintree.Plan(self.fake, copy.deepcopy(plan))
+            for plan in self.fake.plans.values()
+        ]
+
+
+class GatewayFake(object):
+    """ Stateful in-memory stand-in for the `braintree.BraintreeGateway`."""
+
+    def __init__(
+        self,
+        latency: Optional[Dict] = None,
+        error_rate: float = 0.0,
+        rate_limit: Optional[Dict] = None,
+        plans: Optional[List[Dict]] = None,
+        seed: Optional[int] = None,
+        merchant_id: str = "fake_merchant_id",
+        **kwargs
+    ):
+        """ Constructor.
+
+        Args:
+            latency (Optional[Dict] = None): The distribution of the latency
+                in seconds simulated on every call defined through a
+                `distribution` key of `constant` (with a `value`), `uniform`
+                (with a `min` and a `max`), or `lognormal` (with a `median` and
+                a `sigma`). Defaults to no latency.
+            error_rate (float): The fraction of calls failing with a
+                `braintree.exceptions.ServerError`.
+            rate_limit (Optional[Dict] = None): A token-bucket rate limit
+                defined through a `rate` of calls per second and a `burst` of
+                calls, beyond which calls fail with a
+                `braintree.exceptions.TooManyRequestsError`. Defaults to no
+                rate limit.
+            plans (Optional[List[Dict]] = None): The attributes of the
+                available plans. Defaults to `plans_default`.
+            seed (Optional[int] = None): The seed of the random number
+                generator used for the latencies and errors.
+            merchant_id (str): The merchant ID set on created objects.
+        """
+
+        # Internalize arguments.
+        self.latency = latency or {}
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit or {}
+        self.merchant_id = merchant_id
+
+        # Create a class-level logger.
+        self.logger = create_logger(
+            logger_name=type(self).__name__,
+            logger_level=kwargs.get("logger_level", "DEBUG")
+        )
+
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+
+        # The in-memory state keyed by object ID or token.
+        self.customers = {}  # type: Dict[str, Dict]
+        self.payment_methods = {}  # type: Dict[str, Dict]
+        self.subscriptions = {}  # type: Dict[str, Dict]
+        self.plans = {
+            plan["id"]: plan for plan in (plans or plans_default)
+        }  # type: Dict[str, Dict]
+
+        # The token-bucket state.
+        self.rate_limit_tokens = float(self.rate_limit.get("burst", 1))
+        self.rate_limit_updated = time.monotonic()
+
+        # The number of calls made and failed.
+        self.calls = 0
+        self.calls_failed = 0
+        self.calls_limited = 0
+
+        # The number of calls made per thread.
+        self.local = threading.local()
+
+        self.customer = CustomerGatewayFake(fake=self)
+        self.subscription = SubscriptionGatewayFake(fake=self)
+        self.payment_method = PaymentMethodGatewayFake(fake=self)
+        self.client_token = ClientTokenGatewayFake(fake=self)
+        self.plan = PlanGatewayFake(fake=self)
+
+    @staticmethod
+    def now() -> datetime.datetime:
+        """ Returns the current UTC time truncated to seconds as Braintree
+            timestamps are.
+        """
+
+        return datetime.datetime.utcnow().replace(microsecond=0)
+
+    def get_latency(self) -> float:
+        """ Draws a latency from the configured distribution.
+
+        Returns:
+            float: The latency in seconds.
+        """
+
+        distribution = self.latency.get("distribution")
+
+        with self.lock:
+            if distribution == "constant":
+                return self.latency["value"]
+            elif distribution == "uniform":
+                return self.random.uniform(
+                    self.latency["min"],
+                    self.latency["max"],
+                )
+            elif distribution == "lognormal":
+                return self.random.lognormvariate(
+                    mu=0.0,
+                    sigma=self.latency["sigma"],
+                ) * self.latency["median"]
+
+        return 0.0
+
+    def is_rate_limited(self) -> bool:
+        """ Checks whether a call exceeds the configured rate limit and
+            consumes a token from the bucket otherwise.
+
+        Returns:
+            bool: Whether the call is rate-limited.
+        """
+
+        if not self.rate_limit:
+            return False
+
+        with self.lock:
+            now = time.monotonic()
+            self.rate_limit_tokens = min(
+                float(self.rate_limit.get("burst", 1)),
+                self.rate_limit_tokens + (
+                    (now - self.rate_limit_updated) * self.rate_limit["rate"]
+                ),
+            )
+            self.rate_limit_updated = now
+
+            if self.rate_limit_tokens < 1:
+                return True
+
+            self.rate_limit_tokens -= 1
+
+        return False
+
+    def simulate_call(self):
+        """ Simulates the latency, rate limit, and errors of a call made
+            against Braintree.
+
+        Raises:
+            DeadlineExceeded: Raised if the deadline of the incoming request
+                has passed or would pass during the call.
+            braintree.exceptions.TooManyRequestsError: Raised if the call
+                exceeds the rate limit.
+            braintree.exceptions.ServerError: Raised for the configured
+                fraction of calls.
+        """
+
+        remaining = check_deadline(operation="fake")
+
+        with self.lock:
+            self.calls += 1
+        self.local.calls = self.get_calls_thread() + 1
+
+        if self.is_rate_limited():
+            with self.lock:
+                self.calls_limited += 1
+            self.logger.debug("Simulating a rate-limited call.")
+            raise braintree.exceptions.TooManyRequestsError()
+
+        latency = self.get_latency()
+        if remaining is not None and latency >= remaining:
+            time.sleep(remaining)
+            msg_fmt = "Deadline exceeded during a simulated call."
+            raise DeadlineExceeded(msg_fmt)
+
+        if latency > 0:
+            time.sleep(latency)
+
+        with self.lock:
+            is_failed = self.random.random() < self.error_rate
+            if is_failed:
+                self.calls_failed += 1
+
+        if is_failed:
+            self.logger.debug("Simulating a failed call.")
+            raise braintree.exceptions.ServerError()
+
+    def get_calls_thread(self) -> int:
+        """ Returns the number of calls made by the current thread since the
+            last `reset_calls_thread` call as the `HttpCounting` strategies
+            do.
+        """
+
+        return getattr(self.local, "calls", 0)
+
+    def reset_calls_thread(self):
+        """ Resets the number of calls made by the current thread."""
+
+        self.local.calls = 0
+
+    def error(self, message: str) -> braintree.ErrorResult:
+        """ Creates an unsuccessful result.
+
+        Args:
+            message (str): The error message.
+
+        Returns:
+            braintree.ErrorResult: The unsuccessful result.
+        """
+
+        return braintree.ErrorResult(self, {"errors": {}, "message": message})
+
+    def get_subscription(self, subscription_id: str) -> braintree.Subscription:
+        """ Creates a `braintree.Subscription` from the stored attributes."""
+
+        return braintree.Subscription(
+            self,
+            copy.deepcopy(self.subscriptions[subscription_id]),
+        )
+
+    def _get_payment_method_attributes(self, token: str) -> Dict:
+        """ Assembles the attributes of a payment-method including its
+            subscriptions.
+        """
+
+        attributes = copy.deepcopy(self.payment_methods[token])
+        attributes["subscriptions"] = [
+            copy.deepcopy(subscription)
+            for subscription in self.subscriptions.values()
+            if subscription["payment_method_token"] == token
+        ]
+
+        return attributes
+
+    def get_payment_method(self, token: str) -> braintree.CreditCard:
+        """ Creates a `braintree.CreditCard` from the stored attributes."""
+
+        return braintree.CreditCard(
+            self,
+            self._get_payment_method_attributes(token=token),
+        )
+
+    def get_customer(self, customer_id: str) -> braintree.Customer:
+        """ Creates a `braintree.Customer` from the stored attributes."""
+
+        attributes = copy.deepcopy(self.customers[customer_id])
+        attributes["credit_cards"] = [
+            self._get_payment_method_attributes(token=token)
+            for token, payment_method in self.payment_methods.items()
+            if payment_method["customer_id"] == customer_id
+        ]
+        attributes["paypal_accounts"] = []
+
+        return braintree.Customer(self, attributes)
@@ -0,0 +1,627 @@
+# coding=utf-8
+
+"""
+This module defines the stores of the responses to requests carrying an
+`Idempotency-Key` header used by the `MiddlewareIdempotency`.
+
+A request reserves its key through `reserve` before being handled and either
+stores its final response through `complete` or, should it have failed with a
+server error, gives the key up through `release` so that it can be retried.
+Duplicates of a request still being handled wait on the original through
+`wait` instead of being handled again.
+
+The `IdempotencyStoreMemory` keeps the responses in the memory of the process
+and is meant for tests and single-process deployments while the
+`IdempotencyStoreFile` and `IdempotencyStoreSqlite` share them across the
+`gunicorn` workers of a host through a directory or a SQLite database.
+"""
+
+import os
+import json
+import time
+import base64
+import sqlite3
+import threading
+import collections
+from typing import Dict, Optional
+
+from braintree_server.excs import IdempotencyStoreError
+
+
+class IdempotencyRecord(object):
+    """ Class representing the reservation of an idempotency key and, once
+        complete, the final response of its request.
+    """
+
+    __slots__ = ("fingerprint", "expires", "status", "content_type", "body")
+
+    def __init__(
+        self,
+        fingerprint: str,
+        expires: float,
+        status: Optional[int] = None,
+        content_type: Optional[str] = None,
+        body: Optional[bytes] = None,
+    ):
+        """ Constructor.
+
+        Args:
+            fingerprint (str): The digest of the request the key was first
+                used with.
+            expires (float): The `time.time` timestamp at which the record
+                expires.
+            status (Optional[int] = None): The status code of the response.
+                Defaults to `None` while the request is being handled.
+            content_type (Optional[str] = None): The content type of the
+                response.
+            body (Optional[bytes] = None): The body of the response.
+        """
+
+        self.fingerprint = fingerprint
+        self.expires = expires
+        self.status = status
+        self.content_type = content_type
+        self.body = body
+
+    @property
+    def is_complete(self) -> bool:
+        """ Whether the request has been handled and its response stored."""
+
+        return self.status is not None
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        """ Checks whether the record has expired."""
+
+        return (time.time() if now is None else now) >= self.expires
+
+    def to_dict(self) -> Dict:
+        """ Converts the record into a JSON-serializable dictionary."""
+
+        return {
+            "fingerprint": self.fingerprint,
+            "expires": self.expires,
+            "status": self.status,
+            "content_type": self.content_type,
+            "body": (
+                base64.b64encode(self.body).decode("ascii")
+                if self.body is not None else None
+            ),
+        }
+
+    @classmethod
+    def from_dict(cls, record: Dict) -> "IdempotencyRecord":
+        """ Creates a record from a dictionary created via `to_dict`."""
+
+        return cls(
+            fingerprint=record["fingerprint"],
+            expires=record["expires"],
+            status=record["status"],
+            content_type=record["content_type"],
+            body=(
+                base64.b64decode(record["body"])
+                if record["body"] is not None else None
+            ),
+        )
+
+
+class IdempotencyStore(object):
+    """ Base class of the stores of idempotent responses."""
+
+    def __init__(
+        self,
+        ttl: float = 86400.0,
+        lock_timeout: float = 60.0,
+        poll_interval: float = 0.05,
+    ):
+        """ Constructor.
+
+        Args:
+            ttl (float): The number of seconds responses are stored for.
+            lock_timeout (float): The number of seconds after which the
+                reservation of a request that was never completed, e.g., due
+                to its worker having been killed, expires.
+            poll_interval (float): The number of seconds between checks on
+                a request being handled while waiting on it.
+        """
+
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+
+    def reserve(
+        self,
+        key: str,
+        fingerprint: str,
+    ) -> Optional[IdempotencyRecord]:
+        """ Reserves a key for a request unless it is already reserved.
+
+        Args:
+            key (str): The key.
+            fingerprint (str): The digest of the request.
+
+        Returns:
+            Optional[IdempotencyRecord]: `None` if the key was reserved in
+                which case `complete` or `release` must be called once the
+                request has been handled, otherwise the existing record.
+        """
+
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+        """ Retrieves the non-expired record of a key (if any)."""
+
+        raise NotImplementedError
+
+    def complete(
+        self,
+        key: str,
+        fingerprint: str,
+        status: int,
+        content_type: Optional[str],
+        body: bytes,
+    ):
+        """ Stores the final response of a request that reserved a key.
+
+        Args:
+            key (str): The key.
+            fingerprint (str): The digest of the request.
+            status (int): The status code of the response.
+            content_type (Optional[str]): The content type of the response.
+            body (bytes): The body of the response.
+        """
+
+        raise NotImplementedError
+
+    def release(self, key: str):
+        """ Gives up the reservation of a key so that its request can be
+            retried.
+        """
+
+        raise NotImplementedError
+
+    def wait(self, key: str, timeout: float) -> Optional[IdempotencyRecord]:
+        """ Waits for the request that reserved a key to be handled.
+
+        Args:
+            key (str): The key.
+            timeout (float): The maximum number of seconds to wait for.
+
+        Returns:
+            Optional[IdempotencyRecord]: The record of the key, still
+                incomplete should the timeout have been reached, or `None` if
+                the reservation was released or expired.
+        """
+
+        deadline = time.monotonic() + timeout
+        while True:
+            record = self.get(key=key)
+            if record is None or record.is_complete:
+                return record
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return record
+
+            time.sleep(min(self.poll_interval, remaining))
+
+
+class IdempotencyStoreMemory(IdempotencyStore):
+    """ Thread-safe, size-bounded, in-process store of idempotent responses.
+    """
+
+    def __init__(self, max_entries: int = 10000, **kwargs):
+        """ Constructor.
+
+        Args:
+            max_entries (int): The maximum number of records after which the
+                oldest records are evicted.
+        """
+
+        super(IdempotencyStoreMemory, self).__init__(**kwargs)
+
+        self.max_entries = max_entries
+
+        # Records ordered from the oldest to the most recent.
+        self.records = collections.OrderedDict()  # type: Dict
+
+        self.condition = threading.Condition()
+
+    def _get(self, key: str) -> Optional[IdempotencyRecord]:
+        """ Retrieves the non-expired record of a key.
+
+        Note:
+            This method must be called while holding `self.condition`.
+        """
+
+        record = self.records.get(key)
+        if record is not None and record.is_expired():
+            del self.records[key]
+            record = None
+
+        return record
+
+    def reserve(
+        self,
+        key: str,
+        fingerprint: str,
+    ) -> Optional[IdempotencyRecord]:
+
+        with self.condition:
+            record = self._get(key=key)
+            if record is not None:
+                return record
+
+            self.records[key] = IdempotencyRecord(
+                fingerprint=fingerprint,
+                expires=time.time() + self.lock_timeout,
+            )
+
+            while len(self.records) > self.max_entries:
+                self.records.popitem(last=False)
+
+        return None
+
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+
+        with self.condition:
+            return self._get(key=key)
+
+    def complete(
+        self,
+        key: str,
+        fingerprint: str,
+        status: int,
+        content_type: Optional[str],
+        body: bytes,
+    ):
+
+        with self.condition:
+            self.records[key] = IdempotencyRecord(
+                fingerprint=fingerprint,
+                expires=time.time() + self.ttl,
+                status=status,
+                content_type=content_type,
+                body=body,
+            )
+            self.records.move_to_end(key)
+            self.condition.notify_all()
+
+    def release(self, key: str):
+
+        with self.condition:
+            self.records.pop(key, None)
+            self.condition.notify_all()
+
+    def wait(self, key: str, timeout: float) -> Optional[IdempotencyRecord]:
+
+        def is_settled() -> bool:
+            record = self._get(key=key)
+            return record is None or record.is_complete
+
+        with self.condition:
+            self.condition.wait_for(is_settled, timeout=timeout)
+
+            return self._get(key=key)
+
+
+class IdempotencyStoreFile(IdempotencyStore):
+    """ Store of idempotent responses shared across processes through one
+        JSON file per key under a directory.
+    """
+
+    def __init__(self, directory: str, **kwargs):
+        """ Constructor.
+
+        Args:
+            directory (str): The directory the records are written to.
+        """
+
+        super(IdempotencyStoreFile, self).__init__(**kwargs)
+
+        self.directory = directory
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.purged = time.monotonic()
+
+    def get_fname(self, key: str) -> str:
+        """ Returns the path of the record file of a key."""
+
+        return os.path.join(self.directory, "{}.json".format(key))
+
+    def read(self, fname: str) -> Optional[IdempotencyRecord]:
+        """ Reads a record file.
+
+        Returns:
+            Optional[IdempotencyRecord]: The record or `None` if the file
+                doesn't exist. Files still being written to are read as
+                incomplete records.
+        """
+
+        try:
+            with open(fname) as fin:
+                content = fin.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            return IdempotencyRecord.from_dict(json.loads(content))
+        except ValueError:
+            return IdempotencyRecord(
+                fingerprint="",
+                expires=time.time() + self.lock_timeout,
+            )
+
+    def write(self, fname: str, record: IdempotencyRecord):
+        """ Atomically replaces a record file."""
+
+        fname_tmp = "{}.{}.{}.tmp".format(
+            fname,
+            os.getpid(),
+            threading.get_ident(),
+        )
+        with open(fname_tmp, "w") as fout:
+            json.dump(record.to_dict(), fout)
+        os.replace(fname_tmp, fname)
+
+    def purge(self):
+        """ Removes the expired record files at most once per `ttl`."""
+
+        now = time.monotonic()
+        if now - self.purged < min(self.ttl, 60.0):
+            return None
+        self.purged = now
+
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            record = self.read(fname=entry.path)
+            if record is not None and record.is_expired():
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def reserve(
+        self,
+        key: str,
+        fingerprint: str,
+    ) -> Optional[IdempotencyRecord]:
+
+        self.purge()
+
+        fname = self.get_fname(key=key)
+        record = IdempotencyRecord(
+            fingerprint=fingerprint,
+            expires=time.time() + self.lock_timeout,
+        )
+
+        # Attempt to reserve the key once more should its record have expired.
+        for _ in range(2):
+            try:
+                fd = os.open(fname, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                existing = self.read(fname=fname)
+                if existing is not None and not existing.is_expired():
+                    return existing
+                try:
+                    os.unlink(fname)
+                except FileNotFoundError:
+                    pass
+                continue
+            except OSError as exc:
+                msg = "Could not reserve idempotency key file '{}': {}"
+                msg_fmt = msg.format(fname, str(exc))
+                raise IdempotencyStoreError(msg_fmt)
+
+            with os.fdopen(fd, "w") as fout:
+                json.dump(record.to_dict(), fout)
+
+            return None
+
+        return self.read(fname=fname)
+
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+
+        record = self.read(fname=self.get_fname(key=key))
+        if record is None or record.is_expired():
+            return None
+
+        return record
+
+    def complete(
+        self,
+        key: str,
+        fingerprint: str,
+        status: int,
+        content_type: Optional[str],
+        body: bytes,
+    ):
+
+        self.write(
+            fname=self.get_fname(key=key),
+            record=IdempotencyRecord(
+                fingerprint=fingerprint,
+                expires=time.time() + self.ttl,
+                status=status,
+                content_type=content_type,
+                body=body,
+            ),
+        )
+
+    def release(self, key: str):
+
+        try:
+            os.unlink(self.get_fname(key=key))
+        except FileNotFoundError:
+            pass
+
+
+class IdempotencyStoreSqlite(IdempotencyStore):
+    """ Store of idempotent responses shared across processes through a
+        SQLite database.
+    """
+
+    def __init__(self, path: str, **kwargs):
+        """ Constructor.
+
+        Args:
+            path (str): The path of the SQLite database file.
+        """
+
+        super(IdempotencyStoreSqlite, self).__init__(**kwargs)
+
+        self.path = path
+
+        # Connections are opened per thread and process.
+        self.local = threading.local()
+
+        self.purged = time.monotonic()
+
+        connection = self.get_connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS idempotency ("
+            "key TEXT PRIMARY KEY, "
+            "fingerprint TEXT NOT NULL, "
+            "expires REAL NOT NULL, "
+            "status INTEGER, "
+            "content_type TEXT, "
+            "body BLOB)"
+        )
+
+    def get_connection(self) -> sqlite3.Connection:
+        """ Returns the connection of the current thread opening it first if
+            needed, e.g., in a forked worker.
+        """
+
+        connection = getattr(self.local, "connection", None)
+        if connection is None or self.local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.lock_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+
+        return connection
+
+    def execute(self, *args) -> sqlite3.Cursor:
+        """ Executes a statement through the connection of the current thread
+            wrapping errors into `IdempotencyStoreError` exceptions.
+        """
+
+        try:
+            return self.get_connection().execute(*args)
+        except sqlite3.Error as exc:
+            msg = "Could not query idempotency store '{}': {}"
+            msg_fmt = msg.format(self.path, str(exc))
+            raise IdempotencyStoreError(msg_fmt)
+
+    def purge(self):
+        """ Removes the expired records at most once per `ttl`."""
+
+        now = time.monotonic()
+        if now - self.purged < min(self.ttl, 60.0):
+            return None
+        self.purged = now
+
+        self.execute(
+            "DELETE FROM idempotency WHERE expires <= ?",
+            (time.time(),),
+        )
+
+    def reserve(
+        self,
+        key: str,
+        fingerprint: str,
+    ) -> Optional[IdempotencyRecord]:
+
+        self.purge()
+
+        now = time.time()
+        self.execute(
+            "DELETE FROM idempotency WHERE key = ? AND expires <= ?",
+            (key, now),
+        )
+        cursor = self.execute(
+            "INSERT OR IGNORE INTO idempotency (key, fingerprint, expires) "
+            "VALUES (?, ?, ?)",
+            (key, fingerprint, now + self.lock_timeout),
+        )
+        if cursor.rowcount == 1:
+            return None
+
+        return self.get(key=key)
+
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+
+        row = self.execute(
+            "SELECT fingerprint, expires, status, content_type, body "
+            "FROM idempotency WHERE key = ? AND expires > ?",
+            (key, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+
+        return IdempotencyRecord(
+            fingerprint=row[0],
+            expires=row[1],
+            status=row[2],
+            content_type=row[3],
+            body=bytes(row[4]) if row[4] is not None else None,
+        )
+
+    def complete(
+        self,
+        key: str,
+        fingerprint: str,
+        status: int,
+        content_type: Optional[str],
+        body: bytes,
+    ):
+
+        self.execute(
+            "INSERT OR REPLACE INTO idempotency "
+            "(key, fingerprint, expires, status, content_type, body) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                fingerprint,
+                time.time() + self.ttl,
+                status,
+                content_type,
+                sqlite3.Binary(body),
+            ),
+        )
+
+    def release(self, key: str):
+
+        self.execute("DELETE FROM idempotency WHERE key = ?", (key,))
+
+
+def create_idempotency_store(
+    backend: str = "memory",
+    path: Optional[str] = None,
+    **kwargs
+) -> IdempotencyStore:
+    """ Creates a store of idempotent responses.
+
+    Args:
+        backend (str): The backend of the store, i.e., `memory`, `file`, or
+            `sqlite`.
+        path (Optional[str] = None): The directory of the `file` backend or
+            the database file of the `sqlite` backend.
+
+    Returns:
+        IdempotencyStore: The created store.
+    """
+
+    if backend == "file":
+        return IdempotencyStoreFile(directory=path, **kwargs)
+    elif backend == "sqlite":
+        return IdempotencyStoreSqlite(path=path, **kwargs)
+
+    return IdempotencyStoreMemory(**kwargs)
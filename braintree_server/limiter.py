@@ -0,0 +1,133 @@
+# coding=utf-8
+
+"""
+This module defines an adaptive limiter of the concurrent requests a worker
+process makes to Braintree.
+
+The `LimiterAimd` follows an additive-increase/multiplicative-decrease scheme:
+the limit grows by one whenever a request completes within the latency
+threshold while at least half the limit was in use, and shrinks by the
+backoff ratio whenever a request is slower than the threshold or fails, e.g.,
+times out or is rate-limited. Requests over the limit are shed rather than
+queued so that threads aren't tied up waiting on a degraded Braintree, e.g.,
+
+    if limiter.acquire():
+        start = time.perf_counter()
+        try:
+            ...
+        finally:
+            limiter.release(latency=time.perf_counter() - start, failed=...)
+"""
+
+import threading
+
+from braintree_server.metrics import metric_braintree_limit
+from braintree_server.metrics import metric_braintree_inflight
+
+
+class LimiterAimd(object):
+    """ Class limiting the number of concurrent requests adapting the limit
+        to their latency.
+    """
+
+    def __init__(
+        self,
+        limit_initial: int = 20,
+        limit_min: int = 1,
+        limit_max: int = 200,
+        latency_threshold: float = 1.0,
+        backoff_ratio: float = 0.9,
+        retry_after: int = 1,
+    ):
+        """ Constructor.
+
+        Args:
+            limit_initial (int): The initial limit.
+            limit_min (int): The lowest the limit can shrink to.
+            limit_max (int): The highest the limit can grow to.
+            latency_threshold (float): The latency in seconds above which the
+                limit shrinks.
+            backoff_ratio (float): The ratio the limit is multiplied by when
+                shrinking.
+            retry_after (int): The number of seconds clients of shed requests
+                are advised to wait before retrying.
+        """
+
+        # Internalize arguments.
+        self.limit_min = limit_min
+        self.limit_max = limit_max
+        self.latency_threshold = latency_threshold
+        self.backoff_ratio = backoff_ratio
+        self.retry_after = retry_after
+
+        self.limit = float(min(max(limit_initial, limit_min), limit_max))
+        self.inflight = 0
+        self.lock = threading.Lock()
+
+        # Expose the limit and in-flight requests upon collection.
+        metric_braintree_limit.labels().set_function(self.get_limit)
+        metric_braintree_inflight.labels().set_function(self.get_inflight)
+
+    def get_limit(self) -> int:
+        """ Returns the current limit."""
+
+        return int(self.limit)
+
+    def get_inflight(self) -> int:
+        """ Returns the number of requests in flight."""
+
+        return self.inflight
+
+    def acquire(self, force: bool = False) -> bool:
+        """ Admits a request should the limit not have been reached.
+
+        Args:
+            force (bool): Whether to admit the request regardless of the
+                limit, e.g., for later requests of a sequence whose first
+                request was admitted.
+
+        Returns:
+            bool: Whether the request was admitted in which case `release`
+                must be called upon its completion.
+        """
+
+        with self.lock:
+            if not force and self.inflight >= int(self.limit):
+                return False
+            self.inflight += 1
+
+        return True
+
+    def release(
+        self,
+        latency: float,
+        failed: bool = False,
+        cancelled: bool = False,
+    ):
+        """ Records the completion of an admitted request adapting the limit
+            to its outcome.
+
+        Args:
+            latency (float): The latency of the request in seconds.
+            failed (bool): Whether the request failed in a way indicating
+                overload, e.g., timed out or was rate-limited.
+            cancelled (bool): Whether the request was given up on by its
+                caller, e.g., at the deadline of the incoming request, in
+                which case its outcome says nothing about Braintree and the
+                limit is left as is.
+        """
+
+        with self.lock:
+            inflight = self.inflight
+            self.inflight -= 1
+
+            if cancelled:
+                return None
+
+            if failed or latency > self.latency_threshold:
+                self.limit = max(
+                    self.limit_min,
+                    self.limit * self.backoff_ratio,
+                )
+            elif inflight * 2 >= self.limit:
+                self.limit = min(self.limit_max, self.limit + 1)
@@ -4,17 +4,475 @@
 
 This module contains a function that creates and customizes `logging.Logger`
 objects for use across the entire-application.
+
+The handlers writing to standard-out and syslog are shared across all loggers
+created with the same settings. Optionally, through `enable_logging_queue`,
+records can instead be handed to a bounded queue drained by a single
+`logging.handlers.QueueListener` thread per process, i.e., the request threads
+never write to standard-out or syslog themselves.
+
+Records can be emitted as compact JSON lines through `set_log_format` and carry
+the ID of the request they were emitted under, as bound via `bind_context`,
+along with any fields passed to a `LoggerStructured`, e.g.,
+
+    logger = LoggerStructured(create_logger(logger_name="Resource"))
+    logger.info("Retrieving customer '%s'.", customer_id, customer_id=cid)
+
+Records of a `LoggerStructured` are formatted lazily and, as configured via
+`set_log_sampling`, only emitted for a fraction of the requests to a route.
 """
 
 from __future__ import unicode_literals
 
+import os
 import sys
+import json
+import queue
+import random
+import atexit
+import datetime
 import logging
 import logging.handlers
+import threading
+import contextvars
+from typing import Dict, Optional, Tuple
 
 import colorlog
 
 
+# The loggers created through `create_logger` and their shared handlers keyed
+# by the logger name.
+_loggers = {}  # type: Dict[str, Tuple[logging.Logger, list]]
+
+# The shared handlers keyed by the settings they were created with.
+_handlers = {}  # type: Dict[tuple, list]
+
+# The lock guarding the shared state above.
+_lock = threading.RLock()
+
+# The queue pipeline placeholder, i.e., `None` unless enabled.
+_logging_queue = None
+
+# The format of the records emitted by the shared handlers, i.e., `text` or
+# `json`.
+_log_format = "text"
+
+# The fraction of requests whose records are emitted keyed by the route and
+# the logging level. The `*` route applies to routes without rates of their
+# own.
+_log_sampling = {}  # type: Dict[Tuple[str, int], float]
+
+# The context of the request being handled by the current thread.
+_log_context = contextvars.ContextVar("log_context", default=None)
+
+# The `LogRecord` attributes which are not emitted as fields.
+_record_attributes = set(vars(logging.makeLogRecord({}))) | {"message"}
+
+
+class LogContext(object):
+    """ Class holding the context of the request being handled."""
+
+    __slots__ = ("request_id", "route", "sample")
+
+    def __init__(self, request_id: str, route: Optional[str] = None):
+        """ Constructor.
+
+        Args:
+            request_id (str): The ID of the request.
+            route (Optional[str]): The route the request was routed to.
+        """
+
+        self.request_id = request_id
+        self.route = route
+
+        # The random number compared against the sampling rates so that
+        # records of a request are either all emitted or dropped per level.
+        self.sample = random.random()
+
+
+def bind_context(request_id: str) -> contextvars.Token:
+    """ Binds the context of a request to the current thread.
+
+    Args:
+        request_id (str): The ID of the request.
+
+    Returns:
+        contextvars.Token: The token used to unbind the context via
+            `unbind_context`.
+    """
+
+    return _log_context.set(LogContext(request_id=request_id))
+
+
+def unbind_context(token: contextvars.Token):
+    """ Unbinds the context of a request from the current thread.
+
+    Args:
+        token (contextvars.Token): The token returned by `bind_context`.
+    """
+
+    _log_context.reset(token)
+
+
+def get_context() -> Optional[LogContext]:
+    """ Returns the context of the request being handled, if any."""
+
+    return _log_context.get()
+
+
+def is_sampled(level: int) -> bool:
+    """ Checks whether records of a given level are emitted for the current
+        request as configured via `set_log_sampling`.
+
+    Args:
+        level (int): The logging level.
+
+    Returns:
+        bool: Whether records are emitted.
+    """
+
+    if not _log_sampling:
+        return True
+
+    context = _log_context.get()
+    route = context.route if context is not None else None
+
+    rate = _log_sampling.get((route, level))
+    if rate is None:
+        rate = _log_sampling.get(("*", level), 1.0)
+
+    if rate >= 1.0:
+        return True
+
+    sample = context.sample if context is not None else random.random()
+
+    return sample < rate
+
+
+def set_log_sampling(sampling: Optional[Dict[str, Dict[str, float]]]):
+    """ Sets the fraction of requests whose records are emitted per route and
+        logging level.
+
+    Args:
+        sampling (Optional[Dict[str, Dict[str, float]]]): The rates keyed by
+            route and level name, e.g., `{"/ping": {"INFO": 0.01}}`. The `*`
+            route applies to routes without rates of their own. Levels
+            without a rate are always emitted.
+    """
+
+    global _log_sampling
+
+    _log_sampling = {
+        (route, logging.getLevelName(level)): rate
+        for route, rates in (sampling or {}).items()
+        for level, rate in rates.items()
+    }
+
+
+class FilterContext(logging.Filter):
+    """ Filter adding the ID of the request being handled to the records on
+        the thread emitting them.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+
+        context = _log_context.get()
+        record.request_id = context.request_id if context else None
+
+        return True
+
+
+# The filter shared by all loggers created through `create_logger`.
+_filter_context = FilterContext()
+
+
+class FormatterJson(logging.Formatter):
+    """ Formatter emitting records as compact JSON lines including the ID of
+        the request and any fields passed to a `LoggerStructured`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+
+        event = {
+            "ts": datetime.datetime.utcfromtimestamp(
+                record.created
+            ).isoformat() + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+        }
+
+        for name, value in record.__dict__.items():
+            if name not in _record_attributes:
+                event[name] = value
+
+        if record.exc_info:
+            event["exc_info"] = self.formatException(record.exc_info)
+
+        return json.dumps(event, separators=(",", ":"), default=str)
+
+
+class LoggerStructured(logging.LoggerAdapter):
+    """ Logger adapter accepting fields as keyword arguments, formatting the
+        message lazily, and emitting records per the sampling rates, e.g.,
+
+            logger.info("Deleting customer '%s'.", cid, customer_id=cid)
+    """
+
+    # The keyword arguments handled by `logging.Logger.log`.
+    kwargs_logger = ("exc_info", "stack_info", "stacklevel", "extra")
+
+    def __init__(self, logger: logging.Logger):
+        super(LoggerStructured, self).__init__(logger=logger, extra=None)
+
+    def isEnabledFor(self, level: int) -> bool:
+
+        return self.logger.isEnabledFor(level) and is_sampled(level)
+
+    def process(self, msg, kwargs):
+
+        extra = kwargs.pop("extra", None) or {}
+        for name in list(kwargs):
+            if name not in self.kwargs_logger:
+                extra[name] = kwargs.pop(name)
+        kwargs["extra"] = extra
+
+        return msg, kwargs
+
+
+class QueueHandlerBounded(logging.handlers.QueueHandler):
+    """ Queue handler enqueueing records into a bounded queue and either
+        dropping or blocking on records that don't fit.
+    """
+
+    def __init__(
+        self,
+        queue_records: queue.Queue,
+        overflow: str = "drop",
+        block_timeout: Optional[float] = None,
+    ):
+        """ Constructor.
+
+        Args:
+            queue_records (queue.Queue): The bounded queue records are
+                enqueued into.
+            overflow (str): The policy applied when the queue is full, i.e.,
+                `drop` to discard the record or `block` to wait for space.
+            block_timeout (Optional[float]): The number of seconds to wait for
+                space under the `block` policy before discarding the record.
+                Defaults to waiting indefinitely.
+        """
+
+        super(QueueHandlerBounded, self).__init__(queue=queue_records)
+
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        """ Enqueues a record counting it as dropped should the queue be
+            full.
+
+        Args:
+            record (logging.LogRecord): The prepared record.
+        """
+
+        try:
+            if self.overflow == "block":
+                self.queue.put(record, block=True, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with _lock:
+                self.dropped += 1
+
+
+class LoggingQueue(object):
+    """ Class managing the bounded queue, the `QueueHandlerBounded` shared by
+        all loggers, and the `QueueListener` thread draining the queue into
+        the shared handlers.
+    """
+
+    def __init__(
+        self,
+        handlers: list,
+        queue_size: int = 10000,
+        overflow: str = "drop",
+        block_timeout: Optional[float] = None,
+    ):
+        """ Constructor.
+
+        Args:
+            handlers (list): The handlers the records are written to by the
+                listener thread.
+            queue_size (int): The maximum number of records held in the queue.
+            overflow (str): The policy applied when the queue is full, i.e.,
+                `drop` or `block`.
+            block_timeout (Optional[float]): The number of seconds to wait for
+                space under the `block` policy.
+        """
+
+        self.handlers = handlers
+        self.queue_size = queue_size
+
+        self.handler = QueueHandlerBounded(
+            queue_records=queue.Queue(maxsize=queue_size),
+            overflow=overflow,
+            block_timeout=block_timeout,
+        )
+        self.listener = None
+
+    def start(self):
+        """ Starts the listener thread draining the queue."""
+
+        self.listener = logging.handlers.QueueListener(
+            self.handler.queue,
+            *self.handlers,
+            respect_handler_level=True
+        )
+        self.listener.start()
+
+    def stop(self):
+        """ Stops the listener thread after the queued records are written."""
+
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def reinitialize(self):
+        """ Replaces the queue and listener thread after a fork since the
+            thread doesn't survive the fork and the queue may be left locked.
+            The records queued in the parent are written by the parent.
+        """
+
+        self.handler.queue = queue.Queue(maxsize=self.queue_size)
+        self.handler.dropped = 0
+        self.listener = None
+        self.start()
+
+    def get_stats(self) -> Dict[str, int]:
+        """ Returns the queue depth and capacity and the number of dropped
+            records.
+
+        Returns:
+            Dict[str, int]: The `queue_depth`, `queue_capacity`, and
+                `records_dropped` of the current process.
+        """
+
+        return {
+            "queue_depth": self.handler.queue.qsize(),
+            "queue_capacity": self.queue_size,
+            "records_dropped": self.handler.dropped,
+        }
+
+
+def _set_formatter(handler: logging.Handler):
+    """ Sets the formatter of a shared handler per the current log format."""
+
+    if _log_format == "json":
+        handler.setFormatter(FormatterJson())
+    else:
+        handler.setFormatter(handler.formatter_text)
+
+
+def set_log_format(log_format: str):
+    """ Sets the format of the records emitted by the shared handlers.
+
+    Args:
+        log_format (str): The format, i.e., `text` for the human-readable
+            (and, on standard-out, colourful) format or `json` for compact
+            JSON lines.
+    """
+
+    global _log_format
+
+    with _lock:
+        _log_format = log_format
+        for handlers in _handlers.values():
+            for handler in handlers:
+                _set_formatter(handler=handler)
+
+
+def _get_handlers(
+    project_name: str,
+    do_log_stdout: bool,
+    do_log_syslog: bool,
+    do_color_logs: bool,
+) -> list:
+    """ Returns the handlers shared by the loggers created with the given
+        settings creating them upon first use.
+
+    Args:
+        project_name (str): Name of the project appearing in the messages.
+        do_log_stdout (bool): Whether to create a 'standard-out' handler.
+        do_log_syslog (bool): Whether to create a 'syslog' handler.
+        do_color_logs (bool): Whether to emitted colorful log messages.
+
+    Returns:
+        list: The shared handlers.
+    """
+
+    key = (project_name, do_log_stdout, do_log_syslog, do_color_logs)
+
+    with _lock:
+        if key in _handlers:
+            return _handlers[key]
+
+        handlers = []
+
+        # Assemble the logging format.
+        fmt_tmpl = ("{0}: %(process)d %(processName)s %(asctime)-15s "
+                    "%(levelname)-8s %(name)-10s %(funcName)s %(message)s")
+        fmt = fmt_tmpl.format(project_name)
+
+        # Create a colourful formatter (should one be needed).
+        formatter_w_color = colorlog.ColoredFormatter(
+            fmt="%(log_color)s" + fmt,
+            datefmt="%Y-%m-%dT%H:%M:%SZ",
+            reset=True,
+            log_colors={
+                'DEBUG': 'blue',
+                'INFO': 'green',
+                'WARNING': 'yellow',
+                'ERROR': 'red',
+                'CRITICAL': 'red,bg_white',
+            },
+            secondary_log_colors={},
+            style='%'
+        )
+
+        # Create a formatter without colours.
+        formatter_wo_color = logging.Formatter(fmt=fmt)
+
+        # Create an 'stdout' logging handler, set its output format, and add
+        # it to the shared handlers (if enabled).
+        if do_log_stdout:
+            handler_stdout = logging.StreamHandler(sys.stdout)
+            handler_stdout.formatter_text = (
+                formatter_w_color if do_color_logs else formatter_wo_color
+            )
+            handlers.append(handler_stdout)
+
+        # Create a 'syslog' logging handler, set its output format, and add it
+        # to the shared handlers (if enabled).
+        if do_log_syslog and ("darwin" not in sys.platform):
+            handler_syslog = logging.handlers.SysLogHandler(address="/dev/log")
+            # Syslog does not like colours and displays the colour-codes in a
+            # mess so we're using the colour-less formatter instead.
+            handler_syslog.formatter_text = formatter_wo_color
+            handlers.append(handler_syslog)
+
+        # Set the output format of the handlers.
+        for handler in handlers:
+            _set_formatter(handler=handler)
+
+        _handlers[key] = handlers
+
+        return handlers
+
+
 def create_logger(
         logger_name,
         logger_level="DEBUG",
@@ -32,7 +490,9 @@ def create_logger(
 
     Other features include logging to standard-out, syslog, a very verbose
     format used in the handlers to aid in debugging, and colorful messages via
-    the `colorlog` package.
+    the `colorlog` package. The handlers are shared across loggers created with
+    the same settings while, should the queue have been enabled through
+    `enable_logging_queue`, the logger only hands its records to the queue.
 
     Note:
         Due to the `logging` design, loggers are uniquely identified by their
@@ -69,46 +529,132 @@ def create_logger(
     if logger.handlers:
         return logger
 
-    # Assemble the logging format.
-    fmt_tmpl = ("{0}: %(process)d %(processName)s %(asctime)-15s "
-                "%(levelname)-8s %(name)-10s %(funcName)s %(message)s")
-    fmt = fmt_tmpl.format(project_name)
-
-    # Create a colourful formatter (should one be needed).
-    formatter_w_color = colorlog.ColoredFormatter(
-        fmt="%(log_color)s" + fmt,
-        datefmt="%Y-%m-%dT%H:%M:%SZ",
-        reset=True,
-        log_colors={
-            'DEBUG': 'blue',
-            'INFO': 'green',
-            'WARNING': 'yellow',
-            'ERROR': 'red',
-            'CRITICAL': 'red,bg_white',
-        },
-        secondary_log_colors={},
-        style='%'
-    )
-
-    # Create a formatter without colours.
-    formatter_wo_color = logging.Formatter(fmt=fmt)
-
-    # Create an 'stdout' logging handler, set its output format, and add to the
-    # logger (if enabled).
-    if do_log_stdout:
-        handler_stdout = logging.StreamHandler(sys.stdout)
-        handler_stdout.setFormatter(
-            formatter_w_color if do_color_logs else formatter_wo_color
+    with _lock:
+        handlers = _get_handlers(
+            project_name=project_name,
+            do_log_stdout=do_log_stdout,
+            do_log_syslog=do_log_syslog,
+            do_color_logs=do_color_logs,
         )
-        logger.addHandler(handler_stdout)
 
-    # Create a 'syslog' logging handler, set its output format, and add to the
-    # logger (if enabled).
-    if do_log_syslog and ("darwin" not in sys.platform):
-        handler_syslog = logging.handlers.SysLogHandler(address="/dev/log")
-        # Syslog does not like colours and displays the colour-codes in a mess
-        # so we're using the colour-less formatter instead.
-        handler_syslog.setFormatter(formatter_wo_color)
-        logger.addHandler(handler_syslog)
+        if _logging_queue is not None:
+            logger.addHandler(_logging_queue.handler)
+        else:
+            for handler in handlers:
+                logger.addHandler(handler)
+
+        # Add the ID of the request being handled to the records.
+        logger.addFilter(_filter_context)
+
+        _loggers[logger_name] = (logger, handlers)
 
     return logger
+
+
+def enable_logging_queue(
+    queue_size: int = 10000,
+    overflow: str = "drop",
+    block_timeout: Optional[float] = None,
+    project_name: str = "braintree-gateway",
+    do_log_stdout: bool = True,
+    do_log_syslog: bool = True,
+    do_color_logs: bool = True,
+):
+    """ Routes the records of all loggers created through `create_logger`
+        through a bounded queue drained by a single listener thread.
+
+    Note:
+        The listener writes to the handlers created with the settings passed
+        here irrespective of the settings individual loggers were created
+        with. The listener thread is restarted in forked child processes,
+        e.g., the workers of a pre-loading `gunicorn`. Calling this function
+        while the queue is enabled has no effect.
+
+    Args:
+        queue_size (int): The maximum number of records held in the queue.
+        overflow (str): The policy applied when the queue is full, i.e.,
+            `drop` to discard the record or `block` to wait for space.
+        block_timeout (Optional[float]): The number of seconds to wait for
+            space under the `block` policy before discarding the record.
+        project_name (str): Name of the project appearing in the messages.
+        do_log_stdout (bool, optional): Whether to log to standard-out.
+        do_log_syslog (bool, optional): Whether to log to syslog.
+        do_color_logs (bool, optional): Whether to emitted colorful log
+            messages.
+    """
+
+    global _logging_queue
+
+    with _lock:
+        if _logging_queue is not None:
+            return None
+
+        handlers = _get_handlers(
+            project_name=project_name,
+            do_log_stdout=do_log_stdout,
+            do_log_syslog=do_log_syslog,
+            do_color_logs=do_color_logs,
+        )
+
+        _logging_queue = LoggingQueue(
+            handlers=handlers,
+            queue_size=queue_size,
+            overflow=overflow,
+            block_timeout=block_timeout,
+        )
+        _logging_queue.start()
+
+        # Point the existing loggers to the queue.
+        for logger, handlers_logger in _loggers.values():
+            for handler in handlers_logger:
+                logger.removeHandler(handler)
+            logger.addHandler(_logging_queue.handler)
+
+
+def disable_logging_queue():
+    """ Writes out the queued records, stops the listener thread, and points
+        the loggers back to their shared handlers.
+    """
+
+    global _logging_queue
+
+    with _lock:
+        if _logging_queue is None:
+            return None
+
+        _logging_queue.stop()
+
+        for logger, handlers_logger in _loggers.values():
+            logger.removeHandler(_logging_queue.handler)
+            for handler in handlers_logger:
+                logger.addHandler(handler)
+
+        _logging_queue = None
+
+
+def get_logging_queue_stats() -> Optional[Dict[str, int]]:
+    """ Returns the queue depth and capacity and the number of dropped records
+        of the current process.
+
+    Returns:
+        Optional[Dict[str, int]]: The `queue_depth`, `queue_capacity`, and
+            `records_dropped` or `None` if the queue isn't enabled.
+    """
+
+    if _logging_queue is None:
+        return None
+
+    return _logging_queue.get_stats()
+
+
+def _reinitialize_after_fork():
+    """ Restarts the queue listener in a forked child process."""
+
+    if _logging_queue is not None:
+        _logging_queue.reinitialize()
+
+
+# Write out the queued records on exit and restart the listener thread, which
+# doesn't survive a fork, in child processes.
+atexit.register(disable_logging_queue)
+os.register_at_fork(after_in_child=_reinitialize_after_fork)
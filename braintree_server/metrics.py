@@ -0,0 +1,902 @@
+# coding=utf-8
+
+"""
+This module defines an in-process metrics registry and the metrics recorded by
+the service, exposed in the Prometheus text format under `/metrics`.
+
+Recording a value updates plain Python numbers under a lock per set of label
+values as CPython may switch threads within in-place additions, which would
+lose updates made concurrently.
+
+To aggregate the metrics across `gunicorn` worker processes every process
+periodically writes a snapshot of its metrics to a file of its own under a
+shared directory through a `MetricsStore` whose `collect` method sums the
+snapshots of all processes, i.e., the aggregated values lag by at most the
+flush interval for processes other than the one serving the scrape. The values
+are reset in forked child processes so that the workers of a pre-loading
+`gunicorn` don't inherit those of the master. Snapshots of exited workers,
+without their gauges which only reflect running processes, are folded into a
+single aggregate snapshot and deleted so that counters never decrease while
+workers recycled through `max_requests` don't pile files up, i.e., the
+directory should be emptied on deployment, e.g., by placing it under `/run`.
+"""
+
+import os
+import json
+import glob
+import fcntl
+import bisect
+import threading
+import contextlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# The default upper bounds of the histogram buckets in seconds.
+BUCKETS_DEFAULT = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0,
+)
+
+
+class CounterChild(object):
+    """ Class holding the value of a counter for a set of label values."""
+
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        """ Increments the counter.
+
+        Args:
+            amount (float): The amount the counter is incremented by.
+        """
+
+        with self.lock:
+            self.value += amount
+
+    def get(self) -> float:
+        return self.value
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.value = 0.0
+
+    def merge(self, value: float):
+        self.value += value
+
+
+class GaugeChild(object):
+    """ Class holding the value of a gauge for a set of label values or the
+        function returning it.
+    """
+
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+
+    def set(self, value: float):
+        """ Sets the gauge.
+
+        Args:
+            value (float): The value of the gauge.
+        """
+
+        self.value = value
+
+    def set_function(self, function):
+        """ Sets a function returning the value of the gauge upon collection,
+            e.g., the current limit of a concurrency limiter.
+
+        Args:
+            function (Callable[[], float]): The function.
+        """
+
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            return float(self.function())
+        return self.value
+
+    def reset(self):
+        self.value = 0.0
+
+    def merge(self, value: float):
+        self.value += value
+
+
+class HistogramChild(object):
+    """ Class holding the bucket counts and sum of a histogram for a set of
+        label values.
+    """
+
+    __slots__ = ("upper_bounds", "counts", "sum", "lock")
+
+    def __init__(self, upper_bounds: Sequence[float]):
+        self.upper_bounds = upper_bounds
+        # The counts per bucket, non-cumulative, with the last bucket counting
+        # values above the highest upper bound.
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        """ Records an observed value.
+
+        Args:
+            value (float): The observed value, e.g., a duration in seconds.
+        """
+
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def get(self) -> List:
+        with self.lock:
+            return [list(self.counts), self.sum]
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.counts = [0] * len(self.counts)
+        self.sum = 0.0
+
+    def merge(self, value: List):
+        counts, value_sum = value
+        for index, count in enumerate(counts):
+            self.counts[index] += count
+        self.sum += value_sum
+
+
+class Metric(object):
+    """ Base class of the metrics holding a child per set of label values."""
+
+    type = None  # type: str
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+    ):
+        """ Constructor.
+
+        Args:
+            name (str): The name of the metric.
+            documentation (str): The description of the metric.
+            labelnames (Sequence[str]): The names of the labels.
+        """
+
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+        self.children = {}  # type: Dict[Tuple[str, ...], object]
+        self.lock = threading.Lock()
+
+    def create_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """ Returns the child pertaining to a set of label values creating it
+            upon first use.
+
+        Args:
+            *values (str): The label values in the order of the label names.
+
+        Returns:
+            The `CounterChild`, `GaugeChild`, or `HistogramChild`.
+        """
+
+        try:
+            return self.children[values]
+        except KeyError:
+            with self.lock:
+                return self.children.setdefault(values, self.create_child())
+
+    def reset(self):
+        """ Resets the recorded values in-place so that children retrieved
+            via `labels` ahead of time remain valid.
+
+        Note:
+            This method is called in forked child processes and doesn't
+            acquire the lock which may have been held by a parent thread.
+        """
+
+        self.lock = threading.Lock()
+        for child in list(self.children.values()):
+            child.reset()
+
+    def collect(self) -> Dict:
+        """ Returns a JSON-serializable snapshot of the recorded values."""
+
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": [
+                [list(values), child.get()]
+                for values, child in list(self.children.items())
+            ],
+        }
+
+
+class Counter(Metric):
+    """ Class implementing a monotonically increasing counter."""
+
+    type = "counter"
+
+    def create_child(self) -> CounterChild:
+        return CounterChild()
+
+
+class Gauge(Metric):
+    """ Class implementing a gauge, i.e., a value which can go up and down.
+
+    Note:
+        Gauges are summed across processes like counters, e.g., the limits of
+        the concurrency limiters of all workers add up to the limit of the
+        deployment.
+    """
+
+    type = "gauge"
+
+    def create_child(self) -> GaugeChild:
+        return GaugeChild()
+
+
+class Histogram(Metric):
+    """ Class implementing a histogram of observed values."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = BUCKETS_DEFAULT,
+    ):
+        """ Constructor.
+
+        Args:
+            name (str): The name of the metric.
+            documentation (str): The description of the metric.
+            labelnames (Sequence[str]): The names of the labels.
+            buckets (Sequence[float]): The sorted upper bounds of the buckets.
+        """
+
+        super(Histogram, self).__init__(
+            name=name,
+            documentation=documentation,
+            labelnames=labelnames,
+        )
+
+        self.buckets = tuple(buckets)
+
+    def create_child(self) -> HistogramChild:
+        return HistogramChild(upper_bounds=self.buckets)
+
+    def collect(self) -> Dict:
+
+        snapshot = super(Histogram, self).collect()
+        snapshot["buckets"] = list(self.buckets)
+
+        return snapshot
+
+
+class MetricsRegistry(object):
+    """ Class holding the metrics of the process."""
+
+    def __init__(self):
+        self.metrics = {}  # type: Dict[str, Metric]
+
+    def register(self, metric: Metric) -> Metric:
+        """ Registers a metric.
+
+        Args:
+            metric (Metric): The metric.
+
+        Returns:
+            Metric: The registered metric.
+        """
+
+        self.metrics[metric.name] = metric
+
+        return metric
+
+    def reset(self):
+        """ Discards the recorded values of all metrics."""
+
+        for metric in self.metrics.values():
+            metric.reset()
+
+    def collect(self) -> Dict[str, Dict]:
+        """ Returns a JSON-serializable snapshot of all metrics."""
+
+        return {
+            name: metric.collect() for name, metric in self.metrics.items()
+        }
+
+
+def merge_snapshots(snapshots: List[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """ Sums the snapshots of several processes.
+
+    Args:
+        snapshots (List[Dict[str, Dict]]): The snapshots as returned by
+            `MetricsRegistry.collect`.
+
+    Returns:
+        Dict[str, Dict]: The aggregated snapshot.
+    """
+
+    merged = {}  # type: Dict[str, Dict]
+    children = {}  # type: Dict[str, Dict[Tuple[str, ...], object]]
+
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            if name not in merged:
+                merged[name] = dict(metric, samples=[])
+                children[name] = {}
+
+            for values, value in metric["samples"]:
+                key = tuple(values)
+                child = children[name].get(key)
+                if child is None:
+                    if metric["type"] == "histogram":
+                        child = HistogramChild(metric["buckets"])
+                    elif metric["type"] == "gauge":
+                        child = GaugeChild()
+                    else:
+                        child = CounterChild()
+                    children[name][key] = child
+                child.merge(value)
+
+    for name, metric in merged.items():
+        metric["samples"] = [
+            [list(key), child.get()]
+            for key, child in sorted(children[name].items())
+        ]
+
+    return merged
+
+
+def _escape(value: str) -> str:
+    """ Escapes a label value per the Prometheus text format."""
+
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace("\"", "\\\"")
+    )
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str]) -> str:
+    """ Formats a set of labels per the Prometheus text format."""
+
+    if not labelnames:
+        return ""
+
+    return "{{{}}}".format(",".join(
+        "{}=\"{}\"".format(name, _escape(value))
+        for name, value in zip(labelnames, values)
+    ))
+
+
+def _format_value(value: float) -> str:
+    """ Formats a sample value per the Prometheus text format."""
+
+    if value == float("inf"):
+        return "+Inf"
+
+    return repr(float(value))
+
+
+def render(snapshot: Dict[str, Dict]) -> str:
+    """ Renders a snapshot in the Prometheus text format.
+
+    Args:
+        snapshot (Dict[str, Dict]): The snapshot as returned by
+            `MetricsRegistry.collect` or `merge_snapshots`.
+
+    Returns:
+        str: The rendered metrics.
+    """
+
+    lines = []
+    for name, metric in sorted(snapshot.items()):
+        lines.append("# HELP {} {}".format(name, metric["help"]))
+        lines.append("# TYPE {} {}".format(name, metric["type"]))
+
+        labelnames = metric["labelnames"]
+        for values, value in metric["samples"]:
+            if metric["type"] != "histogram":
+                lines.append("{}{} {}".format(
+                    name,
+                    _format_labels(labelnames, values),
+                    _format_value(value),
+                ))
+                continue
+
+            counts, value_sum = value
+            cumulative = 0
+            upper_bounds = list(metric["buckets"]) + [float("inf")]
+            for upper_bound, count in zip(upper_bounds, counts):
+                cumulative += count
+                lines.append("{}_bucket{} {}".format(
+                    name,
+                    _format_labels(
+                        list(labelnames) + ["le"],
+                        list(values) + [_format_value(upper_bound)],
+                    ),
+                    cumulative,
+                ))
+            lines.append("{}_sum{} {}".format(
+                name,
+                _format_labels(labelnames, values),
+                _format_value(value_sum),
+            ))
+            lines.append("{}_count{} {}".format(
+                name,
+                _format_labels(labelnames, values),
+                cumulative,
+            ))
+
+    return "\n".join(lines) + "\n"
+
+
+def is_process_running(fname: str) -> bool:
+    """ Checks whether the process whose snapshot file is given is running.
+
+    Args:
+        fname (str): The path of the snapshot file, i.e.,
+            `metrics-<pid>.json`.
+
+    Returns:
+        bool: Whether the process is running.
+    """
+
+    try:
+        pid = int(os.path.basename(fname)[len("metrics-"):-len(".json")])
+        os.kill(pid, 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+class MetricsStore(object):
+    """ Class sharing the metrics of a process with the other processes
+        through snapshot files written under a shared directory.
+    """
+
+    def __init__(
+        self,
+        registry: "MetricsRegistry",
+        directory: Optional[str] = None,
+        flush_interval: float = 1.0,
+    ):
+        """ Constructor.
+
+        Args:
+            registry (MetricsRegistry): The registry of the process.
+            directory (Optional[str] = None): The directory the snapshots of
+                all processes are written to. Defaults to `None` in which case
+                only the metrics of the current process are collected.
+            flush_interval (float): The number of seconds between writing the
+                snapshots.
+        """
+
+        self.registry = registry
+        self.directory = directory
+        self.flush_interval = flush_interval
+
+        self.thread = None
+        self.event_stop = threading.Event()
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def get_fname(self, pid: Optional[int] = None) -> str:
+        """ Returns the path of the snapshot file of a process."""
+
+        return os.path.join(
+            self.directory,
+            "metrics-{}.json".format(pid or os.getpid()),
+        )
+
+    def get_fname_exited(self) -> str:
+        """ Returns the path of the aggregate snapshot of exited processes."""
+
+        return os.path.join(self.directory, "metrics-exited.json")
+
+    @contextlib.contextmanager
+    def lock_directory(self):
+        """ Holds an exclusive lock on a file of the directory so that
+            snapshots are neither folded twice nor read halfway through being
+            folded by processes collecting concurrently.
+        """
+
+        fd = os.open(
+            os.path.join(self.directory, "metrics.lock"),
+            os.O_RDWR | os.O_CREAT,
+            0o644,
+        )
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def fold(self, fnames: List[str]):
+        """ Adds the snapshots of exited processes, without their gauges, to
+            the aggregate snapshot and deletes them.
+
+        Note:
+            This method must be called while holding the `lock_directory`
+            lock.
+
+        Args:
+            fnames (List[str]): The paths of the snapshot files.
+        """
+
+        fname_exited = self.get_fname_exited()
+
+        snapshots = []
+        for fname in [fname_exited] + fnames:
+            try:
+                with open(fname) as fin:
+                    snapshot = json.load(fin)
+            except FileNotFoundError:
+                continue
+            except ValueError:
+                snapshot = {}
+            snapshots.append({
+                name: metric for name, metric in snapshot.items()
+                if metric["type"] != "gauge"
+            })
+
+        fname_tmp = fname_exited + ".tmp"
+        with open(fname_tmp, "w") as fout:
+            json.dump(merge_snapshots(snapshots=snapshots), fout)
+        os.replace(fname_tmp, fname_exited)
+
+        for fname in fnames:
+            try:
+                os.remove(fname)
+            except FileNotFoundError:
+                pass
+
+    def flush(self):
+        """ Atomically writes the snapshot of the current process."""
+
+        if not self.directory:
+            return None
+
+        fname = self.get_fname()
+        fname_tmp = fname + ".tmp"
+        with open(fname_tmp, "w") as fout:
+            json.dump(self.registry.collect(), fout)
+        os.replace(fname_tmp, fname)
+
+    def run(self):
+        """ Writes the snapshot of the current process periodically."""
+
+        while not self.event_stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def start(self):
+        """ Starts the thread writing the snapshots.
+
+        Note:
+            A snapshot already written under the PID of the current process
+            belongs to an exited process the PID was reused from and is
+            folded before being overwritten.
+        """
+
+        if not self.directory:
+            return None
+
+        if os.path.exists(self.get_fname()):
+            try:
+                with self.lock_directory():
+                    self.fold(fnames=[self.get_fname()])
+            except OSError:
+                pass
+
+        self.event_stop = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run,
+            name=type(self).__name__,
+            daemon=True,
+        )
+        self.thread.start()
+
+    def stop(self):
+        """ Stops the thread writing the snapshots and writes a final one."""
+
+        if self.thread is not None:
+            self.event_stop.set()
+            self.thread.join()
+            self.thread = None
+            self.flush()
+
+    def collect(self) -> Dict[str, Dict]:
+        """ Returns the metrics aggregated across all processes.
+
+        Returns:
+            Dict[str, Dict]: The aggregated snapshot.
+        """
+
+        snapshot = self.registry.collect()
+        if not self.directory:
+            return snapshot
+
+        try:
+            with self.lock_directory():
+                return self.collect_directory(snapshot=snapshot)
+        except OSError:
+            return self.collect_directory(snapshot=snapshot)
+
+    def collect_directory(self, snapshot: Dict[str, Dict]) -> Dict[str, Dict]:
+        """ Adds the snapshots of all other processes to the snapshot of the
+            current process folding those of exited processes.
+
+        Args:
+            snapshot (Dict[str, Dict]): The snapshot of the current process.
+
+        Returns:
+            Dict[str, Dict]: The aggregated snapshot.
+        """
+
+        fname_own = self.get_fname()
+        fname_exited = self.get_fname_exited()
+        fnames = [
+            fname
+            for fname in glob.glob(
+                os.path.join(self.directory, "metrics-*.json"),
+            )
+            if fname not in (fname_own, fname_exited)
+        ]
+
+        # Fold the snapshots of exited processes into the aggregate snapshot.
+        fnames_exited = [
+            fname for fname in fnames if not is_process_running(fname=fname)
+        ]
+        if fnames_exited:
+            try:
+                self.fold(fnames=fnames_exited)
+            except OSError:
+                pass
+
+        snapshots = [snapshot]
+        for fname in [fname_exited] + fnames:
+            try:
+                with open(fname) as fin:
+                    snapshot = json.load(fin)
+            except (OSError, ValueError):
+                continue
+
+            # Discard the gauges of exited processes whose snapshot couldn't
+            # be folded.
+            if fname in fnames_exited:
+                snapshot = {
+                    name: metric for name, metric in snapshot.items()
+                    if metric["type"] != "gauge"
+                }
+
+            snapshots.append(snapshot)
+
+        return merge_snapshots(snapshots=snapshots)
+
+
+# The registry of the process holding the metrics recorded by the service.
+registry = MetricsRegistry()
+
+metric_http_requests = registry.register(Counter(
+    name="http_requests_total",
+    documentation="The number of handled requests.",
+    labelnames=("method", "route", "status"),
+))
+
+metric_http_duration = registry.register(Histogram(
+    name="http_request_duration_seconds",
+    documentation="The time taken to handle requests.",
+    labelnames=("method", "route"),
+))
+
+metric_braintree_duration = registry.register(Histogram(
+    name="braintree_request_duration_seconds",
+    documentation="The time taken by requests to Braintree.",
+    labelnames=("operation",),
+))
+
+metric_braintree_errors = registry.register(Counter(
+    name="braintree_errors_total",
+    documentation="The number of failed requests to Braintree.",
+    labelnames=("operation", "error"),
+))
+
+metric_auth_duration = registry.register(Histogram(
+    name="auth_verification_duration_seconds",
+    documentation="The time taken to verify access-tokens.",
+))
+
+metric_serialization_duration = registry.register(Histogram(
+    name="serialization_duration_seconds",
+    documentation="The time taken to encode responses.",
+    labelnames=("schema",),
+))
+
+metric_cache_lookups = registry.register(Counter(
+    name="cache_lookups_total",
+    documentation=("The number of response cache lookups per tier, i.e., "
+                   "`memory` or `shared`, and outcome, i.e., `hit` or `miss`."),
+    labelnames=("tier", "outcome"),
+))
+
+metric_cache_stale_responses = registry.register(Counter(
+    name="cache_stale_responses_total",
+    documentation=("The number of expired cached responses served while "
+                   "revalidating or upon Braintree errors."),
+    labelnames=("reason",),
+))
+
+metric_cache_revalidations = registry.register(Counter(
+    name="cache_revalidations_total",
+    documentation="The number of background refreshes of cached responses.",
+    labelnames=("outcome",),
+))
+
+metric_cache_snapshot_entries = registry.register(Counter(
+    name="cache_snapshot_entries_total",
+    documentation=("The number of cached responses saved to or loaded from "
+                   "the cache snapshot."),
+    labelnames=("operation",),
+))
+
+metric_sentry_events_dropped = registry.register(Counter(
+    name="sentry_events_dropped_total",
+    documentation="The number of Sentry events dropped on a full queue.",
+))
+
+metric_braintree_limit = registry.register(Gauge(
+    name="braintree_concurrency_limit",
+    documentation="The limit of concurrent requests to Braintree.",
+))
+
+metric_braintree_inflight = registry.register(Gauge(
+    name="braintree_requests_inflight",
+    documentation="The number of requests to Braintree in flight.",
+))
+
+metric_braintree_shed = registry.register(Counter(
+    name="braintree_requests_shed_total",
+    documentation="The number of requests shed by the concurrency limiter.",
+    labelnames=("operation",),
+))
+
+metric_lane_inflight = registry.register(Gauge(
+    name="http_lane_requests_inflight",
+    documentation="The number of requests in flight per priority lane.",
+    labelnames=("lane",),
+))
+
+metric_lane_shed = registry.register(Counter(
+    name="http_lane_requests_shed_total",
+    documentation="The number of requests shed per saturated priority lane.",
+    labelnames=("lane",),
+))
+
+metric_idempotent_replays = registry.register(Counter(
+    name="http_idempotent_replays_total",
+    documentation=("The number of responses replayed for requests carrying "
+                   "an already used idempotency key."),
+    labelnames=("route",),
+))
+
+metric_deadline_exceeded = registry.register(Counter(
+    name="http_deadline_exceeded_total",
+    documentation="The number of requests whose deadline was exceeded.",
+    labelnames=("route",),
+))
+
+metric_webhooks = registry.register(Counter(
+    name="braintree_webhooks_total",
+    documentation=("The number of Braintree webhook notifications received "
+                   "per kind and outcome."),
+    labelnames=("kind", "outcome"),
+))
+
+metric_webhook_verification_duration = registry.register(Histogram(
+    name="braintree_webhook_verification_duration_seconds",
+    documentation=("The time taken to verify and parse Braintree webhook "
+                   "notifications."),
+))
+
+metric_webhook_queue_depth = registry.register(Gauge(
+    name="braintree_webhook_queue_depth",
+    documentation="The number of queued Braintree webhook notifications.",
+))
+
+metric_replica_reads = registry.register(Counter(
+    name="replica_reads_total",
+    documentation=("The number of replica lookups per resource and outcome, "
+                   "i.e., `hit`, `stale`, or `miss`."),
+    labelnames=("resource", "outcome"),
+))
+
+metric_replica_lag = registry.register(Histogram(
+    name="replica_lag_seconds",
+    documentation=("The lag of the replicated objects responses were served "
+                   "from."),
+    labelnames=("resource",),
+    buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0),
+))
+
+metric_replica_reconciled = registry.register(Counter(
+    name="replica_reconciled_total",
+    documentation=("The number of replicated objects refreshed from Braintree "
+                   "per resource and outcome."),
+    labelnames=("resource", "outcome"),
+))
+
+# The store placeholder, i.e., `None` until created via `create_store`.
+_store = None
+
+
+def create_store(
+    directory: Optional[str] = None,
+    flush_interval: float = 1.0,
+) -> MetricsStore:
+    """ Creates and starts the `MetricsStore` of the process replacing any
+        previously created one.
+
+    Args:
+        directory (Optional[str] = None): The directory the snapshots of all
+            processes are written to.
+        flush_interval (float): The number of seconds between writing the
+            snapshots.
+
+    Returns:
+        MetricsStore: The created store.
+    """
+
+    global _store
+
+    if _store is not None:
+        _store.stop()
+
+    _store = MetricsStore(
+        registry=registry,
+        directory=directory,
+        flush_interval=flush_interval,
+    )
+    _store.start()
+
+    return _store
+
+
+def _reinitialize_after_fork():
+    """ Discards the values inherited from the parent process and restarts
+        the thread writing the snapshots in a forked child process.
+    """
+
+    registry.reset()
+    if _store is not None:
+        _store.thread = None
+        _store.start()
+
+
+os.register_at_fork(after_in_child=_reinitialize_after_fork)
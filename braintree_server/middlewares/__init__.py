@@ -2,3 +2,10 @@
 
 from braintree_server.middlewares import cors
 from braintree_server.middlewares import auth0
+from braintree_server.middlewares import cassette
+from braintree_server.middlewares import context
+from braintree_server.middlewares import metrics
+from braintree_server.middlewares import timing
+from braintree_server.middlewares import priority
+from braintree_server.middlewares import deadline
+from braintree_server.middlewares import idempotency
@@ -8,7 +8,10 @@ missing or invalid.
 """
 
 import re
-from typing import List, Optional, Dict
+import json
+import time
+import urllib.parse
+from typing import List, Optional, Dict, Tuple
 
 import falcon
 from jose import jwt
@@ -16,6 +19,8 @@ import requests
 
 from braintree_server.loggers import create_logger
 from braintree_server.excs import Auth0JwksRetrievalError
+from braintree_server.metrics import metric_auth_duration
+from braintree_server.timing import add_phase
 from braintree_server.middlewares.cors import MiddlewareCors
 
 
@@ -61,13 +66,32 @@ class MiddlewareAuth0(object):
             logger_level=kwargs.get("logger_level", "DEBUG")
         )
 
-        # Retrieve the Auth0 JWKS.
+        # Retrieve the Auth0 JWKS and assemble the RSA keys keyed by their ID
+        # before the workers are forked.
         self.jwks = self._get_jwks()
+        self.rsa_keys = {
+            key["kid"]: {
+                "kty": key["kty"],
+                "kid": key["kid"],
+                "use": key["use"],
+                "n": key["n"],
+                "e": key["e"]
+            }
+            for key in self.jwks["keys"]
+        }
+
+        # Retrieve the histogram of the time taken to verify access-tokens.
+        self.metric_auth_duration = metric_auth_duration.labels()
 
     def _get_jwks(self) -> Dict:
         """ Retrieves and JSON-decodes the Auth0 JSON Web Key Set from the URL
             defined upon instantiation.
 
+        Note:
+            URLs with a `file` scheme, e.g., `file:///tmp/jwks.json`, are read
+            from the local filesystem allowing for a locally generated JWKS to
+            be used in place of the Auth0 one.
+
         Returns:
             Dict: The retrieved and decoded Auth0 JWKS.
         """
@@ -76,6 +100,12 @@ class MiddlewareAuth0(object):
         msg_fmt = msg.format(self.auth0_jwks_url)
         self.logger.debug(msg_fmt)
 
+        # Read local JWKS files directly.
+        url_parsed = urllib.parse.urlparse(self.auth0_jwks_url)
+        if url_parsed.scheme == "file":
+            with open(urllib.parse.unquote(url_parsed.path)) as fin:
+                return json.load(fin)
+
         # Retrieve the JWKS.
         response = requests.get(url=self.auth0_jwks_url)
 
@@ -129,7 +159,6 @@ class MiddlewareAuth0(object):
         # If the `Authorization` header is missing then raise a 401.
         if not auth:
             msg_fmt = "'Authorization' header not found."
-            self.logger.error(msg_fmt)
 
             raise falcon.HTTPError(
                 status=falcon.HTTP_401,
@@ -143,7 +172,6 @@ class MiddlewareAuth0(object):
         # header and raise a 401 is any of them fail.
         if parts[0].lower() != "bearer":
             msg_fmt = "'Authorization' header does not start with `Bearer`."
-            self.logger.error(msg_fmt)
 
             raise falcon.HTTPError(
                 status=falcon.HTTP_401,
@@ -152,7 +180,6 @@ class MiddlewareAuth0(object):
             )
         elif len(parts) == 1:
             msg_fmt = "No token found in 'Authorization' header."
-            self.logger.error(msg_fmt)
 
             raise falcon.HTTPError(
                 status=falcon.HTTP_401,
@@ -162,7 +189,6 @@ class MiddlewareAuth0(object):
         elif len(parts) > 2:
             msg_fmt = ("'Authorization' header must follow a 'Bearer "
                        "<token>' format.")
-            self.logger.error(msg_fmt)
 
             raise falcon.HTTPError(
                 status=falcon.HTTP_401,
@@ -174,31 +200,16 @@ class MiddlewareAuth0(object):
 
         return token
 
-    def process_request(
-        self,
-        req: falcon.Request,
-        resp: falcon.Response,
-    ):
-        """ Intercepts incoming requests and performs an authorization check.
-
-        Note:
-            Requests to paths matching any of the `excluded` strings or regexes
-            are not subjected to a check and immediately routed.
+    def _verify(self, req: falcon.Request) -> Tuple[str, Dict]:
+        """ Validates the `Authorization` header and decodes the access-token
+            raising 401 errors if either is invalid.
 
         Args:
             req (falcon.Request): The Falcon `Request` object.
-            resp (falcon.Response): The Falcon `Response` object.
-        """
 
-        # Skip the authentication check if the current request is a CORS
-        # OPTIONS request. The actual handling of the request will be handled
-        # via the `MiddlewareCors` class.
-        if MiddlewareCors.is_req_cors(req=req):
-            return None
-
-        # Skip the authentication check if the current path has been excluded.
-        if self._is_path_excluded(req.path):
-            return None
+        Returns:
+            Tuple[str, Dict]: The access-token and its decoded payload.
+        """
 
         # Validate the authorization header and retrieve the token.
         token = self._get_token(req=req)
@@ -209,7 +220,6 @@ class MiddlewareAuth0(object):
             unverified_header = jwt.get_unverified_header(token)
         except Exception:
             msg_fmt = "'Authorization' token is malformed."
-            self.logger.exception(msg_fmt)
 
             raise falcon.HTTPError(
                 status=falcon.HTTP_401,
@@ -217,17 +227,8 @@ class MiddlewareAuth0(object):
                 description=msg_fmt,
             )
 
-        # Assemble the RSA key.
-        rsa_key = {}
-        for key in self.jwks["keys"]:
-            if key["kid"] == unverified_header["kid"]:
-                rsa_key = {
-                    "kty": key["kty"],
-                    "kid": key["kid"],
-                    "use": key["use"],
-                    "n": key["n"],
-                    "e": key["e"]
-                }
+        # Retrieve the RSA key.
+        rsa_key = self.rsa_keys.get(unverified_header.get("kid"), {})
 
         # Validate and decode the access token and raise a 401 should it fail.
         if rsa_key:
@@ -241,7 +242,6 @@ class MiddlewareAuth0(object):
                 )
             except jwt.ExpiredSignatureError:
                 msg_fmt = "'Authorization' token has expired."
-                self.logger.exception(msg_fmt)
 
                 raise falcon.HTTPError(
                     status=falcon.HTTP_401,
@@ -250,7 +250,6 @@ class MiddlewareAuth0(object):
                 )
             except Exception:
                 msg_fmt = "'Authorization' header is invalid."
-                self.logger.exception(msg_fmt)
 
                 raise falcon.HTTPError(
                     status=falcon.HTTP_401,
@@ -260,7 +259,6 @@ class MiddlewareAuth0(object):
         else:
             msg_fmt = ("Could not find appropriately key in 'Authorization'"
                        " header.")
-            self.logger.error(msg_fmt)
 
             raise falcon.HTTPError(
                 status=falcon.HTTP_401,
@@ -268,6 +266,43 @@ class MiddlewareAuth0(object):
                 description=msg_fmt,
             )
 
+        return token, payload
+
+    def process_request(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+    ):
+        """ Intercepts incoming requests and performs an authorization check.
+
+        Note:
+            Requests to paths matching any of the `excluded` strings or regexes
+            are not subjected to a check and immediately routed.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+        """
+
+        # Skip the authentication check if the current request is a CORS
+        # OPTIONS request. The actual handling of the request will be handled
+        # via the `MiddlewareCors` class.
+        if MiddlewareCors.is_req_cors(req=req):
+            return None
+
+        # Skip the authentication check if the current path has been excluded.
+        if self._is_path_excluded(req.path):
+            return None
+
+        # Validate and decode the access token recording the time taken.
+        start = time.perf_counter_ns()
+        try:
+            token, payload = self._verify(req=req)
+        finally:
+            duration_ns = time.perf_counter_ns() - start
+            self.metric_auth_duration.observe(duration_ns / 1e9)
+            add_phase(name="auth", duration_ns=duration_ns)
+
         # Add the token and decoded payload to the request context so they can
         # be used in the resources.
         req.context["token"] = token
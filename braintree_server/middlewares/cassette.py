@@ -0,0 +1,113 @@
+# coding=utf-8
+
+"""
+This module defines a `MiddlewareCassette` class meant to act as a middleware
+that delimits the episodes recorded into a `Cassette`, i.e., that records each
+incoming request along with the Braintree exchanges made while handling it.
+"""
+
+import io
+import time
+
+import falcon
+
+from braintree_server.loggers import create_logger
+from braintree_server.transport import Cassette, scrub_json
+
+
+class MiddlewareCassette(object):
+    """ Falcon middleware class recording incoming requests into a cassette."""
+
+    def __init__(self, cassette: Cassette, **kwargs):
+        """ Constructor.
+
+        Args:
+            cassette (Cassette): The cassette episodes are recorded into.
+        """
+
+        # Internalize arguments.
+        self.cassette = cassette
+
+        # Create a class-level logger.
+        self.logger = create_logger(
+            logger_name=type(self).__name__,
+            logger_level=kwargs.get("logger_level", "DEBUG")
+        )
+
+    @staticmethod
+    def get_route(req: falcon.Request, params: dict) -> str:
+        """ Reconstructs the route of a request by replacing the values of
+            its parameters in the path with their names.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            params (dict): The parameters of the matched route.
+
+        Returns:
+            str: The route, e.g., `/customer/{customer_id}`.
+        """
+
+        route = req.path
+        for name, value in sorted(
+            params.items(),
+            key=lambda item: -len(str(item[1])),
+        ):
+            route = route.replace(str(value), "{{{}}}".format(name))
+
+        return route
+
+    def process_resource(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource: object,
+        params: dict,
+    ):
+        """ Begins the episode of an incoming request.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            resource (object): The resource the request was routed to.
+            params (dict): The parameters of the matched route.
+        """
+
+        # Buffer the body so it can be recorded and still read by the
+        # resource.
+        body = req.stream.read(req.content_length or 0)
+        req.stream = io.BytesIO(body)
+
+        req.context["cassette_start"] = time.perf_counter()
+
+        self.cassette.begin(request={
+            "method": req.method,
+            "route": self.get_route(req=req, params=params),
+            "path": req.path,
+            "body": scrub_json(body.decode("utf-8")) if body else None,
+        })
+
+    def process_response(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource: object,
+        req_succeeded: bool,
+    ):
+        """ Ends the episode of an incoming request.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            resource (object): The resource the request was routed to.
+            req_succeeded (bool): Whether the request was handled without
+                unhandled exceptions.
+        """
+
+        start = req.context.get("cassette_start")
+        if start is None:
+            return None
+
+        self.cassette.end(
+            status=int(resp.status[:3]),
+            duration=time.perf_counter() - start,
+        )
@@ -0,0 +1,153 @@
+# coding=utf-8
+
+"""
+This module defines a `MiddlewareRequestContext` class meant to act as a
+middleware that binds the ID of each incoming request to the records logged
+while handling it and logs one structured event per request.
+"""
+
+import re
+import time
+import uuid
+from typing import Optional
+
+import falcon
+
+from braintree_server.loggers import create_logger
+from braintree_server.loggers import LoggerStructured
+from braintree_server.loggers import bind_context
+from braintree_server.loggers import get_context
+from braintree_server.loggers import unbind_context
+from braintree_server.transport import HttpCounting
+
+
+class MiddlewareRequestContext(object):
+    """ Falcon middleware class binding the context of incoming requests."""
+
+    # The header carrying the request ID.
+    header_request_id = "X-Request-ID"
+
+    # The request IDs accepted from clients.
+    regex_request_id = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+    def __init__(self, transport: Optional[HttpCounting] = None, **kwargs):
+        """ Constructor.
+
+        Args:
+            transport (Optional[HttpCounting] = None): The HTTP strategy of the
+                Braintree gateway counting the upstream calls made per
+                request. Defaults to `None` in which case no calls are
+                reported.
+        """
+
+        # Internalize arguments.
+        self.transport = transport
+
+        # Create a class-level logger.
+        self.logger = LoggerStructured(
+            create_logger(
+                logger_name=type(self).__name__,
+                logger_level=kwargs.get("logger_level", "DEBUG")
+            )
+        )
+
+    def get_request_id(self, req: falcon.Request) -> str:
+        """ Returns the request ID provided by the client, if valid, or a
+            newly generated one.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+
+        Returns:
+            str: The request ID.
+        """
+
+        request_id = req.get_header(self.header_request_id)
+        if request_id and self.regex_request_id.match(request_id):
+            return request_id
+
+        return uuid.uuid4().hex
+
+    def process_request(self, req: falcon.Request, resp: falcon.Response):
+        """ Binds the context of an incoming request.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+        """
+
+        request_id = self.get_request_id(req=req)
+
+        req.context["request_id"] = request_id
+        req.context["log_context_token"] = bind_context(request_id=request_id)
+        req.context["log_start"] = time.perf_counter()
+
+        resp.set_header(self.header_request_id, request_id)
+
+        if self.transport is not None:
+            self.transport.reset_calls_thread()
+
+    def process_resource(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource: object,
+        params: dict,
+    ):
+        """ Adds the matched route to the context of an incoming request.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            resource (object): The resource the request was routed to.
+            params (dict): The parameters of the matched route.
+        """
+
+        context = get_context()
+        if context is not None:
+            context.route = req.uri_template
+
+        req.context["log_params"] = params
+
+    def process_response(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource: object,
+        req_succeeded: bool,
+    ):
+        """ Logs the handled request and unbinds its context.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            resource (object): The resource the request was routed to.
+            req_succeeded (bool): Whether the request was handled without
+                unhandled exceptions.
+        """
+
+        token = req.context.get("log_context_token")
+        if token is None:
+            return None
+
+        latency = time.perf_counter() - req.context["log_start"]
+
+        self.logger.info(
+            "Handled '%s %s' with status '%s'.",
+            req.method,
+            req.path,
+            resp.status,
+            method=req.method,
+            route=req.uri_template,
+            customer_id=(req.context.get("log_params") or {}).get(
+                "customer_id"
+            ),
+            status=int(resp.status[:3]),
+            latency_ms=round(latency * 1000, 3),
+            upstream_calls=(
+                self.transport.get_calls_thread()
+                if self.transport is not None else None
+            ),
+        )
+
+        unbind_context(token=token)
@@ -0,0 +1,154 @@
+# coding=utf-8
+
+"""
+This module defines a `MiddlewareDeadline` class meant to act as a middleware
+that turns the timeout requested by clients through a request header, and the
+default timeout of the requested route, into a deadline bounding the Braintree
+requests made while handling the request.
+"""
+
+import time
+from typing import Dict, Optional
+
+import falcon
+
+from braintree_server.deadline import bind_deadline
+from braintree_server.deadline import unbind_deadline
+from braintree_server.loggers import create_logger
+
+
+class MiddlewareDeadline(object):
+    """ Falcon middleware class binding the deadline of requests."""
+
+    def __init__(
+        self,
+        request_header: Optional[str] = "X-Request-Timeout",
+        default_timeout: Optional[float] = None,
+        routes: Optional[Dict[str, float]] = None,
+        **kwargs
+    ):
+        """ Constructor.
+
+        Args:
+            request_header (Optional[str] = "X-Request-Timeout"): The request
+                header holding the number of seconds the client is willing to
+                wait for the response. Defaults to `X-Request-Timeout`.
+                Clients can't set a timeout if `None`.
+            default_timeout (Optional[float] = None): The number of seconds
+                applied to requests of routes without a timeout of their own.
+                Defaults to `None` in which case such requests are only
+                bounded by the request header.
+            routes (Optional[Dict[str, float]] = None): The timeouts in
+                seconds keyed by `<method> <route>`, e.g., `POST /customer`.
+        """
+
+        # Internalize arguments.
+        self.request_header = request_header
+        self.default_timeout = default_timeout
+        self.routes = routes or {}
+
+        # Create a class-level logger.
+        self.logger = create_logger(
+            logger_name=type(self).__name__,
+            logger_level=kwargs.get("logger_level", "DEBUG")
+        )
+
+    def get_timeout(self, req: falcon.Request) -> Optional[float]:
+        """ Returns the timeout of a routed request as the lowest of the
+            timeout requested by the client and that of its route.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+
+        Returns:
+            Optional[float]: The timeout in seconds or `None` if the request
+                has no timeout.
+
+        Raises:
+            falcon.HTTPBadRequest: Raised if the request header doesn't hold
+                a positive number.
+        """
+
+        timeout = self.routes.get(
+            "{} {}".format(req.method, req.uri_template),
+            self.default_timeout,
+        )
+
+        value = None
+        if self.request_header:
+            value = req.get_header(self.request_header)
+        if value is None:
+            return timeout
+
+        try:
+            timeout_requested = float(value)
+        except ValueError:
+            timeout_requested = None
+
+        if timeout_requested is None or not timeout_requested > 0:
+            msg = "Header '{}' must hold a positive number of seconds."
+            msg_fmt = msg.format(self.request_header)
+            raise falcon.HTTPBadRequest(
+                title="Invalid request timeout.",
+                description=msg_fmt,
+            )
+
+        if timeout is None:
+            return timeout_requested
+
+        return min(timeout, timeout_requested)
+
+    def process_request(self, req: falcon.Request, resp: falcon.Response):
+        """ Records the arrival of a request from which its deadline is
+            counted.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+        """
+
+        req.context["deadline_start"] = time.monotonic()
+
+    def process_resource(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource: object,
+        params: dict,
+    ):
+        """ Binds the deadline of a routed request (if any).
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            resource (object): The resource the request was routed to.
+            params (dict): The parameters of the matched route.
+        """
+
+        timeout = self.get_timeout(req=req)
+        if timeout is None:
+            return None
+
+        deadline = req.context["deadline_start"] + timeout
+        req.context["deadline"] = bind_deadline(deadline=deadline)
+
+    def process_response(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource: object,
+        req_succeeded: bool,
+    ):
+        """ Unbinds the deadline of the request (if any).
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            resource (object): The resource the request was routed to.
+            req_succeeded (bool): Whether the request was handled without
+                unhandled exceptions.
+        """
+
+        token = req.context.pop("deadline", None)
+        if token is not None:
+            unbind_deadline(token=token)
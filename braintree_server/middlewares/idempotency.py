@@ -0,0 +1,290 @@
+# coding=utf-8
+
+"""
+This module defines a `MiddlewareIdempotency` class meant to act as a
+middleware that stores the final response of requests carrying an
+`Idempotency-Key` header per key and principal and replays it for retries of
+the request so that, e.g., a retried subscription creation doesn't repeat its
+Braintree calls and create duplicate payment-methods.
+"""
+
+import time
+import hashlib
+from typing import List, Optional
+
+import falcon
+
+from braintree_server.deadline import get_remaining
+from braintree_server.excs import IdempotencyStoreError
+from braintree_server.idempotency import IdempotencyRecord
+from braintree_server.idempotency import IdempotencyStore
+from braintree_server.loggers import create_logger
+from braintree_server.metrics import metric_idempotent_replays
+from braintree_server.transport import HttpCounting
+
+
+# The `<method> <route>` of the requests whose responses are stored when none
+# are configured.
+ROUTES_DEFAULT = [
+    "POST /customer",
+    "POST /customer/{customer_id}/subscription",
+]
+
+# The maximum length of idempotency keys.
+KEY_LENGTH_MAX = 255
+
+
+class MiddlewareIdempotency(object):
+    """ Falcon middleware class replaying the responses of requests retried
+        with the same idempotency key.
+    """
+
+    def __init__(
+        self,
+        store: IdempotencyStore,
+        routes: Optional[List[str]] = None,
+        request_header: str = "Idempotency-Key",
+        wait_timeout: float = 10.0,
+        transport: Optional[HttpCounting] = None,
+        **kwargs
+    ):
+        """ Constructor.
+
+        Args:
+            store (IdempotencyStore): The store of the responses.
+            routes (Optional[List[str]] = None): The `<method> <route>` of the
+                requests whose responses are stored, e.g., `POST /customer`.
+                Defaults to `ROUTES_DEFAULT`.
+            request_header (str): The request header holding the idempotency
+                key. Defaults to `Idempotency-Key`.
+            wait_timeout (float): The maximum number of seconds duplicates of
+                a request still being handled wait on it before being
+                responded to with a 409.
+            transport (Optional[HttpCounting] = None): The HTTP strategy of
+                the Braintree gateway counting the upstream calls made per
+                request. Defaults to `None` in which case the responses of
+                server errors are always stored.
+        """
+
+        # Internalize arguments.
+        self.store = store
+        self.routes = set(routes or ROUTES_DEFAULT)
+        self.request_header = request_header
+        self.wait_timeout = wait_timeout
+        self.transport = transport
+
+        # Create a class-level logger.
+        self.logger = create_logger(
+            logger_name=type(self).__name__,
+            logger_level=kwargs.get("logger_level", "DEBUG")
+        )
+
+    @staticmethod
+    def get_key(req: falcon.Request, idempotency_key: str) -> str:
+        """ Derives the store key of a request from its idempotency key, its
+            method and path, and the subject of its access-token so that keys
+            can't collide across principals or routes.
+        """
+
+        token_payload = req.context.get("token_payload") or {}
+
+        digest = hashlib.sha256()
+        for part in [
+            token_payload.get("sub") or "",
+            req.method,
+            req.path,
+            idempotency_key,
+        ]:
+            digest.update(part.encode("utf-8") + b"\n")
+
+        return digest.hexdigest()
+
+    @staticmethod
+    def get_fingerprint(req: falcon.Request) -> str:
+        """ Reads the body of a request, storing it under `req.context` for
+            the resource, and returns its digest.
+        """
+
+        body = req.bounded_stream.read() or b""
+        req.context["body"] = body
+
+        return hashlib.sha256(body).hexdigest()
+
+    def is_upstream_untouched(self) -> bool:
+        """ Checks whether the request handled by the current thread made no
+            Braintree calls.
+        """
+
+        if self.transport is None:
+            return False
+
+        return self.transport.get_calls_thread() == 0
+
+    def replay(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        record: IdempotencyRecord,
+    ):
+        """ Responds to a request with a stored response skipping its
+            resource.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            record (IdempotencyRecord): The complete record.
+        """
+
+        metric_idempotent_replays.labels(req.uri_template).inc()
+
+        resp.status = falcon.get_http_status(record.status)
+        if record.content_type:
+            resp.content_type = record.content_type
+        resp.data = record.body
+        resp.set_header("Idempotent-Replayed", "true")
+        resp.complete = True
+
+    def process_resource(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource: object,
+        params: dict,
+    ):
+        """ Reserves the idempotency key of a routed request, replays the
+            response stored for it, or waits on the request still being
+            handled with it.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            resource (object): The resource the request was routed to.
+            params (dict): The parameters of the matched route.
+        """
+
+        if "{} {}".format(req.method, req.uri_template) not in self.routes:
+            return None
+
+        idempotency_key = req.get_header(self.request_header)
+        if idempotency_key is None:
+            return None
+
+        if not idempotency_key or len(idempotency_key) > KEY_LENGTH_MAX:
+            msg = "Header '{}' must hold between 1 and {} characters."
+            msg_fmt = msg.format(self.request_header, KEY_LENGTH_MAX)
+            raise falcon.HTTPBadRequest(
+                title="Invalid idempotency key.",
+                description=msg_fmt,
+            )
+
+        key = self.get_key(req=req, idempotency_key=idempotency_key)
+        fingerprint = self.get_fingerprint(req=req)
+
+        # Wait on duplicates no longer than the deadline of the request.
+        timeout = self.wait_timeout
+        remaining = get_remaining()
+        if remaining is not None:
+            timeout = min(timeout, max(remaining, 0.0))
+        deadline = time.monotonic() + timeout
+
+        try:
+            while True:
+                record = self.store.reserve(key=key, fingerprint=fingerprint)
+                if record is None:
+                    req.context["idempotency"] = (key, fingerprint)
+                    return None
+
+                if record.fingerprint and record.fingerprint != fingerprint:
+                    msg = ("Idempotency key '{}' was already used with a "
+                           "different request body.")
+                    msg_fmt = msg.format(idempotency_key)
+                    raise falcon.HTTPUnprocessableEntity(
+                        title="Idempotency key reused.",
+                        description=msg_fmt,
+                    )
+
+                if record.is_complete:
+                    self.replay(req=req, resp=resp, record=record)
+                    return None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    msg = ("A request with idempotency key '{}' is still "
+                           "being handled.")
+                    msg_fmt = msg.format(idempotency_key)
+                    raise falcon.HTTPConflict(
+                        title="Request in progress.",
+                        description=msg_fmt,
+                    )
+
+                self.store.wait(key=key, timeout=remaining)
+        except IdempotencyStoreError as exc:
+            self.logger.error(str(exc))
+            raise falcon.HTTPServiceUnavailable(
+                title="Idempotency store unavailable.",
+                description=str(exc),
+                retry_after=1,
+            )
+
+    def process_response(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource: object,
+        req_succeeded: bool,
+    ):
+        """ Stores the final response of a request that reserved its
+            idempotency key or releases the key should the request have
+            failed with a server error before calling Braintree.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            resource (object): The resource the request was routed to.
+            req_succeeded (bool): Whether the request was handled without
+                unhandled exceptions.
+        """
+
+        reservation = req.context.pop("idempotency", None)
+        if reservation is None:
+            return None
+
+        key, fingerprint = reservation
+        status = int(resp.status[:3])
+
+        # Failed requests whose status isn't an error raised an unhandled
+        # exception and are responded to with a 500 by the WSGI server.
+        if not req_succeeded and status < 400:
+            error = falcon.HTTPInternalServerError()
+            resp.status = error.status
+            resp.content_type = falcon.MEDIA_JSON
+            resp.data = None
+            resp.body = error.to_json()
+            status = 500
+
+        try:
+            # Server errors of requests which made no Braintree calls, e.g.,
+            # shed requests, may succeed once retried. Those of requests which
+            # did may have left side-effects, e.g., a payment-method created
+            # ahead of a failed subscription creation, and are stored so that
+            # retries don't repeat them. Streamed responses can't be stored.
+            if (
+                status >= 500 and self.is_upstream_untouched()
+            ) or resp.stream is not None:
+                self.store.release(key=key)
+                return None
+
+            if resp.data is not None:
+                body = resp.data
+            else:
+                body = (resp.body or "").encode("utf-8")
+
+            self.store.complete(
+                key=key,
+                fingerprint=fingerprint,
+                status=status,
+                content_type=resp.content_type,
+                body=body,
+            )
+        except IdempotencyStoreError as exc:
+            self.logger.error(str(exc))
@@ -0,0 +1,69 @@
+# coding=utf-8
+
+"""
+This module defines a `MiddlewareMetrics` class meant to act as a middleware
+that records the number, status, and latency of the requests per route.
+"""
+
+import time
+
+import falcon
+
+from braintree_server.loggers import create_logger
+from braintree_server.metrics import metric_http_requests
+from braintree_server.metrics import metric_http_duration
+
+
+class MiddlewareMetrics(object):
+    """ Falcon middleware class recording request metrics per route."""
+
+    # The route label of requests that weren't routed, e.g., unknown paths or
+    # requests rejected by a middleware.
+    route_unmatched = "unmatched"
+
+    def __init__(self, **kwargs):
+        """ Constructor."""
+
+        # Create a class-level logger.
+        self.logger = create_logger(
+            logger_name=type(self).__name__,
+            logger_level=kwargs.get("logger_level", "DEBUG")
+        )
+
+    def process_request(self, req: falcon.Request, resp: falcon.Response):
+        """ Records the start of an incoming request.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+        """
+
+        req.context["metrics_start"] = time.perf_counter()
+
+    def process_response(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource: object,
+        req_succeeded: bool,
+    ):
+        """ Records the status and latency of a handled request.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            resource (object): The resource the request was routed to.
+            req_succeeded (bool): Whether the request was handled without
+                unhandled exceptions.
+        """
+
+        start = req.context.get("metrics_start")
+        if start is None:
+            return None
+
+        route = req.uri_template or self.route_unmatched
+
+        metric_http_duration.labels(req.method, route).observe(
+            time.perf_counter() - start
+        )
+        metric_http_requests.labels(req.method, route, resp.status[:3]).inc()
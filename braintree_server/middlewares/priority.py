@@ -0,0 +1,204 @@
+# coding=utf-8
+
+"""
+This module defines a `MiddlewarePriority` class meant to act as a middleware
+that classifies requests per route into priority lanes, each admitting a
+bounded number of concurrent requests, so that a burst of expensive requests,
+e.g., subscription creations, can't occupy every worker thread and starve the
+cheap ones, e.g., cached customer retrievals.
+"""
+
+import threading
+from typing import Dict, Optional
+
+import falcon
+
+from braintree_server.excs import LaneSaturated
+from braintree_server.loggers import create_logger
+from braintree_server.metrics import metric_lane_inflight
+from braintree_server.metrics import metric_lane_shed
+
+
+# The lanes of the expensive mutations, i.e., customer and subscription
+# creations and deletions, used when none are configured.
+LANES_DEFAULT = {
+    "mutation": {
+        "max_concurrency": 4,
+        "max_wait": 0.0,
+    },
+}
+
+# The lane per `<method> <route>` used when none are configured. Routes not
+# classified into a lane aren't limited.
+ROUTES_DEFAULT = {
+    "POST /customer": "mutation",
+    "DELETE /customer/{customer_id}": "mutation",
+    "POST /customer/{customer_id}/subscription": "mutation",
+    "DELETE /customer/{customer_id}/subscription/{subscription_id}": (
+        "mutation"
+    ),
+}
+
+
+class Lane(object):
+    """ Class admitting a bounded number of concurrent requests."""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_wait: float = 0.0,
+    ):
+        """ Constructor.
+
+        Args:
+            name (str): The name of the lane.
+            max_concurrency (int): The maximum number of requests in flight.
+            max_wait (float): The number of seconds a request waits for
+                admission before being shed. Defaults to `0` in which case
+                requests over the limit are shed immediately.
+        """
+
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.inflight = 0
+
+        metric_lane_inflight.labels(name).set_function(self.get_inflight)
+        self.metric_shed = metric_lane_shed.labels(name)
+
+    def get_inflight(self) -> int:
+        """ Returns the number of requests in flight."""
+
+        return self.inflight
+
+    def acquire(self) -> bool:
+        """ Admits a request waiting up to `max_wait` seconds.
+
+        Returns:
+            bool: Whether the request was admitted in which case `release`
+                must be called upon its completion.
+        """
+
+        if self.max_wait > 0:
+            admitted = self.semaphore.acquire(timeout=self.max_wait)
+        else:
+            admitted = self.semaphore.acquire(blocking=False)
+
+        if admitted:
+            self.inflight += 1
+        else:
+            self.metric_shed.inc()
+
+        return admitted
+
+    def release(self):
+        """ Records the completion of an admitted request."""
+
+        self.inflight -= 1
+        self.semaphore.release()
+
+
+class MiddlewarePriority(object):
+    """ Falcon middleware class admitting requests through the priority lane
+        of their route.
+    """
+
+    def __init__(
+        self,
+        lanes: Optional[Dict[str, Dict]] = None,
+        routes: Optional[Dict[str, str]] = None,
+        retry_after: int = 1,
+        **kwargs
+    ):
+        """ Constructor.
+
+        Args:
+            lanes (Optional[Dict[str, Dict]] = None): The `max_concurrency`
+                and `max_wait` settings keyed by lane name. Defaults to
+                `LANES_DEFAULT`.
+            routes (Optional[Dict[str, str]] = None): The lane names keyed by
+                `<method> <route>`, e.g., `POST /customer`. Defaults to
+                `ROUTES_DEFAULT`.
+            retry_after (int): The number of seconds clients of shed requests
+                are advised to wait before retrying.
+        """
+
+        # Internalize arguments.
+        self.retry_after = retry_after
+
+        # Create a class-level logger.
+        self.logger = create_logger(
+            logger_name=type(self).__name__,
+            logger_level=kwargs.get("logger_level", "DEBUG")
+        )
+
+        self.lanes = {
+            name: Lane(
+                name=name,
+                max_concurrency=settings["max_concurrency"],
+                max_wait=settings.get("max_wait", 0.0),
+            )
+            for name, settings in (lanes or LANES_DEFAULT).items()
+        }  # type: Dict[str, Lane]
+
+        # Map the routes to their lanes.
+        self.routes = {}  # type: Dict[str, Lane]
+        for route, name in (routes or ROUTES_DEFAULT).items():
+            if name not in self.lanes:
+                msg = "Route '{}' is classified into undefined lane '{}'."
+                msg_fmt = msg.format(route, name)
+                self.logger.error(msg_fmt)
+                raise ValueError(msg_fmt)
+            self.routes[route] = self.lanes[name]
+
+    def process_resource(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource: object,
+        params: dict,
+    ):
+        """ Admits a routed request through the lane of its route raising
+            `LaneSaturated` should it be shed.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            resource (object): The resource the request was routed to.
+            params (dict): The parameters of the matched route.
+        """
+
+        lane = self.routes.get("{} {}".format(req.method, req.uri_template))
+        if lane is None:
+            return None
+
+        if not lane.acquire():
+            msg = "Priority lane '{}' is saturated."
+            msg_fmt = msg.format(lane.name)
+            raise LaneSaturated(msg_fmt, retry_after=self.retry_after)
+
+        req.context["priority_lane"] = lane
+
+    def process_response(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource: object,
+        req_succeeded: bool,
+    ):
+        """ Releases the lane the request was admitted through (if any).
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            resource (object): The resource the request was routed to.
+            req_succeeded (bool): Whether the request was handled without
+                unhandled exceptions.
+        """
+
+        lane = req.context.pop("priority_lane", None)
+        if lane is not None:
+            lane.release()
@@ -0,0 +1,164 @@
+# coding=utf-8
+
+"""
+This module defines a `MiddlewareTiming` class meant to act as a middleware
+that traces the phases of handling requests, returns their durations in a
+`Server-Timing` header for authenticated requests asking for it or sampled
+requests, and logs the breakdown of slow requests.
+"""
+
+import time
+import random
+from typing import Optional
+
+import falcon
+
+from braintree_server.loggers import create_logger
+from braintree_server.loggers import LoggerStructured
+from braintree_server.timing import Timings
+from braintree_server.timing import bind_timings
+from braintree_server.timing import unbind_timings
+
+
+class MiddlewareTiming(object):
+    """ Falcon middleware class tracing the phases of requests."""
+
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        request_header: Optional[str] = "X-Request-Timing",
+        slow_threshold: Optional[float] = None,
+        **kwargs
+    ):
+        """ Constructor.
+
+        Args:
+            sample_rate (float): The fraction of requests returning a
+                `Server-Timing` header regardless of the request headers.
+            request_header (Optional[str] = "X-Request-Timing"): The request
+                header through which authenticated requests ask for a
+                `Server-Timing` header. Defaults to `X-Request-Timing`.
+                Requests can't ask for the header if `None`.
+            slow_threshold (Optional[float] = None): The number of seconds
+                above which the breakdown of a request is logged. Defaults to
+                `None` in which case no breakdowns are logged.
+        """
+
+        # Internalize arguments.
+        self.sample_rate = sample_rate
+        self.request_header = request_header
+        self.slow_threshold_ns = (
+            int(slow_threshold * 1e9) if slow_threshold is not None else None
+        )
+
+        # Create a class-level logger.
+        self.logger = LoggerStructured(
+            create_logger(
+                logger_name=type(self).__name__,
+                logger_level=kwargs.get("logger_level", "DEBUG")
+            )
+        )
+
+    def is_header_requested(self, req: falcon.Request) -> bool:
+        """ Checks whether a request asks for a `Server-Timing` header.
+
+        Note:
+            The header is only returned to requests asking for it once they
+            have been authenticated (see `is_header_allowed`).
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+
+        Returns:
+            bool: Whether the header was requested.
+        """
+
+        return bool(self.request_header and req.get_header(self.request_header))
+
+    def is_sampled(self) -> bool:
+        """ Checks whether a request is sampled to return a `Server-Timing`
+            header regardless of the request headers.
+        """
+
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @staticmethod
+    def is_header_allowed(req: falcon.Request) -> bool:
+        """ Checks whether a request asking for a `Server-Timing` header may
+            receive it, i.e., whether its access-token was verified, so that
+            the internal phases aren't disclosed to anonymous callers.
+        """
+
+        return req.context.get("token_payload") is not None
+
+    def process_request(self, req: falcon.Request, resp: falcon.Response):
+        """ Starts tracing an incoming request should it return a
+            `Server-Timing` header or slow requests be logged.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+        """
+
+        is_requested = self.is_header_requested(req=req)
+        is_sampled = self.is_sampled()
+        if (
+            not is_requested and
+            not is_sampled and
+            self.slow_threshold_ns is None
+        ):
+            return None
+
+        timings = Timings()
+        req.context["timing"] = (
+            timings,
+            bind_timings(timings=timings),
+            is_requested,
+            is_sampled,
+            time.perf_counter_ns(),
+        )
+
+    def process_response(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource: object,
+        req_succeeded: bool,
+    ):
+        """ Adds the `Server-Timing` header and logs the breakdown of slow
+            requests.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            resource (object): The resource the request was routed to.
+            req_succeeded (bool): Whether the request was handled without
+                unhandled exceptions.
+        """
+
+        timing = req.context.get("timing")
+        if timing is None:
+            return None
+
+        timings, token, is_requested, is_sampled, start = timing
+        unbind_timings(token=token)
+
+        duration_ns = time.perf_counter_ns() - start
+        timings.add(name="total", duration_ns=duration_ns)
+
+        if is_sampled or (is_requested and self.is_header_allowed(req=req)):
+            resp.set_header("Server-Timing", timings.to_header())
+
+        if (
+            self.slow_threshold_ns is not None and
+            duration_ns > self.slow_threshold_ns
+        ):
+            self.logger.warning(
+                "Slow request '%s %s' took %.3f ms.",
+                req.method,
+                req.path,
+                duration_ns / 1e6,
+                route=req.uri_template,
+                status=int(resp.status[:3]),
+                phases=timings.to_dict(),
+            )
@@ -0,0 +1,356 @@
+# coding=utf-8
+
+"""
+This module defines an on-demand sampling profiler and allocation tracer for
+live worker processes.
+
+A capture samples the stacks of every thread of the process at a fixed
+interval for a bounded duration and aggregates them into collapsed stacks,
+i.e., one `frame;frame;...;frame count` line per distinct stack, which can be
+rendered by flamegraph tools, e.g., `flamegraph.pl` or speedscope. Optionally
+`tracemalloc` traces allocations during the capture and the top allocation
+sites still alive at its end are reported.
+
+Nothing runs unless a capture is requested from a `Profiler`, either through
+the `/admin/profile` route or through the signal handler installed via
+`Profiler.install_signal_handler`, and only one capture runs per process at a
+time.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import datetime
+import tempfile
+import threading
+import tracemalloc
+from typing import Dict, List, Optional
+
+from braintree_server.excs import ProfilerBusy
+from braintree_server.loggers import create_logger
+
+
+# The bounds of the sampling interval and duration of captures.
+INTERVAL_MIN = 0.001
+DURATION_MAX = 60.0
+
+# The maximum number of frames sampled per stack.
+DEPTH_MAX = 128
+
+# Lock ensuring only one capture runs per process.
+_lock_capture = threading.Lock()
+
+
+def _get_label(code, labels: Dict) -> str:
+    """ Returns the label of the frame of a code object as
+        `function (path:line)` caching it per code object.
+    """
+
+    label = labels.get(code)
+    if label is None:
+        label = "{} ({}:{})".format(
+            code.co_name,
+            code.co_filename,
+            code.co_firstlineno,
+        )
+        labels[code] = label
+
+    return label
+
+
+def sample_stacks(
+    duration: float,
+    interval: float,
+    counts: Dict[str, int],
+) -> int:
+    """ Samples the stacks of every thread of the process, besides the
+        sampling one, at a fixed interval aggregating them into collapsed
+        stacks.
+
+    Args:
+        duration (float): The duration of the sampling in seconds.
+        interval (float): The interval between samples in seconds.
+        counts (Dict[str, int]): The number of samples per collapsed stack,
+            rooted at the thread name, updated in place.
+
+    Returns:
+        int: The number of samples taken.
+    """
+
+    ident_sampling = threading.get_ident()
+
+    labels = {}
+    samples = 0
+    end = time.monotonic() + duration
+    while True:
+        names = {
+            thread.ident: thread.name for thread in threading.enumerate()
+        }
+        for ident, frame in sys._current_frames().items():
+            if ident == ident_sampling:
+                continue
+
+            stack = []
+            while frame is not None and len(stack) < DEPTH_MAX:
+                stack.append(_get_label(code=frame.f_code, labels=labels))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            stack.reverse()
+
+            key = ";".join(stack)
+            counts[key] = counts.get(key, 0) + 1
+        samples += 1
+
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(interval, remaining))
+
+    return samples
+
+
+def get_allocations(
+    snapshot_start: tracemalloc.Snapshot,
+    snapshot_end: tracemalloc.Snapshot,
+    top: int,
+) -> List[Dict]:
+    """ Returns the allocation sites whose memory grew the most between two
+        `tracemalloc` snapshots.
+
+    Args:
+        snapshot_start (tracemalloc.Snapshot): The snapshot taken at the start
+            of the capture.
+        snapshot_end (tracemalloc.Snapshot): The snapshot taken at the end of
+            the capture.
+        top (int): The number of allocation sites to return.
+
+    Returns:
+        List[Dict]: The allocation sites as `site`, `size`, `size_diff`,
+            `count`, and `count_diff` dictionaries ordered by decreasing
+            `size_diff`.
+    """
+
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ]
+    snapshot_start = snapshot_start.filter_traces(filters)
+    snapshot_end = snapshot_end.filter_traces(filters)
+
+    allocations = []
+    for stat in snapshot_end.compare_to(snapshot_start, "lineno")[:top]:
+        frame = stat.traceback[0]
+        allocations.append({
+            "site": "{}:{}".format(frame.filename, frame.lineno),
+            "size": stat.size,
+            "size_diff": stat.size_diff,
+            "count": stat.count,
+            "count_diff": stat.count_diff,
+        })
+
+    return allocations
+
+
+class Profiler(object):
+    """ Class capturing sampling profiles and allocation sites of the current
+        process on demand.
+    """
+
+    def __init__(
+        self,
+        duration_max: float = 30.0,
+        directory: Optional[str] = None,
+        **kwargs
+    ):
+        """ Constructor.
+
+        Args:
+            duration_max (float): The maximum duration of captures in seconds
+                capped at `DURATION_MAX`.
+            directory (Optional[str] = None): The directory captures triggered
+                by signal are written under. Defaults to the temporary
+                directory.
+        """
+
+        # Internalize arguments.
+        self.duration_max = min(duration_max, DURATION_MAX)
+        self.directory = directory or tempfile.gettempdir()
+
+        # Create a class-level logger.
+        self.logger = create_logger(
+            logger_name=type(self).__name__,
+            logger_level=kwargs.get("logger_level", "DEBUG")
+        )
+
+        # The arguments of the captures triggered by signal.
+        self.signal_kwargs = {}  # type: Dict
+
+    def capture(
+        self,
+        duration: float = 10.0,
+        interval: float = 0.01,
+        allocations: bool = False,
+        top: int = 25,
+    ) -> Dict:
+        """ Captures a sampling profile of the other threads of the process
+            and, optionally, the allocation sites grown during it.
+
+        Note:
+            The duration is capped at `duration_max` and the interval floored
+            at `INTERVAL_MIN`. `tracemalloc` is only started for the capture,
+            unless it already was, and stopped at its end.
+
+        Args:
+            duration (float): The duration of the capture in seconds.
+            interval (float): The interval between stack samples in seconds.
+            allocations (bool): Whether to trace allocations during the
+                capture.
+            top (int): The number of allocation sites to report.
+
+        Returns:
+            Dict: The capture as a dictionary with the `pid`, `duration`,
+                `interval`, `samples`, `stacks`, i.e., the collapsed stacks,
+                and `allocations` keys.
+
+        Raises:
+            ProfilerBusy: Raised if a capture is already running in the
+                process.
+        """
+
+        if not _lock_capture.acquire(blocking=False):
+            msg = "A capture is already running in process '{}'."
+            msg_fmt = msg.format(os.getpid())
+            raise ProfilerBusy(msg_fmt)
+
+        duration = min(max(duration, 0.0), self.duration_max)
+        interval = max(interval, INTERVAL_MIN)
+
+        msg = "Capturing a {}s profile of process '{}'."
+        msg_fmt = msg.format(duration, os.getpid())
+        self.logger.info(msg_fmt)
+
+        try:
+            tracing = allocations and not tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.start()
+
+            snapshot_start = None
+            if allocations:
+                snapshot_start = tracemalloc.take_snapshot()
+
+            counts = {}  # type: Dict[str, int]
+            try:
+                samples = sample_stacks(
+                    duration=duration,
+                    interval=interval,
+                    counts=counts,
+                )
+
+                snapshot_end = None
+                if allocations:
+                    snapshot_end = tracemalloc.take_snapshot()
+            finally:
+                if tracing:
+                    tracemalloc.stop()
+        finally:
+            _lock_capture.release()
+
+        result = {
+            "pid": os.getpid(),
+            "duration": duration,
+            "interval": interval,
+            "samples": samples,
+            "stacks": "\n".join(
+                "{} {}".format(stack, count)
+                for stack, count in sorted(counts.items())
+            ),
+            "allocations": None,
+        }
+
+        if allocations:
+            result["allocations"] = get_allocations(
+                snapshot_start=snapshot_start,
+                snapshot_end=snapshot_end,
+                top=top,
+            )
+
+        return result
+
+    def capture_to_files(self, **kwargs) -> Optional[Dict[str, str]]:
+        """ Captures a profile via `capture` and writes the collapsed stacks
+            and allocation sites under the directory as
+            `profile-<pid>-<timestamp>.collapsed` and
+            `profile-<pid>-<timestamp>.allocations.json`.
+
+        Args:
+            **kwargs: The arguments passed to `capture`.
+
+        Returns:
+            Optional[Dict[str, str]]: The paths of the written files keyed by
+                `stacks` and `allocations` or `None` if a capture was already
+                running.
+        """
+
+        try:
+            result = self.capture(**kwargs)
+        except ProfilerBusy as exc:
+            self.logger.warning(str(exc))
+            return None
+
+        prefix = os.path.join(
+            self.directory,
+            "profile-{}-{}".format(
+                result["pid"],
+                datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S"),
+            ),
+        )
+
+        paths = {"stacks": prefix + ".collapsed"}
+        with open(paths["stacks"], "w") as fout:
+            fout.write(result["stacks"] + "\n")
+
+        if result["allocations"] is not None:
+            paths["allocations"] = prefix + ".allocations.json"
+            with open(paths["allocations"], "w") as fout:
+                json.dump(result["allocations"], fout, indent=2)
+
+        msg = "Wrote profile of process '{}' to '{}'."
+        msg_fmt = msg.format(result["pid"], "', '".join(paths.values()))
+        self.logger.info(msg_fmt)
+
+        return paths
+
+    def _handle_signal(self, signum, frame):
+        """ Starts a capture written to files in a background thread so that
+            the interrupted thread resumes immediately.
+        """
+
+        thread = threading.Thread(
+            target=self.capture_to_files,
+            kwargs=self.signal_kwargs,
+            name="profiler",
+            daemon=True,
+        )
+        thread.start()
+
+    def install_signal_handler(self, signal_name: str, **kwargs):
+        """ Installs a handler starting a capture written under the directory
+            upon receiving a signal, e.g., `kill -URG <worker pid>`.
+
+        Note:
+            The handler is inherited by forked processes, e.g., `gunicorn`
+            workers, so the signal should not be one the process manager
+            handles in its workers, e.g., `SIGUSR1`, `SIGUSR2`, or `SIGHUP`.
+
+        Args:
+            signal_name (str): The name of the signal, e.g., `SIGURG`.
+            **kwargs: The arguments passed to `capture`.
+        """
+
+        self.signal_kwargs = kwargs
+
+        signal.signal(getattr(signal, signal_name), self._handle_signal)
@@ -0,0 +1,532 @@
+# coding=utf-8
+
+"""
+This module defines a `Replica` class meant to act as a local, SQLite-backed
+replica of the customers, with their payment-methods, and subscriptions as
+last serialized via the `SchemaCustomer` and `SchemaSubscription` schemas so
+that reads tolerating some staleness can be answered without Braintree.
+
+Objects are written to the replica by the resources whenever they are
+retrieved, created, or cancelled through the service, marked as stale upon
+webhook notifications, and periodically refreshed from Braintree by a
+background thread of which only one runs at a time across the workers sharing
+the replica. The time of the latest invalidation, i.e., marking as stale or
+removal, of every object is recorded so that objects retrieved from Braintree
+before an invalidation aren't written after it.
+
+Statements are limited to those supported by SQLite 3.11, e.g., no upserts,
+as shipped by Ubuntu 16.04.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import contextlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+import braintree.exceptions
+
+from braintree_server.excs import ReplicaError
+from braintree_server.loggers import create_logger
+from braintree_server.metrics import metric_replica_reconciled
+
+
+# The number of seconds invalidations are recorded for, which must exceed the
+# time taken to retrieve an object from Braintree.
+INVALIDATION_TTL = 3600.0
+
+
+class ReplicaEntry(object):
+    """ Class representing a replicated object."""
+
+    __slots__ = ("body", "updated_at", "synced")
+
+    def __init__(self, body: str, updated_at: Optional[str], synced: float):
+        """ Constructor.
+
+        Args:
+            body (str): The object serialized via its unrestricted schema.
+            updated_at (Optional[str]): The latest `updated_at` timestamp of
+                the object, and the objects nested under it, in ISO format
+                from which its entity-tags are computed.
+            synced (float): The `time.time` timestamp at which the object was
+                last retrieved from Braintree or `0` if it was marked stale.
+        """
+
+        self.body = body
+        self.updated_at = updated_at
+        self.synced = synced
+
+    def get_lag(self, now: Optional[float] = None) -> float:
+        """ Returns the number of seconds since the object was synchronized.
+        """
+
+        return (time.time() if now is None else now) - self.synced
+
+
+def project(data, fields: Tuple[str, ...]):
+    """ Restricts a deserialized response to a projection.
+
+    Args:
+        data: The deserialized response, i.e., a dictionary or a list
+            thereof.
+        fields (Tuple[str, ...]): The projection as returned by the
+            `get_fields` method of the resources, i.e., serialized keys where
+            nested keys are expressed as dot-delimited paths.
+
+    Returns:
+        The restricted response.
+    """
+
+    # Assemble the tree of the requested keys where `None` marks a key
+    # requested in its entirety.
+    tree = {}  # type: Dict
+    for path in fields:
+        node = tree
+        keys = path.split(".")
+        for key in keys[:-1]:
+            if node.get(key, {}) is None:
+                break
+            node = node.setdefault(key, {})
+        else:
+            node[keys[-1]] = None
+
+    def apply(value, node):
+        if node is None or value is None:
+            return value
+        if isinstance(value, list):
+            return [apply(item, node) for item in value]
+        return {
+            key: apply(value[key], subnode)
+            for key, subnode in node.items()
+            if key in value
+        }
+
+    return apply(data, tree)
+
+
+class Replica(object):
+    """ Class holding the replicated objects in a SQLite database shared by
+        the workers of a host.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        reconcile_interval: float = 60.0,
+        reconcile_batch: int = 50,
+        reconcile_age: float = 300.0,
+        **kwargs
+    ):
+        """ Constructor.
+
+        Args:
+            path (str): The path of the SQLite database file.
+            reconcile_interval (float): The number of seconds between
+                refreshes.
+            reconcile_batch (int): The maximum number of objects refreshed
+                at once.
+            reconcile_age (float): The number of seconds since their last
+                synchronization after which objects are refreshed.
+        """
+
+        # Internalize arguments.
+        self.path = path
+        self.reconcile_interval = reconcile_interval
+        self.reconcile_batch = reconcile_batch
+        self.reconcile_age = reconcile_age
+
+        # Create a class-level logger.
+        self.logger = create_logger(
+            logger_name=type(self).__name__,
+            logger_level=kwargs.get("logger_level", "DEBUG")
+        )
+
+        # Connections are opened per thread and process.
+        self.local = threading.local()
+
+        # The functions retrieving objects from Braintree and serializing them
+        # keyed by resource name as added via `register`.
+        self.serializers = {}  # type: Dict[str, Tuple[Callable, Callable]]
+
+        self.thread = None  # type: Optional[threading.Thread]
+        self.pid = None  # type: Optional[int]
+        self.lock = threading.Lock()
+        self.event_stop = threading.Event()
+
+        self.get_connection().executescript(
+            "CREATE TABLE IF NOT EXISTS objects ("
+            "resource TEXT NOT NULL, "
+            "resource_id TEXT NOT NULL, "
+            "customer_id TEXT, "
+            "body TEXT NOT NULL, "
+            "updated_at TEXT, "
+            "synced REAL NOT NULL, "
+            "PRIMARY KEY (resource, resource_id));"
+            "CREATE INDEX IF NOT EXISTS objects_synced ON objects (synced);"
+            "CREATE INDEX IF NOT EXISTS objects_customer_id "
+            "ON objects (customer_id);"
+            "CREATE TABLE IF NOT EXISTS leases ("
+            "name TEXT PRIMARY KEY, "
+            "pid INTEGER NOT NULL, "
+            "expires REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS invalidations ("
+            "resource TEXT NOT NULL, "
+            "resource_id TEXT NOT NULL, "
+            "invalidated REAL NOT NULL, "
+            "PRIMARY KEY (resource, resource_id));"
+        )
+
+    def register(self, resource: str, retrieve: Callable, serialize: Callable):
+        """ Registers the functions through which objects of a resource are
+            refreshed.
+
+        Args:
+            resource (str): The resource name, e.g., `customer`.
+            retrieve (Callable): The function retrieving an object by ID,
+                e.g., `gateway.customer.find`, and raising a
+                `braintree.exceptions.NotFoundError` for missing objects.
+            serialize (Callable): The function serializing an object into a
+                `(body, updated_at)` tuple.
+        """
+
+        self.serializers[resource] = (retrieve, serialize)
+
+    def get_connection(self) -> sqlite3.Connection:
+        """ Returns the connection of the current thread opening it first if
+            needed, e.g., in a forked worker.
+        """
+
+        connection = getattr(self.local, "connection", None)
+        if connection is None or self.local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path,
+                timeout=10.0,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+
+        return connection
+
+    def execute(self, *args) -> sqlite3.Cursor:
+        """ Executes a statement through the connection of the current
+            thread wrapping errors into `ReplicaError` exceptions.
+        """
+
+        try:
+            return self.get_connection().execute(*args)
+        except sqlite3.Error as exc:
+            msg = "Could not query replica '{}': {}"
+            msg_fmt = msg.format(self.path, str(exc))
+            raise ReplicaError(msg_fmt)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """ Executes the statements issued within the context atomically."""
+
+        self.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            self.execute("COMMIT")
+        except BaseException:
+            try:
+                self.execute("ROLLBACK")
+            except ReplicaError:
+                pass
+            raise
+
+    def get(self, resource: str, resource_id: str) -> Optional[ReplicaEntry]:
+        """ Retrieves a replicated object.
+
+        Args:
+            resource (str): The resource name, e.g., `customer`.
+            resource_id (str): The ID of the object.
+
+        Returns:
+            Optional[ReplicaEntry]: The replicated object or `None` if it
+                isn't replicated.
+        """
+
+        row = self.execute(
+            "SELECT body, updated_at, synced FROM objects "
+            "WHERE resource = ? AND resource_id = ?",
+            (resource, resource_id),
+        ).fetchone()
+        if row is None:
+            return None
+
+        return ReplicaEntry(body=row[0], updated_at=row[1], synced=row[2])
+
+    def put(
+        self,
+        resource: str,
+        resource_id: str,
+        body: str,
+        updated_at: Optional[str] = None,
+        customer_id: Optional[str] = None,
+        fetched: Optional[float] = None,
+    ) -> bool:
+        """ Writes an object just retrieved from Braintree unless it was
+            invalidated since.
+
+        Args:
+            resource (str): The resource name, e.g., `customer`.
+            resource_id (str): The ID of the object.
+            body (str): The object serialized via its unrestricted schema.
+            updated_at (Optional[str] = None): The latest `updated_at`
+                timestamp of the object in ISO format.
+            customer_id (Optional[str] = None): The ID of the customer the
+                object belongs to. Defaults to `None` in which case the
+                previously recorded customer ID (if any) is kept.
+            fetched (Optional[float] = None): The `time.time` timestamp at
+                which the retrieval of the object started. Defaults to `None`
+                in which case the object is written regardless of preceding
+                invalidations, e.g., as it was just created or updated by the
+                service itself.
+
+        Returns:
+            bool: Whether the object was written.
+        """
+
+        synced = time.time() if fetched is None else fetched
+
+        # Skip objects invalidated since they were retrieved.
+        is_invalidated = (
+            "NOT EXISTS (SELECT 1 FROM invalidations "
+            "WHERE resource = ? AND resource_id = ? AND invalidated >= ?)"
+        )
+        params_invalidated = (resource, resource_id, synced)
+
+        with self.transaction():
+            self.execute(
+                "INSERT OR IGNORE INTO objects "
+                "(resource, resource_id, customer_id, body, updated_at, "
+                "synced) "
+                "SELECT ?, ?, ?, ?, ?, ? WHERE " + is_invalidated,
+                (
+                    resource,
+                    resource_id,
+                    customer_id,
+                    body,
+                    updated_at,
+                    synced,
+                ) + params_invalidated,
+            )
+            cursor = self.execute(
+                "UPDATE objects SET "
+                "customer_id = COALESCE(?, customer_id), "
+                "body = ?, "
+                "updated_at = ?, "
+                "synced = ? "
+                "WHERE resource = ? AND resource_id = ? AND " + is_invalidated,
+                (
+                    customer_id,
+                    body,
+                    updated_at,
+                    synced,
+                    resource,
+                    resource_id,
+                ) + params_invalidated,
+            )
+
+        return cursor.rowcount == 1
+
+    def record_invalidation(self, resource: str, resource_id: str):
+        """ Records the invalidation of an object.
+
+        Note:
+            This method must be called within a `transaction`.
+        """
+
+        self.execute(
+            "INSERT OR REPLACE INTO invalidations "
+            "(resource, resource_id, invalidated) VALUES (?, ?, ?)",
+            (resource, resource_id, time.time()),
+        )
+
+    def mark_stale(self, resource: str, resource_id: str):
+        """ Marks an object as stale so that it's no longer served and is
+            refreshed first.
+        """
+
+        with self.transaction():
+            self.execute(
+                "UPDATE objects SET synced = 0 "
+                "WHERE resource = ? AND resource_id = ?",
+                (resource, resource_id),
+            )
+            self.record_invalidation(
+                resource=resource,
+                resource_id=resource_id,
+            )
+
+    def delete(self, resource: str, resource_id: str):
+        """ Removes an object and, for customers, their subscriptions."""
+
+        with self.transaction():
+            objects = [(resource, resource_id)]
+            if resource == "customer":
+                objects += self.execute(
+                    "SELECT resource, resource_id FROM objects "
+                    "WHERE customer_id = ?",
+                    (resource_id,),
+                ).fetchall()
+
+            for resource_object, resource_id_object in objects:
+                self.execute(
+                    "DELETE FROM objects "
+                    "WHERE resource = ? AND resource_id = ?",
+                    (resource_object, resource_id_object),
+                )
+                self.record_invalidation(
+                    resource=resource_object,
+                    resource_id=resource_id_object,
+                )
+
+    def purge_invalidations(self):
+        """ Removes the invalidations recorded over `INVALIDATION_TTL`
+            seconds ago.
+        """
+
+        self.execute(
+            "DELETE FROM invalidations WHERE invalidated < ?",
+            (time.time() - INVALIDATION_TTL,),
+        )
+
+    def get_stale(self, age: float, limit: int) -> List[Tuple[str, str]]:
+        """ Returns the least recently synchronized objects synchronized more
+            than `age` seconds ago as `(resource, resource_id)` tuples.
+        """
+
+        return self.execute(
+            "SELECT resource, resource_id FROM objects WHERE synced < ? "
+            "ORDER BY synced LIMIT ?",
+            (time.time() - age, limit),
+        ).fetchall()
+
+    def acquire_lease(self, name: str, duration: float) -> bool:
+        """ Acquires a lease shared by the processes using the replica.
+
+        Args:
+            name (str): The name of the lease.
+            duration (float): The number of seconds the lease is held for.
+
+        Returns:
+            bool: Whether the lease was acquired by the current process.
+        """
+
+        now = time.time()
+        pid = os.getpid()
+
+        self.execute(
+            "INSERT OR IGNORE INTO leases (name, pid, expires) "
+            "VALUES (?, ?, 0)",
+            (name, pid),
+        )
+        cursor = self.execute(
+            "UPDATE leases SET pid = ?, expires = ? "
+            "WHERE name = ? AND (expires < ? OR pid = ?)",
+            (pid, now + duration, name, now, pid),
+        )
+
+        return cursor.rowcount == 1
+
+    def reconcile(self) -> int:
+        """ Refreshes the least recently synchronized objects from Braintree
+            removing those no longer found.
+
+        Returns:
+            int: The number of refreshed or removed objects.
+        """
+
+        self.purge_invalidations()
+
+        count = 0
+        for resource, resource_id in self.get_stale(
+            age=self.reconcile_age,
+            limit=self.reconcile_batch,
+        ):
+            serializer = self.serializers.get(resource)
+            if serializer is None:
+                continue
+            retrieve, serialize = serializer
+
+            fetched = time.time()
+            try:
+                obj = retrieve(resource_id)
+            except braintree.exceptions.NotFoundError:
+                self.delete(resource=resource, resource_id=resource_id)
+                metric_replica_reconciled.labels(resource, "removed").inc()
+                count += 1
+                continue
+            except Exception as exc:
+                msg = "Could not refresh replicated {} with ID '{}': {}"
+                msg_fmt = msg.format(resource, resource_id, str(exc))
+                self.logger.warning(msg_fmt)
+                metric_replica_reconciled.labels(resource, "failed").inc()
+                continue
+
+            body, updated_at = serialize(obj)
+            if not self.put(
+                resource=resource,
+                resource_id=resource_id,
+                body=body,
+                updated_at=updated_at,
+                fetched=fetched,
+            ):
+                continue
+            metric_replica_reconciled.labels(resource, "refreshed").inc()
+            count += 1
+
+        return count
+
+    def start(self):
+        """ Starts the refreshing thread of the current process unless it's
+            already running, e.g., after a `gunicorn` worker was forked.
+        """
+
+        if not self.serializers:
+            return None
+
+        with self.lock:
+            if self.thread is not None and self.pid == os.getpid():
+                return None
+
+            self.pid = os.getpid()
+            self.event_stop.clear()
+            self.thread = threading.Thread(
+                target=self.run,
+                name=type(self).__name__,
+                daemon=True,
+            )
+            self.thread.start()
+
+    def stop(self):
+        """ Stops the refreshing thread."""
+
+        self.event_stop.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        """ Refreshes the replica every `reconcile_interval` seconds in the
+            process holding the lease.
+        """
+
+        while not self.event_stop.wait(self.reconcile_interval):
+            try:
+                if self.acquire_lease(
+                    name="reconcile",
+                    duration=self.reconcile_interval * 2,
+                ):
+                    self.reconcile()
+            except Exception as exc:
+                msg = "Could not reconcile replica '{}': {}"
+                msg_fmt = msg.format(self.path, str(exc))
+                self.logger.exception(msg_fmt)
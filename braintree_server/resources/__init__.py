@@ -5,3 +5,6 @@ from braintree_server.resources import resource_client_token
 from braintree_server.resources import resource_customer
 from braintree_server.resources import resource_ping
 from braintree_server.resources import resource_subscription
+from braintree_server.resources import resource_metrics
+from braintree_server.resources import resource_profile
+from braintree_server.resources import resource_webhook
@@ -1,23 +1,161 @@
 # coding=utf-8
 
 import json
-from typing import Optional, Dict
+import time
+import hashlib
+import datetime
+import itertools
+from typing import Optional, Dict, Tuple, Any, Callable
 
 import attrdict
 import braintree
 import falcon
 import marshmallow
+import sentry_sdk
 
 from braintree_server.loggers import create_logger
+from braintree_server.loggers import LoggerStructured
+from braintree_server.cache import CacheMemory, CacheEntry
+from braintree_server.cache import CacheNegative
+from braintree_server.metrics import metric_cache_stale_responses
+from braintree_server.metrics import metric_replica_lag
+from braintree_server.metrics import metric_replica_reads
+from braintree_server.metrics import metric_serialization_duration
+from braintree_server.excs import ReplicaError
+from braintree_server.replica import Replica
+from braintree_server.replica import project
+from braintree_server.revalidation import Revalidator
+from braintree_server.timing import add_phase
+from braintree_server.resources.streaming import iter_dumps
+from braintree_server.resources.validation import get_violations
+
+
+def resolve_fields(
+    schema: marshmallow.Schema,
+    fields: Tuple[str, ...],
+) -> Tuple[str, ...]:
+    """ Translates a projection expressed in the keys of the serialized
+        response, e.g., `id` or `credit_cards.token`, into the marshmallow
+        field names expected by the `only` argument of a schema.
+
+    Args:
+        schema (marshmallow.Schema): The schema against which the projection
+            is resolved.
+        fields (Tuple[str, ...]): The requested fields where nested fields
+            are expressed as dot-delimited paths.
+
+    Returns:
+        Tuple[str, ...]: The projection expressed in marshmallow field names.
+
+    Raises:
+        KeyError: Raised with the offending path when a requested field does
+            not exist under the schema.
+    """
+
+    names = []
+    for path in fields:
+        schema_current = schema
+        names_path = []
+        for key in path.split("."):
+            # Fields nested under a scalar field cannot be projected.
+            if schema_current is None:
+                raise KeyError(path)
+
+            # Match the key against the serialized name of each field which
+            # may differ from the field name through `dump_to`.
+            for name, field in schema_current.fields.items():
+                if (field.dump_to or name) == key and not field.load_only:
+                    break
+            else:
+                raise KeyError(path)
+
+            names_path.append(name)
+
+            if isinstance(field, marshmallow.fields.Nested):
+                schema_current = field.schema
+            else:
+                schema_current = None
+
+        names.append(".".join(names_path))
+
+    return tuple(names)
+
+
+def get_updated_at(
+    obj: Any,
+    schema: marshmallow.Schema,
+) -> Optional[datetime.datetime]:
+    """ Retrieves the latest `updated_at` timestamp of an object and all
+        objects nested under it through the fields of a `marshmallow` schema,
+        e.g., the credit-cards and subscriptions of a customer.
+
+    Args:
+        obj (Any): The object, e.g., a Braintree customer.
+        schema (marshmallow.Schema): The schema used to encode the object.
+
+    Returns:
+        Optional[datetime.datetime]: The latest `updated_at` timestamp or
+            `None` if no timestamp was found.
+    """
+
+    updated_at = marshmallow.utils.get_value("updated_at", obj, None)
+
+    for name, field in schema.fields.items():
+        if not isinstance(field, marshmallow.fields.Nested):
+            continue
+
+        value = marshmallow.utils.get_value(
+            field.attribute or name, obj, None
+        )
+        if not value:
+            continue
+
+        for obj_nested in (value if field.many else [value]):
+            updated_at_nested = get_updated_at(
+                obj=obj_nested,
+                schema=field.schema,
+            )
+            if updated_at_nested is None:
+                continue
+            if updated_at is None or updated_at_nested > updated_at:
+                updated_at = updated_at_nested
+
+    return updated_at
+
+
+def create_etag(
+    resource: str,
+    resource_id: str,
+    updated_at: str,
+    fields: Optional[Tuple[str, ...]] = None,
+) -> str:
+    """ Computes a strong entity-tag from the ID of an object, its latest
+        `updated_at` timestamp in ISO format, and the requested projection.
+    """
+
+    parts = [resource, resource_id, updated_at, ",".join(fields or ())]
+
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
 
 
 class ResourceBase(object):
     """ Falcon resource base-class."""
 
+    # Schema variants keyed by the schema class, the projection, and the
+    # `strict` option they were created for so that they are built only once.
+    schemas_variants = {}  # type: Dict[Tuple, marshmallow.Schema]
+
+    # Maximum number of schema variants to keep around.
+    schemas_variants_max = 256
+
     def __init__(
         self,
         cfg: attrdict.AttrDict,
         gateway: braintree.BraintreeGateway,
+        cache: Optional[CacheMemory] = None,
+        cache_negative: Optional[CacheNegative] = None,
+        replica: Optional[Replica] = None,
+        revalidator: Optional[Revalidator] = None,
         **kwargs
     ):
         """Constructor.
@@ -28,17 +166,65 @@ class ResourceBase(object):
             gateway (braintree.BraintreeGateway): The instantiated and
                 configured Braintree gateway that will be used to interact with
                 Braintree.
+            cache (Optional[CacheMemory] = None): The cache of serialized
+                responses shared by the resources. Defaults to `None` in which
+                case no responses are cached.
+            cache_negative (Optional[CacheNegative] = None): The cache of the
+                objects recently not found shared by the resources. Defaults
+                to `None` in which case every lookup reaches Braintree.
+            replica (Optional[Replica] = None): The local replica of customers
+                and subscriptions shared by the resources. Defaults to `None`
+                in which case no objects are replicated.
+            revalidator (Optional[Revalidator] = None): The runner of the
+                background refreshes of expired cached responses. Defaults to
+                `None` in which case expired responses are only served upon
+                Braintree errors.
         """
 
         # Internalize arguments.
         self.cfg = cfg
         self.gateway = gateway
+        self.cache = cache
+        self.cache_negative = cache_negative
+        self.replica = replica
+        self.revalidator = revalidator
+
+        # Create a class-level logger formatting records lazily.
+        self.logger = LoggerStructured(
+            create_logger(
+                logger_name=type(self).__name__,
+                logger_level=kwargs.get("logger_level", "DEBUG")
+            )
+        )
+
+        # Retrieve the response-validation settings. Under the `full` mode
+        # responses are encoded via the schemas as defined, i.e., strict
+        # schemas fail on serialization errors. Under the `sampled` and `off`
+        # modes responses are encoded via non-strict schema variants while
+        # under the `sampled` mode one in every `sample_every` responses is
+        # checked against the schema validators and violations are reported.
+        cfg_validation = cfg.get("response_validation") or {}
+        self.validation_mode = cfg_validation.get("mode", "full")
+        self.validation_sample_every = cfg_validation.get("sample_every", 100)
+        self.validation_counter = itertools.count()
 
-        # Create a class-level logger.
-        self.logger = create_logger(
-            logger_name=type(self).__name__,
-            logger_level=kwargs.get("logger_level", "DEBUG")
+        # Retrieve the staleness policies of the replica, i.e., the request
+        # header through which clients accept responses up to a number of
+        # seconds stale and the staleness accepted per route by default.
+        cfg_replica = cfg.get("replica") or {}
+        self.replica_request_header = cfg_replica.get(
+            "request_header",
+            "X-Max-Staleness",
         )
+        self.replica_routes = cfg_replica.get("routes") or {}
+
+        # Retrieve the number of seconds past their `ttl` cached responses are
+        # served for while being refreshed in the background or upon Braintree
+        # errors.
+        cfg_cache = cfg.get("cache") or {}
+        self.cache_ttl = cfg_cache.get("ttl", 0)
+        self.stale_while_revalidate = cfg_cache.get("stale_while_revalidate", 0)
+        self.stale_if_error = cfg_cache.get("stale_if_error", 0)
 
     def check_auth(
         self,
@@ -79,7 +265,40 @@ class ResourceBase(object):
             msg = ("'Authorization' token does not grant access to customer "
                    "with ID '{}'.")
             msg_fmt = msg.format(customer_id)
-            self.logger.error(msg_fmt)
+
+            raise falcon.HTTPError(
+                status=falcon.HTTP_403,
+                title="Unathorized.",
+                description=msg_fmt,
+            )
+
+    def check_scope(
+        self,
+        req: falcon.Request,
+        scope: str,
+    ):
+        """ Checks whether the access-token provided in the request grants a
+            specific scope, e.g., `admin:profile`, either through its `scope`
+            claim or, with Auth0 RBAC, its `permissions` claim.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            scope (str): The scope the access-token must grant.
+
+        Raises:
+            falcon.HTTPError: Raised with a 403 response if the access-token
+                doesn't grant the scope.
+        """
+
+        # Retrieve the decoded token payload from the request context.
+        token_payload = req.context["token_payload"]
+
+        scopes = (token_payload.get("scope") or "").split()
+        permissions = token_payload.get("permissions") or []
+
+        if scope not in scopes and scope not in permissions:
+            msg = "'Authorization' token does not grant the '{}' scope."
+            msg_fmt = msg.format(scope)
 
             raise falcon.HTTPError(
                 status=falcon.HTTP_403,
@@ -101,11 +320,17 @@ class ResourceBase(object):
                 will be used to decode the body.
         """
 
+        start = time.perf_counter_ns()
+
+        # Reuse the body should a middleware have already read it, e.g., to
+        # fingerprint the request, reading it through the stream bounded by
+        # the `Content-Length` otherwise.
         try:
-            request_json = req.stream.read()
-        except Exception as exc:
+            request_json = req.context.get("body")
+            if request_json is None:
+                request_json = req.bounded_stream.read()
+        except Exception:
             msg_fmt = "Could not retrieve JSON body."
-            self.logger.exception(msg_fmt)
             raise falcon.HTTPError(
                 status=falcon.HTTP_400,
                 title="InvalidRequest",
@@ -124,28 +349,777 @@ class ResourceBase(object):
                 parameters = {}
         except marshmallow.ValidationError as exc:
             msg_fmt = "Response body violates schema."
-            self.logger.exception(msg_fmt)
             raise falcon.HTTPError(
                 status=falcon.HTTP_422,
                 title="Schema violation.",
                 description=msg_fmt + " Exception: {0}".format(str(exc))
             )
         except Exception as exc:
-            msg_fmt = "Could not decode JSON body '{}'.".format(request_json)
-            self.logger.exception(msg_fmt)
+            # The body is deliberately not embedded in the error description
+            # as it may be arbitrarily large and carry sensitive data.
+            msg = "Could not decode JSON body of length {}."
+            msg_fmt = msg.format(len(request_json))
             raise falcon.HTTPError(
                 status=falcon.HTTP_400,
                 title="InvalidRequest",
-                description=msg_fmt + ". Exception: {0}".format(str(exc))
+                description=msg_fmt + " Exception: {0}".format(str(exc))
             )
 
+        add_phase(name="parse", duration_ns=time.perf_counter_ns() - start)
+
         return parameters
 
+    def get_fields(
+        self,
+        req: falcon.Request,
+        schema: marshmallow.Schema,
+    ) -> Optional[Tuple[str, ...]]:
+        """ Retrieves the projection requested through the `fields` query
+            parameter and validates it against a `marshmallow` schema.
+
+        Note:
+            Nested fields are requested through dot-delimited paths, e.g.,
+            `fields=id,email,credit_cards.token`.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            schema (marshmallow.Schema): The marshmallow schema instance that
+                will be used to encode the response.
+
+        Returns:
+            Optional[Tuple[str, ...]]: The normalized projection or `None` if
+                no `fields` parameter was provided.
+
+        Raises:
+            falcon.HTTPError: Raised with a 400 response if any of the
+                requested fields does not exist under the schema.
+        """
+
+        values = req.get_param_as_list("fields")
+        if not values:
+            return None
+
+        # Split comma-delimited values (the parameter may also be repeated)
+        # and normalize the projection so that equivalent requests share the
+        # same cached schema.
+        fields = tuple(sorted(set(
+            field.strip()
+            for value in values
+            for field in value.split(",")
+            if field.strip()
+        )))
+        if not fields:
+            return None
+
+        # Ensure the projection can be resolved (the resulting schema is
+        # cached for the subsequent `prepare_response` call).
+        self.get_schema_variant(schema=schema, fields=fields)
+
+        return fields
+
+    def get_schema_variant(
+        self,
+        schema: marshmallow.Schema,
+        fields: Optional[Tuple[str, ...]] = None,
+        strict: Optional[bool] = None,
+    ) -> marshmallow.Schema:
+        """ Retrieves a cached instance of a `marshmallow` schema restricted
+            to a given projection and/or overriding the schema `strict` option
+            creating it if necessary.
+
+        Args:
+            schema (marshmallow.Schema): The unrestricted marshmallow schema
+                instance.
+            fields (Optional[Tuple[str, ...]] = None): The normalized
+                projection as returned by the `get_fields` method.
+            strict (Optional[bool] = None): The `strict` option of the variant.
+                Defaults to `None` in which case the option defined under the
+                schema `Meta` is used.
+
+        Returns:
+            marshmallow.Schema: The marshmallow schema variant instance.
+
+        Raises:
+            falcon.HTTPError: Raised with a 400 response if any of the
+                requested fields does not exist under the schema.
+        """
+
+        if not fields and strict is None:
+            return schema
+
+        key = (type(schema), fields, strict)
+
+        schema_variant = self.schemas_variants.get(key)
+        if schema_variant is not None:
+            return schema_variant
+
+        try:
+            only = resolve_fields(schema=schema, fields=fields or ())
+        except KeyError as exc:
+            msg = "Unknown field '{}' requested."
+            msg_fmt = msg.format(exc.args[0])
+
+            raise falcon.HTTPError(
+                status=falcon.HTTP_400,
+                title="Invalid fields.",
+                description=msg_fmt,
+            )
+
+        schema_variant = type(schema)(only=only or None, strict=strict)
+
+        # Start afresh once the cache is full instead of tracking usage as
+        # the number of distinct projections in use is expected to be small.
+        if len(self.schemas_variants) >= self.schemas_variants_max:
+            self.schemas_variants.clear()
+        self.schemas_variants[key] = schema_variant
+
+        return schema_variant
+
+    def get_schema_response(
+        self,
+        schema: marshmallow.Schema,
+        fields: Optional[Tuple[str, ...]] = None,
+    ) -> marshmallow.Schema:
+        """ Retrieves the variant of a `marshmallow` schema used to encode a
+            response based on the requested projection and the
+            response-validation mode.
+
+        Args:
+            schema (marshmallow.Schema): The marshmallow schema instance.
+            fields (Optional[Tuple[str, ...]] = None): The normalized
+                projection as returned by the `get_fields` method.
+
+        Returns:
+            marshmallow.Schema: The marshmallow schema variant instance.
+        """
+
+        return self.get_schema_variant(
+            schema=schema,
+            fields=fields,
+            strict=None if self.validation_mode == "full" else False,
+        )
+
+    def is_validation_sampled(self) -> bool:
+        """ Checks whether the current response should be checked against the
+            schema validators under the `sampled` response-validation mode.
+
+        Returns:
+            bool: Whether the current response should be checked.
+        """
+
+        if self.validation_mode != "sampled":
+            return False
+
+        count = next(self.validation_counter)
+
+        return count % self.validation_sample_every == 0
+
+    def report_violations(
+        self,
+        schema: marshmallow.Schema,
+        result: Any,
+        errors: Optional[Dict] = None,
+    ):
+        """ Checks a result against the validators of a `marshmallow` schema
+            and reports any violations, alongside any serialization errors,
+            via the logger and Sentry without failing the request.
+
+        Args:
+            schema (marshmallow.Schema): The marshmallow schema instance used
+                to encode the result.
+            result (Any): The encoded result.
+            errors (Optional[Dict] = None): The serialization errors returned
+                by the schema.
+        """
+
+        violations = dict(errors or {})
+        violations.update(get_violations(schema=schema, obj=result))
+
+        if not violations:
+            return None
+
+        msg = "Response encoded via '{}' violates schema: {}"
+        msg_fmt = msg.format(type(schema).__name__, violations)
+        self.logger.warning(msg_fmt)
+
+        sentry_sdk.capture_message(msg_fmt, level="warning")
+
+    def invalidate(self, resource: str, resource_id: str):
+        """ Removes all cached responses pertaining to an object, including
+            any cached 404, and marks its replicated copy as stale.
+
+        Args:
+            resource (str): The resource name, e.g., `customer`.
+            resource_id (str): The ID of the object.
+        """
+
+        if self.cache is not None:
+            self.cache.invalidate(resource=resource, resource_id=resource_id)
+
+        if self.cache_negative is not None:
+            self.cache_negative.discard(
+                resource=resource,
+                resource_id=resource_id,
+            )
+
+        if self.replica is not None:
+            try:
+                self.replica.mark_stale(
+                    resource=resource,
+                    resource_id=resource_id,
+                )
+            except ReplicaError as exc:
+                self.logger.error(str(exc))
+
+    def get_etag(
+        self,
+        resource: str,
+        result: Any,
+        schema: marshmallow.Schema,
+        fields: Optional[Tuple[str, ...]] = None,
+    ) -> Optional[str]:
+        """ Computes a strong entity-tag for a Braintree object from its ID,
+            its latest `updated_at` timestamp, and the requested projection.
+
+        Note:
+            The `updated_at` timestamps of nested objects, e.g., the
+            subscriptions under a customer's credit-cards, are taken into
+            account as updating them does not update the parent object.
+
+        Args:
+            resource (str): The resource name, e.g., `customer`.
+            result (Any): The Braintree object.
+            schema (marshmallow.Schema): The unrestricted marshmallow schema
+                instance that will be used to encode the object.
+            fields (Optional[Tuple[str, ...]] = None): The projection as
+                returned by the `get_fields` method.
+
+        Returns:
+            Optional[str]: The entity-tag or `None` if the object carries no
+                `updated_at` timestamp.
+        """
+
+        updated_at = get_updated_at(obj=result, schema=schema)
+        if updated_at is None:
+            return None
+
+        return create_etag(
+            resource=resource,
+            resource_id=str(marshmallow.utils.get_value("id", result, "")),
+            updated_at=updated_at.isoformat(),
+            fields=fields,
+        )
+
+    def respond_not_modified(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        etag: Optional[str],
+    ) -> bool:
+        """ Responds with a 304 if the entity-tag matches any of the
+            entity-tags in the `If-None-Match` header of the request.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            etag (Optional[str]): The entity-tag of the current representation.
+
+        Returns:
+            bool: Whether a 304 response was prepared.
+        """
+
+        if etag is None:
+            return False
+
+        for etag_request in (req.if_none_match or []):
+            if etag_request == "*" or etag_request == etag:
+                resp.etag = etag
+                resp.status = falcon.HTTP_304
+                return True
+
+        return False
+
+    def respond_cached(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        key: Tuple,
+    ) -> bool:
+        """ Responds with a cached serialized response, or a 304 should its
+            entity-tag match the `If-None-Match` header, if one exists.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            key (Tuple): The `(resource, resource_id, fields)` cache key.
+
+        Returns:
+            bool: Whether a response was prepared from the cache.
+        """
+
+        if self.cache is None:
+            return False
+
+        entry = self.cache.get(key=key)
+        if entry is None:
+            return False
+
+        if self.respond_not_modified(req=req, resp=resp, etag=entry.etag):
+            return True
+
+        resp.content_type = "application/json"
+        resp.body = entry.body
+        if entry.etag is not None:
+            resp.etag = entry.etag
+        resp.status = falcon.HTTP_200
+
+        return True
+
+    def get_cached_stale(self, key: Tuple) -> Optional[CacheEntry]:
+        """ Retrieves an expired cached response which may still be served
+            while revalidating or upon Braintree errors.
+
+        Args:
+            key (Tuple): The `(resource, resource_id, fields)` cache key.
+
+        Returns:
+            Optional[CacheEntry]: The cached entry or `None` if there's none
+                or no stale window is configured.
+        """
+
+        if self.cache is None:
+            return None
+
+        if not (self.stale_while_revalidate or self.stale_if_error):
+            return None
+
+        return self.cache.get_stale(key=key)
+
+    def respond_stale(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        entry: CacheEntry,
+        warning: str,
+    ):
+        """ Responds with an expired cached response, or a 304 should its
+            entity-tag match the `If-None-Match` header, along with its age.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            entry (CacheEntry): The expired cached entry.
+            warning (str): The value of the `Warning` header.
+        """
+
+        resp.set_header("Age", str(int(time.monotonic() - entry.created)))
+        resp.set_header("Warning", warning)
+
+        if self.respond_not_modified(req=req, resp=resp, etag=entry.etag):
+            return None
+
+        resp.content_type = "application/json"
+        resp.body = entry.body
+        if entry.etag is not None:
+            resp.etag = entry.etag
+        resp.status = falcon.HTTP_200
+
+    def respond_stale_while_revalidate(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        key: Tuple,
+        entry: Optional[CacheEntry],
+        refresh: Callable,
+    ) -> bool:
+        """ Responds with an expired cached response within the
+            stale-while-revalidate window scheduling its refresh.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            key (Tuple): The `(resource, resource_id, fields)` cache key.
+            entry (Optional[CacheEntry]): The expired cached entry (if any).
+            refresh (Callable): The function refreshing the cached response.
+
+        Returns:
+            bool: Whether the expired response was served.
+        """
+
+        if entry is None or self.revalidator is None:
+            return False
+
+        age = time.monotonic() - entry.created
+        if age > self.cache_ttl + self.stale_while_revalidate:
+            return False
+
+        self.revalidator.submit(key=key, refresh=refresh)
+
+        self.respond_stale(
+            req=req,
+            resp=resp,
+            entry=entry,
+            warning='110 - "Response is Stale"',
+        )
+        metric_cache_stale_responses.labels("revalidate").inc()
+
+        return True
+
+    def respond_stale_if_error(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        entry: Optional[CacheEntry],
+    ) -> bool:
+        """ Responds with an expired cached response within the
+            stale-if-error window after a failed Braintree request.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            entry (Optional[CacheEntry]): The expired cached entry (if any).
+
+        Returns:
+            bool: Whether the expired response was served.
+        """
+
+        if entry is None:
+            return False
+
+        age = time.monotonic() - entry.created
+        if age > self.cache_ttl + self.stale_if_error:
+            return False
+
+        self.respond_stale(
+            req=req,
+            resp=resp,
+            entry=entry,
+            warning='111 - "Revalidation Failed"',
+        )
+        metric_cache_stale_responses.labels("error").inc()
+
+        return True
+
+    def refresh_cached(
+        self,
+        resource: str,
+        resource_id: str,
+        fields: Optional[Tuple[str, ...]],
+        retrieve: Callable,
+        schema: marshmallow.Schema,
+    ):
+        """ Retrieves an object from Braintree and caches its response, e.g.,
+            in the background after serving its stale response.
+
+        Args:
+            resource (str): The resource name, e.g., `customer`.
+            resource_id (str): The ID of the object.
+            fields (Optional[Tuple[str, ...]]): The projection as returned by
+                the `get_fields` method.
+            retrieve (Callable): The function retrieving the object.
+            schema (marshmallow.Schema): The unrestricted marshmallow schema
+                instance of the object.
+        """
+
+        cache_key = (resource, resource_id, fields)
+
+        # Look the response up first so that the shared cache tier records
+        # the version of the object preceding its retrieval.
+        if self.cache.get(key=cache_key) is not None:
+            return None
+
+        try:
+            result = retrieve()
+        except braintree.exceptions.NotFoundError:
+            self.invalidate(resource=resource, resource_id=resource_id)
+            return None
+
+        self.prepare_response(
+            resp=falcon.Response(),
+            result=result,
+            schema=schema,
+            fields=fields,
+            etag=self.get_etag(
+                resource=resource,
+                result=result,
+                schema=schema,
+                fields=fields,
+            ),
+            cache_key=cache_key,
+        )
+
+    def respond_not_found_cached(
+        self,
+        resp: falcon.Response,
+        resource: str,
+        resource_id: str,
+    ) -> bool:
+        """ Responds with the cached 404 of an object recently not found in
+            Braintree, if one exists.
+
+        Args:
+            resp (falcon.Response): The Falcon `Response` object.
+            resource (str): The resource name, e.g., `customer`.
+            resource_id (str): The ID of the object.
+
+        Returns:
+            bool: Whether a 404 response was prepared from the cache.
+        """
+
+        if self.cache_negative is None:
+            return False
+
+        body = self.cache_negative.get(
+            resource=resource,
+            resource_id=resource_id,
+        )
+        if body is None:
+            return False
+
+        resp.status = falcon.HTTP_404
+        resp.content_type = "application/json"
+        resp.body = body
+        resp.append_header("Vary", "Accept")
+
+        return True
+
+    def not_found(
+        self,
+        resource: str,
+        resource_id: str,
+        description: str,
+    ) -> falcon.HTTPError:
+        """ Creates the 404 error of an object not found in Braintree caching
+            its serialized response (if enabled).
+
+        Args:
+            resource (str): The resource name, e.g., `customer`.
+            resource_id (str): The ID of the object.
+            description (str): The error description.
+
+        Returns:
+            falcon.HTTPError: The error to be raised.
+        """
+
+        error = falcon.HTTPError(
+            status=falcon.HTTP_404,
+            title="Not found.",
+            description=description,
+        )
+
+        if self.cache_negative is not None:
+            self.cache_negative.add(
+                resource=resource,
+                resource_id=resource_id,
+                body=error.to_json(),
+            )
+
+        return error
+
+    def get_max_staleness(self, req: falcon.Request) -> Optional[float]:
+        """ Retrieves the number of seconds stale a response to a request may
+            be from the request header or, should it be missing, the policy of
+            the route.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+
+        Returns:
+            Optional[float]: The maximum staleness or `None` if the response
+                must be retrieved from Braintree.
+
+        Raises:
+            falcon.HTTPError: Raised with a 400 when the header isn't a
+                non-negative number.
+        """
+
+        value = req.get_header(self.replica_request_header)
+        if value is None:
+            return self.replica_routes.get(
+                "{} {}".format(req.method, req.uri_template),
+            )
+
+        try:
+            max_staleness = float(value)
+        except ValueError:
+            max_staleness = -1.0
+
+        if not max_staleness >= 0:
+            msg = "The '{}' header must be a non-negative number of seconds."
+            msg_fmt = msg.format(self.replica_request_header)
+            raise falcon.HTTPError(
+                status=falcon.HTTP_400,
+                title="Invalid header.",
+                description=msg_fmt,
+            )
+
+        return max_staleness
+
+    def respond_replicated(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+        resource: str,
+        resource_id: str,
+        fields: Optional[Tuple[str, ...]] = None,
+    ) -> bool:
+        """ Responds with the replicated copy of an object, or a 304 should
+            its entity-tag match the `If-None-Match` header, if one exists and
+            is no more stale than the request allows.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+            resource (str): The resource name, e.g., `customer`.
+            resource_id (str): The ID of the object.
+            fields (Optional[Tuple[str, ...]] = None): The projection as
+                returned by the `get_fields` method.
+
+        Returns:
+            bool: Whether a response was prepared from the replica.
+        """
+
+        if self.replica is None:
+            return False
+
+        max_staleness = self.get_max_staleness(req=req)
+        if max_staleness is None:
+            return False
+
+        self.replica.start()
+
+        try:
+            entry = self.replica.get(
+                resource=resource,
+                resource_id=resource_id,
+            )
+        except ReplicaError as exc:
+            self.logger.error(str(exc))
+            return False
+
+        if entry is None:
+            metric_replica_reads.labels(resource, "miss").inc()
+            return False
+
+        # Objects marked stale are never served.
+        lag = entry.get_lag()
+        if not entry.synced or lag > max_staleness:
+            metric_replica_reads.labels(resource, "stale").inc()
+            return False
+
+        metric_replica_reads.labels(resource, "hit").inc()
+        metric_replica_lag.labels(resource).observe(lag)
+
+        resp.set_header("X-Replica-Lag", "{:.3f}".format(lag))
+
+        etag = None
+        if entry.updated_at is not None:
+            etag = create_etag(
+                resource=resource,
+                resource_id=resource_id,
+                updated_at=entry.updated_at,
+                fields=fields,
+            )
+        if self.respond_not_modified(req=req, resp=resp, etag=etag):
+            return True
+
+        body = entry.body
+        if fields:
+            body = json.dumps(project(data=json.loads(body), fields=fields))
+
+        resp.content_type = "application/json"
+        resp.body = body
+        if etag is not None:
+            resp.etag = etag
+        resp.status = falcon.HTTP_200
+
+        return True
+
+    def serialize_replicated(
+        self,
+        result: Any,
+        schema: marshmallow.Schema,
+    ) -> Tuple[str, Optional[str]]:
+        """ Serializes an object to be replicated via its unrestricted schema.
+
+        Args:
+            result (Any): The Braintree object.
+            schema (marshmallow.Schema): The unrestricted marshmallow schema
+                instance of the object.
+
+        Returns:
+            Tuple[str, Optional[str]]: The serialized object and its latest
+                `updated_at` timestamp in ISO format (if any).
+        """
+
+        body, _ = self.get_schema_response(schema=schema).dumps(result)
+        updated_at = get_updated_at(obj=result, schema=schema)
+
+        return body, updated_at.isoformat() if updated_at else None
+
+    def replicate(
+        self,
+        resource: str,
+        resource_id: str,
+        result: Any,
+        schema: marshmallow.Schema,
+        customer_id: Optional[str] = None,
+        body: Optional[str] = None,
+        fetched: Optional[float] = None,
+    ):
+        """ Writes an object just retrieved from Braintree to the replica (if
+            any).
+
+        Args:
+            resource (str): The resource name, e.g., `customer`.
+            resource_id (str): The ID of the object.
+            result (Any): The Braintree object.
+            schema (marshmallow.Schema): The unrestricted marshmallow schema
+                instance of the object.
+            customer_id (Optional[str] = None): The ID of the customer the
+                object belongs to (if any).
+            body (Optional[str] = None): The object already serialized via
+                its unrestricted schema, e.g., for the response. Defaults to
+                `None` in which case the object is serialized anew.
+            fetched (Optional[float] = None): The `time.time` timestamp at
+                which the retrieval of the object started so that objects
+                invalidated since aren't written. Defaults to `None` for
+                objects just created or updated by the service itself.
+        """
+
+        if self.replica is None:
+            return None
+
+        self.replica.start()
+
+        if body is None:
+            body, updated_at = self.serialize_replicated(
+                result=result,
+                schema=schema,
+            )
+        else:
+            updated_at = get_updated_at(obj=result, schema=schema)
+            updated_at = updated_at.isoformat() if updated_at else None
+        try:
+            self.replica.put(
+                resource=resource,
+                resource_id=resource_id,
+                body=body,
+                updated_at=updated_at,
+                customer_id=customer_id,
+                fetched=fetched,
+            )
+        except ReplicaError as exc:
+            self.logger.error(str(exc))
+
     def prepare_response(
         self,
         resp: falcon.Response,
         result: Dict,
         schema: Optional[marshmallow.Schema] = None,
+        fields: Optional[Tuple[str, ...]] = None,
+        etag: Optional[str] = None,
+        cache_key: Optional[Tuple] = None,
     ):
         """ Encodes a `result` either via a `marshmallow` schema or standard
             JSON-encoding and adds it to the provided `falcon.Response` object.
@@ -156,34 +1130,121 @@ class ResourceBase(object):
                 `falcon.Response` object.
             schema (Optional[marshmallow.Schema] = None): The marshmallow
                 schema instance that will be used to encode the result.
+            fields (Optional[Tuple[str, ...]] = None): The projection, as
+                returned by the `get_fields` method, to which the encoded
+                result will be restricted.
+            etag (Optional[str] = None): The entity-tag of the result which
+                will be set in the `ETag` header.
+            cache_key (Optional[Tuple] = None): The key under which the
+                encoded result will be cached. Defaults to `None` in which case
+                the encoded result is not cached.
 
         Returns:
             falcon.Response: The updated response object.
         """
 
+        # Swap the schema for its cached variant pertaining to the requested
+        # projection and response-validation mode.
+        if schema:
+            schema = self.get_schema_response(schema=schema, fields=fields)
+
+        start = time.perf_counter_ns()
         try:
             if schema:
-                response_json = schema.dumps(result).data
+                response_json, errors = schema.dumps(result)
+                if self.is_validation_sampled():
+                    self.report_violations(
+                        schema=schema,
+                        result=result,
+                        errors=errors,
+                    )
             else:
                 response_json = json.dumps(result)
         except marshmallow.ValidationError as exc:
             msg_fmt = "Response body violates schema."
-            self.logger.exception(msg_fmt)
             raise falcon.HTTPError(
                 status=falcon.HTTP_422,
                 title="Schema violation.",
                 description=msg_fmt + ". Exception: {0}".format(str(exc))
             )
         except Exception as exc:
-            msg_fmt = "Could not encode results '{0}' into JSON".format(result)
-            self.logger.exception(msg_fmt)
+            msg = "Could not encode result of type '{0}' into JSON"
+            msg_fmt = msg.format(type(result).__name__)
             raise falcon.HTTPError(
                 status=falcon.HTTP_500,
                 title="UnhandledError",
                 description=msg_fmt + ". Exception: {0}".format(str(exc))
             )
 
+        duration_ns = time.perf_counter_ns() - start
+        metric_serialization_duration.labels(
+            type(schema).__name__ if schema else "json",
+        ).observe(duration_ns / 1e9)
+        add_phase(name="serialize", duration_ns=duration_ns)
+
         resp.content_type = "application/json"
         resp.body = response_json
+        if etag is not None:
+            resp.etag = etag
+
+        if self.cache is not None and cache_key is not None:
+            self.cache.set(
+                key=cache_key,
+                entry=CacheEntry(body=response_json, etag=etag),
+            )
+
+        return resp
+
+    def prepare_response_stream(
+        self,
+        resp: falcon.Response,
+        result: Any,
+        schema: marshmallow.Schema,
+        fields: Optional[Tuple[str, ...]] = None,
+        etag: Optional[str] = None,
+        chunk_size: int = 65536,
+    ):
+        """ Encodes a `result` via a `marshmallow` schema incrementally and
+            sets the resulting chunks as the stream of the provided
+            `falcon.Response` object.
+
+        Note:
+            The streamed body is byte-identical to the one set by the
+            `prepare_response` method but is neither built in memory as a
+            whole nor cached. As serialization takes place while the response
+            is being sent, serialization errors cannot result in an error
+            response.
+
+        Args:
+            resp (falcon.Response): The Falcon `Response` object.
+            result (Any): The result that will be encoded and streamed.
+            schema (marshmallow.Schema): The marshmallow schema instance that
+                will be used to encode the result.
+            fields (Optional[Tuple[str, ...]] = None): The projection, as
+                returned by the `get_fields` method, to which the encoded
+                result will be restricted.
+            etag (Optional[str] = None): The entity-tag of the result which
+                will be set in the `ETag` header.
+            chunk_size (int): The approximate size of the streamed chunks.
+
+        Returns:
+            falcon.Response: The updated response object.
+        """
+
+        # Swap the schema for its cached variant pertaining to the requested
+        # projection and response-validation mode.
+        schema = self.get_schema_response(schema=schema, fields=fields)
+
+        if self.is_validation_sampled():
+            self.report_violations(schema=schema, result=result)
+
+        resp.content_type = "application/json"
+        resp.stream = iter_dumps(
+            schema=schema,
+            obj=result,
+            chunk_size=chunk_size,
+        )
+        if etag is not None:
+            resp.etag = etag
 
         return resp
@@ -1,5 +1,9 @@
 # coding=utf-8
 
+from typing import Optional, Tuple
+
+import attrdict
+import braintree
 import falcon
 import marshmallow
 
@@ -15,11 +19,52 @@ class SchemaClientToken(marshmallow.Schema):
         strict = True
 
 
-class ResourceClientToken(ResourceBase):
-    """Resource-class to manage Braintree client-tokens."""
+class ResourceClientTokenBase(ResourceBase):
+    """Resource base-class of the Braintree client-token resources."""
 
     schema = SchemaClientToken()
 
+    def __init__(
+        self,
+        cfg: attrdict.AttrDict,
+        gateway: braintree.BraintreeGateway,
+        **kwargs
+    ):
+        """Constructor.
+
+        Args:
+            cfg (attrdict.Attrdict): The application configuration loaded with
+                the methods under the `config.py` module.
+            gateway (braintree.BraintreeGateway): The instantiated and
+                configured Braintree gateway that will be used to interact with
+                Braintree.
+        """
+
+        super(ResourceClientTokenBase, self).__init__(
+            cfg=cfg,
+            gateway=gateway,
+            **kwargs
+        )
+
+        # Client-tokens remain valid for 24 hours and are only cached, and
+        # thus handed to several callers, if enabled.
+        cfg_cache = cfg.get("cache") or {}
+        self.cache_client_tokens = cfg_cache.get("client_tokens", False)
+
+    def get_cache_key(self, customer_id: str) -> Optional[Tuple]:
+        """ Returns the cache key of the client-tokens of a customer or `None`
+            if client-tokens aren't cached.
+        """
+
+        if not self.cache_client_tokens:
+            return None
+
+        return "client_token", customer_id, None
+
+
+class ResourceClientToken(ResourceClientTokenBase):
+    """Resource-class to manage Braintree client-tokens."""
+
     def on_get(
         self,
         req: falcon.Request,
@@ -36,14 +81,21 @@ class ResourceClientToken(ResourceBase):
                 will be generated.
         """
 
-        msg = "Generating customer-token for customer with ID '{}'."
-        msg_fmt = msg.format(customer_id)
-        self.logger.info(msg_fmt)
+        self.logger.info(
+            "Generating customer-token for customer with ID '%s'.",
+            customer_id,
+            customer_id=customer_id,
+        )
 
         # Check whether the caller is authorized to access resources pertaining
         # to the given customer.
         self.check_auth(req=req, customer_id=customer_id)
 
+        # Respond from the cache if a client-token was recently generated.
+        cache_key = self.get_cache_key(customer_id=customer_id)
+        if cache_key and self.respond_cached(req=req, resp=resp, key=cache_key):
+            return None
+
         # Generate client-token.
         try:
             token = self.gateway.client_token.generate({
@@ -52,7 +104,6 @@ class ResourceClientToken(ResourceBase):
         except ValueError:
             msg = "Customer with ID '{}' not found."
             msg_fmt = msg.format(customer_id)
-            self.logger.exception(msg_fmt)
 
             raise falcon.HTTPError(
                 status=falcon.HTTP_404,
@@ -64,15 +115,14 @@ class ResourceClientToken(ResourceBase):
             resp=resp,
             result={"token": token},
             schema=self.schema,
+            cache_key=cache_key,
         )
         resp.status = falcon.HTTP_200
 
 
-class ResourceClientTokenNoCustomerId(ResourceBase):
+class ResourceClientTokenNoCustomerId(ResourceClientTokenBase):
     """Resource-class to manage Braintree client-tokens."""
 
-    schema = SchemaClientToken()
-
     def on_get(
         self,
         req: falcon.Request,
@@ -81,6 +131,11 @@ class ResourceClientTokenNoCustomerId(ResourceBase):
         msg_fmt = "Generating customer-token."
         self.logger.info(msg_fmt)
 
+        # Respond from the cache if a client-token was recently generated.
+        cache_key = self.get_cache_key(customer_id="")
+        if cache_key and self.respond_cached(req=req, resp=resp, key=cache_key):
+            return None
+
         # Generate client-token.
         token = self.gateway.client_token.generate()
 
@@ -88,5 +143,6 @@ class ResourceClientTokenNoCustomerId(ResourceBase):
             resp=resp,
             result={"token": token},
             schema=self.schema,
+            cache_key=cache_key,
         )
         resp.status = falcon.HTTP_200
@@ -1,10 +1,18 @@
 # coding=utf-8
 
+import time
+import functools
+from typing import Any
+
+import attrdict
+import braintree
 import falcon
 import marshmallow
 import braintree.exceptions
 
+from braintree_server.excs import ReplicaError
 from braintree_server.resources.base import ResourceBase
+from braintree_server.revalidation import UPSTREAM_ERRORS
 from braintree_server.resources.schemata import SchemaCustomer
 
 
@@ -24,6 +32,57 @@ class ResourceCustomer(ResourceBase):
     schema_post_request = SchemaCustomerPostRequest()
     schema_response = SchemaCustomer()
 
+    def __init__(
+        self,
+        cfg: attrdict.AttrDict,
+        gateway: braintree.BraintreeGateway,
+        **kwargs
+    ):
+        """Constructor.
+
+        Args:
+            cfg (attrdict.Attrdict): The application configuration loaded with
+                the methods under the `config.py` module.
+            gateway (braintree.BraintreeGateway): The instantiated and
+                configured Braintree gateway that will be used to interact with
+                Braintree.
+        """
+
+        super(ResourceCustomer, self).__init__(
+            cfg=cfg,
+            gateway=gateway,
+            **kwargs
+        )
+
+        # Retrieve the settings of the streaming serialization. Streaming is
+        # disabled unless a minimum number of payment-methods is configured.
+        cfg_streaming = cfg.get("streaming") or {}
+        self.stream_min_payment_methods = cfg_streaming.get(
+            "min_payment_methods"
+        )
+        self.stream_chunk_size = cfg_streaming.get("chunk_size", 65536)
+
+    def is_streamed(self, customer: Any) -> bool:
+        """ Checks whether a customer should be serialized via the streaming
+            serializer based on their number of payment-methods.
+
+        Args:
+            customer (Any): The Braintree customer.
+
+        Returns:
+            bool: Whether the customer should be streamed.
+        """
+
+        if not self.stream_min_payment_methods:
+            return False
+
+        num_payment_methods = sum(
+            len(marshmallow.utils.get_value(name, customer, None) or [])
+            for name in ["credit_cards", "paypal_accounts"]
+        )
+
+        return num_payment_methods >= self.stream_min_payment_methods
+
     def on_get(
         self,
         req: falcon.Request,
@@ -37,35 +96,136 @@ class ResourceCustomer(ResourceBase):
             resp (falcon.Response): The Falcon `Response` object.
             customer_id (str): The Braintree customer ID for which retrieval
                 will be performed.
+
+        Note:
+            The response can be restricted to a subset of its fields through
+            the `fields` query parameter, e.g., `?fields=id,email` or
+            `?fields=id,credit_cards.token` for nested fields.
         """
 
-        msg = "Retrieving customer with ID '{}'."
-        msg_fmt = msg.format(customer_id)
-        self.logger.info(msg_fmt)
+        self.logger.info(
+            "Retrieving customer with ID '%s'.",
+            customer_id,
+            customer_id=customer_id,
+        )
 
         # Check whether the caller is authorized to access resources pertaining
         # to the given customer.
         self.check_auth(req=req, customer_id=customer_id)
 
+        # Retrieve the projection requested through the `fields` query
+        # parameter (if any).
+        fields = self.get_fields(req=req, schema=self.schema_response)
+
+        # Respond with the cached 404 if the customer was recently not found.
+        if self.respond_not_found_cached(
+            resp=resp,
+            resource="customer",
+            resource_id=customer_id,
+        ):
+            return None
+
+        # Respond from the cache if the customer was recently retrieved.
+        cache_key = ("customer", customer_id, fields)
+        if self.respond_cached(req=req, resp=resp, key=cache_key):
+            return None
+
+        # Respond with the expired cached customer while refreshing it in the
+        # background should it be within the stale-while-revalidate window.
+        entry_stale = self.get_cached_stale(key=cache_key)
+        if self.respond_stale_while_revalidate(
+            req=req,
+            resp=resp,
+            key=cache_key,
+            entry=entry_stale,
+            refresh=functools.partial(
+                self.refresh_cached,
+                resource="customer",
+                resource_id=customer_id,
+                fields=fields,
+                retrieve=functools.partial(
+                    self.gateway.customer.find,
+                    customer_id=customer_id,
+                ),
+                schema=self.schema_response,
+            ),
+        ):
+            return None
+
+        # Respond from the replica if the request accepts its staleness.
+        if self.respond_replicated(
+            req=req,
+            resp=resp,
+            resource="customer",
+            resource_id=customer_id,
+            fields=fields,
+        ):
+            return None
+
         # Retrieve customer or respond with a 404 if no customer was found for
         # the given ID.
+        fetched = time.time()
         try:
             customer = self.gateway.customer.find(customer_id=customer_id)
         except braintree.exceptions.NotFoundError:
             msg_fmt = "Customer with ID '{}' not found.".format(customer_id)
-            self.logger.exception(msg_fmt)
 
-            raise falcon.HTTPError(
-                status=falcon.HTTP_404,
-                title="Not found.",
+            raise self.not_found(
+                resource="customer",
+                resource_id=customer_id,
                 description=msg_fmt,
             )
-
-        resp = self.prepare_response(
-            resp=resp,
+        except UPSTREAM_ERRORS:
+            # Respond with the expired cached customer should it be within the
+            # stale-if-error window.
+            if self.respond_stale_if_error(
+                req=req,
+                resp=resp,
+                entry=entry_stale,
+            ):
+                return None
+            raise
+
+        # Respond with a 304 without serializing the customer if the caller
+        # already holds the current representation.
+        etag = self.get_etag(
+            resource="customer",
             result=customer,
             schema=self.schema_response,
+            fields=fields,
         )
+        if self.respond_not_modified(req=req, resp=resp, etag=etag):
+            return None
+
+        # Stream customers with many payment-methods so that their entire
+        # payload isn't built in memory. Streamed customers aren't replicated
+        # for the same reason.
+        if self.is_streamed(customer=customer):
+            resp = self.prepare_response_stream(
+                resp=resp,
+                result=customer,
+                schema=self.schema_response,
+                fields=fields,
+                etag=etag,
+                chunk_size=self.stream_chunk_size,
+            )
+        else:
+            resp = self.prepare_response(
+                resp=resp,
+                result=customer,
+                schema=self.schema_response,
+                fields=fields,
+                etag=etag,
+                cache_key=cache_key,
+            )
+            self.replicate(
+                resource="customer",
+                resource_id=customer_id,
+                result=customer,
+                schema=self.schema_response,
+                body=None if fields else resp.body,
+                fetched=fetched,
+            )
         resp.status = falcon.HTTP_200
 
     def on_post(
@@ -88,9 +248,11 @@ class ResourceCustomer(ResourceBase):
         # Retrieve defined customer ID.
         customer_id = parameters["customer_id"]
 
-        msg = "Creating customer with ID '{}'."
-        msg_fmt = msg.format(customer_id)
-        self.logger.info(msg_fmt)
+        self.logger.info(
+            "Creating customer with ID '%s'.",
+            customer_id,
+            customer_id=customer_id,
+        )
 
         # Check whether the caller is authorized to access resources pertaining
         # to the given customer.
@@ -106,7 +268,6 @@ class ResourceCustomer(ResourceBase):
         if not result.is_success:
             msg = "Could not create customer with ID '{}': {}"
             msg_fmt = msg.format(customer_id, result.message)
-            self.logger.error(msg_fmt)
 
             raise falcon.HTTPError(
                 status=falcon.HTTP_409,
@@ -114,11 +275,21 @@ class ResourceCustomer(ResourceBase):
                 description=msg_fmt,
             )
 
+        # Discard any cached 404 pertaining to the created customer.
+        self.invalidate(resource="customer", resource_id=customer_id)
+
         resp = self.prepare_response(
             resp=resp,
             result=result.customer,
             schema=self.schema_response,
         )
+        self.replicate(
+            resource="customer",
+            resource_id=customer_id,
+            result=result.customer,
+            schema=self.schema_response,
+            body=resp.body,
+        )
         resp.status = falcon.HTTP_201
 
     def on_delete(
@@ -141,9 +312,11 @@ class ResourceCustomer(ResourceBase):
             cancelled.
         """
 
-        msg = "Deleting customer with ID '{}'."
-        msg_fmt = msg.format(customer_id)
-        self.logger.info(msg_fmt)
+        self.logger.info(
+            "Deleting customer with ID '%s'.",
+            customer_id,
+            customer_id=customer_id,
+        )
 
         # Check whether the caller is authorized to access resource pertaining
         # to the given customer.
@@ -155,7 +328,6 @@ class ResourceCustomer(ResourceBase):
             result = self.gateway.customer.delete(customer_id=customer_id)
         except braintree.exceptions.NotFoundError:
             msg_fmt = "Customer with ID '{}' not found.".format(customer_id)
-            self.logger.exception(msg_fmt)
 
             raise falcon.HTTPError(
                 status=falcon.HTTP_404,
@@ -167,7 +339,6 @@ class ResourceCustomer(ResourceBase):
         if not result.is_success:
             msg = "Could not delete customer with ID '{}': {}"
             msg_fmt = msg.format(customer_id, result.message)
-            self.logger.error(msg_fmt)
 
             raise falcon.HTTPError(
                 status=falcon.HTTP_409,
@@ -175,4 +346,18 @@ class ResourceCustomer(ResourceBase):
                 description=msg_fmt,
             )
 
+        # Discard any cached responses, and client-tokens, pertaining to the
+        # deleted customer and remove them, and their subscriptions, from the
+        # replica.
+        self.invalidate(resource="customer", resource_id=customer_id)
+        self.invalidate(resource="client_token", resource_id=customer_id)
+        if self.replica is not None:
+            try:
+                self.replica.delete(
+                    resource="customer",
+                    resource_id=customer_id,
+                )
+            except ReplicaError as exc:
+                self.logger.error(str(exc))
+
         resp.status = falcon.HTTP_204
@@ -0,0 +1,38 @@
+# coding=utf-8
+
+import falcon
+
+from braintree_server.metrics import MetricsStore, render
+from braintree_server.resources.base import ResourceBase
+
+
+class ResourceMetrics(ResourceBase):
+    """Resource-class exposing the metrics in the Prometheus text format."""
+
+    def __init__(self, store: MetricsStore, **kwargs):
+        """Constructor.
+
+        Args:
+            store (MetricsStore): The store aggregating the metrics across
+                processes.
+        """
+
+        super(ResourceMetrics, self).__init__(**kwargs)
+
+        self.store = store
+
+    def on_get(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+    ):
+        """Responds with the metrics aggregated across processes.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+        """
+
+        resp.content_type = "text/plain; version=0.0.4; charset=utf-8"
+        resp.body = render(snapshot=self.store.collect())
+        resp.status = falcon.HTTP_200
@@ -3,13 +3,29 @@
 import falcon
 import marshmallow
 
+from braintree_server.loggers import get_logging_queue_stats
 from braintree_server.resources.base import ResourceBase
 
 
+class SchemaLoggingQueue(marshmallow.Schema):
+    """Marshmallow schema for the logging queue statistics."""
+
+    queue_depth = marshmallow.fields.Integer(required=True)
+    queue_capacity = marshmallow.fields.Integer(required=True)
+    records_dropped = marshmallow.fields.Integer(required=True)
+
+    class Meta:
+        strict = True
+
+
 class SchemaPingResponse(marshmallow.Schema):
     """Marshmallow schema for ping response."""
 
     status = marshmallow.fields.String(required=True)
+    logging_queue = marshmallow.fields.Nested(
+        SchemaLoggingQueue,
+        required=False,
+    )
 
     class Meta:
         strict = True
@@ -25,7 +41,8 @@ class ResourcePing(ResourceBase):
         req: falcon.Request,
         resp: falcon.Response,
     ):
-        """Responds with the service status.
+        """Responds with the service status and, should the logging queue be
+            enabled, its depth and the number of dropped log records.
 
         Args:
             req (falcon.Request): The Falcon `Request` object.
@@ -35,9 +52,15 @@ class ResourcePing(ResourceBase):
         msg_fmt = "Processing 'ping' request."
         self.logger.info(msg_fmt)
 
+        result = {"status": "OK"}
+
+        stats = get_logging_queue_stats()
+        if stats is not None:
+            result["logging_queue"] = stats
+
         resp = self.prepare_response(
             resp=resp,
-            result={"status": "OK"},
+            result=result,
             schema=self.schema,
         )
         resp.status = falcon.HTTP_200
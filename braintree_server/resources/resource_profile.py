@@ -0,0 +1,130 @@
+# coding=utf-8
+
+import falcon
+import marshmallow
+
+from braintree_server.excs import ProfilerBusy
+from braintree_server.profiler import Profiler
+from braintree_server.resources.base import ResourceBase
+
+
+class SchemaProfilePostRequest(marshmallow.Schema):
+    """Marshmallow schema for profile requests."""
+
+    duration = marshmallow.fields.Float(
+        required=False,
+        missing=10.0,
+        validate=marshmallow.validate.Range(min=0),
+    )
+    interval = marshmallow.fields.Float(
+        required=False,
+        missing=0.01,
+        validate=marshmallow.validate.Range(min=0),
+    )
+    allocations = marshmallow.fields.Boolean(required=False, missing=False)
+    top = marshmallow.fields.Integer(
+        required=False,
+        missing=25,
+        validate=marshmallow.validate.Range(min=1),
+    )
+
+    class Meta:
+        strict = True
+
+
+class SchemaAllocation(marshmallow.Schema):
+    """Marshmallow schema for allocation sites."""
+
+    site = marshmallow.fields.String(required=True)
+    size = marshmallow.fields.Integer(required=True)
+    size_diff = marshmallow.fields.Integer(required=True)
+    count = marshmallow.fields.Integer(required=True)
+    count_diff = marshmallow.fields.Integer(required=True)
+
+    class Meta:
+        strict = True
+
+
+class SchemaProfileResponse(marshmallow.Schema):
+    """Marshmallow schema for profile responses."""
+
+    pid = marshmallow.fields.Integer(required=True)
+    duration = marshmallow.fields.Float(required=True)
+    interval = marshmallow.fields.Float(required=True)
+    samples = marshmallow.fields.Integer(required=True)
+    stacks = marshmallow.fields.String(required=True)
+    allocations = marshmallow.fields.Nested(
+        SchemaAllocation,
+        many=True,
+        allow_none=True,
+    )
+
+    class Meta:
+        strict = True
+
+
+class ResourceProfile(ResourceBase):
+    """ Resource-class capturing sampling profiles and allocation sites of
+        the worker process handling the request.
+    """
+
+    schema_post_request = SchemaProfilePostRequest()
+    schema_response = SchemaProfileResponse()
+
+    def __init__(self, profiler: Profiler, scope: str, **kwargs):
+        """Constructor.
+
+        Args:
+            profiler (Profiler): The profiler of the process.
+            scope (str): The scope the access-token must grant.
+        """
+
+        super(ResourceProfile, self).__init__(**kwargs)
+
+        self.profiler = profiler
+        self.scope = scope
+
+    def on_post(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+    ):
+        """Captures a profile of the worker process for the requested
+            duration and responds with the collapsed stacks and, if requested,
+            the top allocation sites.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+        """
+
+        # Check whether the caller is authorized to capture profiles.
+        self.check_scope(req=req, scope=self.scope)
+
+        parameters = self.get_parameters(
+            req=req,
+            schema=self.schema_post_request,
+        )
+
+        # Capture the profile in the current thread, which isn't sampled.
+        # Respond with a 409 if a capture is already running in the process.
+        try:
+            result = self.profiler.capture(
+                duration=parameters["duration"],
+                interval=parameters["interval"],
+                allocations=parameters["allocations"],
+                top=parameters["top"],
+            )
+        except ProfilerBusy as exc:
+            raise falcon.HTTPError(
+                status=falcon.HTTP_409,
+                title="Profiler busy.",
+                description=str(exc),
+            )
+
+        resp = self.prepare_response(
+            resp=resp,
+            result=result,
+            schema=self.schema_response,
+        )
+        resp.status = falcon.HTTP_200
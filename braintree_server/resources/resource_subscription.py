@@ -1,10 +1,14 @@
 # coding=utf-8
 
+import time
+import functools
+
 import falcon
 import marshmallow
 import braintree.exceptions
 
 from braintree_server.resources.base import ResourceBase
+from braintree_server.revalidation import UPSTREAM_ERRORS
 from braintree_server.resources.schemata import SchemaSubscription
 
 
@@ -41,18 +45,78 @@ class ResourceSubscription(ResourceBase):
                 will be performed.
             subscription_id (str): The Braintree subscription ID for which
                 retrieval will be performed.
+
+        Note:
+            The response can be restricted to a subset of its fields through
+            the `fields` query parameter, e.g., `?fields=id,status`.
         """
 
-        msg = "Retrieving subscription with ID '{}' for customer with ID '{}'."
-        msg_fmt = msg.format(subscription_id, customer_id)
-        self.logger.info(msg_fmt)
+        self.logger.info(
+            "Retrieving subscription with ID '%s' for customer with ID '%s'.",
+            subscription_id,
+            customer_id,
+            subscription_id=subscription_id,
+            customer_id=customer_id,
+        )
 
         # Check whether the caller is authorized to access resource pertaining
         # to the given customer.
         self.check_auth(req=req, customer_id=customer_id)
 
+        # Retrieve the projection requested through the `fields` query
+        # parameter (if any).
+        fields = self.get_fields(req=req, schema=self.schema_response)
+
+        # Respond with the cached 404 if the subscription was recently not
+        # found.
+        if self.respond_not_found_cached(
+            resp=resp,
+            resource="subscription",
+            resource_id=subscription_id,
+        ):
+            return None
+
+        # Respond from the cache if the subscription was recently retrieved.
+        cache_key = ("subscription", subscription_id, fields)
+        if self.respond_cached(req=req, resp=resp, key=cache_key):
+            return None
+
+        # Respond with the expired cached subscription while refreshing it in
+        # the background should it be within the stale-while-revalidate
+        # window.
+        entry_stale = self.get_cached_stale(key=cache_key)
+        if self.respond_stale_while_revalidate(
+            req=req,
+            resp=resp,
+            key=cache_key,
+            entry=entry_stale,
+            refresh=functools.partial(
+                self.refresh_cached,
+                resource="subscription",
+                resource_id=subscription_id,
+                fields=fields,
+                retrieve=functools.partial(
+                    self.gateway.subscription.find,
+                    subscription_id=subscription_id,
+                ),
+                schema=self.schema_response,
+            ),
+        ):
+            return None
+
+        # Respond from the replica if the request accepts its staleness.
+        if self.respond_replicated(
+            req=req,
+            resp=resp,
+            resource="subscription",
+            resource_id=subscription_id,
+            fields=fields,
+        ):
+            return None
+
         # Retrieve subscription or respond with a 404 if no subscription was
         # found for the given ID.
+        fetched = time.time()
         try:
             subscription = self.gateway.subscription.find(
                 subscription_id=subscription_id,
@@ -60,18 +124,50 @@ class ResourceSubscription(ResourceBase):
         except braintree.exceptions.NotFoundError:
             msg = "Subscription with ID '{}' not found."
             msg_fmt = msg.format(subscription_id)
-            self.logger.exception(msg_fmt)
 
-            raise falcon.HTTPError(
-                status=falcon.HTTP_404,
-                title="Not found.",
+            raise self.not_found(
+                resource="subscription",
+                resource_id=subscription_id,
                 description=msg_fmt,
             )
+        except UPSTREAM_ERRORS:
+            # Respond with the expired cached subscription should it be within
+            # the stale-if-error window.
+            if self.respond_stale_if_error(
+                req=req,
+                resp=resp,
+                entry=entry_stale,
+            ):
+                return None
+            raise
+
+        # Respond with a 304 without serializing the subscription if the
+        # caller already holds the current representation.
+        etag = self.get_etag(
+            resource="subscription",
+            result=subscription,
+            schema=self.schema_response,
+            fields=fields,
+        )
+        if self.respond_not_modified(req=req, resp=resp, etag=etag):
+            return None
 
         resp = self.prepare_response(
             resp=resp,
             result=subscription,
             schema=self.schema_response,
+            fields=fields,
+            etag=etag,
+            cache_key=cache_key,
+        )
+        self.replicate(
+            resource="subscription",
+            resource_id=subscription_id,
+            result=subscription,
+            schema=self.schema_response,
+            customer_id=customer_id,
+            body=None if fields else resp.body,
+            fetched=fetched,
         )
         resp.status = falcon.HTTP_200
 
@@ -96,9 +192,11 @@ class ResourceSubscription(ResourceBase):
             schema=self.schema_post_request,
         )
 
-        msg = "Creating subscription for customer with ID '{}'."
-        msg_fmt = msg.format(customer_id)
-        self.logger.info(msg_fmt)
+        self.logger.info(
+            "Creating subscription for customer with ID '%s'.",
+            customer_id,
+            customer_id=customer_id,
+        )
 
         # Check whether the caller is authorized to access resource pertaining
         # to the given customer.
@@ -110,11 +208,10 @@ class ResourceSubscription(ResourceBase):
             self.gateway.customer.find(customer_id=customer_id)
         except braintree.exceptions.NotFoundError:
             msg_fmt = "Customer with ID '{}' not found.".format(customer_id)
-            self.logger.exception(msg_fmt)
 
-            raise falcon.HTTPError(
-                status=falcon.HTTP_404,
-                title="Not found.",
+            raise self.not_found(
+                resource="customer",
+                resource_id=customer_id,
                 description=msg_fmt,
             )
 
@@ -132,7 +229,6 @@ class ResourceSubscription(ResourceBase):
             msg = ("Could not create payment-method for customer with ID "
                    "'{}': {}")
             msg_fmt = msg.format(customer_id, pm_result.message)
-            self.logger.error(msg_fmt)
 
             raise falcon.HTTPError(
                 status=falcon.HTTP_409,
@@ -140,17 +236,23 @@ class ResourceSubscription(ResourceBase):
                 description=msg_fmt,
             )
 
-        # Create a new subscription.
-        result = self.gateway.subscription.create(params={
-            "payment_method_token": pm_result.payment_method.token,
-            "plan_id": parameters["plan_id"],
-        })
+        # Create a new subscription and then discard any cached responses
+        # pertaining to the customer as they don't include the new
+        # payment-method (or subscription). Invalidating only once Braintree
+        # has responded, whatever the outcome, ensures that responses cached
+        # by concurrent requests in the meantime aren't served.
+        try:
+            result = self.gateway.subscription.create(params={
+                "payment_method_token": pm_result.payment_method.token,
+                "plan_id": parameters["plan_id"],
+            })
+        finally:
+            self.invalidate(resource="customer", resource_id=customer_id)
 
         # Respond with a 409 if the subscription could not be created.
         if not result.is_success:
             msg = "Could not create subscription for customer with ID '{}': {}"
             msg_fmt = msg.format(customer_id, result.message)
-            self.logger.error(msg_fmt)
 
             raise falcon.HTTPError(
                 status=falcon.HTTP_409,
@@ -158,11 +260,23 @@ class ResourceSubscription(ResourceBase):
                 description=msg_fmt,
             )
 
+        # Discard any cached 404 pertaining to the created subscription.
+        subscription_id = marshmallow.utils.get_value("id", result.subscription)
+        self.invalidate(resource="subscription", resource_id=subscription_id)
+
         resp = self.prepare_response(
             resp=resp,
             result=result.subscription,
             schema=self.schema_response,
         )
+        self.replicate(
+            resource="subscription",
+            resource_id=subscription_id,
+            result=result.subscription,
+            schema=self.schema_response,
+            customer_id=customer_id,
+            body=resp.body,
+        )
         resp.status = falcon.HTTP_201
 
     def on_delete(
@@ -183,9 +297,13 @@ class ResourceSubscription(ResourceBase):
                 cancellation will be performed.
         """
 
-        msg = "Deleting subscription with ID '{}' for customer with ID '{}'."
-        msg_fmt = msg.format(subscription_id, customer_id)
-        self.logger.info(msg_fmt)
+        self.logger.info(
+            "Deleting subscription with ID '%s' for customer with ID '%s'.",
+            subscription_id,
+            customer_id,
+            subscription_id=subscription_id,
+            customer_id=customer_id,
+        )
 
         # Check whether the caller is authorized to access resource pertaining
         # to the given customer.
@@ -200,7 +318,6 @@ class ResourceSubscription(ResourceBase):
         except braintree.exceptions.NotFoundError:
             msg = "Subscription with ID '{}' not found."
             msg_fmt = msg.format(subscription_id)
-            self.logger.exception(msg_fmt)
 
             raise falcon.HTTPError(
                 status=falcon.HTTP_404,
@@ -212,7 +329,6 @@ class ResourceSubscription(ResourceBase):
         if not result.is_success:
             msg = "Could not cancel subscription with ID '{}': {}"
             msg_fmt = msg.format(subscription_id, result.message)
-            self.logger.error(msg_fmt)
 
             raise falcon.HTTPError(
                 status=falcon.HTTP_409,
@@ -220,4 +336,9 @@ class ResourceSubscription(ResourceBase):
                 description=msg_fmt,
             )
 
+        # Discard any cached responses pertaining to the cancelled
+        # subscription and its customer.
+        self.invalidate(resource="subscription", resource_id=subscription_id)
+        self.invalidate(resource="customer", resource_id=customer_id)
+
         resp.status = falcon.HTTP_204
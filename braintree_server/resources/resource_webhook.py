@@ -0,0 +1,97 @@
+# coding=utf-8
+
+import time
+import urllib.parse
+
+import falcon
+import braintree.exceptions
+
+from braintree_server.metrics import metric_webhook_verification_duration
+from braintree_server.metrics import metric_webhooks
+from braintree_server.resources.base import ResourceBase
+from braintree_server.webhooks import WebhookConsumer
+
+
+class ResourceWebhookBraintree(ResourceBase):
+    """ Resource-class receiving Braintree webhook notifications."""
+
+    def __init__(self, consumer: WebhookConsumer, **kwargs):
+        """Constructor.
+
+        Args:
+            consumer (WebhookConsumer): The consumer the verified
+                notifications are queued into.
+        """
+
+        super(ResourceWebhookBraintree, self).__init__(**kwargs)
+
+        self.consumer = consumer
+
+        self.metric_verification_duration = (
+            metric_webhook_verification_duration.labels()
+        )
+
+    def on_post(
+        self,
+        req: falcon.Request,
+        resp: falcon.Response,
+    ):
+        """ Verifies and parses a Braintree webhook notification and queues it
+            to be applied to the cached responses.
+
+        Args:
+            req (falcon.Request): The Falcon `Request` object.
+            resp (falcon.Response): The Falcon `Response` object.
+        """
+
+        # Braintree posts the `bt_signature` and `bt_payload` form-encoded.
+        body = req.bounded_stream.read() or b""
+        form = urllib.parse.parse_qs(body.decode("utf-8", errors="replace"))
+        signature = (form.get("bt_signature") or [None])[0]
+        payload = (form.get("bt_payload") or [None])[0]
+
+        if not signature or not payload:
+            metric_webhooks.labels("", "invalid").inc()
+            msg_fmt = "The 'bt_signature' and 'bt_payload' fields are required."
+            raise falcon.HTTPError(
+                status=falcon.HTTP_400,
+                title="Invalid notification.",
+                description=msg_fmt,
+            )
+
+        # Verify the signature and parse the notification responding with a
+        # 403 should the signature not match.
+        start = time.perf_counter_ns()
+        try:
+            notification = self.gateway.webhook_notification.parse(
+                signature,
+                payload,
+            )
+        except braintree.exceptions.InvalidSignatureError as exc:
+            metric_webhooks.labels("", "invalid").inc()
+            raise falcon.HTTPError(
+                status=falcon.HTTP_403,
+                title="Invalid signature.",
+                description=str(exc),
+            )
+        finally:
+            self.metric_verification_duration.observe(
+                (time.perf_counter_ns() - start) / 1e9
+            )
+
+        self.logger.info(
+            "Received webhook notification of kind '%s'.",
+            notification.kind,
+            kind=notification.kind,
+        )
+
+        # Respond with a 503 should the queue be full so that Braintree
+        # retries the notification.
+        if not self.consumer.submit(notification=notification):
+            raise falcon.HTTPServiceUnavailable(
+                title="Webhook queue full.",
+                description="The notification could not be queued.",
+                retry_after=1,
+            )
+
+        resp.status = falcon.HTTP_200
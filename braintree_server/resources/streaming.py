@@ -0,0 +1,132 @@
+# coding=utf-8
+
+"""
+This module defines functions to serialize objects via `marshmallow` schemas
+into JSON incrementally so that large payloads, e.g., customers with hundreds
+of payment-methods, can be streamed without building the entire document in
+memory.
+
+Note:
+    The generated JSON is byte-identical to that produced by the `dumps`
+    method of the schema as the members of the top-level object are emitted in
+    the order of the schema fields and encoded with the same `json.dumps`
+    defaults.
+"""
+
+import json
+from typing import Any, Iterator
+
+import marshmallow
+from marshmallow.utils import missing
+
+
+def iter_pieces(
+    schema: marshmallow.Schema,
+    obj: Any,
+) -> Iterator[str]:
+    """ Serializes an object via a `marshmallow` schema yielding the JSON
+        document in pieces.
+
+    Note:
+        The items of `Nested` fields with `many=True` are serialized and
+        yielded one at a time while all other fields are serialized whole.
+
+    Args:
+        schema (marshmallow.Schema): The marshmallow schema instance that will
+            be used to encode the object.
+        obj (Any): The object to be encoded.
+
+    Yields:
+        str: The next piece of the JSON document.
+    """
+
+    accessor = schema.get_attribute
+
+    yield "{"
+
+    separator = ""
+    for name, field in schema.fields.items():
+        if field.load_only:
+            continue
+
+        key = json.dumps(field.dump_to or name)
+
+        # Serialize the items of nested collections one at a time.
+        if isinstance(field, marshmallow.fields.Nested) and field.many:
+            value = field.get_value(name, obj, accessor=accessor)
+            if value is not missing and value is not None:
+                yield separator + key + ": ["
+                separator = ""
+                for item in value:
+                    yield separator + json.dumps(
+                        _dump(schema=field.schema, obj=item)
+                    )
+                    separator = ", "
+                yield "]"
+                separator = ", "
+                continue
+
+        # Mimic the `marshmallow.marshalling.Marshaller` in storing the
+        # partially serialized value of fields that fail to serialize.
+        try:
+            value = field.serialize(name, obj, accessor=accessor)
+        except marshmallow.ValidationError as exc:
+            value = exc.data or missing
+
+        if value is missing:
+            continue
+
+        yield separator + key + ": " + json.dumps(value)
+        separator = ", "
+
+    yield "}"
+
+
+def iter_dumps(
+    schema: marshmallow.Schema,
+    obj: Any,
+    chunk_size: int = 65536,
+) -> Iterator[bytes]:
+    """ Serializes an object via a `marshmallow` schema yielding the UTF-8
+        encoded JSON document in chunks of roughly `chunk_size` bytes.
+
+    Args:
+        schema (marshmallow.Schema): The marshmallow schema instance that will
+            be used to encode the object.
+        obj (Any): The object to be encoded.
+        chunk_size (int): The number of characters to accumulate before a
+            chunk is yielded.
+
+    Yields:
+        bytes: The next chunk of the JSON document.
+    """
+
+    pieces = []
+    size = 0
+    for piece in iter_pieces(schema=schema, obj=obj):
+        pieces.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(pieces).encode("utf-8")
+            pieces = []
+            size = 0
+
+    if pieces:
+        yield "".join(pieces).encode("utf-8")
+
+
+def _dump(schema: marshmallow.Schema, obj: Any) -> Any:
+    """ Serializes a single item of a nested collection.
+
+    Args:
+        schema (marshmallow.Schema): The nested marshmallow schema instance.
+        obj (Any): The item to be serialized.
+
+    Returns:
+        Any: The serialized item.
+    """
+
+    try:
+        return schema.dump(obj, many=False).data
+    except marshmallow.ValidationError as exc:
+        return exc.data
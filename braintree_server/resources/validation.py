@@ -0,0 +1,74 @@
+# coding=utf-8
+
+"""
+This module defines functions to check objects against the validators, e.g.,
+`OneOf`, declared on the fields of `marshmallow` schemas.
+
+Note:
+    The `marshmallow` 2.x `dump` does not run field validators. These functions
+    run them on the values that would be serialized so that responses can be
+    checked against the schemas without failing the request.
+"""
+
+from typing import Any, Dict, List
+
+import marshmallow
+from marshmallow.utils import missing
+
+
+def get_violations(
+    schema: marshmallow.Schema,
+    obj: Any,
+) -> Dict[str, List[str]]:
+    """ Runs the validators of the schema fields, including those of nested
+        schemas, against the values of an object.
+
+    Args:
+        schema (marshmallow.Schema): The marshmallow schema instance that will
+            be used to encode the object.
+        obj (Any): The object to be checked.
+
+    Returns:
+        Dict[str, List[str]]: The violation messages keyed by the
+            dot-delimited path of the offending serialized fields, e.g.,
+            `credit_cards.0.card_type`.
+    """
+
+    accessor = schema.get_attribute
+
+    violations = {}
+    for name, field in schema.fields.items():
+        if field.load_only:
+            continue
+
+        key = field.dump_to or name
+
+        value = field.get_value(name, obj, accessor=accessor)
+        if value is missing or value is None:
+            continue
+
+        if isinstance(field, marshmallow.fields.Nested):
+            for index, item in enumerate(value if field.many else [value]):
+                violations_nested = get_violations(
+                    schema=field.schema,
+                    obj=item,
+                )
+                for key_nested, messages in violations_nested.items():
+                    path = (
+                        "{}.{}.{}".format(key, index, key_nested)
+                        if field.many else
+                        "{}.{}".format(key, key_nested)
+                    )
+                    violations[path] = messages
+            continue
+
+        for validator in field.validators:
+            try:
+                if validator(value) is False:
+                    violations.setdefault(key, []).append(
+                        field.error_messages["validator_failed"]
+                    )
+            except marshmallow.ValidationError as exc:
+                violations.setdefault(key, []).extend(exc.messages)
+
+    return violations
@@ -0,0 +1,130 @@
+# coding=utf-8
+
+"""
+This module defines a `Revalidator` class meant to refresh expired cached
+responses in the background while their stale copies are served, running at
+most one refresh per cache key at a time.
+"""
+
+import os
+import threading
+import concurrent.futures
+from typing import Callable, Dict, Hashable, Optional
+
+import braintree.exceptions
+import braintree.exceptions.http
+import requests.exceptions
+
+from braintree_server.excs import DeadlineExceeded
+from braintree_server.excs import UpstreamOverloaded
+from braintree_server.loggers import create_logger
+from braintree_server.metrics import metric_cache_revalidations
+
+
+# The exceptions of failed Braintree requests upon which stale cached
+# responses may be served. The gateway doesn't wrap the HTTP exceptions so
+# timeouts and connection failures surface as raw `requests` exceptions.
+UPSTREAM_ERRORS = (
+    braintree.exceptions.ServerError,
+    braintree.exceptions.DownForMaintenanceError,
+    braintree.exceptions.TooManyRequestsError,
+    braintree.exceptions.UnexpectedError,
+    DeadlineExceeded,
+    UpstreamOverloaded,
+    braintree.exceptions.http.ConnectionError,
+    braintree.exceptions.http.InvalidResponseError,
+    braintree.exceptions.http.TimeoutError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ConnectionError,
+)
+
+
+class Revalidator(object):
+    """ Class running the background refreshes of cached responses through a
+        thread-pool per process.
+    """
+
+    def __init__(self, max_workers: int = 2, **kwargs):
+        """ Constructor.
+
+        Args:
+            max_workers (int): The maximum number of concurrent refreshes.
+        """
+
+        # Internalize arguments.
+        self.max_workers = max_workers
+
+        # Create a class-level logger.
+        self.logger = create_logger(
+            logger_name=type(self).__name__,
+            logger_level=kwargs.get("logger_level", "DEBUG")
+        )
+
+        # The futures of the running refreshes keyed by cache key.
+        self.inflight = {}  # type: Dict[Hashable, concurrent.futures.Future]
+
+        self.executor = None  # type: Optional[concurrent.futures.Executor]
+        self.pid = None  # type: Optional[int]
+        self.lock = threading.Lock()
+
+    def get_executor(self) -> concurrent.futures.Executor:
+        """ Returns the thread-pool of the current process creating it first
+            if needed, e.g., after a `gunicorn` worker was forked.
+
+        Note:
+            This method must be called while holding `self.lock`.
+        """
+
+        if self.executor is None or self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.inflight = {}
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=type(self).__name__,
+            )
+
+        return self.executor
+
+    def submit(self, key: Hashable, refresh: Callable) -> bool:
+        """ Schedules the refresh of a cached response unless one is already
+            running.
+
+        Args:
+            key (Hashable): The cache key of the response.
+            refresh (Callable): The function refreshing the response.
+
+        Returns:
+            bool: Whether the refresh was scheduled.
+        """
+
+        with self.lock:
+            if key in self.inflight:
+                return False
+
+            executor = self.get_executor()
+            self.inflight[key] = executor.submit(self.run, key, refresh)
+
+        return True
+
+    def run(self, key: Hashable, refresh: Callable):
+        """ Runs the refresh of a cached response."""
+
+        try:
+            refresh()
+            metric_cache_revalidations.labels("refreshed").inc()
+        except Exception as exc:
+            msg = "Could not refresh cached response with key '{}': {}"
+            msg_fmt = msg.format(key, str(exc))
+            self.logger.warning(msg_fmt)
+            metric_cache_revalidations.labels("failed").inc()
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+    def join(self, timeout: Optional[float] = None):
+        """ Blocks until the running refreshes have completed."""
+
+        with self.lock:
+            futures = list(self.inflight.values())
+
+        concurrent.futures.wait(futures, timeout=timeout)
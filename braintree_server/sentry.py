@@ -1,16 +1,156 @@
 # -*- coding: utf-8 -*-
 
+import queue
+import datetime
+from typing import Dict, Optional
+
+import braintree.exceptions
+import falcon
 import sentry_sdk
 from sentry_sdk.integrations.falcon import FalconIntegration
+from sentry_sdk.transport import HttpTransport
+from sentry_sdk.worker import BackgroundWorker
+from sentry_sdk.worker import _TERMINATOR
 
 import attrdict
 
+from braintree_server.loggers import get_context
+from braintree_server.metrics import metric_sentry_events_dropped
+from braintree_server.timing import add_phase_listener
+
+
+# The exceptions which are part of the normal operation of the service and
+# shouldn't be reported to Sentry.
+EXCEPTIONS_EXPECTED = (
+    braintree.exceptions.NotFoundError,
+)
+
+
+class BackgroundWorkerBounded(BackgroundWorker):
+    """ Sentry background worker sending events from a bounded queue and
+        dropping events that don't fit so that request threads never block
+        or accumulate events while Sentry is slow or unreachable.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        """ Constructor.
+
+        Args:
+            queue_size (int): The maximum number of events awaiting sending.
+        """
+
+        super(BackgroundWorkerBounded, self).__init__()
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def submit(self, callback):
+        """ Enqueues an event counting it as dropped should the queue be
+            full.
+        """
+
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(callback)
+        except queue.Full:
+            self.dropped += 1
+            metric_sentry_events_dropped.labels().inc()
+
+    def kill(self):
+        """ Stops the worker thread without blocking should the queue be
+            full.
+        """
+
+        with self._lock:
+            if self._thread:
+                try:
+                    self._queue.put_nowait(_TERMINATOR)
+                except queue.Full:
+                    pass
+                self._thread = None
+                self._thread_for_pid = None
+
+
+class TransportBounded(HttpTransport):
+    """ Sentry HTTP transport sending events through a
+        `BackgroundWorkerBounded`.
+    """
+
+    # The maximum number of events awaiting sending.
+    queue_size = 100
+
+    def __init__(self, options: Dict):
+        super(TransportBounded, self).__init__(options)
+
+        self._worker = BackgroundWorkerBounded(queue_size=self.queue_size)
+
+
+def before_send(event: Dict, hint: Dict) -> Optional[Dict]:
+    """ Drops events caused by client errors and expected exceptions, e.g.,
+        missing customers, and tags the remaining ones with the request ID.
+
+    Args:
+        event (Dict): The Sentry event.
+        hint (Dict): The hint holding the `exc_info` of the exception, if
+            any.
+
+    Returns:
+        Optional[Dict]: The event or `None` if it's dropped.
+    """
+
+    exc_info = hint.get("exc_info") if hint else None
+    if exc_info:
+        exc = exc_info[1]
+        if isinstance(exc, EXCEPTIONS_EXPECTED):
+            return None
+        if isinstance(exc, falcon.HTTPError) and exc.status < "500":
+            return None
+
+    context = get_context()
+    if context is not None:
+        event.setdefault("tags", {})["request_id"] = context.request_id
+
+    return event
+
+
+def record_span(
+    name: str,
+    duration_ns: int,
+    description: Optional[str] = None,
+):
+    """ Records a finished phase of the current request as a span of the
+        sampled Sentry transaction, if any.
+
+    Args:
+        name (str): The name of the phase, used as the span operation.
+        duration_ns (int): The duration of the phase in nanoseconds.
+        description (Optional[str]): The description of the phase.
+    """
+
+    hub = sentry_sdk.Hub.current
+    with hub.configure_scope() as scope:
+        parent = scope.span
+    if parent is None or not parent.sampled:
+        return None
+
+    span = parent.new_span(op=name, description=description)
+    span.start_timestamp = datetime.datetime.now() - datetime.timedelta(
+        microseconds=duration_ns / 1000,
+    )
+    span.finish(hub=hub)
+
 
 def initialize_sentry(cfg: attrdict.AttrDict) -> None:
     """ Initializes the Sentry agent to capture exceptions which are then
         displayed under the sentry.io dashboard and the `fightfor-graphql`
         project.
 
+    Note:
+        Performance tracing is enabled by setting `sentry.traces_sample_rate`
+        in which case the verification of the access-token, the Braintree
+        calls, and the encoding of responses are recorded as spans of the
+        sampled requests.
+
     Args:
         cfg (attrdict.AttrDict): The service configuration dictionary.
     """
@@ -20,8 +160,24 @@ def initialize_sentry(cfg: attrdict.AttrDict) -> None:
     if not cfg.sentry.dsn:
         return None
 
+    # Create the transport class with the configured queue size.
+    transport = type(
+        TransportBounded.__name__,
+        (TransportBounded,),
+        {"queue_size": cfg.sentry.get("queue_size", 100)},
+    )
+
+    traces_sample_rate = cfg.sentry.get("traces_sample_rate", 0.0)
+
     sentry_sdk.init(
         dsn=cfg.sentry.dsn,
         integrations=[FalconIntegration()],
         send_default_pii=False,
+        before_send=before_send,
+        transport=transport,
+        traces_sample_rate=traces_sample_rate,
     )
+
+    # Record the phases timed per request as spans.
+    if traces_sample_rate:
+        add_phase_listener(listener=record_span)
@@ -0,0 +1,163 @@
+# coding=utf-8
+
+"""
+This module defines the per-request timing of the phases of handling a
+request, e.g., the verification of the access-token, the decoding of the body,
+each Braintree call, and the encoding of the response.
+
+The `MiddlewareTiming` binds a `Timings` instance to the requests being traced
+through `bind_timings` while the code handling the phases reports their
+durations through `add_phase`, which amounts to a context-variable lookup when
+the request isn't traced, e.g.,
+
+    start = time.perf_counter_ns()
+    ...
+    add_phase(name="parse", duration_ns=time.perf_counter_ns() - start)
+
+Listeners registered through `add_phase_listener`, e.g., the Sentry tracing,
+are notified of every phase regardless of whether the request is traced.
+"""
+
+import contextvars
+from typing import Callable, List, Optional, Tuple
+
+
+# The timings of the request being handled by the current thread, if traced.
+_timings = contextvars.ContextVar("timings", default=None)
+
+# The callables notified of every phase as `listener(name, duration_ns,
+# description)`.
+_listeners = []  # type: List[Callable]
+
+
+class Timings(object):
+    """ Class holding the durations of the phases of a request."""
+
+    __slots__ = ("phases",)
+
+    def __init__(self):
+        # The phases as `(name, description, duration_ns)` tuples in the order
+        # they completed.
+        self.phases = []  # type: List[Tuple[str, Optional[str], int]]
+
+    def add(
+        self,
+        name: str,
+        duration_ns: int,
+        description: Optional[str] = None,
+    ):
+        """ Adds the duration of a phase.
+
+        Args:
+            name (str): The name of the phase, e.g., `auth`.
+            duration_ns (int): The duration of the phase in nanoseconds.
+            description (Optional[str]): The description of the phase, e.g.,
+                the Braintree operation.
+        """
+
+        self.phases.append((name, description, duration_ns))
+
+    def to_header(self) -> str:
+        """ Returns the phases formatted as a `Server-Timing` header value,
+            e.g., `auth;dur=1.2, braintree;desc="GET customers";dur=80.3`.
+        """
+
+        metrics = []
+        for name, description, duration_ns in self.phases:
+            metric = name
+            if description:
+                metric += ";desc=\"{}\"".format(
+                    description.replace("\\", "\\\\").replace("\"", "\\\"")
+                )
+            metric += ";dur={:.3f}".format(duration_ns / 1e6)
+            metrics.append(metric)
+
+        return ", ".join(metrics)
+
+    def to_dict(self) -> dict:
+        """ Returns the durations in milliseconds keyed by phase, summing
+            phases sharing a name and description.
+        """
+
+        breakdown = {}
+        for name, description, duration_ns in self.phases:
+            key = "{} {}".format(name, description) if description else name
+            breakdown[key] = round(
+                breakdown.get(key, 0.0) + duration_ns / 1e6,
+                3,
+            )
+
+        return breakdown
+
+
+def bind_timings(timings: Timings) -> contextvars.Token:
+    """ Binds the timings of a traced request to the current thread.
+
+    Args:
+        timings (Timings): The timings of the request.
+
+    Returns:
+        contextvars.Token: The token used to unbind the timings via
+            `unbind_timings`.
+    """
+
+    return _timings.set(timings)
+
+
+def unbind_timings(token: contextvars.Token):
+    """ Unbinds the timings of a traced request from the current thread.
+
+    Args:
+        token (contextvars.Token): The token returned by `bind_timings`.
+    """
+
+    _timings.reset(token)
+
+
+def add_phase_listener(listener: Callable):
+    """ Registers a callable notified of every phase as
+        `listener(name, duration_ns, description)`.
+
+    Args:
+        listener (Callable): The callable to register.
+    """
+
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def remove_phase_listener(listener: Callable):
+    """ Unregisters a callable registered via `add_phase_listener`.
+
+    Args:
+        listener (Callable): The callable to unregister.
+    """
+
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def add_phase(
+    name: str,
+    duration_ns: int,
+    description: Optional[str] = None,
+):
+    """ Adds the duration of a phase to the timings of the current request
+        should it be traced.
+
+    Args:
+        name (str): The name of the phase, e.g., `auth`.
+        duration_ns (int): The duration of the phase in nanoseconds.
+        description (Optional[str]): The description of the phase.
+    """
+
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(
+            name=name,
+            duration_ns=duration_ns,
+            description=description,
+        )
+
+    for listener in _listeners:
+        listener(name, duration_ns, description)
@@ -0,0 +1,749 @@
+# coding=utf-8
+
+"""
+This module defines record/replay HTTP strategies for the Braintree gateway.
+
+The `HttpRecorder` performs real Braintree requests and records each exchange,
+with its duration, into a `Cassette` while the `HttpReplayer` serves recorded
+exchanges back without network access, sleeping for their recorded duration
+scaled by a configurable factor. Both are meant to be passed as the
+`http_strategy` of a `braintree.Configuration`, e.g.,
+
+    braintree.Configuration(
+        ...,
+        http_strategy=functools.partial(HttpRecorder, cassette=cassette),
+    )
+
+Cassettes are JSON-lines files holding one episode per line, i.e., an incoming
+request to the service (if any) along with the Braintree exchanges made while
+handling it. Credentials, card data, nonces, and client-tokens are scrubbed
+before anything is written.
+
+Both strategies, as well as the `HttpCounted` strategy performing real requests
+without recording them, count the Braintree requests made per thread so that
+the upstream calls made while handling a given incoming request can be
+reported. Given a `LimiterAimd` they also shed the first Braintree request of
+incoming requests once the limit of concurrent requests is reached, raising
+`UpstreamOverloaded`, while later requests of the same incoming request are
+always admitted so that sequences of mutations aren't interrupted midway.
+
+Should the incoming request carry a deadline, as bound by the
+`MiddlewareDeadline`, Braintree requests are bounded by the remaining budget
+and `DeadlineExceeded` is raised once it has run out so that the remaining
+requests of the incoming request are skipped.
+"""
+
+import re
+import copy
+import json
+import time
+import threading
+import collections
+from typing import Dict, List, Optional, Tuple
+
+import braintree
+import requests
+from braintree.util.http import Http
+
+from braintree_server.deadline import check_deadline
+from braintree_server.deadline import get_remaining
+from braintree_server.excs import CassetteInteractionNotFound
+from braintree_server.excs import DeadlineExceeded
+from braintree_server.excs import UpstreamOverloaded
+from braintree_server.limiter import LimiterAimd
+from braintree_server.metrics import metric_braintree_duration
+from braintree_server.metrics import metric_braintree_errors
+from braintree_server.metrics import metric_braintree_shed
+from braintree_server.timing import add_phase
+
+
+# The placeholder substituted for the merchant ID in recorded paths and bodies.
+MERCHANT_ID_PLACEHOLDER = "{merchant_id}"
+
+# The value substituted for scrubbed secrets.
+SCRUBBED = "[scrubbed]"
+
+# The XML elements holding secrets in Braintree request and response bodies.
+SCRUBBED_ELEMENTS = [
+    "number",
+    "cvv",
+    "payment-method-nonce",
+    "value",
+]
+
+# The members holding secrets in the JSON bodies of incoming requests.
+SCRUBBED_MEMBERS = [
+    "payment_method_nonce",
+]
+
+_regex_elements = re.compile(
+    r"<({})(\s[^>]*)?>[^<]*</\1>".format("|".join(SCRUBBED_ELEMENTS))
+)
+
+
+def scrub_xml(text: Optional[str]) -> Optional[str]:
+    """ Scrubs secrets from a Braintree request or response body.
+
+    Note:
+        The API keys are only sent in the `Authorization` header which is
+        never recorded.
+
+    Args:
+        text (Optional[str]): The XML body.
+
+    Returns:
+        Optional[str]: The scrubbed body.
+    """
+
+    if not text:
+        return text
+
+    return _regex_elements.sub(
+        lambda match: "<{0}{1}>{2}</{0}>".format(
+            match.group(1),
+            match.group(2) or "",
+            SCRUBBED,
+        ),
+        text,
+    )
+
+
+def mask_merchant_id(text: Optional[str], merchant_id: str) -> Optional[str]:
+    """ Replaces the merchant ID in the merchant paths and `merchant-id`
+        elements of a Braintree request path or body with a placeholder.
+
+    Args:
+        text (Optional[str]): The path or body.
+        merchant_id (str): The merchant ID.
+
+    Returns:
+        Optional[str]: The masked path or body.
+    """
+
+    if not text:
+        return text
+
+    text = text.replace(
+        "/merchants/{}".format(merchant_id),
+        "/merchants/{}".format(MERCHANT_ID_PLACEHOLDER),
+    )
+
+    return re.sub(
+        r"(<merchant-id(?:\s[^>]*)?>){}(</merchant-id>)".format(
+            re.escape(merchant_id),
+        ),
+        r"\g<1>{}\g<2>".format(MERCHANT_ID_PLACEHOLDER),
+        text,
+    )
+
+
+def scrub_json(text: Optional[str]) -> Optional[str]:
+    """ Scrubs secrets from the JSON body of an incoming request.
+
+    Args:
+        text (Optional[str]): The JSON body.
+
+    Returns:
+        Optional[str]: The scrubbed body.
+    """
+
+    if not text:
+        return text
+
+    try:
+        body = json.loads(text)
+    except ValueError:
+        return SCRUBBED
+
+    if isinstance(body, dict):
+        for member in SCRUBBED_MEMBERS:
+            if member in body:
+                body[member] = SCRUBBED
+
+    return json.dumps(body)
+
+
+def get_operation(http_verb: str, path: str) -> str:
+    """ Returns the name of the Braintree operation a request pertains to,
+        e.g., `GET customers` or `PUT subscriptions/cancel`.
+
+    Args:
+        http_verb (str): The HTTP method.
+        path (str): The normalized request path.
+
+    Returns:
+        str: The name of the operation.
+    """
+
+    prefix = "/merchants/{}/".format(MERCHANT_ID_PLACEHOLDER)
+    if path.startswith(prefix):
+        path = path[len(prefix):]
+
+    # Keep the resource and, for paths like `subscriptions/<id>/cancel`, the
+    # action while dropping the IDs.
+    segments = path.split("?", 1)[0].strip("/").split("/")
+    name = "/".join(segments[0:1] + segments[2:3])
+
+    return "{} {}".format(http_verb, name)
+
+
+class Cassette(object):
+    """ Class recording episodes of incoming requests and the Braintree
+        exchanges made while handling them into a JSON-lines file.
+    """
+
+    def __init__(self, path: str):
+        """ Constructor.
+
+        Args:
+            path (str): The path of the cassette file.
+        """
+
+        self.path = path
+
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def begin(self, request: Dict):
+        """ Begins an episode on the current thread.
+
+        Args:
+            request (Dict): The `method`, `route`, `path`, and scrubbed
+                `body` of the incoming request.
+        """
+
+        self.local.episode = {
+            "request": request,
+            "interactions": [],
+        }
+
+    def end(self, status: int, duration: float):
+        """ Ends the episode of the current thread and appends it to the
+            cassette file.
+
+        Args:
+            status (int): The response status code.
+            duration (float): The time taken to handle the request in seconds.
+        """
+
+        episode = getattr(self.local, "episode", None)
+        if episode is None:
+            return None
+
+        self.local.episode = None
+
+        episode["response"] = {"status": status}
+        episode["duration"] = duration
+
+        self.write(episode=episode)
+
+    def record(self, interaction: Dict):
+        """ Records a Braintree exchange under the episode of the current
+            thread or as an episode of its own if none has begun.
+
+        Args:
+            interaction (Dict): The scrubbed exchange.
+        """
+
+        episode = getattr(self.local, "episode", None)
+        if episode is not None:
+            episode["interactions"].append(interaction)
+        else:
+            self.write(episode={
+                "request": None,
+                "interactions": [interaction],
+            })
+
+    def write(self, episode: Dict):
+        """ Appends an episode to the cassette file.
+
+        Args:
+            episode (Dict): The episode.
+        """
+
+        line = json.dumps(episode) + "\n"
+        with self.lock:
+            with open(self.path, "a") as fout:
+                fout.write(line)
+
+    @staticmethod
+    def load(path: str) -> List[Dict]:
+        """ Loads the episodes of a cassette file.
+
+        Args:
+            path (str): The path of the cassette file.
+
+        Returns:
+            List[Dict]: The episodes.
+        """
+
+        with open(path) as fin:
+            return [json.loads(line) for line in fin if line.strip()]
+
+
+class HttpCounting(Http):
+    """ Base class of the record/replay strategies counting the Braintree
+        requests made in total and per thread.
+    """
+
+    def __init__(
+        self,
+        config: braintree.Configuration,
+        environment=None,
+        limiter: Optional[LimiterAimd] = None,
+    ):
+        """ Constructor.
+
+        Args:
+            config (braintree.Configuration): The Braintree configuration.
+            environment (braintree.Environment): The Braintree environment.
+            limiter (Optional[LimiterAimd] = None): The limiter of concurrent
+                Braintree requests. Defaults to `None` in which case requests
+                are never shed.
+        """
+
+        super(HttpCounting, self).__init__(
+            config=config,
+            environment=environment,
+        )
+
+        self.limiter = limiter
+
+        self.local = threading.local()
+        self.calls = collections.Counter()
+        self.lock = threading.Lock()
+
+    def normalize_path(self, path: str) -> str:
+        """ Strips the base URL from a request path and replaces the merchant
+            ID with a placeholder.
+
+        Args:
+            path (str): The request path.
+
+        Returns:
+            str: The normalized path.
+        """
+
+        base_url = self.config.base_url()
+        if path.startswith(base_url):
+            path = path[len(base_url):]
+
+        return mask_merchant_id(text=path, merchant_id=self.config.merchant_id)
+
+    def count(self, http_verb: str, path: str):
+        """ Counts a Braintree request.
+
+        Args:
+            http_verb (str): The HTTP method.
+            path (str): The normalized request path.
+        """
+
+        self.local.calls = getattr(self.local, "calls", 0) + 1
+        with self.lock:
+            self.calls[(http_verb, path)] += 1
+
+    def admit(self, http_verb: str, path: str) -> bool:
+        """ Admits a Braintree request through the limiter, if any, shedding
+            it should the limit have been reached and it be the first request
+            made by the current thread, i.e., for the incoming request.
+
+        Note:
+            This method must be called ahead of `count`.
+
+        Args:
+            http_verb (str): The HTTP method.
+            path (str): The normalized request path.
+
+        Returns:
+            bool: Whether the request was admitted by the limiter in which
+                case `release` must be called upon its completion.
+
+        Raises:
+            UpstreamOverloaded: Raised if the request was shed.
+        """
+
+        if self.limiter is None:
+            return False
+
+        is_first = self.get_calls_thread() == 0
+        if not self.limiter.acquire(force=not is_first):
+            operation = get_operation(http_verb=http_verb, path=path)
+            metric_braintree_shed.labels(operation).inc()
+
+            msg = "Braintree request '{}' shed by the concurrency limiter."
+            msg_fmt = msg.format(operation)
+            raise UpstreamOverloaded(
+                msg_fmt,
+                retry_after=self.limiter.retry_after,
+            )
+
+        return True
+
+    def release(
+        self,
+        admitted: bool,
+        duration: float,
+        failed: bool,
+        cancelled: bool = False,
+    ):
+        """ Records the completion of a Braintree request with the limiter.
+
+        Args:
+            admitted (bool): Whether the request was admitted by the limiter
+                as returned by `admit`.
+            duration (float): The duration of the request in seconds.
+            failed (bool): Whether the request failed, timed out, or was
+                rate-limited.
+            cancelled (bool): Whether the request was given up on at the
+                deadline of the incoming request rather than timing out per
+                the configured `timeout`.
+        """
+
+        if admitted:
+            self.limiter.release(
+                latency=duration,
+                failed=failed,
+                cancelled=cancelled,
+            )
+
+    def http_do_observed(
+        self,
+        http_verb: str,
+        path: str,
+        path_normalized: str,
+        headers: Dict,
+        request_body,
+        admitted: bool = False,
+    ) -> Tuple[int, str, float]:
+        """ Performs a real Braintree request recording its duration and
+            errors per operation.
+
+        Args:
+            http_verb (str): The HTTP method.
+            path (str): The request path.
+            path_normalized (str): The normalized request path.
+            headers (Dict): The request headers.
+            request_body: The request body.
+            admitted (bool): Whether the request was admitted by the limiter
+                as returned by `admit`.
+
+        Returns:
+            Tuple[int, str, float]: The response status and body and the
+                duration of the request in seconds.
+        """
+
+        operation = get_operation(http_verb=http_verb, path=path_normalized)
+
+        failed = True
+        cancelled = False
+        start = time.perf_counter_ns()
+        try:
+            status, response_body = self.http_do_bounded(
+                http_verb=http_verb,
+                path=path,
+                headers=headers,
+                request_body=request_body,
+                operation=operation,
+            )
+            failed = status >= 500 or status == 429
+        except Exception as exc:
+            # Requests given up on at the deadline of the incoming request,
+            # e.g., a tiny `X-Request-Timeout`, don't reflect on Braintree.
+            cancelled = isinstance(exc, DeadlineExceeded)
+            metric_braintree_errors.labels(
+                operation,
+                type(exc).__name__,
+            ).inc()
+            raise
+        finally:
+            duration_ns = time.perf_counter_ns() - start
+            duration = duration_ns / 1e9
+            metric_braintree_duration.labels(operation).observe(duration)
+            add_phase(
+                name="braintree",
+                duration_ns=duration_ns,
+                description=operation,
+            )
+            self.release(
+                admitted=admitted,
+                duration=duration,
+                failed=failed,
+                cancelled=cancelled,
+            )
+
+        if status >= 400:
+            metric_braintree_errors.labels(operation, str(status)).inc()
+
+        return status, response_body, duration
+
+    def http_do_bounded(
+        self,
+        http_verb: str,
+        path: str,
+        headers: Dict,
+        request_body,
+        operation: str,
+    ) -> Tuple[int, str]:
+        """ Performs a real Braintree request with its timeout bounded by the
+            remaining budget of the incoming request (if any).
+
+        Note:
+            The strategy, and thus its configuration, is shared by every
+            thread so the bounded `timeout` is set on a copy of the
+            configuration used by a `braintree.util.http.Http` created for
+            this request only.
+
+        Args:
+            http_verb (str): The HTTP method.
+            path (str): The request path.
+            headers (Dict): The request headers.
+            request_body: The request body.
+            operation (str): The name of the Braintree operation.
+
+        Returns:
+            Tuple[int, str]: The response status and body.
+
+        Raises:
+            DeadlineExceeded: Raised if the request timed out past the
+                deadline.
+        """
+
+        remaining = get_remaining()
+        if remaining is None:
+            return Http.http_do(self, http_verb, path, headers, request_body)
+
+        config = copy.copy(self.config)
+        config.timeout = min(self.config.timeout, max(remaining, 0.001))
+        http = Http(config=config, environment=self.environment)
+
+        try:
+            status, response_body = http.http_do(
+                http_verb,
+                path,
+                headers,
+                request_body,
+            )
+        except requests.exceptions.Timeout:
+            if get_remaining() > 0:
+                raise
+            msg = "Deadline exceeded during Braintree request '{}'."
+            msg_fmt = msg.format(operation)
+            raise DeadlineExceeded(msg_fmt)
+
+        return status, response_body
+
+    def get_calls_thread(self) -> int:
+        """ Returns the number of Braintree requests made by the current
+            thread since the last `reset_calls_thread` call.
+        """
+
+        return getattr(self.local, "calls", 0)
+
+    def reset_calls_thread(self):
+        """ Resets the number of Braintree requests made by the current
+            thread.
+        """
+
+        self.local.calls = 0
+
+
+class HttpCounted(HttpCounting):
+    """ Braintree HTTP strategy performing real requests while counting them.
+    """
+
+    def http_do(self, http_verb, path, headers, request_body):
+
+        path_normalized = self.normalize_path(path=path)
+        check_deadline(
+            operation=get_operation(http_verb=http_verb, path=path_normalized),
+        )
+        admitted = self.admit(http_verb=http_verb, path=path_normalized)
+        self.count(http_verb=http_verb, path=path_normalized)
+
+        status, response_body, _ = self.http_do_observed(
+            http_verb=http_verb,
+            path=path,
+            path_normalized=path_normalized,
+            headers=headers,
+            request_body=request_body,
+            admitted=admitted,
+        )
+
+        return [status, response_body]
+
+
+class HttpRecorder(HttpCounting):
+    """ Braintree HTTP strategy performing real requests and recording them
+        into a cassette.
+    """
+
+    def __init__(
+        self,
+        config: braintree.Configuration,
+        environment=None,
+        cassette: Optional[Cassette] = None,
+        limiter: Optional[LimiterAimd] = None,
+    ):
+        """ Constructor.
+
+        Args:
+            config (braintree.Configuration): The Braintree configuration.
+            environment (braintree.Environment): The Braintree environment.
+            cassette (Cassette): The cassette exchanges are recorded into.
+            limiter (Optional[LimiterAimd] = None): The limiter of concurrent
+                Braintree requests.
+        """
+
+        super(HttpRecorder, self).__init__(
+            config=config,
+            environment=environment,
+            limiter=limiter,
+        )
+
+        self.cassette = cassette
+
+    def http_do(self, http_verb, path, headers, request_body):
+
+        path_normalized = self.normalize_path(path=path)
+        check_deadline(
+            operation=get_operation(http_verb=http_verb, path=path_normalized),
+        )
+        admitted = self.admit(http_verb=http_verb, path=path_normalized)
+        self.count(http_verb=http_verb, path=path_normalized)
+
+        status, response_body, duration = self.http_do_observed(
+            http_verb=http_verb,
+            path=path,
+            path_normalized=path_normalized,
+            headers=headers,
+            request_body=request_body,
+            admitted=admitted,
+        )
+
+        # Multipart bodies (document uploads) are not recorded.
+        if not isinstance(request_body, str):
+            request_body = None
+
+        self.cassette.record(interaction={
+            "method": http_verb,
+            "path": path_normalized,
+            "request_body": self.scrub(request_body),
+            "status": status,
+            "response_body": self.scrub(response_body),
+            "duration": duration,
+        })
+
+        return [status, response_body]
+
+    def scrub(self, text: Optional[str]) -> Optional[str]:
+        """ Scrubs secrets and the merchant ID from a body."""
+
+        text = scrub_xml(text=text)
+
+        return mask_merchant_id(text=text, merchant_id=self.config.merchant_id)
+
+
+class HttpReplayer(HttpCounting):
+    """ Braintree HTTP strategy serving exchanges recorded in a cassette."""
+
+    def __init__(
+        self,
+        config: braintree.Configuration,
+        environment=None,
+        episodes: Optional[List[Dict]] = None,
+        latency_scale: float = 1.0,
+        limiter: Optional[LimiterAimd] = None,
+    ):
+        """ Constructor.
+
+        Args:
+            config (braintree.Configuration): The Braintree configuration.
+            environment (braintree.Environment): The Braintree environment.
+            episodes (List[Dict]): The episodes loaded from a cassette.
+            latency_scale (float): The factor the recorded durations are
+                multiplied by before sleeping, e.g., `0` to replay without
+                latency.
+            limiter (Optional[LimiterAimd] = None): The limiter of concurrent
+                Braintree requests.
+        """
+
+        super(HttpReplayer, self).__init__(
+            config=config,
+            environment=environment,
+            limiter=limiter,
+        )
+
+        self.latency_scale = latency_scale
+
+        # Group the recorded exchanges by method and path. Exchanges sharing
+        # a method and path are served in the recorded order, starting over
+        # once exhausted.
+        self.interactions = collections.defaultdict(list)
+        for episode in episodes or []:
+            for interaction in episode["interactions"]:
+                key = (interaction["method"], interaction["path"])
+                self.interactions[key].append(interaction)
+        self.positions = collections.Counter()
+
+    def http_do(self, http_verb, path, headers, request_body):
+
+        path_normalized = self.normalize_path(path=path)
+        key = (http_verb, path_normalized)
+        operation = get_operation(http_verb=http_verb, path=path_normalized)
+
+        remaining = check_deadline(operation=operation)
+        admitted = self.admit(http_verb=http_verb, path=path_normalized)
+        self.count(http_verb=http_verb, path=path_normalized)
+
+        latency = 0.0
+        failed = True
+        cancelled = False
+        try:
+            with self.lock:
+                interactions = self.interactions.get(key)
+                if not interactions:
+                    msg = "No recorded exchange found for '{} {}'."
+                    msg_fmt = msg.format(http_verb, path_normalized)
+                    raise CassetteInteractionNotFound(msg_fmt)
+
+                position = self.positions[key]
+                self.positions[key] = (position + 1) % len(interactions)
+                interaction = interactions[position]
+
+            latency = interaction["duration"] * self.latency_scale
+
+            # Give up once the deadline is reached as a bounded real request
+            # would time out.
+            if remaining is not None and latency >= remaining:
+                latency = max(remaining, 0.0)
+                time.sleep(latency)
+                cancelled = True
+                msg = "Deadline exceeded during Braintree request '{}'."
+                msg_fmt = msg.format(operation)
+                raise DeadlineExceeded(msg_fmt)
+
+            if latency > 0:
+                time.sleep(latency)
+
+            status = interaction["status"]
+            failed = status >= 500 or status == 429
+        finally:
+            self.release(
+                admitted=admitted,
+                duration=latency,
+                failed=failed,
+                cancelled=cancelled,
+            )
+
+        add_phase(
+            name="braintree",
+            duration_ns=int(latency * 1e9),
+            description=operation,
+        )
+
+        response_body = (interaction["response_body"] or "").replace(
+            MERCHANT_ID_PLACEHOLDER,
+            self.config.merchant_id,
+        )
+
+        return [status, response_body]
@@ -0,0 +1,311 @@
+# coding=utf-8
+
+"""
+This module defines a `CacheSnapshot` class meant to persist the in-process
+response cache to a snapshot file periodically and load it back when a
+`gunicorn` worker is forked, and a `warm_up` function preparing the process
+before the workers are forked so that the first requests of a new or
+recycled worker are served as fast as those of a warm one.
+"""
+
+import os
+import json
+import time
+import weakref
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from braintree_server.cache import CacheEntry
+from braintree_server.cache import CacheMemory
+from braintree_server.cache_shared import CacheTiered
+from braintree_server.loggers import create_logger
+from braintree_server.metrics import metric_cache_snapshot_entries
+
+
+class CacheSnapshot(object):
+    """ Class persisting the entries of an in-process response cache to a
+        snapshot file and loading them back.
+
+    Note:
+        Entries are stored along with their age so that loaded entries keep
+        expiring after their original `ttl`. Entries of a `CacheTiered` also
+        keep their shared version so that loaded entries whose object was
+        invalidated since are never served.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        cache: CacheMemory,
+        interval: float = 60.0,
+        **kwargs
+    ):
+        """ Constructor.
+
+        Args:
+            path (str): The path of the snapshot file.
+            cache (CacheMemory): The response cache, or `CacheTiered` whose
+                in-process tier, is persisted.
+            interval (float): The number of seconds between snapshots.
+        """
+
+        # Internalize arguments.
+        self.path = path
+        self.cache = cache
+        self.interval = interval
+
+        # Create a class-level logger.
+        self.logger = create_logger(
+            logger_name=type(self).__name__,
+            logger_level=kwargs.get("logger_level", "DEBUG")
+        )
+
+        self.thread = None  # type: Optional[threading.Thread]
+        self.pid = None  # type: Optional[int]
+        self.lock = threading.Lock()
+        self.event_stop = threading.Event()
+
+        # The lookup counters of the cache as of the last snapshot so that
+        # processes not serving requests, e.g., the `gunicorn` arbiter, never
+        # overwrite the snapshots of the workers.
+        self.state_saved = self.get_state()
+
+        _snapshots.add(self)
+
+    @property
+    def memory(self) -> CacheMemory:
+        """ The in-process tier of the cache."""
+
+        if isinstance(self.cache, CacheTiered):
+            return self.cache.memory
+
+        return self.cache
+
+    def get_state(self) -> Tuple[int, int, int]:
+        """ Returns the lookup counters and size of the cache."""
+
+        memory = self.memory
+
+        return memory.hits, memory.misses, len(memory.entries)
+
+    def save(self) -> int:
+        """ Atomically writes the non-expired entries of the cache.
+
+        Returns:
+            int: The number of entries written.
+        """
+
+        memory = self.memory
+        now = time.monotonic()
+
+        entries = []  # type: List[List]
+        for key, entry in memory.get_entries():
+            age = now - entry.created
+            if age > memory.ttl + memory.ttl_stale:
+                continue
+            entries.append([
+                list(key),
+                entry.body,
+                entry.etag,
+                age,
+                entry.version,
+            ])
+
+        # Write to a file private to the process so that workers saving
+        # concurrently never interleave. The snapshot holds customer data so
+        # it's only readable by the owner regardless of the umask.
+        path_tmp = "{}.{}.tmp".format(self.path, os.getpid())
+        fd = os.open(path_tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        # Restrict a leftover temporary file whose mode `os.open` kept.
+        os.fchmod(fd, 0o600)
+        with os.fdopen(fd, "w") as fout:
+            json.dump({"saved": time.time(), "entries": entries}, fout)
+        os.replace(path_tmp, self.path)
+
+        metric_cache_snapshot_entries.labels("saved").inc(len(entries))
+
+        return len(entries)
+
+    def load(self) -> int:
+        """ Loads the non-expired entries of the snapshot into the in-process
+            tier of the cache.
+
+        Returns:
+            int: The number of entries loaded.
+        """
+
+        try:
+            with open(self.path) as fin:
+                snapshot = json.load(fin)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as exc:
+            msg = "Could not read cache snapshot '{}': {}"
+            msg_fmt = msg.format(self.path, str(exc))
+            self.logger.warning(msg_fmt)
+            return 0
+
+        memory = self.memory
+        now = time.monotonic()
+        elapsed = max(time.time() - snapshot["saved"], 0)
+
+        count = 0
+        for key, body, etag, age, version in snapshot["entries"]:
+            age += elapsed
+            if age > memory.ttl + memory.ttl_stale:
+                continue
+
+            key = tuple(
+                tuple(part) if isinstance(part, list) else part
+                for part in key
+            )
+            memory.set(
+                key=key,
+                entry=CacheEntry(
+                    body=body,
+                    etag=etag,
+                    created=now - age,
+                    version=version,
+                ),
+            )
+            count += 1
+
+        self.state_saved = self.get_state()
+        metric_cache_snapshot_entries.labels("loaded").inc(count)
+
+        return count
+
+    def start(self):
+        """ Starts the saving thread of the current process unless it's
+            already running, e.g., after a `gunicorn` worker was forked.
+        """
+
+        with self.lock:
+            if self.thread is not None and self.pid == os.getpid():
+                return None
+
+            self.pid = os.getpid()
+            self.event_stop.clear()
+            self.thread = threading.Thread(
+                target=self.run,
+                name=type(self).__name__,
+                daemon=True,
+            )
+            self.thread.start()
+
+    def stop(self):
+        """ Stops the saving thread."""
+
+        self.event_stop.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        """ Saves the cache every `interval` seconds should it have been used
+            since the last snapshot.
+        """
+
+        while not self.event_stop.wait(self.interval):
+            state = self.get_state()
+            if state == self.state_saved:
+                continue
+
+            try:
+                self.save()
+                self.state_saved = state
+            except OSError as exc:
+                msg = "Could not write cache snapshot '{}': {}"
+                msg_fmt = msg.format(self.path, str(exc))
+                self.logger.warning(msg_fmt)
+
+
+def warm_up(
+    snapshot: Optional[CacheSnapshot],
+    schemas: Dict[str, Callable],
+    jwks_keys: int = 0,
+    logger_level: str = "DEBUG",
+) -> Dict[str, int]:
+    """ Prepares the process before the `gunicorn` workers are forked, i.e.,
+        loads the cache snapshot and creates the response serializers of the
+        cached resources, and logs the time taken along with the entry counts.
+
+    Args:
+        snapshot (Optional[CacheSnapshot]): The cache snapshot (if enabled).
+        schemas (Dict[str, Callable]): The functions creating the response
+            serializer of a projection keyed by resource name. Serializers
+            are created for the full responses and for the projections found
+            in the snapshot.
+        jwks_keys (int): The number of JWKS keys assembled by the Auth0
+            middleware, which is only logged.
+        logger_level (str): The logger level.
+
+    Returns:
+        Dict[str, int]: The entry counts.
+    """
+
+    logger = create_logger(logger_name=__name__, logger_level=logger_level)
+
+    time_start = time.perf_counter()
+
+    num_cached = snapshot.load() if snapshot is not None else 0
+
+    projections = {(resource, None) for resource in schemas}
+    if snapshot is not None:
+        projections.update(
+            (key[0], key[2])
+            for key, _ in snapshot.memory.get_entries()
+            if key[0] in schemas
+        )
+
+    for resource, fields in projections:
+        schemas[resource](fields=fields)
+    num_serializers = len(projections)
+
+    counts = {
+        "cached": num_cached,
+        "serializers": num_serializers,
+        "jwks_keys": jwks_keys,
+    }
+
+    msg = ("Warm-up completed in {:.3f} seconds: {} cached responses, {} "
+           "serializers, {} JWKS keys.")
+    msg_fmt = msg.format(
+        time.perf_counter() - time_start,
+        num_cached,
+        num_serializers,
+        jwks_keys,
+    )
+    logger.info(msg_fmt)
+
+    return counts
+
+
+# The snapshots of the process reloaded in forked child processes.
+_snapshots = weakref.WeakSet()
+
+
+def _reload_after_fork():
+    """ Loads the latest snapshots and starts their saving threads in a
+        forked child process, e.g., a new or recycled `gunicorn` worker.
+    """
+
+    for snapshot in list(_snapshots):
+        snapshot.thread = None
+        snapshot.lock = threading.Lock()
+        try:
+            count = snapshot.load()
+        except Exception as exc:
+            msg = "Could not load cache snapshot '{}': {}"
+            msg_fmt = msg.format(snapshot.path, str(exc))
+            snapshot.logger.warning(msg_fmt)
+            continue
+
+        msg = "Loaded {} cached responses from snapshot '{}'."
+        msg_fmt = msg.format(count, snapshot.path)
+        snapshot.logger.info(msg_fmt)
+
+        snapshot.start()
+
+
+os.register_at_fork(after_in_child=_reload_after_fork)
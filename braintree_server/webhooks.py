@@ -0,0 +1,249 @@
+# coding=utf-8
+
+"""
+This module defines a `WebhookConsumer` class meant to apply the Braintree
+webhook notifications received through `POST /webhooks/braintree` to the
+cached responses in the background.
+
+Notifications are verified and parsed while handling the webhook request and
+queued into a bounded queue drained by a single thread per process which
+invalidates the cached responses of the subscriptions and customers they
+pertain to so that the responses can be cached with long time-to-lives, and
+marks their replicated copies as stale so that they are refreshed.
+"""
+
+import os
+import queue
+import threading
+from typing import Optional
+
+import braintree
+import braintree.exceptions
+
+from braintree_server.cache import CacheMemory
+from braintree_server.loggers import create_logger
+from braintree_server.metrics import metric_webhook_queue_depth
+from braintree_server.metrics import metric_webhooks
+from braintree_server.replica import Replica
+
+
+# The notification kinds rendering the cached subscription, and the cached
+# customer it belongs to, stale.
+KINDS_SUBSCRIPTION = {
+    braintree.WebhookNotification.Kind.SubscriptionCanceled,
+    braintree.WebhookNotification.Kind.SubscriptionChargedSuccessfully,
+    braintree.WebhookNotification.Kind.SubscriptionChargedUnsuccessfully,
+    braintree.WebhookNotification.Kind.SubscriptionExpired,
+    braintree.WebhookNotification.Kind.SubscriptionTrialEnded,
+    braintree.WebhookNotification.Kind.SubscriptionWentActive,
+    braintree.WebhookNotification.Kind.SubscriptionWentPastDue,
+}
+
+# The notification kinds rendering the cached customer stale.
+KINDS_CUSTOMER = {
+    braintree.WebhookNotification.Kind.PaymentMethodRevokedByCustomer,
+}
+
+
+class WebhookConsumer(object):
+    """ Class applying queued Braintree webhook notifications to the cached
+        responses through a background thread.
+    """
+
+    def __init__(
+        self,
+        gateway: braintree.BraintreeGateway,
+        cache: Optional[CacheMemory] = None,
+        replica: Optional[Replica] = None,
+        queue_size: int = 1000,
+        **kwargs
+    ):
+        """ Constructor.
+
+        Args:
+            gateway (braintree.BraintreeGateway): The Braintree gateway used
+                to look up the customer of subscriptions whose notifications
+                don't include it.
+            cache (Optional[CacheMemory] = None): The cache of serialized
+                responses. Defaults to `None` in which case notifications are
+                only logged.
+            replica (Optional[Replica] = None): The local replica of
+                customers and subscriptions (if any).
+            queue_size (int): The maximum number of queued notifications
+                after which notifications are refused.
+        """
+
+        # Internalize arguments.
+        self.gateway = gateway
+        self.cache = cache
+        self.replica = replica
+
+        # Create a class-level logger.
+        self.logger = create_logger(
+            logger_name=type(self).__name__,
+            logger_level=kwargs.get("logger_level", "DEBUG")
+        )
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None  # type: Optional[threading.Thread]
+        self.pid = None  # type: Optional[int]
+        self.lock = threading.Lock()
+
+        metric_webhook_queue_depth.labels().set_function(self.queue.qsize)
+
+    def start(self):
+        """ Starts the consuming thread of the current process unless it's
+            already running, e.g., after a `gunicorn` worker was forked.
+        """
+
+        with self.lock:
+            if self.thread is not None and self.pid == os.getpid():
+                return None
+
+            self.pid = os.getpid()
+            self.thread = threading.Thread(
+                target=self.run,
+                name=type(self).__name__,
+                daemon=True,
+            )
+            self.thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """ Stops the consuming thread once the queued notifications have
+            been applied.
+        """
+
+        if self.thread is None:
+            return None
+
+        self.queue.put(None)
+        self.thread.join(timeout=timeout)
+        self.thread = None
+
+    def submit(self, notification: braintree.WebhookNotification) -> bool:
+        """ Queues a notification.
+
+        Args:
+            notification (braintree.WebhookNotification): The parsed
+                notification.
+
+        Returns:
+            bool: Whether the notification was queued, i.e., `False` if the
+                queue was full.
+        """
+
+        self.start()
+
+        try:
+            self.queue.put_nowait(notification)
+        except queue.Full:
+            metric_webhooks.labels(notification.kind, "dropped").inc()
+            return False
+
+        metric_webhooks.labels(notification.kind, "queued").inc()
+
+        return True
+
+    def join(self):
+        """ Blocks until all queued notifications have been applied."""
+
+        self.queue.join()
+
+    def run(self):
+        """ Applies queued notifications until stopped."""
+
+        while True:
+            notification = self.queue.get()
+            try:
+                if notification is None:
+                    return None
+                self.handle(notification=notification)
+            except Exception as exc:
+                msg = "Could not apply webhook notification of kind '{}': {}"
+                msg_fmt = msg.format(notification.kind, str(exc))
+                self.logger.exception(msg_fmt)
+            finally:
+                self.queue.task_done()
+
+    def get_customer_id(
+        self,
+        subscription: braintree.Subscription,
+    ) -> Optional[str]:
+        """ Retrieves the ID of the customer a subscription belongs to from
+            its transactions or, should it have none, its payment-method.
+
+        Args:
+            subscription (braintree.Subscription): The subscription of a
+                notification.
+
+        Returns:
+            Optional[str]: The customer ID or `None` if it couldn't be
+                determined.
+        """
+
+        for transaction in getattr(subscription, "transactions", None) or []:
+            customer_details = getattr(transaction, "customer_details", None)
+            customer_id = getattr(customer_details, "id", None)
+            if customer_id:
+                return customer_id
+
+        token = getattr(subscription, "payment_method_token", None)
+        if not token:
+            return None
+
+        try:
+            payment_method = self.gateway.payment_method.find(
+                payment_method_token=token,
+            )
+        except braintree.exceptions.NotFoundError:
+            return None
+
+        return getattr(payment_method, "customer_id", None)
+
+    def invalidate(self, resource: str, resource_id: Optional[str]):
+        """ Removes the cached responses pertaining to an object (if any) and
+            marks its replicated copy as stale.
+        """
+
+        if not resource_id:
+            return None
+
+        if self.cache is not None:
+            self.cache.invalidate(resource=resource, resource_id=resource_id)
+
+        if self.replica is not None:
+            self.replica.mark_stale(resource=resource, resource_id=resource_id)
+
+    def handle(self, notification: braintree.WebhookNotification):
+        """ Applies a notification to the cached responses.
+
+        Args:
+            notification (braintree.WebhookNotification): The parsed
+                notification.
+        """
+
+        if notification.kind in KINDS_SUBSCRIPTION:
+            subscription = notification.subscription
+            self.invalidate(
+                resource="subscription",
+                resource_id=subscription.id,
+            )
+            self.invalidate(
+                resource="customer",
+                resource_id=self.get_customer_id(subscription=subscription),
+            )
+        elif notification.kind in KINDS_CUSTOMER:
+            metadata = notification.revoked_payment_method_metadata
+            self.invalidate(
+                resource="customer",
+                resource_id=metadata.customer_id,
+            )
+        else:
+            msg = "Ignoring webhook notification of kind '{}'."
+            msg_fmt = msg.format(notification.kind)
+            self.logger.debug(msg_fmt)
+            return None
+
+        msg = "Applied webhook notification of kind '{}'."
+        msg_fmt = msg.format(notification.kind)
+        self.logger.info(msg_fmt)
@@ -1,42 +1,103 @@
 # coding=utf-8
 
+"""
+This module defines the `TestBase` class the resource unit-tests derive from.
+
+The tests are hermetic: the configuration is defined in-memory, access-tokens
+are minted with an RSA key generated once per process by a `JwtIssuerLocal`,
+and the matching JSON Web Key Set is written to a per-process temporary file
+read by the `MiddlewareAuth0`. No network access is needed and the tests can be
+run in parallel, e.g., via `pytest -n auto` with `pytest-xdist`.
+"""
+
+import os
+import copy
+import tempfile
+from typing import Dict, Optional
+
+import attrdict
 from falcon import testing
 
-from braintree_server.config import import_config
+from braintree_server.config import validate_config
 from braintree_server.api import create_api
 
-from tests.utils import JwtTokenGenerator
-
-
-fname_config_file = "/etc/braintree-gateway/braintree-gateway-test.json"
-cfg = import_config(fname_config_file=fname_config_file)
+from tests.utils import JwtIssuerLocal
+
+
+# The in-memory unit-test configuration. The `auth0.jwks_url` setting is
+# populated with the URL of the local JWKS file upon first use.
+cfg_default = {
+    "logger_level": "DEBUG",
+    "braintree": {
+        "environment": "sandbox",
+        "merchant_id": "fake_merchant_id",
+        "public_key": "fake_public_key",
+        "private_key": "fake_private_key",
+    },
+    "auth0": {
+        "domain": "braintree-gateway-test.auth0.com",
+        "audience": "https://braintree-gateway-test",
+        "jwks_url": None,
+        "client_id": "fake_client_id",
+        "client_secret": "fake_client_secret",
+    },
+    "sentry": {
+        "dsn": None,
+    },
+}
 
 # Singleton placeholders.
-_token_generator = None
+_issuer = None
+_cfg = None
 _app = None
 
 
-def _get_token_generator():
-    """Returns an instance of `JwtTokenGenerator` configured for unit-testing.
+def _get_issuer() -> JwtIssuerLocal:
+    """Returns an instance of `JwtIssuerLocal` configured for unit-testing.
 
     Returns:
-        JwtTokenGenerator: The `JwtTokenGenerator` instance configured for
+        JwtIssuerLocal: The `JwtIssuerLocal` instance configured for
             unit-testing.
     """
 
-    global _token_generator
+    global _issuer
+
+    # If the issuer has not been previously instantiated then do so with the
+    # unit-test configuration minting service-to-service tokens by default.
+    if not _issuer:
+        _issuer = JwtIssuerLocal(
+            auth0_domain=cfg_default["auth0"]["domain"],
+            auth0_audience=cfg_default["auth0"]["audience"],
+            subject="{}@clients".format(cfg_default["auth0"]["client_id"]),
+        )
+
+    return _issuer
+
 
-    # If the token-generator has not been previously instantiated then do so
-    # with the unit-test configuration.
-    if not _token_generator:
-        _token_generator = JwtTokenGenerator(
-            auth0_client_id=cfg.auth0.client_id,
-            auth0_client_secret=cfg.auth0.client_secret,
-            auth0_domain=cfg.auth0.domain,
-            auth0_audience=cfg.auth0.audience,
+def _get_cfg() -> attrdict.AttrDict:
+    """Returns the unit-test configuration pointing to the local JWKS.
+
+    Returns:
+        attrdict.AttrDict: The unit-test configuration.
+    """
+
+    global _cfg
+
+    # If the configuration has not been previously assembled then write the
+    # local JWKS to a temporary file unique to this process and point the
+    # configuration to it.
+    if not _cfg:
+        cfg = copy.deepcopy(cfg_default)
+        cfg["auth0"]["jwks_url"] = _get_issuer().write_jwks(
+            fname=os.path.join(
+                tempfile.mkdtemp(prefix="braintree-gateway-test-"),
+                "jwks.json",
+            ),
         )
+        validate_config(config_instance=cfg)
+        _cfg = attrdict.AttrDict(cfg)
 
-    return _token_generator
+    return _cfg
 
 
 def _get_app():
@@ -52,7 +113,7 @@ def _get_app():
     # unit-test configuration.
     if not _app:
         _app = create_api(
-            cfg=cfg,
+            cfg=_get_cfg(),
             logger_level="CRITICAL",
         )
 
@@ -64,21 +125,34 @@ class TestBase(testing.TestCase):
     def setUp(self):
         super(TestBase, self).setUp()
 
-        # Retrieve the `JwtTokenGenerator` singleton.
-        self.token_generator = _get_token_generator()
+        # Retrieve the `JwtIssuerLocal` singleton.
+        self.issuer = _get_issuer()
+
+        # Retrieve the unit-test configuration.
+        self.cfg = _get_cfg()
 
         # Retrieve the `falcon.API` singleton.
         self.app = _get_app()
 
-    def generate_jwt_headers(self):
+    def generate_jwt_headers(
+        self,
+        claims: Optional[Dict] = None,
+        expires_in: int = 3600,
+    ):
         """ Generates headers with a populated `Authorization` header.
 
+        Args:
+            claims (Optional[Dict] = None): Claims overriding the defaults of
+                the access-token, e.g., `{"aud": "other"}`.
+            expires_in (int): The number of seconds until the access-token
+                expires. Negative values generate expired access-tokens.
+
         Returns:
             dict: The generated headers.
         """
 
         # Generate an access-token.
-        token = self.token_generator.generate()
+        token = self.issuer.generate(claims=claims, expires_in=expires_in)
 
         headers = {
             "Authorization": "Bearer {}".format(token),
@@ -65,6 +65,44 @@ subscription = {
     "updated_at": datetime.datetime.utcnow(),
 }
 
+credit_card = {
+    "card_type": "Visa",
+    "customer_id": CUSTOMER_ID,
+    "default": True,
+    "expiration_month": "12",
+    "expiration_year": "2030",
+    "expired": False,
+    "last_4": "1881",
+    "masked_number": "401288******1881",
+    "token": PAYMENT_METHOD_TOKEN,
+    "created_at": datetime.datetime.utcnow(),
+    "updated_at": datetime.datetime.utcnow(),
+}
+
+customer_with_credit_cards = dict(customer, credit_cards=[credit_card])
+
+paypal_account = {
+    "billing_agreement_id": "fake_billing_agreement_id",
+    "customer_id": CUSTOMER_ID,
+    "default": False,
+    "email": CUSTOMER_EMAIL,
+    "payer_id": "fake_payer_id",
+    "subscriptions": [subscription],
+    "token": "fake_paypal_token",
+    "created_at": datetime.datetime.utcnow(),
+    "updated_at": datetime.datetime.utcnow(),
+}
+
+customer_with_payment_methods = dict(
+    customer,
+    credit_cards=[
+        dict(credit_card, token="{}_{}".format(PAYMENT_METHOD_TOKEN, index),
+             subscriptions=[subscription])
+        for index in range(100)
+    ],
+    paypal_accounts=[paypal_account],
+)
+
 
 result_payment_method_success = Result()
 result_payment_method_success.is_success = True
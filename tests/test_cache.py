@@ -0,0 +1,306 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `CacheMemory` and `CacheNegative`
+classes.
+"""
+
+import json
+import unittest
+import unittest.mock
+
+import attrdict
+
+from braintree_server.api import create_api
+from braintree_server.cache import CacheMemory, CacheEntry
+from braintree_server.cache import CacheNegative
+from braintree_server.gateway_fake import GatewayFake
+from tests.base import TestBase
+from tests import fixtures
+
+
+class TestCacheMemory(unittest.TestCase):
+    """Tests the `CacheMemory` class."""
+
+    def test_get(self):
+        """ Tests the `get` method retrieving a stored entry."""
+
+        cache = CacheMemory(ttl=60)
+        cache.set(key=("customer", "id", None), entry=CacheEntry(body="{}"))
+
+        entry = cache.get(key=("customer", "id", None))
+
+        self.assertEqual(entry.body, "{}")
+        self.assertEqual(cache.hits, 1)
+
+    def test_get_expired(self):
+        """ Tests the `get` method retrieving an expired entry."""
+
+        cache = CacheMemory(ttl=60)
+        cache.set(
+            key=("customer", "id", None),
+            entry=CacheEntry(body="{}", created=0),
+        )
+
+        with unittest.mock.patch(target="time.monotonic", return_value=61):
+            entry = cache.get(key=("customer", "id", None))
+
+        self.assertIsNone(entry)
+        self.assertEqual(cache.misses, 1)
+
+    def test_get_stale(self):
+        """ Tests that expired entries are retrieved within the stale window
+            only.
+        """
+
+        cache = CacheMemory(ttl=60, ttl_stale=30)
+        key = ("customer", "id", None)
+        cache.set(key=key, entry=CacheEntry(body="{}", created=0))
+
+        with unittest.mock.patch(target="time.monotonic", return_value=70):
+            self.assertIsNone(cache.get(key=key))
+            self.assertEqual(cache.get_stale(key=key).body, "{}")
+
+        with unittest.mock.patch(target="time.monotonic", return_value=91):
+            self.assertIsNone(cache.get_stale(key=key))
+
+        self.assertNotIn(key, cache.entries)
+
+    def test_set_evict(self):
+        """ Tests the `set` method evicting the least recently used entry."""
+
+        cache = CacheMemory(ttl=60, max_entries=2)
+        cache.set(key=("customer", "a", None), entry=CacheEntry(body="a"))
+        cache.set(key=("customer", "b", None), entry=CacheEntry(body="b"))
+        cache.get(key=("customer", "a", None))
+        cache.set(key=("customer", "c", None), entry=CacheEntry(body="c"))
+
+        self.assertIsNotNone(cache.get(key=("customer", "a", None)))
+        self.assertIsNone(cache.get(key=("customer", "b", None)))
+
+    def test_invalidate(self):
+        """ Tests the `invalidate` method removing all projections."""
+
+        cache = CacheMemory(ttl=60)
+        cache.set(key=("customer", "id", None), entry=CacheEntry(body="{}"))
+        cache.set(
+            key=("customer", "id", ("email", "id")),
+            entry=CacheEntry(body="{}"),
+        )
+
+        cache.invalidate(resource="customer", resource_id="id")
+
+        self.assertIsNone(cache.get(key=("customer", "id", None)))
+        self.assertIsNone(cache.get(key=("customer", "id", ("email", "id"))))
+
+    def test_set_invalidated(self):
+        """ Tests that entries retrieved before an invalidation of their
+            object aren't stored after it.
+        """
+
+        cache = CacheMemory(ttl=60, max_entries=1)
+        key = ("customer", "a", None)
+
+        self.assertIsNone(cache.get(key=key))
+        cache.invalidate(resource="customer", resource_id="a")
+        cache.set(key=key, entry=CacheEntry(body="{}"))
+        self.assertIsNone(cache.get(key=key))
+
+        cache.set(key=key, entry=CacheEntry(body="{}"))
+        self.assertIsNotNone(cache.get(key=key))
+
+        # Assert that entries are discarded once the invalidation record of
+        # their object has been evicted.
+        self.assertIsNone(cache.get(key=("customer", "b", None)))
+        cache.invalidate(resource="customer", resource_id="a")
+        cache.invalidate(resource="customer", resource_id="c")
+        cache.set(key=("customer", "b", None), entry=CacheEntry(body="{}"))
+        self.assertIsNone(cache.get(key=("customer", "b", None)))
+
+
+class TestCacheNegative(unittest.TestCase):
+    """Tests the `CacheNegative` class."""
+
+    def test_get(self):
+        """ Tests that objects not found are remembered until they expire or
+            are discarded.
+        """
+
+        cache = CacheNegative(ttl=30)
+        cache.add(resource="customer", resource_id="a", body="404")
+
+        self.assertEqual(cache.get(resource="customer", resource_id="a"), "404")
+        self.assertIsNone(cache.get(resource="subscription", resource_id="a"))
+
+        with unittest.mock.patch(
+            target="time.monotonic",
+            return_value=cache.entries[("customer", "a")][0] + 1,
+        ):
+            self.assertIsNone(cache.get(resource="customer", resource_id="a"))
+
+        cache.add(resource="customer", resource_id="a", body="404")
+        cache.discard(resource="customer", resource_id="a")
+        self.assertIsNone(cache.get(resource="customer", resource_id="a"))
+
+    def test_add_evict(self):
+        """ Tests that the oldest entries are evicted once full."""
+
+        cache = CacheNegative(ttl=30, max_entries=2)
+        for resource_id in ["a", "b", "c"]:
+            cache.add(resource="customer", resource_id=resource_id, body="")
+
+        self.assertIsNone(cache.get(resource="customer", resource_id="a"))
+        self.assertIsNotNone(cache.get(resource="customer", resource_id="c"))
+
+    def test_versions(self):
+        """ Tests that entries are discarded once their version changes."""
+
+        versions = unittest.mock.Mock()
+        versions.get_version.return_value = 1
+
+        cache = CacheNegative(ttl=30, versions=versions)
+        cache.add(resource="customer", resource_id="a", body="404")
+        self.assertIsNotNone(cache.get(resource="customer", resource_id="a"))
+
+        versions.get_version.return_value = 2
+        self.assertIsNone(cache.get(resource="customer", resource_id="a"))
+
+
+class TestResourceCacheNegative(TestBase):
+    """Tests the 404 responses served from the `CacheNegative`."""
+
+    def setUp(self):
+        super(TestResourceCacheNegative, self).setUp()
+
+        self.gateway = GatewayFake(logger_level="CRITICAL")
+
+        cfg = attrdict.AttrDict(self.cfg)
+        cfg["cache"] = {"negative": {"enabled": True}}
+        self.app = create_api(
+            cfg=cfg,
+            logger_level="CRITICAL",
+            gateway=self.gateway,
+        )
+
+    def test_get_customer(self):
+        """ Tests that repeated lookups of a missing customer are answered
+            from the cache until the customer is created.
+        """
+
+        path = "/customer/{}".format(fixtures.CUSTOMER_ID)
+
+        response = self.simulate_get(
+            path=path,
+            headers=self.generate_jwt_headers(),
+        )
+        self.assertEqual(response.status_code, 404)
+        calls = self.gateway.calls
+
+        response_cached = self.simulate_get(
+            path=path,
+            headers=self.generate_jwt_headers(),
+        )
+        self.assertEqual(response_cached.status_code, 404)
+        self.assertEqual(response_cached.json, response.json)
+        self.assertEqual(self.gateway.calls, calls)
+
+        # Assert that invalid projections are rejected before the cached 404
+        # is served.
+        response = self.simulate_get(
+            path=path,
+            params={"fields": "unknown"},
+            headers=self.generate_jwt_headers(),
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.simulate_post(
+            path="/customer",
+            body=json.dumps({
+                "customer_id": fixtures.CUSTOMER_ID,
+                "email": fixtures.CUSTOMER_EMAIL,
+            }),
+            headers=self.generate_jwt_headers(),
+        )
+        self.assertEqual(response.status_code, 201)
+
+        response = self.simulate_get(
+            path=path,
+            headers=self.generate_jwt_headers(),
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_subscription(self):
+        """ Tests that repeated lookups of a missing subscription are
+            answered from the cache.
+        """
+
+        path = "/customer/{}/subscription/{}".format(
+            fixtures.CUSTOMER_ID,
+            fixtures.SUBSCRIPTION_ID,
+        )
+
+        for _ in range(3):
+            response = self.simulate_get(
+                path=path,
+                headers=self.generate_jwt_headers(),
+            )
+            self.assertEqual(response.status_code, 404)
+
+        self.assertEqual(self.gateway.calls, 1)
+
+
+class TestResourceCache(TestBase):
+    """Tests the invalidation of the cached responses upon writes."""
+
+    def setUp(self):
+        super(TestResourceCache, self).setUp()
+
+        self.gateway = GatewayFake(logger_level="CRITICAL")
+        self.gateway.customer.create(params={
+            "id": fixtures.CUSTOMER_ID,
+            "email": fixtures.CUSTOMER_EMAIL,
+        })
+
+        cfg = attrdict.AttrDict(self.cfg)
+        cfg["cache"] = {"ttl": 60}
+        self.app = create_api(
+            cfg=cfg,
+            logger_level="CRITICAL",
+            gateway=self.gateway,
+        )
+
+    def test_post_subscription_concurrent_get(self):
+        """ Tests that a customer cached by a request concurrent with the
+            creation of their subscription isn't served afterwards.
+        """
+
+        path = "/customer/{}".format(fixtures.CUSTOMER_ID)
+        create = self.gateway.subscription.create
+
+        def create_concurrent(*args, **kwargs):
+            self.simulate_get(path=path, headers=self.generate_jwt_headers())
+            return create(*args, **kwargs)
+
+        with unittest.mock.patch.object(
+            target=self.gateway.subscription,
+            attribute="create",
+            side_effect=create_concurrent,
+        ):
+            response = self.simulate_post(
+                path="/customer/{}/subscription".format(fixtures.CUSTOMER_ID),
+                body=json.dumps({
+                    "payment_method_nonce": fixtures.PAYMENT_METHOD_NONCE,
+                    "customer_id": fixtures.CUSTOMER_ID,
+                    "plan_id": fixtures.PLAN_ID,
+                }),
+                headers=self.generate_jwt_headers(),
+            )
+        self.assertEqual(response.status_code, 201)
+        calls = self.gateway.calls
+
+        response = self.simulate_get(
+            path=path,
+            headers=self.generate_jwt_headers(),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(self.gateway.calls, calls)
@@ -0,0 +1,264 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `CacheShared` and `CacheTiered`
+classes.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+import attrdict
+
+from braintree_server.api import create_api
+from braintree_server.cache import CacheEntry
+from braintree_server.cache import CacheMemory
+from braintree_server.cache_shared import CacheShared
+from braintree_server.cache_shared import CacheTiered
+from braintree_server.cache_shared import hash_bytes
+from braintree_server.gateway_fake import GatewayFake
+from tests.base import TestBase
+from tests import fixtures
+
+
+class TestCacheShared(unittest.TestCase):
+    """Tests the `CacheShared` class."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="braintree-gateway-test-")
+        self.path = os.path.join(self.directory, "cache")
+        self.cache = self.create_cache()
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def create_cache(self, **kwargs):
+        kwargs.setdefault("size", 64 * 1024)
+        kwargs.setdefault("slot_size", 4096)
+        kwargs.setdefault("num_versions", 1024)
+
+        return CacheShared(path=self.path, ttl=60, **kwargs)
+
+    def test_get(self):
+        """ Tests that entries are shared by caches mapping the same file."""
+
+        key = ("customer", "id", ("email", "id"))
+        self.cache.set(key=key, entry=CacheEntry(body='{"id": 1}', etag="a"))
+
+        cache = self.create_cache()
+        entry = cache.get(key=key)
+        cache.close()
+
+        self.assertEqual(entry.body, '{"id": 1}')
+        self.assertEqual(entry.etag, "a")
+        self.assertIsNone(self.cache.get(key=("customer", "id", None)))
+
+    def test_get_expired(self):
+        """ Tests that expired entries aren't served."""
+
+        key = ("customer", "id", None)
+        self.cache.set(key=key, entry=CacheEntry(body="{}"))
+
+        with unittest.mock.patch(
+            target="time.time",
+            return_value=time.time() + 3600,
+        ):
+            self.assertIsNone(self.cache.get(key=key))
+
+    def test_invalidate(self):
+        """ Tests that invalidations apply to all projections and to entries
+            retrieved before the invalidation but written after it.
+        """
+
+        self.cache.set(key=("customer", "id", None), entry=CacheEntry("{}"))
+        self.cache.set(key=("customer", "id", ("id",)), entry=CacheEntry("{}"))
+        self.cache.set(key=("customer", "other", None), entry=CacheEntry("{}"))
+
+        cache = self.create_cache()
+        cache.invalidate(resource="customer", resource_id="id")
+
+        self.assertIsNone(self.cache.get(key=("customer", "id", None)))
+        self.assertIsNone(self.cache.get(key=("customer", "id", ("id",))))
+        self.assertIsNotNone(self.cache.get(key=("customer", "other", None)))
+
+        # Assert that a response retrieved before an invalidation isn't
+        # served once written.
+        key = ("customer", "id", None)
+        self.assertIsNone(self.cache.get(key=key))
+        cache.invalidate(resource="customer", resource_id="id")
+        self.cache.set(key=key, entry=CacheEntry(body="{}"))
+        cache.close()
+
+        self.assertIsNone(self.cache.get(key=key))
+
+        self.cache.set(key=key, entry=CacheEntry(body="{}"))
+        self.assertIsNotNone(self.cache.get(key=key))
+
+    def test_set_bounded(self):
+        """ Tests that the cache is bounded by its size and that responses
+            exceeding a slot aren't cached.
+        """
+
+        cache = self.create_cache(size=8192, slot_size=4096)
+
+        for index in range(10):
+            key = ("customer", str(index), None)
+            cache.set(key=key, entry=CacheEntry(body="{}"))
+
+        num_cached = sum(
+            cache.get(key=("customer", str(index), None)) is not None
+            for index in range(10)
+        )
+        self.assertLessEqual(num_cached, 2)
+        self.assertEqual(os.path.getsize(self.path), cache.size)
+
+        key = ("customer", "large", None)
+        cache.set(key=key, entry=CacheEntry(body="x" * 8192))
+        self.assertIsNone(cache.get(key=key))
+
+        cache.close()
+
+    def test_read_during_write(self):
+        """ Tests that slots being written aren't read."""
+
+        key = ("customer", "id", None)
+        self.cache.set(key=key, entry=CacheEntry(body="{}"))
+
+        # Mark the candidate slots of the key as being written.
+        key_hash = hash_bytes(self.cache.dumps_key(key))
+        for offset in self.cache.get_slot_offsets(key_hash):
+            self.cache.mm[offset] |= 1
+
+        self.assertIsNone(self.cache.get(key=key))
+
+
+class TestCacheTiered(unittest.TestCase):
+    """Tests the `CacheTiered` class."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="braintree-gateway-test-")
+        self.path = os.path.join(self.directory, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def create_cache(self) -> CacheTiered:
+        return CacheTiered(
+            memory=CacheMemory(ttl=60),
+            shared=CacheShared(
+                path=self.path,
+                ttl=60,
+                size=64 * 1024,
+                slot_size=4096,
+                num_versions=1024,
+            ),
+        )
+
+    def test_invalidate(self):
+        """ Tests that invalidations made by one worker reach the in-process
+            tiers of the others.
+        """
+
+        key = ("customer", "id", None)
+        cache_a = self.create_cache()
+        cache_b = self.create_cache()
+
+        cache_a.set(key=key, entry=CacheEntry(body="{}"))
+
+        # Assert that the entry is promoted into the in-process tier.
+        self.assertIsNotNone(cache_b.get(key=key))
+        self.assertEqual(cache_b.memory.hits, 0)
+        self.assertIsNotNone(cache_b.get(key=key))
+        self.assertEqual(cache_b.memory.hits, 1)
+
+        cache_a.invalidate(resource="customer", resource_id="id")
+
+        self.assertIsNone(cache_b.get(key=key))
+        self.assertIsNone(cache_a.get(key=key))
+
+
+class TestResourceCacheShared(TestBase):
+    """Tests the responses served from the shared cache tier."""
+
+    def setUp(self):
+        super(TestResourceCacheShared, self).setUp()
+
+        self.directory = tempfile.mkdtemp(prefix="braintree-gateway-test-")
+
+        self.gateway = GatewayFake(logger_level="CRITICAL")
+        self.gateway.customer.create(params={
+            "id": fixtures.CUSTOMER_ID,
+            "email": fixtures.CUSTOMER_EMAIL,
+        })
+
+        self.cfg_cache = attrdict.AttrDict(self.cfg)
+        self.cfg_cache["cache"] = {
+            "ttl": 60,
+            "client_tokens": True,
+            "shared": {
+                "enabled": True,
+                "path": os.path.join(self.directory, "cache"),
+                "size": 1024 * 1024,
+            },
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+        super(TestResourceCacheShared, self).tearDown()
+
+    def create_app(self):
+        return create_api(
+            cfg=self.cfg_cache,
+            logger_level="CRITICAL",
+            gateway=self.gateway,
+        )
+
+    def test_get(self):
+        """ Tests that responses cached by one worker are served by others."""
+
+        app_a = self.create_app()
+        app_b = self.create_app()
+
+        paths = [
+            "/customer/{}".format(fixtures.CUSTOMER_ID),
+            "/client-token/{}".format(fixtures.CUSTOMER_ID),
+        ]
+
+        for path in paths:
+            self.app = app_a
+            response = self.simulate_get(
+                path=path,
+                headers=self.generate_jwt_headers(),
+            )
+            self.assertEqual(response.status_code, 200)
+            calls = self.gateway.calls
+
+            self.app = app_b
+            response_b = self.simulate_get(
+                path=path,
+                headers=self.generate_jwt_headers(),
+            )
+            self.assertEqual(response_b.status_code, 200)
+            self.assertEqual(response_b.content, response.content)
+            self.assertEqual(self.gateway.calls, calls)
+
+        # Assert that deletions through one worker reach the others.
+        self.app = app_a
+        response = self.simulate_delete(
+            path=paths[0],
+            headers=self.generate_jwt_headers(),
+        )
+        self.assertEqual(response.status_code, 204)
+
+        self.app = app_b
+        response = self.simulate_get(
+            path=paths[0],
+            headers=self.generate_jwt_headers(),
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,59 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `ErrorHandler` class.
+"""
+
+import unittest
+import unittest.mock
+
+import falcon
+
+from braintree_server.errors import ErrorHandler
+
+
+class TestErrorHandler(unittest.TestCase):
+    """Tests the `ErrorHandler` class."""
+
+    def test_to_json(self):
+        """ Tests the `to_json` method asserting that the produced JSON is
+            identical to that produced by `falcon.HTTPError.to_json`.
+        """
+
+        handler = ErrorHandler()
+
+        errors = [
+            falcon.HTTPError(
+                status=falcon.HTTP_404,
+                title="Not found.",
+                description="Customer with ID 'ünïcode \"id\"' not found.",
+            ),
+            falcon.HTTPError(status=falcon.HTTP_404, title="Not found."),
+            falcon.HTTPError(
+                status=falcon.HTTP_409,
+                title="Could not create.",
+                description="Conflict.",
+                code=1,
+            ),
+        ]
+
+        for error in errors:
+            # Serialize twice to exercise the precomputed envelope.
+            self.assertEqual(handler.to_json(error), error.to_json())
+            self.assertEqual(handler.to_json(error), error.to_json())
+
+    def test_is_traceback_due(self):
+        """ Tests the `is_traceback_due` method asserting that tracebacks
+            are rate-limited per exception class.
+        """
+
+        handler = ErrorHandler(traceback_interval=60)
+
+        with unittest.mock.patch(target="time.monotonic", return_value=100):
+            self.assertEqual(handler.is_traceback_due(ValueError), (True, 0))
+            self.assertEqual(handler.is_traceback_due(ValueError), (False, 0))
+            self.assertEqual(handler.is_traceback_due(ValueError), (False, 0))
+            self.assertEqual(handler.is_traceback_due(KeyError), (True, 0))
+
+        with unittest.mock.patch(target="time.monotonic", return_value=161):
+            self.assertEqual(handler.is_traceback_due(ValueError), (True, 2))
@@ -0,0 +1,133 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `GatewayFake` class.
+"""
+
+import unittest
+import unittest.mock
+
+import braintree.exceptions
+
+from braintree_server.gateway_fake import GatewayFake
+from tests import fixtures
+
+
+class TestGatewayFake(unittest.TestCase):
+    """Tests the `GatewayFake` class."""
+
+    def setUp(self):
+        self.gateway = GatewayFake(seed=0, logger_level="CRITICAL")
+
+    def create_subscription(self):
+        """ Creates a customer with a subscription and returns the result of
+            the subscription creation.
+        """
+
+        self.gateway.customer.create(params={
+            "id": fixtures.CUSTOMER_ID,
+            "email": fixtures.CUSTOMER_EMAIL,
+        })
+        pm_result = self.gateway.payment_method.create(params={
+            "customer_id": fixtures.CUSTOMER_ID,
+            "payment_method_nonce": fixtures.PAYMENT_METHOD_NONCE,
+        })
+
+        return self.gateway.subscription.create(params={
+            "payment_method_token": pm_result.payment_method.token,
+            "plan_id": fixtures.PLAN_ID,
+        })
+
+    def test_customer(self):
+        """ Tests creating, retrieving, and deleting customers."""
+
+        result = self.gateway.customer.create(params={
+            "id": fixtures.CUSTOMER_ID,
+            "email": fixtures.CUSTOMER_EMAIL,
+        })
+        self.assertTrue(result.is_success)
+
+        # Assert that duplicate customers can't be created.
+        result = self.gateway.customer.create(params={
+            "id": fixtures.CUSTOMER_ID,
+        })
+        self.assertFalse(result.is_success)
+
+        customer = self.gateway.customer.find(customer_id=fixtures.CUSTOMER_ID)
+        self.assertEqual(customer.email, fixtures.CUSTOMER_EMAIL)
+
+        self.gateway.customer.delete(customer_id=fixtures.CUSTOMER_ID)
+        with self.assertRaises(braintree.exceptions.NotFoundError):
+            self.gateway.customer.find(customer_id=fixtures.CUSTOMER_ID)
+
+    def test_subscription(self):
+        """ Tests creating and canceling subscriptions."""
+
+        result = self.create_subscription()
+        self.assertTrue(result.is_success)
+
+        # Assert that the subscription is listed under the customer's card.
+        customer = self.gateway.customer.find(customer_id=fixtures.CUSTOMER_ID)
+        self.assertEqual(
+            customer.credit_cards[0].subscriptions[0].id,
+            result.subscription.id,
+        )
+        self.assertEqual(customer.credit_cards[0].card_type, "American Express")
+
+        result = self.gateway.subscription.cancel(
+            subscription_id=result.subscription.id,
+        )
+        self.assertTrue(result.is_success)
+        self.assertEqual(result.subscription.status, "Canceled")
+
+        # Assert that canceled subscriptions can't be canceled again.
+        result = self.gateway.subscription.cancel(
+            subscription_id=result.subscription.id,
+        )
+        self.assertFalse(result.is_success)
+
+    def test_subscription_invalid_plan(self):
+        """ Tests creating a subscription to an unknown plan."""
+
+        self.gateway.plans.clear()
+
+        result = self.create_subscription()
+
+        self.assertFalse(result.is_success)
+
+    def test_client_token(self):
+        """ Tests generating client-tokens for unknown customers."""
+
+        with self.assertRaises(ValueError):
+            self.gateway.client_token.generate({
+                "customer_id": fixtures.CUSTOMER_ID,
+            })
+
+    def test_error_rate(self):
+        """ Tests the simulated errors."""
+
+        gateway = GatewayFake(error_rate=1.0, logger_level="CRITICAL")
+
+        with self.assertRaises(braintree.exceptions.ServerError):
+            gateway.plan.all()
+
+    def test_rate_limit(self):
+        """ Tests the simulated rate limit."""
+
+        gateway = GatewayFake(
+            rate_limit={"rate": 1, "burst": 2},
+            logger_level="CRITICAL",
+        )
+
+        with unittest.mock.patch(target="time.monotonic", return_value=0):
+            gateway.rate_limit_updated = 0
+            gateway.plan.all()
+            gateway.plan.all()
+            with self.assertRaises(braintree.exceptions.TooManyRequestsError):
+                gateway.plan.all()
+
+        # Assert that the bucket refills over time.
+        with unittest.mock.patch(target="time.monotonic", return_value=1):
+            gateway.plan.all()
+
+        self.assertEqual(gateway.calls_limited, 1)
@@ -0,0 +1,309 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the stores of the `idempotency` module and
+the `MiddlewareIdempotency` class.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+import unittest.mock
+
+import attrdict
+import braintree
+
+from braintree_server.api import create_api
+from braintree_server.excs import DeadlineExceeded
+from braintree_server.gateway_fake import GatewayFake
+from braintree_server.idempotency import IdempotencyStoreFile
+from braintree_server.idempotency import IdempotencyStoreMemory
+from braintree_server.idempotency import IdempotencyStoreSqlite
+from tests.base import TestBase
+from tests import fixtures
+
+
+class IdempotencyStoreTests(object):
+    """ Tests shared by the stores of idempotent responses."""
+
+    def create_store(self, **kwargs):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="braintree-gateway-test-")
+        self.store = self.create_store()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_reserve_complete(self):
+        """ Tests that a key is reserved once and replayed once complete."""
+
+        self.assertIsNone(self.store.reserve(key="key", fingerprint="a"))
+
+        record = self.store.reserve(key="key", fingerprint="a")
+        self.assertFalse(record.is_complete)
+        self.assertEqual(record.fingerprint, "a")
+
+        self.store.complete(
+            key="key",
+            fingerprint="a",
+            status=201,
+            content_type="application/json",
+            body=b'{"id": 1}',
+        )
+
+        record = self.store.reserve(key="key", fingerprint="a")
+        self.assertTrue(record.is_complete)
+        self.assertEqual(record.status, 201)
+        self.assertEqual(record.content_type, "application/json")
+        self.assertEqual(record.body, b'{"id": 1}')
+
+    def test_release(self):
+        """ Tests that released keys can be reserved again."""
+
+        self.assertIsNone(self.store.reserve(key="key", fingerprint="a"))
+        self.store.release(key="key")
+        self.assertIsNone(self.store.get(key="key"))
+        self.assertIsNone(self.store.reserve(key="key", fingerprint="a"))
+
+    def test_expired(self):
+        """ Tests that expired records and abandoned reservations are
+            discarded.
+        """
+
+        store = self.create_store(ttl=0.01, lock_timeout=0.01)
+
+        self.assertIsNone(store.reserve(key="key", fingerprint="a"))
+        threading.Event().wait(0.02)
+        self.assertIsNone(store.reserve(key="key", fingerprint="a"))
+
+        store.complete(
+            key="key",
+            fingerprint="a",
+            status=200,
+            content_type=None,
+            body=b"",
+        )
+        threading.Event().wait(0.02)
+        self.assertIsNone(store.get(key="key"))
+
+    def test_wait(self):
+        """ Tests that waiting on a reservation returns once it's complete."""
+
+        self.assertIsNone(self.store.reserve(key="key", fingerprint="a"))
+
+        timer = threading.Timer(
+            0.05,
+            self.store.complete,
+            kwargs={
+                "key": "key",
+                "fingerprint": "a",
+                "status": 201,
+                "content_type": None,
+                "body": b"done",
+            },
+        )
+        timer.start()
+
+        record = self.store.wait(key="key", timeout=5.0)
+        timer.join()
+
+        self.assertEqual(record.body, b"done")
+
+        # Assert that waiting on an incomplete reservation times out.
+        self.assertIsNone(self.store.reserve(key="other", fingerprint="a"))
+        record = self.store.wait(key="other", timeout=0.05)
+        self.assertFalse(record.is_complete)
+
+
+class TestIdempotencyStoreMemory(IdempotencyStoreTests, unittest.TestCase):
+    """Tests the `IdempotencyStoreMemory` class."""
+
+    def create_store(self, **kwargs):
+        return IdempotencyStoreMemory(**kwargs)
+
+
+class TestIdempotencyStoreFile(IdempotencyStoreTests, unittest.TestCase):
+    """Tests the `IdempotencyStoreFile` class."""
+
+    def create_store(self, **kwargs):
+        return IdempotencyStoreFile(
+            directory=os.path.join(self.directory, "store"),
+            poll_interval=0.01,
+            **kwargs
+        )
+
+
+class TestIdempotencyStoreSqlite(IdempotencyStoreTests, unittest.TestCase):
+    """Tests the `IdempotencyStoreSqlite` class."""
+
+    def create_store(self, **kwargs):
+        return IdempotencyStoreSqlite(
+            path=os.path.join(self.directory, "store.db"),
+            poll_interval=0.01,
+            **kwargs
+        )
+
+
+class TestMiddlewareIdempotency(TestBase):
+    """Tests the `MiddlewareIdempotency` class."""
+
+    def setUp(self):
+        super(TestMiddlewareIdempotency, self).setUp()
+
+        self.gateway = GatewayFake(logger_level="CRITICAL")
+        self.gateway.customer.create(params={
+            "id": fixtures.CUSTOMER_ID,
+            "email": fixtures.CUSTOMER_EMAIL,
+        })
+
+        cfg = attrdict.AttrDict(self.cfg)
+        cfg["idempotency"] = {"enabled": True}
+        cfg["deadline"] = {"enabled": True}
+        self.app = create_api(
+            cfg=cfg,
+            logger_level="CRITICAL",
+            gateway=self.gateway,
+        )
+
+    def simulate_post_subscription(
+        self,
+        key: str,
+        plan_id=fixtures.PLAN_ID,
+        timeout: str = "5",
+    ):
+        """ Simulates the creation of a subscription with an idempotency
+            key.
+        """
+
+        headers = self.generate_jwt_headers()
+        headers["Idempotency-Key"] = key
+        headers["X-Request-Timeout"] = timeout
+
+        return self.simulate_post(
+            path="/customer/{}/subscription".format(fixtures.CUSTOMER_ID),
+            body=json.dumps({
+                "payment_method_nonce": fixtures.PAYMENT_METHOD_NONCE,
+                "customer_id": fixtures.CUSTOMER_ID,
+                "plan_id": plan_id,
+            }),
+            headers=headers,
+        )
+
+    def test_replay(self):
+        """ Tests that retries are replayed without calling Braintree."""
+
+        response = self.simulate_post_subscription(key="retry")
+        self.assertEqual(response.status_code, 201)
+        calls = self.gateway.calls
+
+        response_retry = self.simulate_post_subscription(key="retry")
+
+        self.assertEqual(response_retry.status_code, 201)
+        self.assertEqual(response_retry.content, response.content)
+        self.assertEqual(
+            response_retry.headers["Idempotent-Replayed"],
+            "true",
+        )
+        self.assertEqual(self.gateway.calls, calls)
+        self.assertEqual(len(self.gateway.subscriptions), 1)
+        self.assertEqual(len(self.gateway.payment_methods), 1)
+
+        # Assert that other keys are handled anew.
+        response = self.simulate_post_subscription(key="other")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.gateway.subscriptions), 2)
+
+    def test_concurrent(self):
+        """ Tests that concurrent duplicates wait on the original request."""
+
+        self.gateway.latency = {"distribution": "constant", "value": 0.05}
+
+        responses = []
+
+        def post():
+            responses.append(self.simulate_post_subscription(key="burst"))
+
+        threads = [threading.Thread(target=post) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([r.status_code for r in responses], [201] * 4)
+        self.assertEqual(len({r.content for r in responses}), 1)
+        self.assertEqual(len(self.gateway.subscriptions), 1)
+
+    def test_reused_key(self):
+        """ Tests that keys reused with a different body are rejected."""
+
+        response = self.simulate_post_subscription(key="reused")
+        self.assertEqual(response.status_code, 201)
+
+        response = self.simulate_post_subscription(
+            key="reused",
+            plan_id="other_plan_id",
+        )
+        self.assertEqual(response.status_code, 422)
+
+    def test_server_error_after_calls(self):
+        """ Tests that server errors following Braintree calls are replayed
+            so that retries don't repeat their side-effects.
+        """
+
+        # Fail the subscription creation past the deadline of the request.
+        with unittest.mock.patch.object(
+            target=self.gateway.subscription,
+            attribute="create",
+            side_effect=DeadlineExceeded("Deadline exceeded."),
+        ):
+            response = self.simulate_post_subscription(key="expired")
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(len(self.gateway.payment_methods), 1)
+
+        response_retry = self.simulate_post_subscription(key="expired")
+
+        self.assertEqual(response_retry.status_code, 504)
+        self.assertEqual(response_retry.content, response.content)
+        self.assertEqual(
+            response_retry.headers["Idempotent-Replayed"],
+            "true",
+        )
+        self.assertEqual(len(self.gateway.payment_methods), 1)
+        self.assertFalse(self.gateway.subscriptions)
+
+        # Fail the subscription creation with an unhandled exception.
+        with unittest.mock.patch.object(
+            target=self.gateway.subscription,
+            attribute="create",
+            side_effect=braintree.exceptions.ServerError(),
+        ):
+            with self.assertRaises(braintree.exceptions.ServerError):
+                self.simulate_post_subscription(key="failed")
+
+        response_retry = self.simulate_post_subscription(key="failed")
+
+        self.assertEqual(response_retry.status_code, 500)
+        self.assertEqual(len(self.gateway.payment_methods), 2)
+        self.assertFalse(self.gateway.subscriptions)
+
+    def test_server_error_before_calls(self):
+        """ Tests that server errors preceding any Braintree call release the
+            key so that the request can be retried.
+        """
+
+        response = self.simulate_post_subscription(
+            key="instant",
+            timeout="0.000001",
+        )
+        self.assertEqual(response.status_code, 504)
+
+        response = self.simulate_post_subscription(key="instant")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", response.headers)
+        self.assertEqual(len(self.gateway.subscriptions), 1)
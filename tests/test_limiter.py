@@ -0,0 +1,174 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `LimiterAimd` class and the shedding of
+Braintree requests by the HTTP strategies of the `transport` module.
+"""
+
+import functools
+import unittest
+
+import attrdict
+import braintree
+
+from braintree_server.api import create_api
+from braintree_server.excs import UpstreamOverloaded
+from braintree_server.limiter import LimiterAimd
+from braintree_server.transport import HttpReplayer
+from tests.base import TestBase
+from tests.test_transport import MERCHANT_ID, customer_xml
+from tests import fixtures
+
+
+# The recorded exchange retrieving the fixture customer.
+episodes = [{
+    "request": None,
+    "interactions": [{
+        "method": "GET",
+        "path": "/merchants/{{merchant_id}}/customers/{}".format(
+            fixtures.CUSTOMER_ID,
+        ),
+        "request_body": None,
+        "status": 200,
+        "response_body": customer_xml.replace(MERCHANT_ID, "{merchant_id}"),
+        "duration": 0.0,
+    }],
+}]
+
+
+def create_gateway(limiter: LimiterAimd) -> braintree.BraintreeGateway:
+    """ Creates a Braintree gateway replaying the fixture customer through a
+        limiter.
+    """
+
+    return braintree.BraintreeGateway(
+        braintree.Configuration(
+            environment="sandbox",
+            merchant_id=MERCHANT_ID,
+            public_key="fake_public_key",
+            private_key="fake_private_key",
+            http_strategy=functools.partial(
+                HttpReplayer,
+                episodes=episodes,
+                latency_scale=0,
+                limiter=limiter,
+            ),
+        )
+    )
+
+
+class TestLimiterAimd(unittest.TestCase):
+    """Tests the `LimiterAimd` class."""
+
+    def test_acquire(self):
+        """ Tests that requests over the limit are refused unless forced."""
+
+        limiter = LimiterAimd(limit_initial=2)
+
+        self.assertTrue(limiter.acquire())
+        self.assertTrue(limiter.acquire())
+        self.assertFalse(limiter.acquire())
+        self.assertTrue(limiter.acquire(force=True))
+        self.assertEqual(limiter.get_inflight(), 3)
+
+    def test_adapt(self):
+        """ Tests that the limit grows with fast requests under load and
+            shrinks with slow or failed requests.
+        """
+
+        limiter = LimiterAimd(
+            limit_initial=4,
+            limit_max=5,
+            latency_threshold=1.0,
+            backoff_ratio=0.5,
+        )
+
+        # Assert that the limit doesn't grow while mostly unused.
+        limiter.acquire()
+        limiter.release(latency=0.1)
+        self.assertEqual(limiter.get_limit(), 4)
+
+        # Assert that the limit grows up to the maximum while in use.
+        for _ in range(3):
+            limiter.acquire()
+            limiter.acquire()
+            limiter.release(latency=0.1)
+            limiter.release(latency=0.1)
+        self.assertEqual(limiter.get_limit(), 5)
+
+        # Assert that cancelled requests leave the limit as is.
+        limiter.acquire()
+        limiter.release(latency=2.0, failed=True, cancelled=True)
+        self.assertEqual(limiter.get_limit(), 5)
+        self.assertEqual(limiter.get_inflight(), 0)
+
+        # Assert that the limit shrinks with slow and failed requests.
+        limiter.acquire()
+        limiter.release(latency=2.0)
+        self.assertEqual(limiter.get_limit(), 2)
+        limiter.acquire()
+        limiter.release(latency=0.1, failed=True)
+        self.assertEqual(limiter.get_limit(), 1)
+
+        # Assert that the limit never shrinks below the minimum.
+        limiter.acquire()
+        limiter.release(latency=2.0)
+        self.assertEqual(limiter.get_limit(), 1)
+
+    def test_shed(self):
+        """ Tests that only the first Braintree request of an incoming request
+            is shed.
+        """
+
+        limiter = LimiterAimd(limit_initial=1)
+        gateway = create_gateway(limiter=limiter)
+        transport = gateway.config.http_strategy()
+
+        # Occupy the only slot.
+        limiter.acquire()
+
+        transport.reset_calls_thread()
+        with self.assertRaises(UpstreamOverloaded):
+            gateway.customer.find(customer_id=fixtures.CUSTOMER_ID)
+
+        # Assert that later requests of an incoming request are admitted.
+        transport.local.calls = 1
+        customer = gateway.customer.find(customer_id=fixtures.CUSTOMER_ID)
+        self.assertEqual(customer.id, fixtures.CUSTOMER_ID)
+        self.assertEqual(limiter.get_inflight(), 1)
+
+
+class TestLimiterApi(TestBase):
+    """Tests the responses to requests shed by the limiter."""
+
+    def test_get_503(self):
+        """ Tests that shed requests are responded to with a 503 and a
+            `Retry-After` header while `/ping` is unaffected.
+        """
+
+        limiter = LimiterAimd(limit_initial=1, retry_after=2)
+        self.app = create_api(
+            cfg=attrdict.AttrDict(self.cfg),
+            logger_level="CRITICAL",
+            gateway=create_gateway(limiter=limiter),
+        )
+
+        response = self.simulate_get(
+            path="/customer/{}".format(fixtures.CUSTOMER_ID),
+            headers=self.generate_jwt_headers(),
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # Occupy all slots.
+        for _ in range(limiter.get_limit()):
+            limiter.acquire()
+
+        response = self.simulate_get(
+            path="/customer/{}".format(fixtures.CUSTOMER_ID),
+            headers=self.generate_jwt_headers(),
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "2")
+
+        response = self.simulate_get(path="/ping")
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,88 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the logging queue under the `loggers`
+module.
+"""
+
+import queue
+import logging
+import unittest
+
+from braintree_server.loggers import create_logger
+from braintree_server.loggers import enable_logging_queue
+from braintree_server.loggers import disable_logging_queue
+from braintree_server.loggers import get_logging_queue_stats
+from braintree_server.loggers import QueueHandlerBounded
+
+
+class TestLoggers(unittest.TestCase):
+    """Tests the shared handlers and the logging queue."""
+
+    def tearDown(self):
+        disable_logging_queue()
+
+    def test_handlers_shared(self):
+        """ Tests that loggers created with the same settings share their
+            handlers.
+        """
+
+        logger_a = create_logger(logger_name="TestLoggersA")
+        logger_b = create_logger(logger_name="TestLoggersB")
+
+        self.assertTrue(logger_a.handlers)
+        self.assertEqual(logger_a.handlers, logger_b.handlers)
+
+    def test_queue_overflow(self):
+        """ Tests that records which don't fit in the queue are counted as
+            dropped under both overflow policies.
+        """
+
+        record = logging.makeLogRecord({"msg": "message"})
+
+        for overflow in ["drop", "block"]:
+            handler = QueueHandlerBounded(
+                queue_records=queue.Queue(maxsize=1),
+                overflow=overflow,
+                block_timeout=0.001,
+            )
+            for _ in range(3):
+                handler.handle(record)
+
+            self.assertEqual(handler.queue.qsize(), 1)
+            self.assertEqual(handler.dropped, 2)
+
+    def test_enable_disable(self):
+        """ Tests routing the records of existing and new loggers through the
+            queue and back.
+        """
+
+        logger_a = create_logger(logger_name="TestLoggersQueueA")
+        handlers = list(logger_a.handlers)
+
+        enable_logging_queue(
+            queue_size=100,
+            do_log_stdout=False,
+            do_log_syslog=False,
+        )
+        logger_b = create_logger(logger_name="TestLoggersQueueB")
+
+        # Assert that both loggers only hand their records to the queue.
+        for logger in [logger_a, logger_b]:
+            self.assertEqual(len(logger.handlers), 1)
+            self.assertIsInstance(logger.handlers[0], QueueHandlerBounded)
+
+        logger_a.info("message")
+
+        self.assertEqual(
+            set(get_logging_queue_stats()),
+            {"queue_depth", "queue_capacity", "records_dropped"},
+        )
+        self.assertEqual(get_logging_queue_stats()["queue_capacity"], 100)
+
+        disable_logging_queue()
+
+        # Assert that the loggers got their shared handlers back.
+        self.assertIsNone(get_logging_queue_stats())
+        self.assertEqual(logger_a.handlers, handlers)
+        self.assertEqual(logger_b.handlers, handlers)
@@ -0,0 +1,168 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the metrics registry under the `metrics`
+module and the `ResourceMetrics` class.
+"""
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+import threading
+import subprocess
+
+import attrdict
+
+from braintree_server.api import create_api
+from braintree_server.metrics import Counter
+from braintree_server.metrics import Histogram
+from braintree_server.metrics import MetricsRegistry
+from braintree_server.metrics import MetricsStore
+from braintree_server.metrics import render
+from tests.base import TestBase
+
+
+class TestMetrics(unittest.TestCase):
+    """Tests the metrics registry and store."""
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.counter = self.registry.register(Counter(
+            name="requests_total",
+            documentation="Requests.",
+            labelnames=("route",),
+        ))
+        self.histogram = self.registry.register(Histogram(
+            name="duration_seconds",
+            documentation="Durations.",
+            buckets=(0.1, 1.0),
+        ))
+
+    def test_render(self):
+        """ Tests rendering counters and cumulative histogram buckets."""
+
+        self.counter.labels("/ping").inc()
+        self.counter.labels("/ping").inc()
+        self.histogram.labels().observe(0.05)
+        self.histogram.labels().observe(0.5)
+        self.histogram.labels().observe(5.0)
+
+        lines = render(snapshot=self.registry.collect()).splitlines()
+
+        self.assertIn("requests_total{route=\"/ping\"} 2.0", lines)
+        self.assertIn("duration_seconds_bucket{le=\"0.1\"} 1", lines)
+        self.assertIn("duration_seconds_bucket{le=\"1.0\"} 2", lines)
+        self.assertIn("duration_seconds_bucket{le=\"+Inf\"} 3", lines)
+        self.assertIn("duration_seconds_sum 5.55", lines)
+        self.assertIn("duration_seconds_count 3", lines)
+
+    def test_store_aggregation(self):
+        """ Tests aggregating the metrics of several processes and resetting
+            them in-place.
+        """
+
+        directory = tempfile.mkdtemp()
+        store = MetricsStore(registry=self.registry, directory=directory)
+
+        child = self.counter.labels("/ping")
+        child.inc()
+        self.histogram.labels().observe(0.5)
+
+        # Write the snapshot of another process.
+        with open(store.get_fname(pid=os.getpid() + 1), "w") as fout:
+            json.dump(self.registry.collect(), fout)
+
+        child.inc()
+
+        lines = render(snapshot=store.collect()).splitlines()
+
+        self.assertIn("requests_total{route=\"/ping\"} 3.0", lines)
+        self.assertIn("duration_seconds_count 2", lines)
+
+        # Assert that children retrieved ahead of a reset remain valid.
+        self.registry.reset()
+        child.inc()
+        self.assertEqual(self.counter.labels("/ping").get(), 1.0)
+
+    def test_store_fold(self):
+        """ Tests that the snapshots of exited processes are folded into the
+            aggregate snapshot without their gauges.
+        """
+
+        directory = tempfile.mkdtemp()
+        store = MetricsStore(registry=self.registry, directory=directory)
+
+        self.counter.labels("/ping").inc()
+
+        # Write the snapshots of two exited processes.
+        for _ in range(2):
+            process = subprocess.Popen([sys.executable, "-c", ""])
+            process.wait()
+            with open(store.get_fname(pid=process.pid), "w") as fout:
+                json.dump(self.registry.collect(), fout)
+
+        for _ in range(2):
+            lines = render(snapshot=store.collect()).splitlines()
+            self.assertIn("requests_total{route=\"/ping\"} 3.0", lines)
+
+        self.assertEqual(
+            sorted(os.listdir(directory)),
+            ["metrics-exited.json", "metrics.lock"],
+        )
+
+    def test_concurrent(self):
+        """ Tests that no updates are lost when recorded concurrently."""
+
+        child = self.counter.labels("/ping")
+        histogram = self.histogram.labels()
+
+        def record():
+            for _ in range(20000):
+                child.inc()
+                histogram.observe(0.5)
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=record) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+        self.assertEqual(child.get(), 80000.0)
+        self.assertEqual(sum(histogram.get()[0]), 80000)
+
+
+class TestResourceMetrics(TestBase):
+    """Tests the `ResourceMetrics` class."""
+
+    def test_get_disabled(self):
+        """ Tests that the metrics aren't exposed unless enabled."""
+
+        response = self.simulate_get("/metrics")
+
+        self.assertNotEqual(response.status_code, 200)
+
+    def test_get(self):
+        """ Tests scraping the metrics without authentication."""
+
+        cfg = attrdict.AttrDict(self.cfg)
+        cfg["metrics"] = {"enabled": True}
+        self.app = create_api(cfg=cfg, logger_level="CRITICAL")
+
+        self.simulate_get("/ping")
+
+        response = self.simulate_get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            "http_requests_total"
+            "{method=\"GET\",route=\"/ping\",status=\"200\"}",
+            response.text,
+        )
+        self.assertIn("serialization_duration_seconds_count", response.text)
@@ -0,0 +1,103 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `MiddlewareAuth0` class.
+"""
+
+import unittest.mock
+
+from tests.base import TestBase
+from tests.utils import JwtIssuerLocal
+from tests import fixtures
+
+
+class TestMiddlewareAuth0(TestBase):
+    """Tests the `MiddlewareAuth0` class."""
+
+    def simulate_get_customer(self, headers=None):
+        """ Simulates a GET request against the customer resource."""
+
+        with unittest.mock.patch(
+            target="braintree.customer_gateway.CustomerGateway.find",
+            new=staticmethod(lambda customer_id: fixtures.customer),
+        ):
+            return self.simulate_get(
+                path="/customer/{}".format(fixtures.CUSTOMER_ID),
+                headers=headers,
+            )
+
+    def test_valid(self):
+        """ Tests that a valid access-token is accepted."""
+
+        response = self.simulate_get_customer(
+            headers=self.generate_jwt_headers(),
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing(self):
+        """ Tests that requests without an access-token are rejected."""
+
+        response = self.simulate_get_customer()
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_expired(self):
+        """ Tests that expired access-tokens are rejected."""
+
+        response = self.simulate_get_customer(
+            headers=self.generate_jwt_headers(expires_in=-60),
+        )
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(
+            response.json["title"],
+            "Expired 'Authorization' token.",
+        )
+
+    def test_audience_wrong(self):
+        """ Tests that access-tokens for a different audience are rejected."""
+
+        response = self.simulate_get_customer(
+            headers=self.generate_jwt_headers(claims={"aud": "other"}),
+        )
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_issuer_wrong(self):
+        """ Tests that access-tokens by a different issuer are rejected."""
+
+        response = self.simulate_get_customer(
+            headers=self.generate_jwt_headers(
+                claims={"iss": "https://other.auth0.com/"},
+            ),
+        )
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_key_unknown(self):
+        """ Tests that access-tokens signed with a key absent from the JWKS
+            are rejected.
+        """
+
+        issuer = JwtIssuerLocal(
+            auth0_domain=self.cfg.auth0.domain,
+            auth0_audience=self.cfg.auth0.audience,
+            subject=self.issuer.subject,
+            key_id="unknown",
+        )
+
+        response = self.simulate_get_customer(
+            headers={"Authorization": "Bearer {}".format(issuer.generate())},
+        )
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_subject_forbidden(self):
+        """ Tests that access-tokens of a different customer are forbidden."""
+
+        response = self.simulate_get_customer(
+            headers=self.generate_jwt_headers(claims={"sub": "auth0|other"}),
+        )
+
+        self.assertEqual(response.status_code, 403)
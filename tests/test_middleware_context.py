@@ -0,0 +1,87 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `MiddlewareRequestContext` class and
+the structured logging it relies on.
+"""
+
+import json
+import logging
+
+from braintree_server.loggers import bind_context
+from braintree_server.loggers import unbind_context
+from braintree_server.loggers import set_log_sampling
+from braintree_server.loggers import FormatterJson
+from tests.base import TestBase
+
+
+class TestMiddlewareRequestContext(TestBase):
+    """Tests the `MiddlewareRequestContext` class."""
+
+    def tearDown(self):
+        set_log_sampling(sampling=None)
+
+        super(TestMiddlewareRequestContext, self).tearDown()
+
+    def test_request_id(self):
+        """ Tests that request IDs are generated or accepted from clients and
+            logged with the handled request.
+        """
+
+        with self.assertLogs("MiddlewareRequestContext", "INFO") as logs:
+            response = self.simulate_get("/ping")
+            response_client = self.simulate_get(
+                "/ping",
+                headers={"X-Request-ID": "client-id"},
+            )
+
+        # Assert that a request ID was generated and the client's was kept.
+        request_id = response.headers["X-Request-ID"]
+        self.assertEqual(len(request_id), 32)
+        self.assertEqual(response_client.headers["X-Request-ID"], "client-id")
+
+        # Assert that the handled requests were logged with their fields.
+        record = logs.records[0]
+        self.assertEqual(record.request_id, request_id)
+        self.assertEqual(record.route, "/ping")
+        self.assertEqual(record.status, 200)
+        self.assertEqual(logs.records[1].request_id, "client-id")
+
+    def test_sampling(self):
+        """ Tests that records are emitted per the sampling rates."""
+
+        set_log_sampling(sampling={"/ping": {"INFO": 0.0}})
+
+        with self.assertLogs("MiddlewareRequestContext", "INFO") as logs:
+            self.simulate_get("/ping")
+            self.simulate_get("/customer/unknown")
+
+        # Assert that only the request rejected before being routed was
+        # logged.
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].status, 401)
+
+    def test_formatter_json(self):
+        """ Tests that records are formatted as JSON lines with their fields
+            and request ID.
+        """
+
+        token = bind_context(request_id="request-id")
+        try:
+            record = logging.makeLogRecord({
+                "name": "Logger",
+                "levelno": logging.INFO,
+                "levelname": "INFO",
+                "msg": "Retrieving customer '%s'.",
+                "args": ("customer",),
+                "customer_id": "customer",
+                "request_id": "request-id",
+            })
+        finally:
+            unbind_context(token=token)
+
+        event = json.loads(FormatterJson().format(record))
+
+        self.assertEqual(event["message"], "Retrieving customer 'customer'.")
+        self.assertEqual(event["customer_id"], "customer")
+        self.assertEqual(event["request_id"], "request-id")
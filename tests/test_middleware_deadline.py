@@ -0,0 +1,182 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `MiddlewareDeadline` class and the
+bounding of Braintree requests by the deadline of incoming requests.
+"""
+
+import json
+import time
+import functools
+import unittest
+
+import attrdict
+import braintree
+
+from braintree_server.api import create_api
+from braintree_server.deadline import bind_deadline
+from braintree_server.deadline import unbind_deadline
+from braintree_server.excs import DeadlineExceeded
+from braintree_server.gateway_fake import GatewayFake
+from braintree_server.limiter import LimiterAimd
+from braintree_server.metrics import metric_deadline_exceeded
+from braintree_server.transport import HttpReplayer
+from tests.base import TestBase
+from tests.test_limiter import episodes
+from tests.test_transport import MERCHANT_ID
+from tests import fixtures
+
+
+class TestHttpReplayerDeadline(unittest.TestCase):
+    """Tests the bounding of replayed Braintree requests by deadlines."""
+
+    def setUp(self):
+        # Replay the fixture customer with a latency of 0.1 seconds.
+        episodes_slow = json.loads(json.dumps(episodes))
+        episodes_slow[0]["interactions"][0]["duration"] = 0.1
+
+        self.limiter = LimiterAimd(limit_initial=20)
+        self.gateway = braintree.BraintreeGateway(
+            braintree.Configuration(
+                environment="sandbox",
+                merchant_id=MERCHANT_ID,
+                public_key="fake_public_key",
+                private_key="fake_private_key",
+                http_strategy=functools.partial(
+                    HttpReplayer,
+                    episodes=episodes_slow,
+                    limiter=self.limiter,
+                ),
+            )
+        )
+
+    def find_customer(self, timeout: float):
+        """ Retrieves the fixture customer under a deadline."""
+
+        token = bind_deadline(deadline=time.monotonic() + timeout)
+        try:
+            return self.gateway.customer.find(customer_id=fixtures.CUSTOMER_ID)
+        finally:
+            unbind_deadline(token=token)
+
+    def test_deadline(self):
+        """ Tests that requests are given up on at the deadline and skipped
+            past it.
+        """
+
+        customer = self.find_customer(timeout=1.0)
+        self.assertEqual(customer.id, fixtures.CUSTOMER_ID)
+
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            self.find_customer(timeout=0.02)
+        self.assertLess(time.monotonic() - start, 0.08)
+
+        transport = self.gateway.config.http_strategy()
+        calls = transport.calls.copy()
+        with self.assertRaises(DeadlineExceeded):
+            self.find_customer(timeout=-1.0)
+        self.assertEqual(transport.calls, calls)
+
+    def test_deadline_limit(self):
+        """ Tests that requests given up on at the deadline of the incoming
+            request don't shrink the concurrency limit.
+        """
+
+        for _ in range(10):
+            with self.assertRaises(DeadlineExceeded):
+                self.find_customer(timeout=0.005)
+
+        self.assertEqual(self.limiter.get_limit(), 20)
+        self.assertEqual(self.limiter.get_inflight(), 0)
+
+
+class TestMiddlewareDeadline(TestBase):
+    """Tests the `MiddlewareDeadline` class."""
+
+    def setUp(self):
+        super(TestMiddlewareDeadline, self).setUp()
+
+        # Create an API against a fake gateway with a latency of 0.1 seconds
+        # per call holding the fixture customer.
+        self.gateway = GatewayFake(
+            latency={"distribution": "constant", "value": 0.1},
+            logger_level="CRITICAL",
+        )
+        self.gateway.customer.create(params={
+            "id": fixtures.CUSTOMER_ID,
+            "email": fixtures.CUSTOMER_EMAIL,
+        })
+        self.gateway.calls = 0
+
+        cfg = attrdict.AttrDict(self.cfg)
+        cfg["deadline"] = {
+            "enabled": True,
+            "routes": {"GET /customer/{customer_id}": 0.05},
+        }
+        self.app = create_api(
+            cfg=cfg,
+            logger_level="CRITICAL",
+            gateway=self.gateway,
+        )
+
+    def simulate_post_subscription(self, timeout: str):
+        """ Simulates the creation of a subscription under a timeout."""
+
+        headers = self.generate_jwt_headers()
+        headers["X-Request-Timeout"] = timeout
+
+        return self.simulate_post(
+            path="/customer/{}/subscription".format(fixtures.CUSTOMER_ID),
+            body=json.dumps({
+                "payment_method_nonce": fixtures.PAYMENT_METHOD_NONCE,
+                "customer_id": fixtures.CUSTOMER_ID,
+                "plan_id": fixtures.PLAN_ID,
+            }),
+            headers=headers,
+        )
+
+    def test_post_504(self):
+        """ Tests that the remaining calls of a request are skipped once its
+            deadline runs out and that a 504 is responded with.
+        """
+
+        route = "/customer/{customer_id}/subscription"
+        counter = metric_deadline_exceeded.labels(route)
+        count = counter.get()
+
+        # The customer retrieval fits within the timeout while the
+        # payment-method creation doesn't.
+        response = self.simulate_post_subscription(timeout="0.15")
+
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(self.gateway.calls, 2)
+        self.assertFalse(self.gateway.subscriptions)
+        self.assertEqual(counter.get(), count + 1)
+
+    def test_post_201(self):
+        """ Tests that requests within their deadline are unaffected."""
+
+        response = self.simulate_post_subscription(timeout="5")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.gateway.calls, 3)
+
+    def test_route_timeout(self):
+        """ Tests that the timeout of a route applies without a header."""
+
+        response = self.simulate_get(
+            path="/customer/{}".format(fixtures.CUSTOMER_ID),
+            headers=self.generate_jwt_headers(),
+        )
+
+        self.assertEqual(response.status_code, 504)
+
+    def test_invalid_header(self):
+        """ Tests that invalid timeouts are responded to with a 400."""
+
+        for timeout in ["soon", "0", "-1"]:
+            response = self.simulate_post_subscription(timeout=timeout)
+            self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(self.gateway.calls, 0)
@@ -0,0 +1,79 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `MiddlewarePriority` class.
+"""
+
+import unittest.mock
+
+import attrdict
+
+from braintree_server.api import create_api
+from tests.base import TestBase
+from tests import fixtures
+
+
+class TestMiddlewarePriority(TestBase):
+    """Tests the `MiddlewarePriority` class."""
+
+    def setUp(self):
+        super(TestMiddlewarePriority, self).setUp()
+
+        # Create an API admitting a single customer deletion at a time.
+        cfg = attrdict.AttrDict(self.cfg)
+        cfg["priority"] = {
+            "enabled": True,
+            "lanes": {"mutation": {"max_concurrency": 1}},
+            "routes": {"DELETE /customer/{customer_id}": "mutation"},
+            "retry_after": 3,
+        }
+        self.app = create_api(cfg=cfg, logger_level="CRITICAL")
+
+    def simulate_delete_customer(self):
+        """ Simulates a DELETE request against the customer resource."""
+
+        return self.simulate_delete(
+            path="/customer/{}".format(fixtures.CUSTOMER_ID),
+            headers=self.generate_jwt_headers(),
+        )
+
+    def test_saturated(self):
+        """ Tests that requests of a saturated lane are shed while requests
+            of other routes are admitted.
+        """
+
+        responses = {}
+
+        def delete(customer_id):
+            # Issue requests while the deletion occupies the lane.
+            responses["delete"] = self.simulate_delete_customer()
+            responses["get"] = self.simulate_get(
+                path="/customer/{}".format(fixtures.CUSTOMER_ID),
+                headers=self.generate_jwt_headers(),
+            )
+            return fixtures.result_success
+
+        with unittest.mock.patch(
+            target="braintree.customer_gateway.CustomerGateway.delete",
+            new=staticmethod(delete),
+        ), unittest.mock.patch(
+            target="braintree.customer_gateway.CustomerGateway.find",
+            new=staticmethod(lambda customer_id: fixtures.customer),
+        ):
+            response = self.simulate_delete_customer()
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(responses["delete"].status_code, 503)
+        self.assertEqual(responses["delete"].headers["Retry-After"], "3")
+        self.assertEqual(responses["get"].status_code, 200)
+
+    def test_released(self):
+        """ Tests that the lane is released once requests are handled."""
+
+        with unittest.mock.patch(
+            target="braintree.customer_gateway.CustomerGateway.delete",
+            new=staticmethod(lambda customer_id: fixtures.result_success),
+        ):
+            for _ in range(2):
+                response = self.simulate_delete_customer()
+                self.assertEqual(response.status_code, 204)
@@ -0,0 +1,87 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `MiddlewareTiming` class.
+"""
+
+import unittest.mock
+
+import attrdict
+
+from braintree_server.api import create_api
+from tests.base import TestBase
+from tests import fixtures
+
+
+class TestMiddlewareTiming(TestBase):
+    """Tests the `MiddlewareTiming` class."""
+
+    def setUp(self):
+        super(TestMiddlewareTiming, self).setUp()
+
+        # Create an API tracing the phases and logging requests over 0s.
+        cfg = attrdict.AttrDict(self.cfg)
+        cfg["timing"] = {"enabled": True, "slow_threshold": 0}
+        self.app = create_api(cfg=cfg, logger_level="CRITICAL")
+
+    def simulate_get_customer(self, headers):
+        """ Simulates a GET request against the customer resource."""
+
+        with unittest.mock.patch(
+            target="braintree.customer_gateway.CustomerGateway.find",
+            new=staticmethod(lambda customer_id: fixtures.customer),
+        ):
+            return self.simulate_get(
+                path="/customer/{}".format(fixtures.CUSTOMER_ID),
+                headers=headers,
+            )
+
+    def test_header(self):
+        """ Tests that the `Server-Timing` header is only returned to
+            authenticated requests asking for it.
+        """
+
+        headers = self.generate_jwt_headers()
+
+        response = self.simulate_get_customer(headers=headers)
+        self.assertNotIn("Server-Timing", response.headers)
+
+        headers["X-Request-Timing"] = "1"
+        response = self.simulate_get_customer(headers=headers)
+
+        self.assertEqual(response.status_code, 200)
+        phases = [
+            metric.split(";")[0]
+            for metric in response.headers["Server-Timing"].split(", ")
+        ]
+        self.assertEqual(phases, ["auth", "serialize", "total"])
+
+    def test_header_unauthenticated(self):
+        """ Tests that the `Server-Timing` header isn't returned to
+            unauthenticated requests asking for it.
+        """
+
+        response = self.simulate_get_customer(
+            headers={"X-Request-Timing": "1"},
+        )
+
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn("Server-Timing", response.headers)
+
+        response = self.simulate_get(
+            path="/ping",
+            headers={"X-Request-Timing": "1"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response.headers)
+
+    def test_slow(self):
+        """ Tests that the breakdown of slow requests is logged."""
+
+        with self.assertLogs("MiddlewareTiming", "WARNING") as logs:
+            self.simulate_get_customer(headers=self.generate_jwt_headers())
+
+        record = logs.records[0]
+        self.assertEqual(record.route, "/customer/{customer_id}")
+        self.assertEqual(set(record.phases), {"auth", "serialize", "total"})
@@ -0,0 +1,351 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `Replica` class and the responses
+served from it.
+"""
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+import attrdict
+import braintree.exceptions
+
+from braintree_server.api import create_api
+from braintree_server.excs import ReplicaError
+from braintree_server.gateway_fake import GatewayFake
+from braintree_server.replica import Replica
+from braintree_server.replica import project
+from tests.base import TestBase
+from tests import fixtures
+
+
+class TestReplica(unittest.TestCase):
+    """Tests the `Replica` class."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="braintree-gateway-test-")
+        self.replica = Replica(
+            path=os.path.join(self.directory, "replica.db"),
+            reconcile_age=0.0,
+            logger_level="CRITICAL",
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_put_get(self):
+        """ Tests that objects are replicated and marked stale."""
+
+        self.replica.put(
+            resource="customer",
+            resource_id="a",
+            body='{"id": "a"}',
+            updated_at="2020-01-01T00:00:00",
+        )
+
+        entry = self.replica.get(resource="customer", resource_id="a")
+        self.assertEqual(entry.body, '{"id": "a"}')
+        self.assertEqual(entry.updated_at, "2020-01-01T00:00:00")
+        self.assertLess(entry.get_lag(), 1.0)
+
+        self.replica.mark_stale(resource="customer", resource_id="a")
+        entry = self.replica.get(resource="customer", resource_id="a")
+        self.assertEqual(entry.synced, 0)
+
+        self.assertIsNone(
+            self.replica.get(resource="customer", resource_id="b")
+        )
+
+    def test_delete(self):
+        """ Tests that deleting a customer removes their subscriptions."""
+
+        self.replica.put(resource="customer", resource_id="a", body="{}")
+        self.replica.put(
+            resource="subscription",
+            resource_id="s",
+            body="{}",
+            customer_id="a",
+        )
+        # Assert that refreshes keep the customer of subscriptions.
+        self.replica.put(resource="subscription", resource_id="s", body="{}")
+
+        self.replica.delete(resource="customer", resource_id="a")
+
+        self.assertIsNone(
+            self.replica.get(resource="customer", resource_id="a")
+        )
+        self.assertIsNone(
+            self.replica.get(resource="subscription", resource_id="s")
+        )
+
+    def test_put_invalidated(self):
+        """ Tests that objects retrieved before an invalidation aren't written
+            after it.
+        """
+
+        fetched = time.time()
+        self.replica.put(resource="customer", resource_id="a", body="{}")
+        self.replica.mark_stale(resource="customer", resource_id="a")
+
+        self.assertFalse(
+            self.replica.put(
+                resource="customer",
+                resource_id="a",
+                body='{"id": "a"}',
+                fetched=fetched,
+            )
+        )
+        entry = self.replica.get(resource="customer", resource_id="a")
+        self.assertEqual(entry.body, "{}")
+        self.assertEqual(entry.synced, 0)
+
+        # Assert that deleted objects aren't resurrected.
+        self.replica.delete(resource="customer", resource_id="a")
+        self.assertFalse(
+            self.replica.put(
+                resource="customer",
+                resource_id="a",
+                body="{}",
+                fetched=fetched,
+            )
+        )
+        self.assertIsNone(
+            self.replica.get(resource="customer", resource_id="a")
+        )
+
+        # Assert that objects retrieved after the invalidation are written.
+        self.assertTrue(
+            self.replica.put(
+                resource="customer",
+                resource_id="a",
+                body='{"id": "a"}',
+                fetched=time.time(),
+            )
+        )
+        entry = self.replica.get(resource="customer", resource_id="a")
+        self.assertEqual(entry.body, '{"id": "a"}')
+
+    def test_acquire_lease(self):
+        """ Tests that a lease is held by a single process until it expires."""
+
+        self.assertTrue(self.replica.acquire_lease(name="a", duration=60.0))
+        self.assertTrue(self.replica.acquire_lease(name="a", duration=60.0))
+
+        self.replica.execute("UPDATE leases SET pid = -1")
+        self.assertFalse(self.replica.acquire_lease(name="a", duration=60.0))
+
+        self.replica.execute("UPDATE leases SET expires = 0")
+        self.assertTrue(self.replica.acquire_lease(name="a", duration=60.0))
+
+    def test_reconcile(self):
+        """ Tests that stale objects are refreshed and missing ones removed."""
+
+        def retrieve(resource_id):
+            if resource_id == "missing":
+                raise braintree.exceptions.NotFoundError()
+            return {"id": resource_id}
+
+        self.replica.register(
+            resource="customer",
+            retrieve=retrieve,
+            serialize=lambda obj: (json.dumps(obj), None),
+        )
+
+        self.replica.put(resource="customer", resource_id="a", body="{}")
+        self.replica.put(resource="customer", resource_id="missing", body="{}")
+        self.replica.mark_stale(resource="customer", resource_id="a")
+
+        self.assertEqual(self.replica.reconcile(), 2)
+
+        entry = self.replica.get(resource="customer", resource_id="a")
+        self.assertEqual(entry.body, '{"id": "a"}')
+        self.assertGreater(entry.synced, 0)
+        self.assertIsNone(
+            self.replica.get(resource="customer", resource_id="missing")
+        )
+
+    def test_project(self):
+        """ Tests that replicated bodies are restricted to projections."""
+
+        data = {
+            "id": "a",
+            "email": "a@example.com",
+            "credit_cards": [
+                {"token": "t1", "last_4": "1111"},
+                {"token": "t2", "last_4": "2222"},
+            ],
+        }
+
+        self.assertEqual(
+            project(data=data, fields=("id", "credit_cards.token")),
+            {"id": "a", "credit_cards": [{"token": "t1"}, {"token": "t2"}]},
+        )
+        self.assertEqual(
+            project(data=data, fields=("credit_cards", "credit_cards.token")),
+            {"credit_cards": data["credit_cards"]},
+        )
+
+
+class TestResourceReplica(TestBase):
+    """Tests the responses served from the replica."""
+
+    def setUp(self):
+        super(TestResourceReplica, self).setUp()
+
+        self.directory = tempfile.mkdtemp(prefix="braintree-gateway-test-")
+
+        self.gateway = GatewayFake(logger_level="CRITICAL")
+        self.gateway.customer.create(params={
+            "id": fixtures.CUSTOMER_ID,
+            "email": fixtures.CUSTOMER_EMAIL,
+        })
+
+        cfg = attrdict.AttrDict(self.cfg)
+        cfg["replica"] = {
+            "enabled": True,
+            "path": os.path.join(self.directory, "replica.db"),
+            "routes": {"GET /customer/{customer_id}/subscription/"
+                       "{subscription_id}": 60},
+        }
+        self.app = create_api(
+            cfg=cfg,
+            logger_level="CRITICAL",
+            gateway=self.gateway,
+        )
+
+        self.replica = self.app._router.find("/customer/a")[0].replica
+
+    def tearDown(self):
+        self.replica.stop()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+        super(TestResourceReplica, self).tearDown()
+
+    def simulate_get_customer(self, max_staleness=None, **kwargs):
+        headers = self.generate_jwt_headers()
+        if max_staleness is not None:
+            headers["X-Max-Staleness"] = max_staleness
+
+        return self.simulate_get(
+            path="/customer/{}".format(fixtures.CUSTOMER_ID),
+            headers=headers,
+            **kwargs
+        )
+
+    def test_get_customer(self):
+        """ Tests that customers are served from the replica when the request
+            accepts its staleness.
+        """
+
+        # Assert that requests without a staleness are served by Braintree
+        # and replicated.
+        response = self.simulate_get_customer()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Replica-Lag", response.headers)
+        calls = self.gateway.calls
+
+        response_replica = self.simulate_get_customer(max_staleness="60")
+
+        self.assertEqual(response_replica.status_code, 200)
+        self.assertIn("X-Replica-Lag", response_replica.headers)
+        self.assertEqual(response_replica.json, response.json)
+        self.assertEqual(
+            response_replica.headers["ETag"],
+            response.headers["ETag"],
+        )
+        self.assertEqual(self.gateway.calls, calls)
+
+        # Assert that projections are applied to the replicated customer.
+        response = self.simulate_get_customer(
+            max_staleness="60",
+            params={"fields": "id"},
+        )
+        self.assertEqual(response.json, {"id": fixtures.CUSTOMER_ID})
+        self.assertEqual(self.gateway.calls, calls)
+
+        # Assert that stricter staleness requirements go to Braintree.
+        response = self.simulate_get_customer(max_staleness="0")
+        self.assertNotIn("X-Replica-Lag", response.headers)
+        self.assertGreater(self.gateway.calls, calls)
+
+        response = self.simulate_get_customer(max_staleness="soon")
+        self.assertEqual(response.status_code, 400)
+
+    def test_post_subscription(self):
+        """ Tests that created subscriptions are replicated and mark their
+            customer stale.
+        """
+
+        self.simulate_get_customer()
+
+        response = self.simulate_post(
+            path="/customer/{}/subscription".format(fixtures.CUSTOMER_ID),
+            body=json.dumps({
+                "payment_method_nonce": fixtures.PAYMENT_METHOD_NONCE,
+                "customer_id": fixtures.CUSTOMER_ID,
+                "plan_id": fixtures.PLAN_ID,
+            }),
+            headers=self.generate_jwt_headers(),
+        )
+        self.assertEqual(response.status_code, 201)
+        subscription_id = response.json["id"]
+        calls = self.gateway.calls
+
+        # Assert that the subscription is served from the replica through the
+        # policy of its route.
+        response = self.simulate_get(
+            path="/customer/{}/subscription/{}".format(
+                fixtures.CUSTOMER_ID,
+                subscription_id,
+            ),
+            headers=self.generate_jwt_headers(),
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("X-Replica-Lag", response.headers)
+        self.assertEqual(self.gateway.calls, calls)
+
+        # Assert that the stale customer is retrieved from Braintree.
+        response = self.simulate_get_customer(max_staleness="60")
+        self.assertNotIn("X-Replica-Lag", response.headers)
+        self.assertGreater(self.gateway.calls, calls)
+
+    def test_delete_customer(self):
+        """ Tests that deleted customers are removed from the replica."""
+
+        self.simulate_get_customer()
+
+        response = self.simulate_delete(
+            path="/customer/{}".format(fixtures.CUSTOMER_ID),
+            headers=self.generate_jwt_headers(),
+        )
+        self.assertEqual(response.status_code, 204)
+
+        response = self.simulate_get_customer(max_staleness="60")
+        self.assertEqual(response.status_code, 404)
+
+    def test_replica_error(self):
+        """ Tests that replica errors don't fail requests Braintree answered.
+        """
+
+        self.simulate_get_customer()
+
+        with unittest.mock.patch.object(
+            target=self.replica,
+            attribute="execute",
+            side_effect=ReplicaError("database is locked"),
+        ):
+            response = self.simulate_get_customer(max_staleness="60")
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("X-Replica-Lag", response.headers)
+
+            response = self.simulate_delete(
+                path="/customer/{}".format(fixtures.CUSTOMER_ID),
+                headers=self.generate_jwt_headers(),
+            )
+            self.assertEqual(response.status_code, 204)
@@ -85,7 +85,7 @@ class TestResourceClientTokenNoCustomerId(TestBase):
             response = self.simulate_get(
                 path="/client-token",
                 headers={
-                    "Authorization": self.token_generator.generate(),
+                    "Authorization": self.issuer.generate(),
                 }
             )  # type: falcon.testing.Result
 
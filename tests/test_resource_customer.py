@@ -51,6 +51,116 @@ class TestResourceCustomer(TestBase):
         # Assert that the request failed with a 404.
         self.assertEqual(response.status_code, 404)
 
+    def test_get_fields(self):
+        """ Tests the `on_get` method restricting the response through the
+            `fields` query parameter.
+        """
+
+        with unittest.mock.patch(
+            target="braintree.customer_gateway.CustomerGateway.find",
+            new=staticmethod(
+                lambda customer_id: fixtures.customer_with_credit_cards
+            ),
+        ):
+            response = self.simulate_get(
+                path="/customer/{}".format(fixtures.CUSTOMER_ID),
+                query_string="fields=id,email,credit_cards.token",
+                headers=self.generate_jwt_headers(),
+            )  # type: falcon.testing.Result
+
+        # Assert that the request was successful.
+        self.assertEqual(response.status_code, 200)
+
+        # Assert that only the requested fields were serialized.
+        self.assertEqual(
+            response.json,
+            {
+                "id": fixtures.CUSTOMER_ID,
+                "email": fixtures.CUSTOMER_EMAIL,
+                "credit_cards": [{"token": fixtures.PAYMENT_METHOD_TOKEN}],
+            }
+        )
+
+    def test_get_fields_400(self):
+        """ Tests the `on_get` method simulating a 400 response due to an
+            unknown field in the `fields` query parameter.
+        """
+
+        with unittest.mock.patch(
+            target="braintree.customer_gateway.CustomerGateway.find",
+            new=staticmethod(lambda customer_id: fixtures.customer),
+        ):
+            response = self.simulate_get(
+                path="/customer/{}".format(fixtures.CUSTOMER_ID),
+                query_string="fields=id,credit_cards.unknown",
+                headers=self.generate_jwt_headers(),
+            )  # type: falcon.testing.Result
+
+        # Assert that the request failed with a 400.
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_304(self):
+        """ Tests the `on_get` method simulating a 304 response through the
+            `If-None-Match` header.
+        """
+
+        with unittest.mock.patch(
+            target="braintree.customer_gateway.CustomerGateway.find",
+            new=staticmethod(lambda customer_id: fixtures.customer),
+        ):
+            response = self.simulate_get(
+                path="/customer/{}".format(fixtures.CUSTOMER_ID),
+                headers=self.generate_jwt_headers(),
+            )  # type: falcon.testing.Result
+
+            # Assert that the response carries an entity-tag.
+            etag = response.headers.get("ETag")
+            self.assertTrue(etag)
+
+            headers = self.generate_jwt_headers()
+            headers["If-None-Match"] = etag
+            response = self.simulate_get(
+                path="/customer/{}".format(fixtures.CUSTOMER_ID),
+                headers=headers,
+            )  # type: falcon.testing.Result
+
+        # Assert that the request was answered with a 304.
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers.get("ETag"), etag)
+
+    def test_get_stream(self):
+        """ Tests the `on_get` method streaming the response and asserts that
+            the streamed body is identical to the buffered one.
+        """
+
+        with unittest.mock.patch(
+            target="braintree.customer_gateway.CustomerGateway.find",
+            new=staticmethod(
+                lambda customer_id: fixtures.customer_with_payment_methods
+            ),
+        ):
+            response_buffered = self.simulate_get(
+                path="/customer/{}".format(fixtures.CUSTOMER_ID),
+                headers=self.generate_jwt_headers(),
+            )  # type: falcon.testing.Result
+
+            with unittest.mock.patch(
+                target=("braintree_server.resources.resource_customer."
+                        "ResourceCustomer.is_streamed"),
+                return_value=True,
+            ):
+                response_streamed = self.simulate_get(
+                    path="/customer/{}".format(fixtures.CUSTOMER_ID),
+                    headers=self.generate_jwt_headers(),
+                )  # type: falcon.testing.Result
+
+        # Assert that the requests were successful.
+        self.assertEqual(response_buffered.status_code, 200)
+        self.assertEqual(response_streamed.status_code, 200)
+
+        # Assert that the streamed body is byte-identical to the buffered one.
+        self.assertEqual(response_streamed.content, response_buffered.content)
+
     def test_post(self):
         """ Tests the `on_post` method."""
 
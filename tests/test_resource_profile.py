@@ -0,0 +1,123 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `ResourceProfile` class and the
+`Profiler` class it exposes.
+"""
+
+import os
+import json
+import tempfile
+import threading
+
+import attrdict
+
+from braintree_server.api import create_api
+from braintree_server.excs import ProfilerBusy
+from braintree_server.profiler import Profiler
+from tests.base import TestBase
+
+
+def spin(event: threading.Event):
+    """ Keeps a thread busy until an event is set."""
+
+    while not event.is_set():
+        sum(range(1000))
+
+
+class TestResourceProfile(TestBase):
+    """Tests the `ResourceProfile` class."""
+
+    def setUp(self):
+        super(TestResourceProfile, self).setUp()
+
+        # Create an API exposing the profiler.
+        cfg = attrdict.AttrDict(self.cfg)
+        cfg["profiler"] = {"enabled": True, "scope": "admin:profile"}
+        self.app = create_api(cfg=cfg, logger_level="CRITICAL")
+
+    def test_post_403(self):
+        """ Tests that access-tokens not granting the scope are refused."""
+
+        response = self.simulate_post(
+            path="/admin/profile",
+            headers=self.generate_jwt_headers(),
+            body=json.dumps({"duration": 0}),
+        )
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_post(self):
+        """ Tests capturing the stacks and allocations of a busy thread."""
+
+        event = threading.Event()
+        thread = threading.Thread(target=spin, args=(event,), name="spinner")
+        thread.start()
+
+        try:
+            response = self.simulate_post(
+                path="/admin/profile",
+                headers=self.generate_jwt_headers(
+                    claims={"scope": "read:customers admin:profile"},
+                ),
+                body=json.dumps({
+                    "duration": 0.2,
+                    "interval": 0.005,
+                    "allocations": True,
+                }),
+            )
+        finally:
+            event.set()
+            thread.join()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["pid"], os.getpid())
+        self.assertGreater(response.json["samples"], 1)
+        self.assertIsInstance(response.json["allocations"], list)
+
+        # Assert that the collapsed stacks are rooted at the thread name and
+        # include the function the thread was spinning in.
+        stacks = [
+            line.rsplit(" ", 1)[0].split(";")
+            for line in response.json["stacks"].splitlines()
+        ]
+        self.assertTrue(any(
+            stack[0] == "spinner" and stack[-1].startswith("spin ")
+            for stack in stacks
+        ))
+
+    def test_busy(self):
+        """ Tests that concurrent captures are refused."""
+
+        profiler = Profiler(logger_level="CRITICAL")
+        thread = threading.Thread(
+            target=profiler.capture,
+            kwargs={"duration": 0.2},
+        )
+        thread.start()
+
+        try:
+            # Wait for the capture to start.
+            while thread.is_alive():
+                try:
+                    profiler.capture(duration=0)
+                except ProfilerBusy:
+                    break
+            else:
+                self.fail("Capture did not overlap.")
+        finally:
+            thread.join()
+
+    def test_capture_to_files(self):
+        """ Tests writing captures to files as when triggered by signal."""
+
+        profiler = Profiler(
+            directory=tempfile.mkdtemp(),
+            logger_level="CRITICAL",
+        )
+
+        paths = profiler.capture_to_files(duration=0, allocations=True)
+
+        self.assertTrue(paths["stacks"].endswith(".collapsed"))
+        with open(paths["allocations"]) as fin:
+            self.assertIsInstance(json.load(fin), list)
@@ -45,6 +45,36 @@ class TestResourceSubscription(TestBase):
             fixtures.SUBSCRIPTION_BALANCE,
         )
 
+    def test_get_304(self):
+        """ Tests the `on_get` method simulating a 304 response through the
+            `If-None-Match` header.
+        """
+
+        with unittest.mock.patch(
+            target="braintree.subscription_gateway.SubscriptionGateway.find",
+            new=staticmethod(lambda subscription_id: fixtures.subscription),
+        ):
+            response = self.simulate_get(
+                path="/customer/{}/subscription/{}".format(
+                    fixtures.CUSTOMER_ID,
+                    fixtures.SUBSCRIPTION_ID,
+                ),
+                headers=self.generate_jwt_headers(),
+            )  # type: falcon.testing.Result
+
+            headers = self.generate_jwt_headers()
+            headers["If-None-Match"] = response.headers["ETag"]
+            response = self.simulate_get(
+                path="/customer/{}/subscription/{}".format(
+                    fixtures.CUSTOMER_ID,
+                    fixtures.SUBSCRIPTION_ID,
+                ),
+                headers=headers,
+            )  # type: falcon.testing.Result
+
+        # Assert that the request was answered with a 304.
+        self.assertEqual(response.status_code, 304)
+
     def test_get_404(self):
         """ Tests the `on_get` method simulating a 404 response."""
 
@@ -0,0 +1,160 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `ResourceWebhookBraintree` and
+`WebhookConsumer` classes.
+"""
+
+import unittest.mock
+import urllib.parse
+
+import attrdict
+import braintree
+
+from braintree_server.api import create_api
+from braintree_server.cache import CacheEntry
+from braintree_server.webhooks import WebhookConsumer
+from tests.base import TestBase
+from tests import fixtures
+
+
+class TestResourceWebhookBraintree(TestBase):
+    """Tests the `ResourceWebhookBraintree` class."""
+
+    def setUp(self):
+        super(TestResourceWebhookBraintree, self).setUp()
+
+        cfg = attrdict.AttrDict(self.cfg)
+        cfg["cache"] = {"ttl": 3600}
+        cfg["webhooks"] = {"enabled": True}
+        self.app = create_api(cfg=cfg, logger_level="CRITICAL")
+
+        # Retrieve the resource to access its cache and consumer.
+        self.resource = self.app._router.find("/webhooks/braintree")[0]
+        self.cache = self.resource.cache
+        self.consumer = self.resource.consumer
+
+        self.gateway = braintree.BraintreeGateway(
+            braintree.Configuration(
+                environment=self.cfg.braintree.environment,
+                merchant_id=self.cfg.braintree.merchant_id,
+                public_key=self.cfg.braintree.public_key,
+                private_key=self.cfg.braintree.private_key,
+            )
+        )
+
+    def tearDown(self):
+        self.consumer.stop(timeout=1.0)
+
+        super(TestResourceWebhookBraintree, self).tearDown()
+
+    def simulate_post_notification(self, notification: dict):
+        """ Simulates the posting of a webhook notification."""
+
+        return self.simulate_post(
+            path="/webhooks/braintree",
+            body=urllib.parse.urlencode(notification),
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+
+    def test_post(self):
+        """ Tests that notifications invalidate the cached responses of their
+            subscription and its customer.
+        """
+
+        keys = [
+            ("subscription", fixtures.SUBSCRIPTION_ID, None),
+            ("customer", fixtures.CUSTOMER_ID, None),
+            ("customer", "other_customer_id", None),
+        ]
+        for key in keys:
+            self.cache.set(key=key, entry=CacheEntry(body="{}"))
+
+        notification = self.gateway.webhook_testing.sample_notification(
+            kind=braintree.WebhookNotification.Kind.SubscriptionWentPastDue,
+            id=fixtures.SUBSCRIPTION_ID,
+        )
+        with unittest.mock.patch.object(
+            WebhookConsumer,
+            "get_customer_id",
+            return_value=fixtures.CUSTOMER_ID,
+        ):
+            response = self.simulate_post_notification(notification)
+            self.consumer.join()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(self.cache.get(key=keys[0]))
+        self.assertIsNone(self.cache.get(key=keys[1]))
+        self.assertIsNotNone(self.cache.get(key=keys[2]))
+
+    def test_post_invalid(self):
+        """ Tests that notifications with missing fields or mismatching
+            signatures are rejected.
+        """
+
+        response = self.simulate_post_notification({"bt_payload": "abc"})
+        self.assertEqual(response.status_code, 400)
+
+        notification = self.gateway.webhook_testing.sample_notification(
+            kind=braintree.WebhookNotification.Kind.SubscriptionCanceled,
+            id=fixtures.SUBSCRIPTION_ID,
+        )
+        notification["bt_signature"] = notification["bt_signature"][:-4]
+        response = self.simulate_post_notification(notification)
+        self.assertEqual(response.status_code, 403)
+
+    def test_post_queue_full(self):
+        """ Tests that notifications are refused with a 503 once the queue is
+            full so that Braintree retries them.
+        """
+
+        notification = self.gateway.webhook_testing.sample_notification(
+            kind=braintree.WebhookNotification.Kind.SubscriptionExpired,
+            id=fixtures.SUBSCRIPTION_ID,
+        )
+        with unittest.mock.patch.object(
+            self.consumer,
+            "submit",
+            return_value=False,
+        ):
+            response = self.simulate_post_notification(notification)
+
+        self.assertEqual(response.status_code, 503)
+
+
+class TestWebhookConsumer(unittest.TestCase):
+    """Tests the `WebhookConsumer` class."""
+
+    def test_get_customer_id(self):
+        """ Tests that the customer of a subscription is determined from its
+            transactions or its payment-method.
+        """
+
+        gateway = unittest.mock.Mock()
+        gateway.payment_method.find.return_value = attrdict.AttrDict(
+            customer_id="payment_method_customer_id",
+        )
+        consumer = WebhookConsumer(gateway=gateway, logger_level="CRITICAL")
+
+        subscription = braintree.Subscription(gateway, {
+            "id": fixtures.SUBSCRIPTION_ID,
+            "transactions": [{
+                "id": "transaction_id",
+                "amount": "10.00",
+                "customer": {"id": fixtures.CUSTOMER_ID},
+            }],
+        })
+        self.assertEqual(
+            consumer.get_customer_id(subscription=subscription),
+            fixtures.CUSTOMER_ID,
+        )
+
+        subscription = braintree.Subscription(gateway, {
+            "id": fixtures.SUBSCRIPTION_ID,
+            "payment_method_token": "token",
+            "transactions": [],
+        })
+        self.assertEqual(
+            consumer.get_customer_id(subscription=subscription),
+            "payment_method_customer_id",
+        )
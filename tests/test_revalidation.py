@@ -0,0 +1,176 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `Revalidator` class and the expired
+cached responses served while revalidating or upon Braintree errors.
+"""
+
+import threading
+import unittest
+import unittest.mock
+
+import attrdict
+import braintree.exceptions
+import requests.exceptions
+
+from braintree_server.api import create_api
+from braintree_server.gateway_fake import GatewayFake
+from braintree_server.revalidation import Revalidator
+from tests.base import TestBase
+from tests import fixtures
+
+
+class TestRevalidator(unittest.TestCase):
+    """Tests the `Revalidator` class."""
+
+    def test_submit(self):
+        """ Tests that a single refresh runs per key at a time."""
+
+        revalidator = Revalidator(max_workers=2, logger_level="CRITICAL")
+        event = threading.Event()
+        calls = []
+
+        def refresh():
+            event.wait(timeout=5)
+            calls.append(None)
+
+        self.assertTrue(revalidator.submit(key="a", refresh=refresh))
+        self.assertFalse(revalidator.submit(key="a", refresh=refresh))
+        self.assertTrue(revalidator.submit(key="b", refresh=refresh))
+
+        event.set()
+        revalidator.join(timeout=5)
+
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(revalidator.submit(key="a", refresh=refresh))
+        revalidator.join(timeout=5)
+
+    def test_run_failed(self):
+        """ Tests that failed refreshes don't prevent subsequent ones."""
+
+        revalidator = Revalidator(logger_level="CRITICAL")
+
+        def refresh():
+            raise ValueError("failed")
+
+        self.assertTrue(revalidator.submit(key="a", refresh=refresh))
+        revalidator.join(timeout=5)
+
+        self.assertTrue(revalidator.submit(key="a", refresh=refresh))
+        revalidator.join(timeout=5)
+
+
+class TestResourceStale(TestBase):
+    """Tests the expired cached responses served by the resources."""
+
+    def setUp(self):
+        super(TestResourceStale, self).setUp()
+
+        self.gateway = GatewayFake(logger_level="CRITICAL")
+        self.gateway.customer.create(params={
+            "id": fixtures.CUSTOMER_ID,
+            "email": fixtures.CUSTOMER_EMAIL,
+        })
+
+        self.cfg_cache = attrdict.AttrDict(self.cfg)
+        self.cfg_cache["cache"] = {
+            "ttl": 60,
+            "stale_while_revalidate": 30,
+            "stale_if_error": 600,
+        }
+
+        self.app = create_api(
+            cfg=self.cfg_cache,
+            logger_level="CRITICAL",
+            gateway=self.gateway,
+        )
+
+        self.resource = self.app._router.find("/customer/a")[0]
+
+    def simulate_get_customer(self):
+        return self.simulate_get(
+            path="/customer/{}".format(fixtures.CUSTOMER_ID),
+            headers=self.generate_jwt_headers(),
+        )
+
+    def expire(self, age: float):
+        """ Ages the cached responses by `age` seconds past their creation."""
+
+        for entry in self.resource.cache.entries.values():
+            entry.created -= age
+
+    def test_stale_while_revalidate(self):
+        """ Tests that expired responses are served while being refreshed in
+            the background.
+        """
+
+        response = self.simulate_get_customer()
+        self.assertEqual(response.status_code, 200)
+        calls = self.gateway.calls
+
+        self.expire(age=70)
+
+        response_stale = self.simulate_get_customer()
+        self.assertEqual(response_stale.status_code, 200)
+        self.assertEqual(response_stale.json, response.json)
+        self.assertIn("110", response_stale.headers["Warning"])
+        self.assertGreaterEqual(int(response_stale.headers["Age"]), 70)
+
+        # Assert that the background refresh replaced the expired response.
+        self.resource.revalidator.join(timeout=5)
+        self.assertEqual(self.gateway.calls, calls + 1)
+
+        response = self.simulate_get_customer()
+        self.assertNotIn("Warning", response.headers)
+        self.assertEqual(self.gateway.calls, calls + 1)
+
+        # Assert that responses past the window are retrieved from Braintree.
+        self.expire(age=95)
+
+        response = self.simulate_get_customer()
+        self.assertNotIn("Warning", response.headers)
+        self.assertEqual(self.gateway.calls, calls + 2)
+
+    def test_stale_if_error(self):
+        """ Tests that expired responses are served upon Braintree errors
+            within the stale-if-error window only.
+        """
+
+        response = self.simulate_get_customer()
+        self.assertEqual(response.status_code, 200)
+
+        self.gateway.error_rate = 1.0
+        self.expire(age=120)
+
+        response_stale = self.simulate_get_customer()
+        self.assertEqual(response_stale.status_code, 200)
+        self.assertEqual(response_stale.json, response.json)
+        self.assertIn("111", response_stale.headers["Warning"])
+
+        self.expire(age=600)
+
+        with self.assertRaises(braintree.exceptions.ServerError):
+            self.simulate_get_customer()
+
+    def test_stale_if_error_timeout(self):
+        """ Tests that expired responses are served upon Braintree timeouts
+            and connection failures.
+        """
+
+        response = self.simulate_get_customer()
+        self.assertEqual(response.status_code, 200)
+
+        self.expire(age=120)
+
+        for exc in (
+            requests.exceptions.ReadTimeout("timed out"),
+            requests.exceptions.ConnectionError("connection refused"),
+        ):
+            with unittest.mock.patch.object(
+                self.gateway.customer, "find", side_effect=exc,
+            ):
+                response_stale = self.simulate_get_customer()
+
+            self.assertEqual(response_stale.status_code, 200)
+            self.assertEqual(response_stale.json, response.json)
+            self.assertIn("111", response_stale.headers["Warning"])
@@ -0,0 +1,115 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the Sentry event filtering, bounded
+transport, and span recording under the `sentry` module.
+"""
+
+import sys
+import datetime
+import unittest
+import unittest.mock
+
+import braintree.exceptions
+import falcon
+import sentry_sdk
+from sentry_sdk.tracing import Span
+
+from braintree_server.metrics import metric_sentry_events_dropped
+from braintree_server.sentry import BackgroundWorkerBounded
+from braintree_server.sentry import before_send
+from braintree_server.sentry import record_span
+
+
+def get_exc_info(exc: Exception):
+    """ Returns the `exc_info` of a raised exception."""
+
+    try:
+        raise exc
+    except Exception:
+        return sys.exc_info()
+
+
+class TestSentry(unittest.TestCase):
+    """Tests the `sentry` module."""
+
+    def test_before_send(self):
+        """ Tests that client errors and expected exceptions are dropped."""
+
+        # Assert that client errors and missing resources are dropped.
+        for exc in (
+            falcon.HTTPNotFound(),
+            falcon.HTTPUnauthorized(),
+            braintree.exceptions.NotFoundError(),
+        ):
+            hint = {"exc_info": get_exc_info(exc)}
+            self.assertIsNone(before_send(event={}, hint=hint))
+
+        # Assert that server errors and unexpected exceptions are kept.
+        for exc in (
+            falcon.HTTPBadGateway(),
+            braintree.exceptions.ServerError(),
+            ValueError(),
+        ):
+            hint = {"exc_info": get_exc_info(exc)}
+            self.assertEqual(before_send(event={}, hint=hint), {})
+
+        # Assert that messages are kept.
+        self.assertEqual(before_send(event={}, hint={}), {})
+
+    def test_worker_bounded(self):
+        """ Tests that events exceeding the queue size are dropped and
+            counted.
+        """
+
+        metric = metric_sentry_events_dropped.labels()
+        dropped = metric.get()
+
+        worker = BackgroundWorkerBounded(queue_size=2)
+        # Prevent the worker thread from draining the queue.
+        worker._ensure_thread = lambda: None
+
+        for _ in range(5):
+            worker.submit(callback=lambda: None)
+
+        self.assertEqual(worker._queue.qsize(), 2)
+        self.assertEqual(worker.dropped, 3)
+        self.assertEqual(metric.get() - dropped, 3)
+
+    def test_record_span(self):
+        """ Tests that phases are recorded as spans of sampled transactions
+            only.
+        """
+
+        hub = sentry_sdk.Hub(sentry_sdk.Client())
+
+        with hub:
+            # Assert that no span is recorded outside transactions.
+            record_span(name="auth", duration_ns=1000000)
+
+            transaction = Span(transaction="test", sampled=True)
+            with hub.start_span(transaction):
+                record_span(
+                    name="braintree",
+                    duration_ns=5000000,
+                    description="GET customers",
+                )
+
+            spans = transaction._finished_spans[:-1]
+            self.assertEqual(len(spans), 1)
+            self.assertEqual(spans[0].op, "braintree")
+            self.assertEqual(spans[0].description, "GET customers")
+            self.assertGreaterEqual(
+                spans[0].timestamp - spans[0].start_timestamp,
+                datetime.timedelta(milliseconds=5),
+            )
+
+            # Assert that no span is recorded for unsampled transactions.
+            transaction = Span(transaction="test", sampled=False)
+            with hub.start_span(transaction), unittest.mock.patch.object(
+                target=Span,
+                attribute="new_span",
+            ) as new_span:
+                record_span(name="serialize", duration_ns=1000000)
+
+            new_span.assert_not_called()
@@ -0,0 +1,77 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `streaming` module.
+"""
+
+import unittest
+
+from braintree_server.resources.schemata import SchemaCustomer
+from braintree_server.resources.streaming import iter_dumps
+
+from tests import fixtures
+
+
+class TestIterDumps(unittest.TestCase):
+    """Tests the `iter_dumps` function."""
+
+    def test_iter_dumps(self):
+        """ Tests that the streamed JSON is byte-identical to the buffered
+            JSON.
+        """
+
+        schema = SchemaCustomer()
+
+        chunks = list(iter_dumps(
+            schema=schema,
+            obj=fixtures.customer_with_payment_methods,
+            chunk_size=1024,
+        ))
+
+        # Assert that the document was split into multiple chunks.
+        self.assertGreater(len(chunks), 1)
+
+        self.assertEqual(
+            b"".join(chunks),
+            schema.dumps(fixtures.customer_with_payment_methods).data.encode(),
+        )
+
+    def test_iter_dumps_only(self):
+        """ Tests that the streamed JSON is byte-identical to the buffered
+            JSON when the schema is restricted to a projection.
+        """
+
+        schema = SchemaCustomer(only=(
+            "customer_id",
+            "credit_cards.token",
+            "credit_cards.subscriptions.status",
+        ))
+
+        chunks = list(iter_dumps(
+            schema=schema,
+            obj=fixtures.customer_with_payment_methods,
+        ))
+
+        self.assertEqual(
+            b"".join(chunks),
+            schema.dumps(fixtures.customer_with_payment_methods).data.encode(),
+        )
+
+    def test_iter_dumps_empty(self):
+        """ Tests that the streamed JSON is byte-identical to the buffered
+            JSON for a customer without payment-methods.
+        """
+
+        schema = SchemaCustomer()
+
+        chunks = list(iter_dumps(
+            schema=schema,
+            obj=dict(fixtures.customer, credit_cards=[], paypal_accounts=None),
+        ))
+
+        self.assertEqual(
+            b"".join(chunks),
+            schema.dumps(
+                dict(fixtures.customer, credit_cards=[], paypal_accounts=None)
+            ).data.encode(),
+        )
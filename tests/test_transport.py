@@ -0,0 +1,174 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the record/replay HTTP strategies under the
+`transport` module.
+"""
+
+import os
+import time
+import datetime
+import functools
+import tempfile
+import unittest
+import unittest.mock
+
+import braintree
+import requests
+from braintree.util.http import Http
+from braintree.util.xml_util import XmlUtil
+
+from braintree_server.deadline import bind_deadline
+from braintree_server.deadline import unbind_deadline
+from braintree_server.excs import CassetteInteractionNotFound
+from braintree_server.excs import DeadlineExceeded
+from braintree_server.transport import Cassette
+from braintree_server.transport import HttpCounted
+from braintree_server.transport import HttpRecorder
+from braintree_server.transport import HttpReplayer
+from braintree_server.transport import scrub_xml
+from tests import fixtures
+
+
+MERCHANT_ID = "fake_merchant_id"
+
+customer_xml = XmlUtil.xml_from_dict({
+    "customer": {
+        "id": fixtures.CUSTOMER_ID,
+        "email": fixtures.CUSTOMER_EMAIL,
+        "merchant-id": MERCHANT_ID,
+        "created-at": datetime.datetime(2019, 1, 1),
+        "updated-at": datetime.datetime(2019, 1, 1),
+    }
+})
+
+
+def create_gateway(http_strategy) -> braintree.BraintreeGateway:
+    """ Creates a Braintree gateway using a given HTTP strategy."""
+
+    return braintree.BraintreeGateway(
+        braintree.Configuration(
+            environment="sandbox",
+            merchant_id=MERCHANT_ID,
+            public_key="fake_public_key",
+            private_key="fake_private_key",
+            http_strategy=http_strategy,
+        )
+    )
+
+
+class TestTransport(unittest.TestCase):
+    """Tests the `HttpRecorder` and `HttpReplayer` classes."""
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "cassette.jsonl")
+
+    def test_scrub_xml(self):
+        """ Tests the `scrub_xml` function."""
+
+        text = scrub_xml(
+            "<credit-card><number>4111111111111111</number>"
+            "<cvv type=\"string\">123</cvv></credit-card>"
+        )
+
+        self.assertEqual(
+            text,
+            "<credit-card><number>[scrubbed]</number>"
+            "<cvv type=\"string\">[scrubbed]</cvv></credit-card>"
+        )
+
+    def test_record_replay(self):
+        """ Tests recording an exchange and replaying it."""
+
+        cassette = Cassette(path=self.path)
+        gateway = create_gateway(
+            http_strategy=functools.partial(HttpRecorder, cassette=cassette),
+        )
+
+        with unittest.mock.patch.object(
+            target=Http,
+            attribute="http_do",
+            return_value=[200, customer_xml],
+        ):
+            gateway.customer.find(customer_id=fixtures.CUSTOMER_ID)
+
+        episodes = Cassette.load(path=self.path)
+
+        # Assert that the exchange was recorded with the merchant ID masked.
+        self.assertEqual(len(episodes), 1)
+        interaction = episodes[0]["interactions"][0]
+        self.assertEqual(
+            interaction["path"],
+            "/merchants/{{merchant_id}}/customers/{}".format(
+                fixtures.CUSTOMER_ID
+            ),
+        )
+        self.assertNotIn(MERCHANT_ID, interaction["response_body"])
+
+        gateway = create_gateway(
+            http_strategy=functools.partial(
+                HttpReplayer,
+                episodes=episodes,
+                latency_scale=0,
+            ),
+        )
+        transport = gateway.config.http_strategy()
+
+        customer = gateway.customer.find(customer_id=fixtures.CUSTOMER_ID)
+
+        # Assert that the recorded customer was replayed and the call counted.
+        self.assertEqual(customer.email, fixtures.CUSTOMER_EMAIL)
+        self.assertEqual(customer.merchant_id, MERCHANT_ID)
+        self.assertEqual(transport.get_calls_thread(), 1)
+
+        # Assert that exchanges which were not recorded can't be replayed.
+        with self.assertRaises(CassetteInteractionNotFound):
+            gateway.customer.find(customer_id="unknown")
+
+
+class TestHttpCounted(unittest.TestCase):
+    """Tests the `HttpCounted` class."""
+
+    def setUp(self):
+        self.gateway = create_gateway(http_strategy=HttpCounted)
+        self.token = bind_deadline(deadline=time.monotonic() + 5.0)
+
+    def tearDown(self):
+        unbind_deadline(self.token)
+
+    def test_http_do_bounded(self):
+        """ Tests that requests are bounded by the remaining budget without
+            altering the shared configuration.
+        """
+
+        response = unittest.mock.Mock(status_code=200, text=customer_xml)
+        with unittest.mock.patch.object(
+            target=requests,
+            attribute="get",
+            return_value=response,
+        ) as get:
+            customer = self.gateway.customer.find(fixtures.CUSTOMER_ID)
+
+        self.assertEqual(customer.id, fixtures.CUSTOMER_ID)
+        self.assertLessEqual(get.call_args[1]["timeout"], 5.0)
+        self.assertEqual(self.gateway.config.timeout, 60)
+
+    def test_http_do_bounded_exceeded(self):
+        """ Tests that requests timing out past the deadline raise
+            `DeadlineExceeded`.
+        """
+
+        unbind_deadline(self.token)
+        self.token = bind_deadline(deadline=time.monotonic() + 0.01)
+
+        def get(*args, **kwargs):
+            time.sleep(kwargs["timeout"])
+            raise requests.exceptions.ReadTimeout()
+
+        with unittest.mock.patch.object(
+            target=requests,
+            attribute="get",
+            side_effect=get,
+        ):
+            with self.assertRaises(DeadlineExceeded):
+                self.gateway.customer.find(fixtures.CUSTOMER_ID)
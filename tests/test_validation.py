@@ -0,0 +1,54 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `validation` module.
+"""
+
+import unittest
+
+from braintree_server.resources.schemata import SchemaCustomer
+from braintree_server.resources.schemata import SchemaSubscription
+from braintree_server.resources.validation import get_violations
+
+from tests import fixtures
+
+
+class TestGetViolations(unittest.TestCase):
+    """Tests the `get_violations` function."""
+
+    def test_get_violations(self):
+        """ Tests the `get_violations` function against a valid customer."""
+
+        violations = get_violations(
+            schema=SchemaCustomer(),
+            obj=fixtures.customer_with_payment_methods,
+        )
+
+        self.assertEqual(violations, {})
+
+    def test_get_violations_invalid(self):
+        """ Tests the `get_violations` function against a subscription with
+            an invalid status.
+        """
+
+        violations = get_violations(
+            schema=SchemaSubscription(),
+            obj=dict(fixtures.subscription, status="Unknown"),
+        )
+
+        self.assertEqual(list(violations.keys()), ["status"])
+
+    def test_get_violations_invalid_nested(self):
+        """ Tests the `get_violations` function against a customer with a
+            credit-card of an invalid type.
+        """
+
+        violations = get_violations(
+            schema=SchemaCustomer(),
+            obj=dict(
+                fixtures.customer,
+                credit_cards=[dict(fixtures.credit_card, card_type="Fake")],
+            ),
+        )
+
+        self.assertEqual(list(violations.keys()), ["credit_cards.0.card_type"])
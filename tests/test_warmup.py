@@ -0,0 +1,213 @@
+# coding=utf-8
+
+"""
+This module defines unit-tests for the `CacheSnapshot` class and the
+`warm_up` function.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+import attrdict
+
+from braintree_server.api import create_api
+from braintree_server.cache import CacheEntry
+from braintree_server.cache import CacheMemory
+from braintree_server.gateway_fake import GatewayFake
+from braintree_server.warmup import CacheSnapshot
+from braintree_server.warmup import warm_up
+from tests.base import TestBase
+from tests import fixtures
+
+
+class TestCacheSnapshot(unittest.TestCase):
+    """Tests the `CacheSnapshot` class."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="braintree-gateway-test-")
+        self.path = os.path.join(self.directory, "cache.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def create_snapshot(self) -> CacheSnapshot:
+        return CacheSnapshot(
+            path=self.path,
+            cache=CacheMemory(ttl=60),
+            logger_level="CRITICAL",
+        )
+
+    def test_save_load(self):
+        """ Tests that non-expired entries are restored keeping their age."""
+
+        snapshot = self.create_snapshot()
+        snapshot.cache.set(
+            key=("customer", "a", ("email", "id")),
+            entry=CacheEntry(body='{"id": "a"}', etag='"a"'),
+        )
+        snapshot.cache.set(
+            key=("customer", "expired", None),
+            entry=CacheEntry(body="{}", created=0),
+        )
+
+        self.assertEqual(snapshot.save(), 1)
+
+        snapshot_loaded = self.create_snapshot()
+        self.assertEqual(snapshot_loaded.load(), 1)
+
+        entry = snapshot_loaded.cache.get(
+            key=("customer", "a", ("email", "id")),
+        )
+        self.assertEqual(entry.body, '{"id": "a"}')
+        self.assertEqual(entry.etag, '"a"')
+
+        # Assert that entries expire after their original time-to-live.
+        with open(self.path) as fin:
+            data = json.load(fin)
+        data["saved"] -= 59.5
+        with open(self.path, "w") as fout:
+            json.dump(data, fout)
+
+        snapshot_loaded = self.create_snapshot()
+        self.assertEqual(snapshot_loaded.load(), 1)
+        self.assertIsNotNone(
+            snapshot_loaded.cache.get(key=("customer", "a", ("email", "id")))
+        )
+
+        data["saved"] -= 1
+        with open(self.path, "w") as fout:
+            json.dump(data, fout)
+
+        self.assertEqual(self.create_snapshot().load(), 0)
+
+    def test_save_mode(self):
+        """ Tests that snapshots are only readable by their owner regardless
+            of the umask or leftover temporary files.
+        """
+
+        snapshot = self.create_snapshot()
+        snapshot.cache.set(
+            key=("customer", "a", None),
+            entry=CacheEntry(body='{"id": "a"}'),
+        )
+
+        path_tmp = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(path_tmp, "w"):
+            pass
+        os.chmod(path_tmp, 0o644)
+
+        umask = os.umask(0o022)
+        try:
+            self.assertEqual(snapshot.save(), 1)
+        finally:
+            os.umask(umask)
+
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        self.assertFalse(os.path.exists(path_tmp))
+
+    def test_load_invalid(self):
+        """ Tests that missing or corrupt snapshots are skipped."""
+
+        snapshot = self.create_snapshot()
+        self.assertEqual(snapshot.load(), 0)
+
+        with open(self.path, "w") as fout:
+            fout.write("{")
+
+        self.assertEqual(snapshot.load(), 0)
+
+    def test_warm_up(self):
+        """ Tests that serializers are created for the snapshot projections."""
+
+        snapshot = self.create_snapshot()
+        snapshot.cache.set(
+            key=("customer", "a", ("id",)),
+            entry=CacheEntry(body="{}"),
+        )
+        snapshot.cache.set(
+            key=("client_token", "a", None),
+            entry=CacheEntry(body="{}"),
+        )
+        snapshot.save()
+
+        schemas = []
+        counts = warm_up(
+            snapshot=self.create_snapshot(),
+            schemas={"customer": lambda fields: schemas.append(fields)},
+            jwks_keys=1,
+            logger_level="CRITICAL",
+        )
+
+        self.assertEqual(
+            counts,
+            {"cached": 2, "serializers": 2, "jwks_keys": 1},
+        )
+        self.assertEqual(sorted(schemas, key=str), [("id",), None])
+
+
+class TestResourceWarmUp(TestBase):
+    """Tests the responses served from the loaded cache snapshot."""
+
+    def setUp(self):
+        super(TestResourceWarmUp, self).setUp()
+
+        self.directory = tempfile.mkdtemp(prefix="braintree-gateway-test-")
+
+        self.gateway = GatewayFake(logger_level="CRITICAL")
+        self.gateway.customer.create(params={
+            "id": fixtures.CUSTOMER_ID,
+            "email": fixtures.CUSTOMER_EMAIL,
+        })
+
+        self.cfg_cache = attrdict.AttrDict(self.cfg)
+        self.cfg_cache["cache"] = {
+            "ttl": 60,
+            "snapshot": {
+                "enabled": True,
+                "path": os.path.join(self.directory, "cache.json"),
+            },
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+        super(TestResourceWarmUp, self).tearDown()
+
+    def create_app(self):
+        return create_api(
+            cfg=self.cfg_cache,
+            logger_level="CRITICAL",
+            gateway=self.gateway,
+        )
+
+    def test_get(self):
+        """ Tests that responses cached before a restart are served."""
+
+        path = "/customer/{}".format(fixtures.CUSTOMER_ID)
+
+        self.app = self.create_app()
+        response = self.simulate_get(
+            path=path,
+            headers=self.generate_jwt_headers(),
+        )
+        self.assertEqual(response.status_code, 200)
+        calls = self.gateway.calls
+
+        # Save the snapshot as the worker would have before being recycled.
+        CacheSnapshot(
+            path=self.cfg_cache["cache"]["snapshot"]["path"],
+            cache=self.app._router.find(path)[0].cache,
+            logger_level="CRITICAL",
+        ).save()
+
+        self.app = self.create_app()
+        response_warm = self.simulate_get(
+            path=path,
+            headers=self.generate_jwt_headers(),
+        )
+        self.assertEqual(response_warm.status_code, 200)
+        self.assertEqual(response_warm.content, response.content)
+        self.assertEqual(self.gateway.calls, calls)
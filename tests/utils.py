@@ -2,12 +2,18 @@
 
 """
 This module defines the `JwtTokenGenerator` which can be used to generate
-Auth0 access-tokens used in unit-testing.
+Auth0 access-tokens used in unit-testing and the `JwtIssuerLocal` which mints
+equivalent access-tokens offline with a locally generated RSA key.
 """
 
 import json
+import time
+import base64
+from typing import Dict, Optional
 
 import requests
+from Crypto.PublicKey import RSA
+from jose import jwt
 
 from braintree_server.loggers import create_logger
 from braintree_server.excs import Auth0TokenRetrievalError
@@ -90,3 +96,127 @@ class JwtTokenGenerator(object):
             msg_fmt = msg.format(self.auth0_oauth_url)
             self.logger.error(msg_fmt)
             raise Auth0TokenRetrievalError(msg_fmt)
+
+
+class JwtIssuerLocal(object):
+    """ Class meant to mint access-tokens signed with a locally generated RSA
+        key and to provide the matching JSON Web Key Set so that the Auth0
+        middleware can be used without access to Auth0.
+    """
+
+    def __init__(
+        self,
+        auth0_domain: str,
+        auth0_audience: str,
+        subject: str,
+        key_id: str = "local",
+        key_size: int = 2048,
+    ):
+        """ Constructor.
+
+        Args:
+            auth0_domain (str): The Auth0 domain used to assemble the issuer.
+            auth0_audience (str): The Auth0 audience.
+            subject (str): The default subject of the minted tokens, e.g., the
+                `<client_id>@clients` subject of service-to-service tokens.
+            key_id (str): The key ID set in the token headers and the JWKS.
+            key_size (int): The size of the generated RSA key in bits.
+        """
+
+        # Internalize arguments.
+        self.auth0_domain = auth0_domain
+        self.auth0_audience = auth0_audience
+        self.subject = subject
+        self.key_id = key_id
+
+        # Generate the RSA key.
+        self.key = RSA.generate(key_size)
+        self.key_pem = self.key.exportKey().decode("utf-8")
+
+    @staticmethod
+    def _encode_int(value: int) -> str:
+        """ Encodes an integer into the unpadded base64url representation used
+            in JSON Web Keys.
+
+        Args:
+            value (int): The integer to be encoded.
+
+        Returns:
+            str: The encoded integer.
+        """
+
+        value_bytes = value.to_bytes((value.bit_length() + 7) // 8, "big")
+
+        return base64.urlsafe_b64encode(value_bytes).rstrip(b"=").decode()
+
+    @property
+    def jwks(self) -> Dict:
+        """ Returns the JSON Web Key Set with the public part of the key.
+
+        Returns:
+            Dict: The JWKS.
+        """
+
+        return {
+            "keys": [
+                {
+                    "kty": "RSA",
+                    "kid": self.key_id,
+                    "use": "sig",
+                    "n": self._encode_int(self.key.n),
+                    "e": self._encode_int(self.key.e),
+                }
+            ]
+        }
+
+    def write_jwks(self, fname: str) -> str:
+        """ Writes the JSON Web Key Set to a file and returns its `file` URL
+            which can be set as the `auth0.jwks_url` setting.
+
+        Args:
+            fname (str): The path of the file to be written.
+
+        Returns:
+            str: The `file` URL of the written file.
+        """
+
+        with open(fname, "w") as fout:
+            json.dump(self.jwks, fout)
+
+        return "file://{}".format(fname)
+
+    def generate(
+        self,
+        claims: Optional[Dict] = None,
+        expires_in: int = 3600,
+    ) -> str:
+        """ Mints an access-token.
+
+        Args:
+            claims (Optional[Dict] = None): Claims overriding the defaults,
+                e.g., `{"aud": "other"}` to mint a token for the wrong
+                audience.
+            expires_in (int): The number of seconds until the token expires.
+                Negative values mint expired tokens.
+
+        Returns:
+            str: The access-token.
+        """
+
+        now = int(time.time())
+
+        payload = {
+            "iss": "https://{}/".format(self.auth0_domain),
+            "sub": self.subject,
+            "aud": self.auth0_audience,
+            "iat": now,
+            "exp": now + expires_in,
+        }
+        payload.update(claims or {})
+
+        return jwt.encode(
+            payload,
+            self.key_pem,
+            algorithm="RS256",
+            headers={"kid": self.key_id},
+        )